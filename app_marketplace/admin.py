@@ -31,6 +31,8 @@ from .models import (
     WhatsappMessage,
     WhatsappProduct,
     WhatsappOrder,
+    OutboxEvent,
+    TermoClassificacao,
     GroupLinkRequest,
     ShopperOnboardingToken,
     AddressKeeperOnboardingToken,
@@ -392,7 +394,7 @@ class AddressKeeperAdmin(admin.ModelAdmin):
             'fields': ('user',)
         }),
         ('Localização', {
-            'fields': ('apelido_local', 'rua', 'numero', 'complemento', 'bairro', 'cidade', 'estado', 'cep', 'pais')
+            'fields': ('apelido_local', 'rua', 'numero', 'complemento', 'bairro', 'cidade', 'estado', 'cep', 'pais', 'latitude', 'longitude')
         }),
         ('Capacidade e Taxas', {
             'fields': ('capacidade_itens', 'ocupacao_percent', 'taxa_guarda_dia', 'taxa_motoboy')
@@ -772,6 +774,43 @@ class WhatsappOrderAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['idempotency_key', 'tipo', 'order', 'status', 'tentativas', 'disponivel_em', 'processado_em']
+    list_filter = ['status', 'tipo', 'criado_em']
+    search_fields = ['idempotency_key', 'order__order_number']
+    readonly_fields = ['idempotency_key', 'payload', 'resultado', 'ultimo_erro', 'locked_at', 'criado_em', 'processado_em']
+    raw_id_fields = ['order']
+    
+    actions = ['reprocessar_eventos']
+    
+    def reprocessar_eventos(self, request, queryset):
+        """Devolve os eventos selecionados para a outbox"""
+        from django.utils import timezone
+        
+        updated = queryset.exclude(status=OutboxEvent.Status.DONE).update(
+            status=OutboxEvent.Status.PENDING,
+            tentativas=0,
+            locked_at=None,
+            disponivel_em=timezone.now()
+        )
+        self.message_user(request, f"✅ {updated} evento(s) devolvido(s) para a outbox")
+    
+    reprocessar_eventos.short_description = "Reprocessar eventos selecionados"
+    
+    def has_add_permission(self, request):
+        # Eventos são criados apenas pelo fechamento de pedidos
+        return False
+
+
+@admin.register(TermoClassificacao)
+class TermoClassificacaoAdmin(admin.ModelAdmin):
+    list_display = ['termo', 'categoria', 'rotulo', 'prioridade', 'ativo', 'atualizado_em']
+    list_filter = ['categoria', 'ativo']
+    list_editable = ['rotulo', 'prioridade', 'ativo']
+    search_fields = ['termo', 'rotulo']
+
+
 # ============================================================================
 # ADMIN KMN - KEEPER MESH NETWORK
 # ============================================================================
@@ -1125,35 +1164,25 @@ class PublicacaoAgoraAdmin(admin.ModelAdmin):
         })
     )
     
-    def get_queryset(self, request):
-        """Anotar estatísticas para exibição"""
-        qs = super().get_queryset(request)
-        from django.db.models import Count, Sum, Q
-        return qs.annotate(
-            _total_views=Count('engajamentos', filter=Q(engajamentos__tipo='view')),
-            _total_likes=Count('engajamentos', filter=Q(engajamentos__tipo='like')),
-            _total_add_carrinho=Count('engajamentos', filter=Q(engajamentos__tipo='add_carrinho')),
-        )
-    
     def spark_score_admin(self, obj):
         return f"{obj.spark_score:.2f}"
     spark_score_admin.short_description = 'Spark Score'
     spark_score_admin.admin_order_field = 'spark_score'
     
     def total_views_admin(self, obj):
-        return getattr(obj, '_total_views', 0)
+        return obj.total_views
     total_views_admin.short_description = 'Views'
-    total_views_admin.admin_order_field = '_total_views'
+    total_views_admin.admin_order_field = 'total_views'
     
     def total_likes_admin(self, obj):
-        return getattr(obj, '_total_likes', 0)
+        return obj.total_likes
     total_likes_admin.short_description = 'Likes'
-    total_likes_admin.admin_order_field = '_total_likes'
+    total_likes_admin.admin_order_field = 'total_likes'
     
     def total_add_carrinho_admin(self, obj):
-        return getattr(obj, '_total_add_carrinho', 0)
+        return obj.total_add_carrinho
     total_add_carrinho_admin.short_description = 'Add Carrinho'
-    total_add_carrinho_admin.admin_order_field = '_total_add_carrinho'
+    total_add_carrinho_admin.admin_order_field = 'total_add_carrinho'
     
     def get_urls(self):
         """Adicionar URLs customizadas para dashboard e PPA em lote"""
@@ -6,9 +6,14 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count, Sum, F, Case, When, IntegerField
-from django.utils import timezone
+from django.db.models import F, Case, When, IntegerField
+from django.utils.http import http_date, parse_http_date_safe
 from django.contrib.auth.models import User
+from django.conf import settings
+from datetime import datetime
+from decimal import Decimal
+import base64
+import json
 
 from .models import (
     PublicacaoAgora, EngajamentoAgora, Produto, Evento,
@@ -16,9 +21,10 @@ from .models import (
 )
 from .serializers import (
     PublicacaoAgoraSerializer, PublicacaoAgoraCreateSerializer,
-    EngajamentoAgoraSerializer, EngajamentoAgoraCreateSerializer,
-    PublicacaoAgoraAnalyticsSerializer
+    EngajamentoAgoraSerializer, EngajamentoAgoraCreateSerializer
 )
+from . import agora_engajamento
+from .agora_ranking import LEADERBOARD_TAMANHO, LEADERBOARD_TTL, calcular_spark_score_inicial, obter_leaderboard
 
 
 class PublicacaoAgoraViewSet(viewsets.ModelViewSet):
@@ -41,7 +47,7 @@ class PublicacaoAgoraViewSet(viewsets.ModelViewSet):
         """Feed com algoritmo de recomendação"""
         queryset = PublicacaoAgora.objects.filter(ativo=True).select_related(
             'autor', 'produto', 'evento'
-        ).prefetch_related('engajamentos')
+        )
         
         # Filtros opcionais
         autor_id = self.request.query_params.get('autor_id')
@@ -59,17 +65,9 @@ class PublicacaoAgoraViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(mesh_type=mesh_type)
         
         # Ordenação por algoritmo de recomendação
-        # Combina spark_score, PPA e engajamento
-        queryset = queryset.annotate(
-            total_engajamentos=Count('engajamentos'),
-            total_likes_anotado=Count('engajamentos', filter=Q(engajamentos__tipo='like')),
-            total_views_anotado=Count('engajamentos', filter=Q(engajamentos__tipo='view')),
-        ).order_by(
-            '-spark_score',
-            '-ppa',
-            '-total_engajamentos',
-            '-criado_em'
-        )
+        # spark_score já incorpora o engajamento (recalculado por agora_ranking);
+        # mesma ordem do feed, coberta pelo índice composto
+        queryset = queryset.order_by(*[f'-{campo}' for campo in PublicacaoAgora.ORDEM_FEED])
         
         return queryset
     
@@ -90,19 +88,78 @@ class PublicacaoAgoraViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Criar engajamento
-        engajamento = EngajamentoAgora.objects.create(
-            publicacao=publicacao,
+        # Criar engajamento (e incrementar os contadores da publicação)
+        engajamento = agora_engajamento.registrar_engajamento(
+            publicacao.id,
+            tipo,
             usuario=request.user if request.user.is_authenticated else None,
-            tipo=tipo,
-            view_time_segundos=view_time_segundos if tipo == 'view' else 0,
+            view_time_segundos=view_time_segundos,
             ip_address=self._get_client_ip(request),
             user_agent=request.META.get('HTTP_USER_AGENT', '')
         )
+        engajamento.publicacao = publicacao
         
         serializer = EngajamentoAgoraSerializer(engajamento)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
+    @action(detail=False, methods=['post'], url_path='engajamentos')
+    def registrar_engajamentos(self, request):
+        """
+        Registra engajamentos em lote (views do feed, likes...).
+        
+        Body: {"eventos": [{"publicacao_id": 1, "tipo": "view", "view_time_segundos": 3}, ...]}
+        
+        Os eventos vão para o buffer de ingestão e são gravados em lote
+        (views repetidas na mesma janela são agrupadas); retorna 202.
+        """
+        eventos = request.data.get('eventos') if isinstance(request.data, dict) else request.data
+        if not isinstance(eventos, list) or not eventos:
+            return Response(
+                {'error': 'Envie uma lista de eventos em "eventos"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        max_eventos = getattr(settings, 'AGORA_ENGAJAMENTO_MAX_EVENTOS', 100)
+        if len(eventos) > max_eventos:
+            return Response(
+                {'error': f'Máximo de {max_eventos} eventos por requisição'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        tipos_validos = {choice[0] for choice in EngajamentoAgora.TipoEngajamento.choices}
+        usuario_id = request.user.id if request.user.is_authenticated else None
+        ip_address = self._get_client_ip(request)
+        user_agent = request.META.get('HTTP_USER_AGENT', '')
+        
+        aceitos = 0
+        rejeitados = []
+        for indice, evento in enumerate(eventos):
+            try:
+                publicacao_id = int(evento.get('publicacao_id'))
+                view_time_segundos = max(0, int(evento.get('view_time_segundos') or 0))
+            except (AttributeError, TypeError, ValueError):
+                rejeitados.append({'indice': indice, 'error': 'publicacao_id/view_time_segundos inválidos'})
+                continue
+            tipo = evento.get('tipo')
+            if tipo not in tipos_validos:
+                rejeitados.append({'indice': indice, 'error': 'Tipo de engajamento inválido'})
+                continue
+            
+            agora_engajamento.engajamento_buffer.adicionar(
+                publicacao_id,
+                tipo,
+                usuario_id=usuario_id,
+                view_time_segundos=view_time_segundos,
+                ip_address=ip_address,
+                user_agent=user_agent
+            )
+            aceitos += 1
+        
+        return Response(
+            {'aceitos': aceitos, 'rejeitados': rejeitados},
+            status=status.HTTP_202_ACCEPTED
+        )
+    
     def _get_client_ip(self, request):
         """Obtém o IP do cliente"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -113,49 +170,73 @@ class PublicacaoAgoraViewSet(viewsets.ModelViewSet):
         return ip
 
 
+def _codificar_cursor(publicacao):
+    """Cursor opaco com os valores de ordenação da última publicação da página"""
+    valores = []
+    for campo in PublicacaoAgora.ORDEM_FEED:
+        valor = getattr(publicacao, campo)
+        valores.append(valor.isoformat() if hasattr(valor, 'isoformat') else str(valor))
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode()
+
+
+def _decodificar_cursor(cursor):
+    """Valores de ordenação do cursor (ou None se inválido)"""
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        spark_score, ppa, likes, views, criado_em, pk = valores
+        return [
+            Decimal(spark_score), Decimal(ppa), int(likes), int(views),
+            datetime.fromisoformat(criado_em), int(pk)
+        ]
+    except (ValueError, TypeError, ArithmeticError):
+        return None
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def agora_feed(request):
     """
     Endpoint principal do feed Ágora.
     Retorna publicações ordenadas por algoritmo de recomendação.
+    
+    Paginação por cursor (keyset): ``?limit=10&cursor=<next_cursor>``. A ordenação
+    usa apenas colunas da publicação, cobertas pelo índice composto do feed.
     """
-    limit = int(request.GET.get('limit', 10))
-    offset = int(request.GET.get('offset', 0))
+    limit = max(1, min(int(request.GET.get('limit', 10)), 100))
+    cursor = request.GET.get('cursor')
     
     # Algoritmo de recomendação determinístico
     queryset = PublicacaoAgora.objects.filter(ativo=True).select_related(
         'autor', 'produto', 'evento'
-    ).prefetch_related('engajamentos')
-    
-    # Anotar estatísticas
-    queryset = queryset.annotate(
-        total_views_anotado=Count('engajamentos', filter=Q(engajamentos__tipo='view')),
-        total_likes_anotado=Count('engajamentos', filter=Q(engajamentos__tipo='like')),
-        total_add_carrinho_anotado=Count('engajamentos', filter=Q(engajamentos__tipo='add_carrinho')),
-        total_compartilhar_anotado=Count('engajamentos', filter=Q(engajamentos__tipo='compartilhar')),
-        total_view_time_anotado=Sum('engajamentos__view_time_segundos', filter=Q(engajamentos__tipo='view'))
     )
     
+    # Página seguinte: (spark_score, ppa, likes, views, criado_em, id) < cursor
+    if cursor:
+        valores = _decodificar_cursor(cursor)
+        if valores is None:
+            return Response({'error': 'Cursor inválido'}, status=status.HTTP_400_BAD_REQUEST)
+        tabela = PublicacaoAgora._meta.db_table
+        colunas = ', '.join(f'"{tabela}"."{campo}"' for campo in PublicacaoAgora.ORDEM_FEED)
+        queryset = queryset.extra(
+            where=[f"({colunas}) < ({', '.join(['%s'] * len(valores))})"],
+            params=valores
+        )
+    
     # Ordenação: spark_score + PPA + engajamento + recência
-    queryset = queryset.order_by(
-        '-spark_score',
-        '-ppa',
-        '-total_likes_anotado',
-        '-total_views_anotado',
-        '-criado_em'
-    )
+    queryset = queryset.order_by(*[f'-{campo}' for campo in PublicacaoAgora.ORDEM_FEED])
     
-    # Paginação
-    publicacoes = queryset[offset:offset + limit]
+    # Buscar um item a mais para saber se há próxima página
+    publicacoes = list(queryset[:limit + 1])
+    tem_proxima = len(publicacoes) > limit
+    publicacoes = publicacoes[:limit]
     
     serializer = PublicacaoAgoraSerializer(publicacoes, many=True)
+    next_cursor = _codificar_cursor(publicacoes[-1]) if tem_proxima else None
     
     return Response({
         'results': serializer.data,
-        'count': queryset.count(),
-        'next': f"?limit={limit}&offset={offset + limit}" if offset + limit < queryset.count() else None,
-        'previous': f"?limit={limit}&offset={max(0, offset - limit)}" if offset > 0 else None
+        'next_cursor': next_cursor,
+        'next': f"?limit={limit}&cursor={next_cursor}" if next_cursor else None,
     })
 
 
@@ -192,86 +273,30 @@ def agora_analytics(request):
     """
     Endpoint para analytics/ranking do Ágora.
     Retorna top publicações por spark_score e engajamento.
-    """
-    limit = int(request.GET.get('limit', 50))
-    
-    queryset = PublicacaoAgora.objects.filter(ativo=True).select_related(
-        'autor', 'produto'
-    ).prefetch_related('engajamentos')
     
-    # Anotar todas as estatísticas
-    queryset = queryset.annotate(
-        total_views_anotado=Count('engajamentos', filter=Q(engajamentos__tipo='view')),
-        total_likes_anotado=Count('engajamentos', filter=Q(engajamentos__tipo='like')),
-        total_add_carrinho_anotado=Count('engajamentos', filter=Q(engajamentos__tipo='add_carrinho')),
-        total_compartilhar_anotado=Count('engajamentos', filter=Q(engajamentos__tipo='compartilhar')),
-        total_view_time_anotado=Sum('engajamentos__view_time_segundos', filter=Q(engajamentos__tipo='view'))
-    ).order_by('-spark_score', '-total_likes_anotado')[:limit]
-    
-    # Montar dados para serializer
-    analytics_data = []
-    for pub in queryset:
-        analytics_data.append({
-            'id': pub.id,
-            'autor_id': pub.autor.id,
-            'autor_nome': pub.autor.get_full_name() or pub.autor.username,
-            'produto_id': pub.produto.id if pub.produto else None,
-            'produto_nome': pub.produto.nome if pub.produto else None,
-            'produto_imagem': pub.produto.imagem if pub.produto else None,
-            'video_url': pub.video_url,
-            'imagem_url': pub.imagem_url,
-            'spark_score': pub.spark_score,
-            'ppa': pub.ppa,
-            'mesh_type': pub.mesh_type,
-            'total_views': pub.total_views_anotado or 0,
-            'total_likes': pub.total_likes_anotado or 0,
-            'total_add_carrinho': pub.total_add_carrinho_anotado or 0,
-            'total_compartilhar': pub.total_compartilhar_anotado or 0,
-            'total_view_time': int(pub.total_view_time_anotado or 0),
-            'criado_em': pub.criado_em
-        })
-    
-    serializer = PublicacaoAgoraAnalyticsSerializer(analytics_data, many=True)
-    return Response(serializer.data)
-
-
-def calcular_spark_score_inicial(publicacao):
-    """
-    Calcula o SparkScore inicial de uma publicação.
-    Versão determinística inicial - pode ser melhorada com IA depois.
+    Servido do leaderboard materializado (agora_ranking.obter_leaderboard), com
+    ETag/Last-Modified: polling repetido recebe 304 sem tocar no banco.
     """
-    score = 0.0
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), LEADERBOARD_TAMANHO)
+    except ValueError:
+        limit = 50
     
-    # Base: 10 pontos
-    score += 10.0
+    leaderboard = obter_leaderboard()
+    etag = f'"{leaderboard["versao"]}-{limit}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(leaderboard['gerado_em']),
+        'Cache-Control': f'public, max-age={LEADERBOARD_TTL}',
+    }
     
-    # Produto vinculado: +20
-    if publicacao.produto:
-        score += 20.0
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        nao_modificado = etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    else:
+        desde = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        nao_modificado = desde is not None and leaderboard['gerado_em'] <= desde
+    if nao_modificado:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
     
-    # Vídeo: +15 (mais engajamento)
-    if publicacao.video_url:
-        score += 15.0
-    elif publicacao.imagem_url:
-        score += 10.0
-    
-    # Evento/Campanha ativa: +25
-    if publicacao.evento:
-        agora = timezone.now()
-        if publicacao.evento.data_inicio <= agora <= publicacao.evento.data_fim:
-            score += 25.0
-    
-    # Mesh type: Mall = +5, Mesh Forte = +15, Mesh Fraca = +10
-    if publicacao.mesh_type == PublicacaoAgora.TipoMesh.MALL:
-        score += 5.0
-    elif publicacao.mesh_type == PublicacaoAgora.TipoMesh.MESH_FORTE:
-        score += 15.0
-    elif publicacao.mesh_type == PublicacaoAgora.TipoMesh.MESH_FRACA:
-        score += 10.0
-    
-    # PPA: multiplicador (0.0-1.0) * 30
-    score += float(publicacao.ppa) * 30.0
-    
-    # Limitar a 100
-    return min(score, 100.0)
-
+    return Response(leaderboard['itens'][:limit], headers=headers)
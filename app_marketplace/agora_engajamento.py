@@ -0,0 +1,282 @@
+"""
+Engajamento do Ágora - Contadores e Ingestão em Lote
+====================================================
+
+Contadores de engajamento denormalizados em ``PublicacaoAgora``
+(``total_views``, ``total_likes``...). Cada engajamento registrado incrementa
+os contadores com ``F()`` (sem ler a linha), e ``reconciliar_contadores``
+recalcula periodicamente a partir de ``EngajamentoAgora`` para corrigir
+desvios (engajamentos removidos pelo admin, falhas parciais).
+
+Eventos de alto volume (views do feed) entram pelo ``engajamento_buffer``:
+acumulados em memória, com views repetidas do mesmo usuário/publicação
+agrupadas por janela, e gravados em lote (``bulk_create`` + um incremento de
+contadores por publicação) quando o buffer enche ou o intervalo expira.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import EngajamentoAgora, PublicacaoAgora
+
+logger = logging.getLogger(__name__)
+
+# Tipo de engajamento -> coluna contadora
+CONTADORES = {
+    EngajamentoAgora.TipoEngajamento.VIEW: 'total_views',
+    EngajamentoAgora.TipoEngajamento.LIKE: 'total_likes',
+    EngajamentoAgora.TipoEngajamento.ADD_CARRINHO: 'total_add_carrinho',
+    EngajamentoAgora.TipoEngajamento.COMPARTILHAR: 'total_compartilhar',
+}
+CAMPOS_CONTADORES = [*CONTADORES.values(), 'total_view_time', 'total_engajamentos']
+
+
+def deltas_engajamentos(engajamentos: Iterable[EngajamentoAgora]) -> Dict[int, Dict[str, int]]:
+    """Incrementos de contadores por publicação para uma lista de engajamentos"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for engajamento in engajamentos:
+        delta = deltas[engajamento.publicacao_id]
+        delta['total_engajamentos'] += 1
+        campo = CONTADORES.get(engajamento.tipo)
+        if campo:
+            delta[campo] += 1
+        if engajamento.tipo == EngajamentoAgora.TipoEngajamento.VIEW:
+            delta['total_view_time'] += engajamento.view_time_segundos or 0
+    return deltas
+
+
+def aplicar_deltas(deltas: Dict[int, Dict[str, int]]):
+    """
+    Incrementa atomicamente (``F()``) os contadores de cada publicação
+
+    Também marca ``ultimo_engajamento_em`` para o recálculo incremental do SparkScore.
+    """
+    agora = timezone.now()
+    for publicacao_id, delta in deltas.items():
+        incrementos = {campo: F(campo) + valor for campo, valor in delta.items() if valor}
+        if incrementos:
+            PublicacaoAgora.objects.filter(pk=publicacao_id).update(ultimo_engajamento_em=agora, **incrementos)
+
+
+def registrar_engajamento(publicacao_id: int, tipo: str, usuario=None, view_time_segundos: int = 0,
+                          ip_address: Optional[str] = None, user_agent: str = '') -> EngajamentoAgora:
+    """Cria o engajamento e incrementa os contadores na mesma transação"""
+    with transaction.atomic():
+        engajamento = EngajamentoAgora.objects.create(
+            publicacao_id=publicacao_id,
+            usuario=usuario,
+            tipo=tipo,
+            view_time_segundos=view_time_segundos if tipo == EngajamentoAgora.TipoEngajamento.VIEW else 0,
+            ip_address=ip_address,
+            user_agent=user_agent[:255],
+        )
+        aplicar_deltas(deltas_engajamentos([engajamento]))
+    return engajamento
+
+
+def reconciliar_contadores(publicacao_ids: Optional[Iterable[int]] = None, batch_size: int = 500) -> int:
+    """
+    Recalcula os contadores a partir de ``EngajamentoAgora``
+
+    Uma agregação por lote de publicações; grava apenas as que divergem.
+
+    Returns:
+        Número de publicações corrigidas
+    """
+    publicacoes = PublicacaoAgora.objects.order_by('pk')
+    if publicacao_ids is not None:
+        publicacoes = publicacoes.filter(pk__in=list(publicacao_ids))
+
+    corrigidas = 0
+    ultimo_id = 0
+    while True:
+        lote = list(publicacoes.filter(pk__gt=ultimo_id).only('pk', *CAMPOS_CONTADORES)[:batch_size])
+        if not lote:
+            break
+        ultimo_id = lote[-1].pk
+
+        agregados = {
+            linha['publicacao_id']: linha
+            for linha in EngajamentoAgora.objects.filter(
+                publicacao_id__in=[p.pk for p in lote]
+            ).values('publicacao_id').annotate(
+                total_engajamentos=Count('id'),
+                total_view_time=Sum('view_time_segundos', filter=Q(tipo=EngajamentoAgora.TipoEngajamento.VIEW)),
+                **{
+                    campo: Count('id', filter=Q(tipo=tipo))
+                    for tipo, campo in CONTADORES.items()
+                }
+            ).order_by()
+        }
+
+        alteradas = []
+        for publicacao in lote:
+            linha = agregados.get(publicacao.pk, {})
+            mudou = False
+            for campo in CAMPOS_CONTADORES:
+                valor = linha.get(campo) or 0
+                if getattr(publicacao, campo) != valor:
+                    setattr(publicacao, campo, valor)
+                    mudou = True
+            if mudou:
+                alteradas.append(publicacao)
+
+        if alteradas:
+            PublicacaoAgora.objects.bulk_update(alteradas, CAMPOS_CONTADORES)
+            corrigidas += len(alteradas)
+
+    if corrigidas:
+        logger.info(f"[AGORA] Contadores reconciliados: {corrigidas} publicação(ões) corrigida(s)")
+    return corrigidas
+
+
+# ============================================================================
+# INGESTÃO EM LOTE
+# ============================================================================
+
+class EngajamentoBuffer:
+    """
+    Buffer de engajamentos em memória (por processo)
+
+    - Views do mesmo usuário (ou IP, se anônimo) na mesma publicação dentro de
+      ``janela_views`` segundos viram um único engajamento (tempo somado)
+    - Flush quando o buffer atinge ``max_eventos`` ou a cada ``intervalo`` segundos
+      (thread em background) e no encerramento do processo
+
+    Uso:
+        engajamento_buffer.adicionar(publicacao_id, 'view', usuario_id=..., view_time_segundos=3)
+    """
+
+    def __init__(self, max_eventos: int, intervalo: float, janela_views: int):
+        self.max_eventos = max_eventos
+        self.intervalo = intervalo
+        self.janela_views = janela_views
+        self._eventos: Dict[tuple, Dict] = {}
+        self._sequencia = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def _chave(self, evento: Dict) -> tuple:
+        if evento['tipo'] == EngajamentoAgora.TipoEngajamento.VIEW and self.janela_views > 0:
+            janela = int(evento['timestamp'] // self.janela_views)
+            autor = evento['usuario_id'] or evento['ip_address']
+            if autor:
+                return ('view', evento['publicacao_id'], autor, janela)
+        # Demais eventos nunca são agrupados
+        self._sequencia += 1
+        return ('evento', self._sequencia)
+
+    def adicionar(self, publicacao_id: int, tipo: str, usuario_id: Optional[int] = None,
+                  view_time_segundos: int = 0, ip_address: Optional[str] = None, user_agent: str = ''):
+        """Enfileira um engajamento (já validado) para o próximo flush"""
+        evento = {
+            'publicacao_id': publicacao_id,
+            'tipo': tipo,
+            'usuario_id': usuario_id,
+            'view_time_segundos': view_time_segundos if tipo == EngajamentoAgora.TipoEngajamento.VIEW else 0,
+            'ip_address': ip_address,
+            'user_agent': (user_agent or '')[:255],
+            'timestamp': time.time(),
+        }
+        with self._lock:
+            chave = self._chave(evento)
+            existente = self._eventos.get(chave)
+            if existente:
+                existente['view_time_segundos'] += evento['view_time_segundos']
+            else:
+                self._eventos[chave] = evento
+            cheio = len(self._eventos) >= self.max_eventos
+            self._iniciar_thread()
+
+        if cheio:
+            self.flush()
+
+    def _iniciar_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name='agora-engajamento-flush', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"[AGORA] Erro no flush de engajamentos: {str(e)}", exc_info=True)
+            finally:
+                close_old_connections()
+
+    def pendentes(self) -> int:
+        with self._lock:
+            return len(self._eventos)
+
+    def flush(self) -> int:
+        """
+        Grava os engajamentos acumulados (``bulk_create``) e aplica os contadores
+
+        Returns:
+            Número de engajamentos gravados
+        """
+        with self._flush_lock:
+            with self._lock:
+                eventos = list(self._eventos.values())
+                self._eventos = {}
+            if not eventos:
+                return 0
+
+            # Publicações removidas/desativadas desde o evento são descartadas
+            ativas = set(PublicacaoAgora.objects.filter(
+                pk__in={e['publicacao_id'] for e in eventos}, ativo=True
+            ).values_list('pk', flat=True))
+            engajamentos = [
+                EngajamentoAgora(
+                    publicacao_id=e['publicacao_id'],
+                    usuario_id=e['usuario_id'],
+                    tipo=e['tipo'],
+                    view_time_segundos=e['view_time_segundos'],
+                    ip_address=e['ip_address'],
+                    user_agent=e['user_agent'],
+                )
+                for e in eventos if e['publicacao_id'] in ativas
+            ]
+
+            try:
+                with transaction.atomic():
+                    EngajamentoAgora.objects.bulk_create(engajamentos, batch_size=500)
+                    aplicar_deltas(deltas_engajamentos(engajamentos))
+            except Exception:
+                # Devolver ao buffer para a próxima tentativa (descartar após 3 falhas)
+                with self._lock:
+                    for evento in eventos:
+                        evento['tentativas'] = evento.get('tentativas', 0) + 1
+                        if evento['tentativas'] < 3:
+                            self._eventos.setdefault(self._chave(evento), evento)
+                raise
+
+        logger.debug(f"[AGORA] Flush de engajamentos: {len(engajamentos)} gravado(s)")
+        return len(engajamentos)
+
+
+engajamento_buffer = EngajamentoBuffer(
+    max_eventos=getattr(settings, 'AGORA_ENGAJAMENTO_BUFFER_SIZE', 500),
+    intervalo=getattr(settings, 'AGORA_ENGAJAMENTO_FLUSH_SECONDS', 5.0),
+    janela_views=getattr(settings, 'AGORA_VIEW_COALESCE_SECONDS', 30),
+)
+
+
+@atexit.register
+def _flush_ao_encerrar():
+    try:
+        engajamento_buffer.flush()
+    except Exception as e:
+        logger.error(f"[AGORA] Engajamentos perdidos no encerramento: {str(e)}")
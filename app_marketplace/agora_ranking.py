@@ -0,0 +1,324 @@
+"""
+Ranking do Ágora - SparkScore
+=============================
+
+``spark_score`` = pontuação estática da publicação (produto, mídia, evento,
+mesh) + PPA x 30 + componente de engajamento (até ``PONTOS_ENGAJAMENTO``).
+
+O engajamento é acumulado com decaimento exponencial (meia-vida configurável):
+
+    acumulado(t) = acumulado(t0) * exp(-λ (t - t0)) + Σ peso(e) * exp(-λ (t - t_e))
+
+``recalcular_spark_scores`` processa apenas publicações com engajamento novo
+desde o último cálculo (``ultimo_engajamento_em > score_calculado_em``) - e as
+que ficaram sem recálculo por ``AGORA_SCORE_MAX_IDADE_HORAS``, para que o
+decaimento também as alcance. A soma ponderada e decaída é calculada no banco,
+uma agregação por lote, e o resultado volta com ``bulk_update``.
+
+``criado_em``/``ultimo_engajamento_em`` são marcados antes do commit do flush,
+então o cálculo é feito até ``agora - MARGEM_SEGUNDOS`` (e é esse instante
+que vai para ``score_calculado_em``): um engajamento que ainda não estava
+visível fica depois da marca e entra no próximo recálculo, sem ser contado
+duas vezes.
+
+O ranking público (``/api/agora/analytics/``) é servido do leaderboard
+materializado: rematerializado a cada recálculo com mudanças e, no máximo,
+a cada ``AGORA_LEADERBOARD_TTL`` segundos.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Exp, Extract
+from django.utils import timezone
+
+from .models import EngajamentoAgora, PublicacaoAgora
+
+logger = logging.getLogger(__name__)
+
+MEIA_VIDA_HORAS = getattr(settings, 'AGORA_SCORE_MEIA_VIDA_HORAS', 24.0)
+MAX_IDADE_HORAS = getattr(settings, 'AGORA_SCORE_MAX_IDADE_HORAS', 6.0)
+# Atraso da marca de cálculo: intervalo do flush + duração máxima da transação
+MARGEM_SEGUNDOS = (
+    getattr(settings, 'AGORA_ENGAJAMENTO_FLUSH_SECONDS', 5.0)
+    + getattr(settings, 'AGORA_SCORE_MARGEM_COMMIT_SEGUNDOS', 30.0)
+)
+LAMBDA = math.log(2) / (MEIA_VIDA_HORAS * 3600)  # por segundo
+
+# Peso de cada tipo de engajamento no acumulado
+PESOS = {
+    EngajamentoAgora.TipoEngajamento.VIEW: 1.0,
+    EngajamentoAgora.TipoEngajamento.VER_DETALHES: 2.0,
+    EngajamentoAgora.TipoEngajamento.LIKE: 3.0,
+    EngajamentoAgora.TipoEngajamento.COMPARTILHAR: 5.0,
+    EngajamentoAgora.TipoEngajamento.ADD_CARRINHO: 8.0,
+}
+PESO_SEGUNDO_VISUALIZADO = 0.05
+
+# Componente de engajamento: PONTOS_ENGAJAMENTO * (1 - exp(-acumulado / ESCALA_ENGAJAMENTO))
+PONTOS_ENGAJAMENTO = 25.0
+ESCALA_ENGAJAMENTO = 50.0
+
+# PPA: taxa de ações (carrinho/compartilhar/like) por view, suavizada para poucas views
+PPA_PRIOR = 0.1
+PPA_PESO_PRIOR = 20
+
+
+def pontuacao_base(publicacao) -> float:
+    """Pontos estáticos da publicação (sem PPA e sem engajamento)"""
+    score = 0.0
+
+    # Base: 10 pontos
+    score += 10.0
+
+    # Produto vinculado: +20
+    if publicacao.produto_id:
+        score += 20.0
+
+    # Vídeo: +15 (mais engajamento)
+    if publicacao.video_url:
+        score += 15.0
+    elif publicacao.imagem_url:
+        score += 10.0
+
+    # Evento/Campanha ativa: +25
+    if publicacao.evento:
+        agora = timezone.now()
+        if publicacao.evento.data_inicio <= agora <= publicacao.evento.data_fim:
+            score += 25.0
+
+    # Mesh type: Mall = +5, Mesh Forte = +15, Mesh Fraca = +10
+    if publicacao.mesh_type == PublicacaoAgora.TipoMesh.MALL:
+        score += 5.0
+    elif publicacao.mesh_type == PublicacaoAgora.TipoMesh.MESH_FORTE:
+        score += 15.0
+    elif publicacao.mesh_type == PublicacaoAgora.TipoMesh.MESH_FRACA:
+        score += 10.0
+
+    return score
+
+
+def calcular_spark_score_inicial(publicacao):
+    """
+    Calcula o SparkScore inicial de uma publicação.
+    Versão determinística inicial - pode ser melhorada com IA depois.
+    """
+    score = pontuacao_base(publicacao)
+
+    # PPA: multiplicador (0.0-1.0) * 30
+    score += float(publicacao.ppa) * 30.0
+
+    # Limitar a 100
+    return min(score, 100.0)
+
+
+def calcular_ppa(publicacao) -> float:
+    """PPA a partir dos contadores: ações ponderadas por view, com prior bayesiano"""
+    acoes = publicacao.total_add_carrinho + 0.5 * publicacao.total_compartilhar + 0.2 * publicacao.total_likes
+    ppa = (acoes + PPA_PRIOR * PPA_PESO_PRIOR) / (publicacao.total_views + PPA_PESO_PRIOR)
+    return min(max(ppa, 0.0), 1.0)
+
+
+def _engajamento_decaido_desde(publicacao_ids: List[int], inicio_por_publicacao: Dict[int, Optional[object]], agora) -> Dict[int, float]:
+    """
+    Σ peso * exp(-λ (agora - criado_em)) dos engajamentos novos, por publicação
+
+    Uma agregação no banco; os limites inferiores (último cálculo) variam por
+    publicação, então o filtro fino é feito com ``Q`` por grupo de início.
+    """
+    segundos_atras = Value(agora.timestamp(), output_field=FloatField()) - Cast(
+        Extract('criado_em', 'epoch'), FloatField()
+    )
+    fator = Exp(segundos_atras * Value(-LAMBDA, output_field=FloatField()))
+    peso = Case(
+        *[When(tipo=tipo, then=Value(p)) for tipo, p in PESOS.items()],
+        default=Value(0.0),
+        output_field=FloatField(),
+    ) + Case(
+        When(
+            tipo=EngajamentoAgora.TipoEngajamento.VIEW,
+            then=Cast(F('view_time_segundos'), FloatField()) * Value(PESO_SEGUNDO_VISUALIZADO),
+        ),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+    # Agrupar publicações pelo mesmo início reduz o tamanho do filtro
+    por_inicio = {}
+    for publicacao_id in publicacao_ids:
+        por_inicio.setdefault(inicio_por_publicacao.get(publicacao_id), []).append(publicacao_id)
+    filtro = Q()
+    for inicio, ids in por_inicio.items():
+        condicao = Q(publicacao_id__in=ids)
+        if inicio is not None:
+            condicao &= Q(criado_em__gt=inicio)
+        filtro |= condicao
+
+    linhas = EngajamentoAgora.objects.filter(filtro, criado_em__lte=agora).values('publicacao_id').annotate(
+        soma=Sum(peso * fator, output_field=FloatField())
+    ).order_by()
+    return {linha['publicacao_id']: linha['soma'] or 0.0 for linha in linhas}
+
+
+def recalcular_spark_scores(batch_size: int = 500, publicacao_ids: Optional[List[int]] = None) -> int:
+    """
+    Recalcula ``spark_score``/``ppa`` das publicações com engajamento novo
+
+    Args:
+        batch_size: Publicações por lote (uma agregação + um bulk_update cada)
+        publicacao_ids: Forçar o recálculo destas publicações
+
+    Returns:
+        Número de publicações atualizadas
+    """
+    # Instante de referência do cálculo, atrasado para alcançar flushes ainda não commitados
+    agora = timezone.now() - timedelta(seconds=MARGEM_SEGUNDOS)
+    if publicacao_ids is not None:
+        candidatas = PublicacaoAgora.objects.filter(pk__in=publicacao_ids)
+    else:
+        candidatas = PublicacaoAgora.objects.filter(ativo=True).filter(
+            Q(ultimo_engajamento_em__isnull=False, score_calculado_em__isnull=True) |
+            Q(ultimo_engajamento_em__gt=F('score_calculado_em')) |
+            Q(score_calculado_em__lt=agora - timedelta(hours=MAX_IDADE_HORAS), engajamento_decaido__gt=0.01)
+        )
+    candidatas = candidatas.select_related('evento').order_by('pk')
+
+    atualizadas = 0
+    ultimo_id = 0
+    while True:
+        lote = list(candidatas.filter(pk__gt=ultimo_id)[:batch_size])
+        if not lote:
+            break
+        ultimo_id = lote[-1].pk
+
+        novos = _engajamento_decaido_desde(
+            [p.pk for p in lote],
+            {p.pk: p.score_calculado_em for p in lote},
+            agora
+        )
+        for publicacao in lote:
+            decorrido = (agora - publicacao.score_calculado_em).total_seconds() if publicacao.score_calculado_em else 0.0
+            acumulado = publicacao.engajamento_decaido * math.exp(-LAMBDA * max(decorrido, 0.0))
+            acumulado += novos.get(publicacao.pk, 0.0)
+
+            ppa = calcular_ppa(publicacao)
+            componente = PONTOS_ENGAJAMENTO * (1 - math.exp(-acumulado / ESCALA_ENGAJAMENTO))
+            score = min(pontuacao_base(publicacao) + ppa * 30.0 + componente, 100.0)
+
+            publicacao.engajamento_decaido = acumulado
+            publicacao.ppa = Decimal(str(round(ppa, 2)))
+            publicacao.spark_score = Decimal(str(round(score, 2)))
+            publicacao.score_calculado_em = agora
+
+        PublicacaoAgora.objects.bulk_update(
+            lote, ['engajamento_decaido', 'ppa', 'spark_score', 'score_calculado_em']
+        )
+        atualizadas += len(lote)
+
+    if atualizadas:
+        logger.info(f"[AGORA] SparkScore recalculado para {atualizadas} publicação(ões)")
+        materializar_leaderboard()
+    return atualizadas
+
+
+# ============================================================================
+# LEADERBOARD MATERIALIZADO (GET /api/agora/analytics/)
+# ============================================================================
+
+LEADERBOARD_CACHE_KEY = 'agora:leaderboard'
+LEADERBOARD_TAMANHO = getattr(settings, 'AGORA_LEADERBOARD_TAMANHO', 100)
+LEADERBOARD_TTL = getattr(settings, 'AGORA_LEADERBOARD_TTL', 60)
+
+# Cópia local do processo: com o DummyCache (Railway) o cache compartilhado
+# não guarda nada, e cada processo reaproveita sua própria materialização
+_leaderboard_local: Optional[Dict] = None
+_leaderboard_lock = threading.RLock()
+
+
+def materializar_leaderboard() -> Dict:
+    """
+    Monta o top ``LEADERBOARD_TAMANHO`` por ``spark_score``/likes e grava no cache
+
+    Returns:
+        ``{'itens': [...], 'versao': <hash do conteúdo>, 'gerado_em': <epoch>}``
+    """
+    global _leaderboard_local
+    from .serializers import PublicacaoAgoraAnalyticsSerializer
+
+    publicacoes = PublicacaoAgora.objects.filter(ativo=True).select_related(
+        'autor', 'produto'
+    ).order_by('-spark_score', '-total_likes', '-id')[:LEADERBOARD_TAMANHO]
+
+    itens = PublicacaoAgoraAnalyticsSerializer(
+        [
+            {
+                'id': pub.id,
+                'autor_id': pub.autor_id,
+                'autor_nome': pub.autor.get_full_name() or pub.autor.username,
+                'produto_id': pub.produto_id,
+                'produto_nome': pub.produto.nome if pub.produto else None,
+                'produto_imagem': pub.produto.imagem if pub.produto else None,
+                'video_url': pub.video_url,
+                'imagem_url': pub.imagem_url,
+                'spark_score': pub.spark_score,
+                'ppa': pub.ppa,
+                'mesh_type': pub.mesh_type,
+                'total_views': pub.total_views,
+                'total_likes': pub.total_likes,
+                'total_add_carrinho': pub.total_add_carrinho,
+                'total_compartilhar': pub.total_compartilhar,
+                'total_view_time': pub.total_view_time,
+                'criado_em': pub.criado_em,
+            }
+            for pub in publicacoes
+        ],
+        many=True
+    ).data
+    itens = json.loads(json.dumps(itens, default=str))
+
+    anterior = _leaderboard_local or cache.get(LEADERBOARD_CACHE_KEY)
+    versao = hashlib.sha256(json.dumps(itens, sort_keys=True).encode()).hexdigest()[:16]
+    if anterior and anterior['versao'] == versao:
+        # Conteúdo igual: manter gerado_em para não invalidar If-Modified-Since
+        leaderboard = {**anterior, 'atualizado_em': time.time()}
+    else:
+        leaderboard = {'itens': itens, 'versao': versao, 'gerado_em': int(time.time()), 'atualizado_em': time.time()}
+
+    with _leaderboard_lock:
+        _leaderboard_local = leaderboard
+    try:
+        cache.set(LEADERBOARD_CACHE_KEY, leaderboard, LEADERBOARD_TTL)
+    except Exception as e:
+        logger.warning(f"[AGORA] Falha ao gravar leaderboard no cache: {str(e)}")
+    return leaderboard
+
+
+def obter_leaderboard() -> Dict:
+    """Leaderboard materializado (cache compartilhado, cópia local ou nova materialização)"""
+    try:
+        leaderboard = cache.get(LEADERBOARD_CACHE_KEY)
+    except Exception:
+        leaderboard = None
+    if leaderboard:
+        return leaderboard
+
+    local = _leaderboard_local
+    if local and time.time() - local['atualizado_em'] < LEADERBOARD_TTL:
+        return local
+
+    with _leaderboard_lock:
+        # Uma materialização por processo; as demais threads aguardam o resultado
+        local = _leaderboard_local
+        if local and time.time() - local['atualizado_em'] < LEADERBOARD_TTL:
+            return local
+        return materializar_leaderboard()
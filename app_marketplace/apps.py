@@ -7,4 +7,9 @@ class AppMarketplaceConfig(AppConfig):
     
     def ready(self):
         """Registra signals quando o app estiver pronto"""
-        import app_marketplace.signals_whatsapp  # noqa
\ No newline at end of file
+        import app_marketplace.signals_whatsapp  # noqa
+        import app_marketplace.signals_kmn  # noqa
+        import app_marketplace.signals_keepers  # noqa
+        import app_marketplace.signals_classificador  # noqa
+        import app_marketplace.signals_esquema  # noqa
+        import app_marketplace.signals_catalogo  # noqa
\ No newline at end of file
@@ -15,13 +15,15 @@ from .models import (
     Cliente, Pedido, Pacote, PedidoPacote, EnderecoEntrega,
     WhatsappOrder, PagamentoIntent, MovimentoPacote, FotoPacote,
     WhatsappGroup, WhatsappParticipant, ProdutoJSON,
-    RelacionamentoClienteShopper, PersonalShopper, LigacaoMesh, TrustlineKeeper
+    RelacionamentoClienteShopper, PersonalShopper
 )
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 import json
 from decimal import Decimal
-from .utils import build_image_url
+from .product_images import imagens_do_produto
+from .kmn_graph import grafo_kmn
+from .schema_registry import esquema
 
 
 # ============================================================================
@@ -42,28 +44,14 @@ def client_dashboard(request):
         return redirect('home')
     
     # ========== PEDIDOS ==========
-    # Usar query raw para evitar problemas com campos que não existem no banco
-    from django.db import connection
-    
+    # Consultar o registro de esquema para evitar campos que não existem no banco
     try:
-        # Verificar quais campos existem na tabela
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name='app_marketplace_pedido'
-            """)
-            columns = [row[0] for row in cursor.fetchall()]
-        
         # Campos básicos que sempre devem existir
         campos_base = ['id', 'cliente_id', 'status', 'valor_total', 'criado_em', 'atualizado_em']
-        campos_existentes = [campo for campo in campos_base if campo in columns]
         
-        # Adicionar campos opcionais se existirem
+        # Campos opcionais (adicionados se a coluna existir)
         campos_opcionais = ['metodo_pagamento', 'observacoes', 'codigo_rastreamento']
-        for campo in campos_opcionais:
-            if campo in columns:
-                campos_existentes.append(campo)
+        campos_existentes = esquema.campos_existentes(Pedido, campos_base + campos_opcionais)
         
         # Usar .only() apenas com campos que existem
         pedidos = Pedido.objects.filter(cliente=cliente).only(*campos_existentes).order_by('-criado_em')
@@ -390,69 +378,16 @@ def client_products(request):
         messages.error(request, "Perfil de cliente não encontrado.")
         return redirect('home')
     
-    # 1. Buscar shoppers que o cliente está seguindo
-    relacionamentos = RelacionamentoClienteShopper.objects.filter(
+    # 1. Usuários (owners) dos shoppers que o cliente está seguindo
+    shoppers_seguidos = RelacionamentoClienteShopper.objects.filter(
         cliente=cliente,
-        status=RelacionamentoClienteShopper.Status.SEGUINDO
-    ).select_related('personal_shopper', 'personal_shopper__user', 'personal_shopper__agente_profile', 'personal_shopper__agente_profile__user')
+        status=RelacionamentoClienteShopper.Status.SEGUINDO,
+        personal_shopper__user__isnull=False
+    ).values_list('personal_shopper__user_id', flat=True)
     
     # IDs dos usuários (owners) dos shoppers seguidos e conectados via KMN
-    users_com_mesh = set()
-    
-    # Adicionar os próprios shoppers seguidos e buscar conexões KMN
-    for relacao in relacionamentos:
-        if relacao.personal_shopper and relacao.personal_shopper.user:
-            shopper_user = relacao.personal_shopper.user
-            users_com_mesh.add(shopper_user.id)
-            
-            # Buscar LigacaoMesh onde este shopper está envolvido (se existir)
-            try:
-                mesh_ligacoes = LigacaoMesh.objects.filter(
-                    (Q(agente_a=shopper_user) | Q(agente_b=shopper_user)),
-                    ativo=True
-                ).select_related('agente_a', 'agente_b')
-                
-                # Adicionar os outros agentes das ligações Mesh
-                for mesh in mesh_ligacoes:
-                    if mesh.agente_a_id == shopper_user.id:
-                        users_com_mesh.add(mesh.agente_b_id)
-                    elif mesh.agente_b_id == shopper_user.id:
-                        users_com_mesh.add(mesh.agente_a_id)
-            except Exception:
-                # LigacaoMesh pode não estar disponível, continuar
-                pass
-            
-            # Buscar TrustlineKeeper (KMN) via Agente
-            try:
-                # Verificar se o PersonalShopper tem um Agente vinculado
-                if hasattr(relacao.personal_shopper, 'agente_profile') and relacao.personal_shopper.agente_profile:
-                    agente_shopper = relacao.personal_shopper.agente_profile
-                    
-                    # Buscar TrustlineKeeper ativas onde este agente está envolvido
-                    trustlines = TrustlineKeeper.objects.filter(
-                        (Q(agente_a=agente_shopper) | Q(agente_b=agente_shopper)),
-                        status=TrustlineKeeper.StatusTrustline.ATIVA
-                    ).select_related('agente_a__user', 'agente_b__user', 'agente_a__personal_shopper', 'agente_b__personal_shopper')
-                    
-                    # Para cada trustline, pegar o outro agente e seu PersonalShopper (se existir)
-                    for trustline in trustlines:
-                        outro_agente = None
-                        if trustline.agente_a == agente_shopper:
-                            outro_agente = trustline.agente_b
-                        else:
-                            outro_agente = trustline.agente_a
-                        
-                        # Se o outro agente tem um PersonalShopper vinculado, adicionar o User dele
-                        if outro_agente and hasattr(outro_agente, 'personal_shopper') and outro_agente.personal_shopper:
-                            outro_shopper_user = outro_agente.personal_shopper.user
-                            if outro_shopper_user:
-                                users_com_mesh.add(outro_shopper_user.id)
-            except Exception as e:
-                # TrustlineKeeper ou Agente podem não estar disponíveis, continuar
-                import traceback
-                print(f"Erro ao buscar TrustlineKeeper: {e}")
-                traceback.print_exc()
-                pass
+    # (LigacaoMesh ativa ou TrustlineKeeper ativa com outro shopper - grafo em memória)
+    users_com_mesh = grafo_kmn.owners_alcancaveis(shoppers_seguidos)
     
     # 2. Buscar grupos dos agentes conectados via Mesh (incluindo os seguidos diretamente)
     grupos_validos = WhatsappGroup.objects.filter(
@@ -490,20 +425,7 @@ def client_products(request):
         dados = pj.get_produto_data() if hasattr(pj, 'get_produto_data') else {}
         produto_data = dados.get('produto', {}) if isinstance(dados, dict) else {}
         
-        imagens = produto_data.get('imagens') or []
-        image_urls = []
-        if isinstance(imagens, list):
-            for img in imagens:
-                url = None
-                if isinstance(img, str):
-                    url = img
-                elif isinstance(img, dict):
-                    url = img.get('url') or img.get('src') or img.get('path') or img.get('image_url')
-                if url:
-                    built = build_image_url(url) or url
-                    image_urls.append(built)
-        if not image_urls and pj.imagem_original:
-            image_urls.append(build_image_url(pj.imagem_original) or pj.imagem_original)
+        image_urls = imagens_do_produto(pj)
         
         preco_valor = produto_data.get('preco')
         try:
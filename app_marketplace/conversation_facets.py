@@ -0,0 +1,125 @@
+"""
+Facetas da Caixa de Entrada - Marketplace
+=========================================
+
+Contadores da sidebar de ``conversations_inbox`` (status, não lidas,
+atribuídas a mim) em uma agregação condicional e as tags disponíveis com
+``jsonb_array_elements_text`` agrupado no banco - sem carregar as conversas.
+
+O resultado fica em cache por usuário (``INBOX_FACETS_CACHE_TTL``) e é
+invalidado pelos signals de ``WhatsappConversation`` para o dono do grupo e
+o responsável atual; um responsável anterior (reatribuição) ou alterações via
+``QuerySet.update()`` se corrigem ao expirar o TTL.
+"""
+
+import logging
+from collections import Counter
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q
+
+from .models import WhatsappConversation, WhatsappGroup
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'inbox_facets'
+CACHE_TTL = getattr(settings, 'INBOX_FACETS_CACHE_TTL', 30)
+
+# Status exibidos por padrão na caixa de entrada
+ACTIVE_STATUSES = ['new', 'open', 'waiting']
+
+
+def _chave(user_id: int) -> str:
+    return f'{CACHE_PREFIX}:{user_id}'
+
+
+def conversas_visiveis(user):
+    """Conversas dos grupos do usuário ou atribuídas a ele"""
+    return WhatsappConversation.objects.filter(Q(group__owner=user) | Q(assigned_to=user))
+
+
+def contar_tags(conversas) -> Dict[str, int]:
+    """Conversas por tag (agregado no banco no PostgreSQL)"""
+    if connection.vendor != 'postgresql':
+        contagem = Counter()
+        for tags in conversas.values_list('tags', flat=True):
+            contagem.update(set(tags or []))
+        return dict(contagem)
+
+    sql, params = conversas.values('tags').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT tag, COUNT(*) FROM (" + sql + ") AS conversas, "
+            "jsonb_array_elements_text(CASE WHEN jsonb_typeof(conversas.tags) = 'array' "
+            "THEN conversas.tags ELSE '[]'::jsonb END) AS tag "
+            "GROUP BY tag",
+            params
+        )
+        return {tag: total for tag, total in cursor.fetchall()}
+
+
+def calcular_facetas(user) -> Dict:
+    """
+    Contadores e tags da caixa de entrada (duas consultas)
+
+    Returns:
+        ``{'stats': {...}, 'tags': [...], 'tag_counts': {...}}``
+    """
+    conversas = conversas_visiveis(user)
+    stats = conversas.aggregate(
+        total=Count('id'),
+        new=Count('id', filter=Q(status='new')),
+        open=Count('id', filter=Q(status='open')),
+        waiting=Count('id', filter=Q(status='waiting')),
+        pending=Count('id', filter=Q(status='pending')),
+        resolved=Count('id', filter=Q(status='resolved')),
+        closed=Count('id', filter=Q(status='closed')),
+        unread=Count('id', filter=Q(unread_count__gt=0)),
+        assigned_to_me=Count('id', filter=Q(assigned_to=user, status__in=ACTIVE_STATUSES)),
+    )
+    tag_counts = contar_tags(conversas)
+    return {
+        'stats': stats,
+        'tags': sorted(tag_counts),
+        'tag_counts': tag_counts,
+    }
+
+
+def facetas_inbox(user) -> Dict:
+    """Facetas do usuário (do cache ou recalculadas)"""
+    try:
+        facetas = cache.get(_chave(user.id))
+    except Exception as e:
+        logger.warning(f"Cache de facetas indisponível: {str(e)}")
+        facetas = None
+    if facetas is not None:
+        return facetas
+
+    facetas = calcular_facetas(user)
+    try:
+        cache.set(_chave(user.id), facetas, CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Cache de facetas indisponível: {str(e)}")
+    return facetas
+
+
+def invalidar_facetas(user_ids: Iterable[int]):
+    """Descarta as facetas em cache dos usuários informados"""
+    chaves = [_chave(user_id) for user_id in set(user_ids) if user_id]
+    if not chaves:
+        return
+    try:
+        cache.delete_many(chaves)
+    except Exception as e:
+        logger.warning(f"Erro ao invalidar facetas da caixa de entrada: {str(e)}")
+
+
+def invalidar_facetas_conversa(conversa: WhatsappConversation):
+    """Invalida as facetas do dono do grupo e do responsável pela conversa"""
+    user_ids = [conversa.assigned_to_id]
+    if conversa.group_id:
+        user_ids.extend(WhatsappGroup.objects.filter(pk=conversa.group_id).values_list('owner_id', flat=True))
+    invalidar_facetas(user_ids)
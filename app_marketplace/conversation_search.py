@@ -0,0 +1,144 @@
+"""
+Busca de Conversas - Marketplace
+================================
+
+Busca textual nas mensagens da caixa de entrada (``conversations_inbox``).
+
+``WhatsappMessage.search_vector`` guarda o ``tsvector`` (config ``portuguese``)
+do conteúdo, mantido por trigger no PostgreSQL a cada INSERT/UPDATE de
+``content`` (inclusive ``bulk_create``) e indexado com GIN - ver migração
+0043. A busca usa ``EXISTS`` por conversa no lugar do join +
+``.distinct()`` com ``icontains``, ordena por relevância (``ts_rank``) e
+destaca o trecho encontrado (``ts_headline``) só para a página exibida.
+
+Fora do PostgreSQL a busca volta para ``icontains`` (sem índice).
+"""
+
+import re
+from typing import Dict, Iterable, Optional
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, Exists, F, FloatField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import WhatsappMessage
+
+CONFIG = 'portuguese'
+MAX_TERMOS = 8
+
+# Delimitadores do ts_headline (trocados por <mark> depois de escapar o texto)
+_INICIO, _FIM = '\x02', '\x03'
+
+
+def _usa_fts() -> bool:
+    return connection.vendor == 'postgresql'
+
+
+def montar_consulta(termo: str) -> Optional[SearchQuery]:
+    """
+    ``tsquery`` com prefixo em cada palavra (``bols`` encontra ``bolsa``)
+
+    Apenas caracteres de palavra são aproveitados, então a entrada do
+    usuário nunca gera uma ``tsquery`` inválida.
+    """
+    palavras = re.findall(r'\w+', termo.lower())[:MAX_TERMOS]
+    if not palavras:
+        return None
+    return SearchQuery(' & '.join(f'{p}:*' for p in palavras), config=CONFIG, search_type='raw')
+
+
+def _filtro_direto(termo: str) -> Q:
+    """Campos da própria conversa/participante (sem tocar nas mensagens)"""
+    return (
+        Q(participant__name__icontains=termo) |
+        Q(participant__phone__icontains=termo) |
+        Q(conversation_id__icontains=termo)
+    )
+
+
+def buscar_conversas(conversas, termo: str):
+    """
+    Filtra ``conversas`` pelo termo e anota ``search_rank``
+
+    Conversas cujo participante/ID casam com o termo recebem +1 na relevância.
+    """
+    filtro_direto = _filtro_direto(termo)
+    consulta = montar_consulta(termo) if _usa_fts() else None
+
+    if consulta is None:
+        mensagens = WhatsappMessage.objects.filter(conversation=OuterRef('pk'), content__icontains=termo)
+        return conversas.filter(filtro_direto | Q(Exists(mensagens))).annotate(
+            search_rank=Case(When(filtro_direto, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+        )
+
+    mensagens = WhatsappMessage.objects.filter(conversation=OuterRef('pk'), search_vector=consulta)
+    melhor_rank = mensagens.annotate(
+        rank=SearchRank(F('search_vector'), consulta)
+    ).order_by('-rank').values('rank')[:1]
+
+    return conversas.filter(filtro_direto | Q(Exists(mensagens))).annotate(
+        search_rank=Coalesce(Subquery(melhor_rank, output_field=FloatField()), Value(0.0)) + Case(
+            When(filtro_direto, then=Value(1.0)), default=Value(0.0), output_field=FloatField()
+        )
+    )
+
+
+def _marcar(texto: str) -> str:
+    return mark_safe(escape(texto).replace(_INICIO, '<mark>').replace(_FIM, '</mark>'))
+
+
+def _trecho_simples(conteudo: str, termo: str, contexto: int = 60) -> str:
+    """Trecho ao redor da primeira ocorrência (fallback sem ts_headline)"""
+    posicao = conteudo.lower().find(termo.lower())
+    if posicao < 0:
+        return _marcar(conteudo[:contexto * 2])
+    inicio = max(posicao - contexto, 0)
+    fim = posicao + len(termo)
+    trecho = (
+        ('…' if inicio else '') + conteudo[inicio:posicao] +
+        _INICIO + conteudo[posicao:fim] + _FIM +
+        conteudo[fim:fim + contexto] + ('…' if fim + contexto < len(conteudo) else '')
+    )
+    return _marcar(trecho)
+
+
+def destacar_mensagens(conversa_ids: Iterable[int], termo: str) -> Dict[int, str]:
+    """
+    Trecho destacado (HTML seguro, ``<mark>``) da mensagem mais relevante de cada conversa
+
+    Duas consultas: a melhor mensagem por conversa (``DISTINCT ON``) e o
+    ``ts_headline`` apenas dessas mensagens.
+    """
+    conversa_ids = list(conversa_ids)
+    if not conversa_ids or not termo:
+        return {}
+
+    consulta = montar_consulta(termo) if _usa_fts() else None
+    if consulta is None:
+        trechos = {}
+        for conversa_id, conteudo in WhatsappMessage.objects.filter(
+            conversation_id__in=conversa_ids, content__icontains=termo
+        ).order_by('conversation_id', '-timestamp').values_list('conversation_id', 'content'):
+            if conversa_id not in trechos:
+                trechos[conversa_id] = _trecho_simples(conteudo, termo)
+        return trechos
+
+    melhores = WhatsappMessage.objects.filter(
+        conversation_id__in=conversa_ids, search_vector=consulta
+    ).annotate(
+        rank=SearchRank(F('search_vector'), consulta)
+    ).order_by('conversation_id', '-rank', '-timestamp').distinct('conversation_id').values_list('id', flat=True)
+
+    return {
+        conversa_id: _marcar(trecho)
+        for conversa_id, trecho in WhatsappMessage.objects.filter(id__in=list(melhores)).annotate(
+            trecho=SearchHeadline(
+                'content', consulta, config=CONFIG,
+                start_sel=_INICIO, stop_sel=_FIM,
+                min_words=8, max_words=24, max_fragments=2, fragment_delimiter=' … ',
+            )
+        ).values_list('conversation_id', 'trecho')
+    }
@@ -20,6 +20,8 @@ from .models import (
     ConversationNote
 )
 from .whatsapp_views import send_message
+from .conversation_search import buscar_conversas, destacar_mensagens
+from .conversation_facets import facetas_inbox
 
 
 # ============================================================================
@@ -70,52 +72,35 @@ def conversations_inbox(request):
         conversations = conversations.filter(priority__gte=int(priority_filter))
     
     if search_query:
-        conversations = conversations.filter(
-            Q(participant__name__icontains=search_query) |
-            Q(participant__phone__icontains=search_query) |
-            Q(conversation_id__icontains=search_query) |
-            Q(messages__content__icontains=search_query)
-        ).distinct()
-    
-    # Estatísticas para sidebar
-    all_conversations = WhatsappConversation.objects.filter(
-        Q(group__owner=request.user) | Q(assigned_to=request.user)
-    )
+        # Busca textual indexada nas mensagens (ver conversation_search.py)
+        conversations = buscar_conversas(conversations, search_query)
     
-    stats = {
-        'total': all_conversations.count(),
-        'new': all_conversations.filter(status='new').count(),
-        'open': all_conversations.filter(status='open').count(),
-        'waiting': all_conversations.filter(status='waiting').count(),
-        'pending': all_conversations.filter(status='pending').count(),
-        'resolved': all_conversations.filter(status='resolved').count(),
-        'closed': all_conversations.filter(status='closed').count(),
-        'unread': all_conversations.filter(unread_count__gt=0).count(),
-        'assigned_to_me': all_conversations.filter(assigned_to=request.user, status__in=['new', 'open', 'waiting']).count(),
-    }
+    # Estatísticas e tags para sidebar (uma agregação cada, em cache por usuário)
+    facets = facetas_inbox(request.user)
     
     # Ordenar por não lidas primeiro, depois por prioridade e última mensagem
-    conversations = conversations.order_by(
-        '-unread_count',
-        '-priority',
-        '-last_message_at'
-    )
+    # (com busca, a relevância vem antes)
+    ordering = ['-unread_count', '-priority', '-last_message_at']
+    if search_query:
+        ordering.insert(0, '-search_rank')
+    conversations = conversations.order_by(*ordering)
     
     # Paginação
     paginator = Paginator(conversations, 50)
     page_number = request.GET.get('page', 1)
     page_obj = paginator.get_page(page_number)
     
-    # Tags disponíveis para filtro
-    all_tags = set()
-    for conv in all_conversations:
-        all_tags.update(conv.tags or [])
+    # Trecho destacado da mensagem encontrada (apenas para a página exibida)
+    if search_query:
+        highlights = destacar_mensagens([conv.pk for conv in page_obj], search_query)
+        for conv in page_obj:
+            conv.search_highlight = highlights.get(conv.pk)
     
     context = {
         'page_obj': page_obj,
         'conversations': page_obj,
-        'stats': stats,
-        'all_tags': sorted(all_tags),
+        'stats': facets['stats'],
+        'all_tags': facets['tags'],
         'filters': {
             'status': status_filter,
             'assigned': assigned_filter,
@@ -0,0 +1,262 @@
+"""
+Cache de Análise de Imagens - Marketplace
+=========================================
+
+Cache endereçado por conteúdo para os resultados de ``analyze_image_with_mcp``
+e ``analyze_image_with_openmind``.
+
+A chave combina o SHA-256 dos bytes da imagem, o idioma e a versão do prompt.
+Um hash perceptual (dHash 64 bits) aponta para a mesma entrada, de modo que a
+mesma foto reenviada com outra compressão/metadados também é reaproveitada.
+
+Só a análise do modelo (``data``) é guardada. Os campos de um upload
+específico não entram no cache: ``image_url``, ``image_path``,
+``saved_filename``, ``request_id`` e ``trace_id``. Referências à imagem salva
+também são retiradas de dentro da análise. No acerto, quem chama salva o
+upload atual e monta esses campos para ele. Assim, uma foto igual (ou
+recomprimida) de outro usuário nunca aponta para o arquivo de outra pessoa.
+
+O armazenamento usa o cache configurado do Django (Redis) e, quando ele é o
+``DummyCache`` (Railway), um store em disco com TTL e despejo LRU.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'img_analysis:v2'  # v2: apenas a análise, sem dados do upload
+CACHE_TTL = getattr(settings, 'IMAGE_ANALYSIS_CACHE_TTL', 7 * 24 * 3600)
+CACHE_MAX_ENTRIES = getattr(settings, 'IMAGE_ANALYSIS_CACHE_MAX_ENTRIES', 2000)
+PROMPT_VERSION = getattr(settings, 'IMAGE_ANALYSIS_PROMPT_VERSION', 'v1')
+
+
+def sha256_imagem(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def sem_referencias_upload(analise, referencias: Iterable[Optional[str]]):
+    """
+    Cópia da análise sem as referências à imagem salva de um upload
+    
+    Textos iguais a uma referência (ou terminados no nome do arquivo salvo)
+    são retirados de listas (ex.: ``produto.imagens``) e anulados em dicts.
+    """
+    referencias = {r for r in referencias if isinstance(r, str) and r}
+    nomes = {os.path.basename(r.rstrip('/')) for r in referencias}
+    nomes.discard('')
+    
+    def do_upload(valor) -> bool:
+        return isinstance(valor, str) and (
+            valor in referencias or os.path.basename(valor.rstrip('/')) in nomes
+        )
+    
+    def limpar(valor):
+        if isinstance(valor, dict):
+            return {k: (None if do_upload(v) else limpar(v)) for k, v in valor.items()}
+        if isinstance(valor, list):
+            return [limpar(v) for v in valor if not do_upload(v)]
+        return valor
+    
+    return limpar(json.loads(json.dumps(analise, default=str)))
+
+
+def hash_perceptual(image_bytes: bytes) -> Optional[str]:
+    """
+    dHash de 64 bits (hex) da imagem
+    
+    Invariante a recompressão, redimensionamento e metadados EXIF.
+    Retorna None se a imagem não puder ser decodificada.
+    """
+    try:
+        from PIL import Image
+        
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img.draft('L', (64, 64))
+            pequena = img.convert('L').resize((9, 8), Image.LANCZOS)
+            pixels = list(pequena.getdata())
+    except Exception as e:
+        logger.debug(f"[IMG_CACHE] Não foi possível calcular hash perceptual: {str(e)}")
+        return None
+    
+    bits = 0
+    for linha in range(8):
+        for coluna in range(8):
+            esquerda = pixels[linha * 9 + coluna]
+            direita = pixels[linha * 9 + coluna + 1]
+            bits = (bits << 1) | (1 if esquerda > direita else 0)
+    return f"{bits:016x}"
+
+
+class _DiskStore:
+    """
+    Store em disco (um JSON por chave) com TTL e despejo LRU
+    
+    O mtime do arquivo marca o último acesso; ao passar de ``max_entries``
+    os arquivos menos usados recentemente são removidos.
+    """
+    
+    def __init__(self, directory: str, max_entries: int):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{hashlib.sha1(key.encode()).hexdigest()}.json")
+    
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if entry.get('expires_at', 0) < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry.get('value')
+    
+    def set(self, key: str, value, timeout: int):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'expires_at': time.time() + timeout, 'value': value}, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"[IMG_CACHE] Falha ao gravar cache em disco: {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        
+        with self._lock:
+            self._writes += 1
+            # Verificar o limite a cada poucas gravações (listar o diretório custa)
+            if self._writes % 20 == 0:
+                self._despejar()
+    
+    def _despejar(self):
+        try:
+            entradas = [e for e in os.scandir(self.directory) if e.name.endswith('.json')]
+        except OSError:
+            return
+        excesso = len(entradas) - self.max_entries
+        if excesso <= 0:
+            return
+        entradas.sort(key=lambda e: e.stat().st_mtime)
+        for entrada in entradas[:excesso]:
+            try:
+                os.remove(entrada.path)
+            except OSError:
+                pass
+
+
+class ImageAnalysisCache:
+    """
+    Cache dos resultados de análise de imagem
+    
+    Uso:
+        chave = image_analysis_cache.chave(image_bytes, language, prompt_version)
+        analise = image_analysis_cache.get(chave)
+        if analise is None:
+            result = chamar_modelo(...)
+            image_analysis_cache.set(chave, result['data'], (result['image_path'], ...))
+    """
+    
+    def __init__(self):
+        self._disk = None
+        if isinstance(caches['default'], DummyCache) or getattr(settings, 'IMAGE_ANALYSIS_CACHE_DIR', None):
+            directory = getattr(settings, 'IMAGE_ANALYSIS_CACHE_DIR', None) or os.path.join(
+                str(getattr(settings, 'BASE_DIR', '.')), '.cache', 'image_analysis'
+            )
+            self._disk = _DiskStore(str(directory), CACHE_MAX_ENTRIES)
+    
+    @property
+    def enabled(self) -> bool:
+        return CACHE_TTL > 0
+    
+    def _get(self, key: str):
+        if self._disk is not None:
+            return self._disk.get(key)
+        try:
+            return caches['default'].get(key)
+        except Exception as e:
+            logger.warning(f"[IMG_CACHE] Cache indisponível: {str(e)}")
+            return None
+    
+    def _set(self, key: str, value):
+        if self._disk is not None:
+            self._disk.set(key, value, CACHE_TTL)
+            return
+        try:
+            caches['default'].set(key, value, CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"[IMG_CACHE] Cache indisponível: {str(e)}")
+    
+    def chave(self, image_bytes: bytes, language: str, prompt_version: str = '') -> Dict[str, Optional[str]]:
+        """Chaves exata (SHA-256) e perceptual da imagem para idioma/versão do prompt"""
+        versao = f"{PROMPT_VERSION}:{prompt_version}" if prompt_version else PROMPT_VERSION
+        phash = hash_perceptual(image_bytes)
+        return {
+            'exata': f"{CACHE_PREFIX}:sha:{sha256_imagem(image_bytes)}:{language}:{versao}",
+            'perceptual': f"{CACHE_PREFIX}:phash:{phash}:{language}:{versao}" if phash else None,
+        }
+    
+    def get(self, chave: Dict[str, Optional[str]]) -> Optional[Dict]:
+        """Análise em cache (cópia independente) ou None"""
+        if not self.enabled:
+            return None
+        
+        analise = self._get(chave['exata'])
+        if analise is None and chave['perceptual']:
+            chave_exata = self._get(chave['perceptual'])
+            if chave_exata:
+                analise = self._get(chave_exata)
+        
+        if not isinstance(analise, dict):
+            return None
+        return json.loads(json.dumps(analise))
+    
+    def set(self, chave: Dict[str, Optional[str]], analise: Dict, referencias_upload: Iterable[Optional[str]] = ()):
+        """
+        Grava a análise do modelo (apenas análises não vazias)
+        
+        ``referencias_upload``: ``image_url``/``image_path``/``saved_filename``
+        do upload analisado, retirados da análise antes de gravar.
+        """
+        if not self.enabled or not isinstance(analise, dict) or not analise:
+            return
+        try:
+            analise = sem_referencias_upload(analise, referencias_upload)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"[IMG_CACHE] Análise não serializável, não será cacheada: {str(e)}")
+            return
+        self._set(chave['exata'], analise)
+        if chave['perceptual']:
+            self._set(chave['perceptual'], chave['exata'])
+
+
+image_analysis_cache = ImageAnalysisCache()
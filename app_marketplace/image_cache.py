@@ -0,0 +1,378 @@
+"""
+Cache de Imagens em Disco - Marketplace
+=======================================
+
+Camada usada por ``image_proxy_views.proxy_image`` para servir as imagens do
+servidor SinapUm sem buscar no upstream a cada exibição.
+
+- Conteúdo endereçado pelo SHA-256 (``objetos/ab/abcd...``): a mesma imagem
+  em caminhos diferentes ocupa espaço uma vez. Cada URL tem um arquivo de
+  metadados (``chaves/``) com o digest, ``Content-Type`` e os validadores do
+  upstream (``ETag``/``Last-Modified``)
+- Tamanho limitado (``IMAGE_PROXY_CACHE_MAX_MB``) com remoção LRU: cada acerto
+  atualiza o mtime do objeto e a limpeza remove os menos usados
+- Após ``IMAGE_PROXY_CACHE_TTL`` a entrada é revalidada com requisição
+  condicional (``If-None-Match``/``If-Modified-Since``); um 304 não baixa a
+  imagem de novo. Se o upstream estiver fora, a cópia antiga continua servida
+- Sessão HTTP compartilhada (pool keep-alive) e download em streaming para
+  arquivo temporário, sem manter a imagem inteira em memória
+- Faltas simultâneas da mesma URL viram um único download: threads do
+  processo esperam o primeiro e processos diferentes se coordenam por
+  ``flock`` no arquivo de trava da URL
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalescência apenas dentro do processo
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = str(getattr(settings, 'IMAGE_PROXY_CACHE_DIR', '') or os.path.join(tempfile.gettempdir(), 'vitrinezap-image-cache'))
+CACHE_MAX_BYTES = getattr(settings, 'IMAGE_PROXY_CACHE_MAX_MB', 512) * 1024 * 1024
+CACHE_TTL = getattr(settings, 'IMAGE_PROXY_CACHE_TTL', 3600)
+MAX_IMAGE_BYTES = getattr(settings, 'IMAGE_PROXY_MAX_IMAGE_MB', 20) * 1024 * 1024
+UPSTREAM_TIMEOUT = getattr(settings, 'IMAGE_PROXY_TIMEOUT', 10)
+POOL_SIZE = getattr(settings, 'IMAGE_PROXY_POOL_SIZE', 10)
+
+# Limpeza remove até sobrar esta fração do limite (evita limpar a cada download)
+FRACAO_APOS_LIMPEZA = 0.9
+CHUNK = 64 * 1024
+
+
+class ImagemIndisponivel(Exception):
+    """Imagem não encontrada no upstream (ou upstream fora do ar sem cópia em cache)"""
+
+
+@dataclass
+class ImagemEmCache:
+    url: str
+    digest: str
+    content_type: str
+    tamanho: int
+    atualizado_em: float  # quando o conteúdo mudou (Last-Modified para o cliente)
+    verificado_em: float  # última confirmação com o upstream
+    etag_upstream: str = ''
+    last_modified_upstream: str = ''
+    caminho: str = ''
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest[:32]}"'
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Sessão HTTP compartilhada do processo (pool keep-alive com o SinapUm)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=2,
+                    read=0,
+                    backoff_factor=0.2,
+                    status_forcelist=(502, 503, 504),
+                    allowed_methods=frozenset(['GET']),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.headers['User-Agent'] = 'ÉVORA-Connect/1.0'
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+class _Voo:
+    """Download em andamento de uma URL (demais threads esperam o resultado)"""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado: Optional[ImagemEmCache] = None
+        self.erro: Optional[Exception] = None
+
+
+class CacheImagens:
+    """Cache de imagens em disco compartilhado pelos processos da máquina"""
+
+    def __init__(self, diretorio: str, max_bytes: int, ttl: float):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._em_voo: Dict[str, _Voo] = {}
+        self._lock_limpeza = threading.Lock()
+        self._bytes_estimados: Optional[int] = None
+
+    # ------------------------------------------------------------------
+    # Caminhos e metadados
+    # ------------------------------------------------------------------
+
+    def _caminho_objeto(self, digest: str) -> str:
+        return os.path.join(self.diretorio, 'objetos', digest[:2], digest)
+
+    def _caminho_meta(self, chave: str) -> str:
+        return os.path.join(self.diretorio, 'chaves', chave[:2], f'{chave}.json')
+
+    def _caminho_trava(self, chave: str) -> str:
+        return os.path.join(self.diretorio, 'travas', chave[:2], f'{chave}.lock')
+
+    def _ler_meta(self, chave: str) -> Optional[ImagemEmCache]:
+        try:
+            with open(self._caminho_meta(chave), encoding='utf-8') as arquivo:
+                imagem = ImagemEmCache(**json.load(arquivo))
+        except (OSError, ValueError, TypeError):
+            return None
+        imagem.caminho = self._caminho_objeto(imagem.digest)
+        return imagem
+
+    def _gravar_meta(self, chave: str, imagem: ImagemEmCache):
+        dados = asdict(imagem)
+        dados.pop('caminho')
+        self._gravar_atomico(self._caminho_meta(chave), json.dumps(dados).encode('utf-8'))
+
+    @staticmethod
+    def _gravar_atomico(caminho: str, conteudo: bytes):
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), prefix='.tmp-')
+        try:
+            with os.fdopen(descritor, 'wb') as arquivo:
+                arquivo.write(conteudo)
+            os.replace(temporario, caminho)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.unlink(temporario)
+            raise
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def _valida(self, imagem: Optional[ImagemEmCache]) -> bool:
+        return imagem is not None and time.time() - imagem.verificado_em < self.ttl and os.path.exists(imagem.caminho)
+
+    def _tocar(self, imagem: ImagemEmCache):
+        """Marca o objeto como usado agora (relógio do LRU)"""
+        try:
+            os.utime(imagem.caminho)
+        except OSError:
+            pass
+
+    def obter(self, url: str, ignorar_cache: bool = False) -> ImagemEmCache:
+        """
+        Imagem da URL no disco (baixa ou revalida se necessário)
+
+        Raises:
+            ImagemIndisponivel: upstream sem a imagem e nenhuma cópia em cache
+        """
+        chave = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        if not ignorar_cache:
+            imagem = self._ler_meta(chave)
+            if self._valida(imagem):
+                self._tocar(imagem)
+                return imagem
+
+        with self._lock:
+            voo = self._em_voo.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._em_voo[chave] = _Voo()
+
+        if not lider:
+            if not voo.evento.wait(UPSTREAM_TIMEOUT * 3):
+                raise ImagemIndisponivel(f"Tempo esgotado aguardando download de {url}")
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.resultado
+
+        try:
+            voo.resultado = self._buscar_com_trava(url, chave, ignorar_cache)
+            return voo.resultado
+        except Exception as e:
+            voo.erro = e
+            raise
+        finally:
+            with self._lock:
+                self._em_voo.pop(chave, None)
+            voo.evento.set()
+
+    def _buscar_com_trava(self, url: str, chave: str, ignorar_cache: bool) -> ImagemEmCache:
+        if fcntl is None:
+            return self._buscar(url, chave, ignorar_cache)
+
+        caminho_trava = self._caminho_trava(chave)
+        os.makedirs(os.path.dirname(caminho_trava), exist_ok=True)
+        with open(caminho_trava, 'a') as trava:
+            fcntl.flock(trava, fcntl.LOCK_EX)
+            try:
+                # Outro processo pode ter baixado enquanto esperávamos a trava
+                imagem = self._ler_meta(chave)
+                if not ignorar_cache and self._valida(imagem):
+                    self._tocar(imagem)
+                    return imagem
+                return self._buscar(url, chave, ignorar_cache)
+            finally:
+                fcntl.flock(trava, fcntl.LOCK_UN)
+
+    def _buscar(self, url: str, chave: str, ignorar_cache: bool) -> ImagemEmCache:
+        anterior = self._ler_meta(chave)
+        if anterior is not None and not os.path.exists(anterior.caminho):
+            anterior = None  # objeto removido pela limpeza
+
+        headers = {}
+        if anterior is not None and not ignorar_cache:
+            if anterior.etag_upstream:
+                headers['If-None-Match'] = anterior.etag_upstream
+            if anterior.last_modified_upstream:
+                headers['If-Modified-Since'] = anterior.last_modified_upstream
+
+        try:
+            with get_session().get(url, headers=headers, stream=True, timeout=UPSTREAM_TIMEOUT) as response:
+                if response.status_code == 304 and anterior is not None:
+                    anterior.verificado_em = time.time()
+                    self._gravar_meta(chave, anterior)
+                    self._tocar(anterior)
+                    return anterior
+
+                if response.status_code != 200:
+                    logger.warning(f"[IMAGE_PROXY] Upstream respondeu {response.status_code}: {url}")
+                    raise ImagemIndisponivel(f"Imagem não encontrada: {url}")
+
+                digest, tamanho = self._salvar_objeto(response)
+                agora = time.time()
+                imagem = ImagemEmCache(
+                    url=url,
+                    digest=digest,
+                    content_type=response.headers.get('Content-Type', 'image/jpeg'),
+                    tamanho=tamanho,
+                    atualizado_em=anterior.atualizado_em if anterior is not None and anterior.digest == digest else agora,
+                    verificado_em=agora,
+                    etag_upstream=response.headers.get('ETag', ''),
+                    last_modified_upstream=response.headers.get('Last-Modified', ''),
+                    caminho=self._caminho_objeto(digest),
+                )
+                self._gravar_meta(chave, imagem)
+                logger.info(f"[IMAGE_PROXY] Imagem baixada: {url} ({tamanho} bytes)")
+                return imagem
+        except requests.exceptions.RequestException as e:
+            if anterior is not None:
+                logger.warning(f"[IMAGE_PROXY] Upstream indisponível, servindo cópia em cache de {url}: {str(e)}")
+                return anterior
+            raise ImagemIndisponivel(f"Erro ao buscar imagem {url}: {str(e)}") from e
+
+    def _salvar_objeto(self, response) -> tuple:
+        """Grava o corpo da resposta em streaming; retorna (digest, tamanho)"""
+        pasta_tmp = os.path.join(self.diretorio, 'objetos')
+        os.makedirs(pasta_tmp, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=pasta_tmp, prefix='.tmp-')
+        hash_conteudo = hashlib.sha256()
+        tamanho = 0
+        try:
+            with os.fdopen(descritor, 'wb') as arquivo:
+                for bloco in response.iter_content(CHUNK):
+                    tamanho += len(bloco)
+                    if tamanho > MAX_IMAGE_BYTES:
+                        raise ImagemIndisponivel(f"Imagem maior que o limite ({MAX_IMAGE_BYTES} bytes)")
+                    hash_conteudo.update(bloco)
+                    arquivo.write(bloco)
+
+            digest = hash_conteudo.hexdigest()
+            destino = self._caminho_objeto(digest)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            if os.path.exists(destino):
+                os.unlink(temporario)  # mesmo conteúdo já em cache
+                os.utime(destino)
+            else:
+                os.replace(temporario, destino)
+                self._registrar_bytes(tamanho)
+            return digest, tamanho
+        except BaseException:
+            if os.path.exists(temporario):
+                os.unlink(temporario)
+            raise
+
+    # ------------------------------------------------------------------
+    # Limpeza (LRU por mtime)
+    # ------------------------------------------------------------------
+
+    def _registrar_bytes(self, adicionados: int):
+        if self._bytes_estimados is not None:
+            self._bytes_estimados += adicionados
+        if self._bytes_estimados is None or self._bytes_estimados > self.max_bytes:
+            self.limpar()
+
+    def limpar(self) -> int:
+        """Remove os objetos usados há mais tempo até caber no limite; retorna bytes removidos"""
+        if not self._lock_limpeza.acquire(blocking=False):
+            return 0
+        try:
+            objetos = []
+            total = 0
+            for raiz, _, arquivos in os.walk(os.path.join(self.diretorio, 'objetos')):
+                for nome in arquivos:
+                    caminho = os.path.join(raiz, nome)
+                    try:
+                        estado = os.stat(caminho)
+                    except OSError:
+                        continue
+                    if nome.startswith('.tmp-'):
+                        # Temporário abandonado por um processo interrompido
+                        if time.time() - estado.st_mtime > UPSTREAM_TIMEOUT * 10:
+                            self._remover(caminho)
+                        continue
+                    objetos.append((estado.st_mtime, estado.st_size, caminho))
+                    total += estado.st_size
+
+            removidos = 0
+            if total > self.max_bytes:
+                alvo = self.max_bytes * FRACAO_APOS_LIMPEZA
+                for _, tamanho, caminho in sorted(objetos):
+                    if total - removidos <= alvo:
+                        break
+                    if self._remover(caminho):
+                        removidos += tamanho
+                self._remover_metas_orfaos()
+                logger.info(f"[IMAGE_PROXY] Limpeza do cache: {removidos} bytes removidos")
+
+            self._bytes_estimados = total - removidos
+            return removidos
+        finally:
+            self._lock_limpeza.release()
+
+    def _remover_metas_orfaos(self):
+        for raiz, _, arquivos in os.walk(os.path.join(self.diretorio, 'chaves')):
+            for nome in arquivos:
+                imagem = self._ler_meta(nome[:-len('.json')]) if nome.endswith('.json') else None
+                if imagem is not None and not os.path.exists(imagem.caminho):
+                    self._remover(os.path.join(raiz, nome))
+
+    @staticmethod
+    def _remover(caminho: str) -> bool:
+        try:
+            os.unlink(caminho)
+            return True
+        except OSError:
+            return False
+
+
+cache_imagens = CacheImagens(CACHE_DIR, CACHE_MAX_BYTES, CACHE_TTL)
@@ -1,16 +1,101 @@
 """
 View para fazer proxy de imagens do servidor SinapUm
 Isso resolve o problema de mixed content (HTTPS tentando carregar HTTP)
+
+As imagens ficam no cache em disco de ``image_cache`` e são enviadas com
+``FileResponse`` (sendfile pelo servidor WSGI quando disponível), com suporte
+a requisições condicionais (304) e a ``Range`` (206).
 """
-import requests
-from django.http import HttpResponse, Http404
+import os
+import re
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
-from django.core.cache import cache
+from django.utils.http import http_date, parse_http_date_safe
 import logging
 
+from .image_cache import CACHE_TTL, CHUNK, ImagemIndisponivel, cache_imagens
+
 logger = logging.getLogger(__name__)
 
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _url_upstream(image_path):
+    """URL da imagem no servidor SinapUm"""
+    openmind_url = getattr(settings, 'OPENMIND_AI_URL', '')
+    if not openmind_url:
+        # Fallback para IP padrão
+        sinapum_base = 'http://127.0.0.1:8001'
+    else:
+        # Remover /api/v1 se existir
+        sinapum_base = openmind_url.replace('/api/v1', '').rstrip('/')
+    
+    if image_path.startswith('http://') or image_path.startswith('https://'):
+        # Já é URL completa, usar diretamente
+        return image_path
+    
+    # Adicionar /media/ se não tiver
+    clean_path = image_path.lstrip('/')
+    if clean_path.startswith('media/'):
+        return f"{sinapum_base}/{clean_path}"
+    return f"{sinapum_base}/media/{clean_path}"
+
+
+def _intervalo(request, imagem, last_modified):
+    """
+    Intervalo pedido em ``Range`` como ``(inicio, fim)`` inclusivo
+    
+    Returns:
+        ``None`` para enviar a imagem inteira (sem Range, Range ignorado ou
+        If-Range desatualizado) ou ``False`` se o intervalo não é satisfazível
+    """
+    cabecalho = request.headers.get('Range', '').strip()
+    if not cabecalho:
+        return None
+    
+    if_range = request.headers.get('If-Range', '').strip()
+    if if_range and if_range != imagem.etag and if_range != last_modified:
+        return None
+    
+    # Apenas um intervalo; múltiplos intervalos ou sintaxe inválida recebem a imagem inteira
+    match = RANGE_RE.match(cabecalho.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    inicio, fim = match.groups()
+    tamanho = imagem.tamanho
+    
+    if not inicio:
+        # Sufixo: últimos N bytes
+        sufixo = int(fim)
+        if sufixo == 0 or tamanho == 0:
+            return False
+        return max(tamanho - sufixo, 0), tamanho - 1
+    
+    inicio = int(inicio)
+    # Início além do fim do arquivo vem antes: ``bytes=5000-`` num arquivo menor é 416
+    if inicio >= tamanho:
+        return False
+    fim = int(fim) if fim else tamanho - 1
+    if fim < inicio:
+        return None
+    return inicio, min(fim, tamanho - 1)
+
+
+def _ler_intervalo(arquivo, inicio, fim):
+    try:
+        arquivo.seek(inicio)
+        restante = fim - inicio + 1
+        while restante > 0:
+            bloco = arquivo.read(min(CHUNK, restante))
+            if not bloco:
+                break
+            restante -= len(bloco)
+            yield bloco
+    finally:
+        arquivo.close()
+
+
 @require_http_methods(["GET"])
 def proxy_image(request, image_path):
     """
@@ -19,83 +104,63 @@ def proxy_image(request, image_path):
     URL esperada: /api/images/proxy/<path:image_path>
     Exemplo: /api/images/proxy/media/uploads/06215ae2-5eca-4ed1-b8e5-90f69e297734.jpg
     """
+    image_url = _url_upstream(image_path)
+    
     try:
-        # Construir URL completa no servidor SinapUm
-        openmind_url = getattr(settings, 'OPENMIND_AI_URL', '')
-        if not openmind_url:
-            # Fallback para IP padrão
-            sinapum_base = 'http://127.0.0.1:8001'
-        else:
-            # Remover /api/v1 se existir
-            sinapum_base = openmind_url.replace('/api/v1', '').rstrip('/')
-        
-        # Construir URL da imagem
-        if image_path.startswith('http://') or image_path.startswith('https://'):
-            # Já é URL completa, usar diretamente
-            image_url = image_path
-        else:
-            # Adicionar /media/ se não tiver
-            clean_path = image_path.lstrip('/')
-            if clean_path.startswith('media/'):
-                image_url = f"{sinapum_base}/{clean_path}"
-            else:
-                image_url = f"{sinapum_base}/media/{clean_path}"
-        
-        logger.info(f"[IMAGE_PROXY] Fazendo proxy de: {image_url}")
-        
-        # Verificar cache primeiro (opcional - reduz carga no SinapUm)
-        cache_key = f"image_proxy_{image_path}"
-        cached_response = cache.get(cache_key)
-        if cached_response:
-            logger.info(f"[IMAGE_PROXY] Retornando do cache: {image_path}")
-            return HttpResponse(
-                cached_response['content'],
-                content_type=cached_response['content_type']
-            )
-        
-        # Fazer requisição ao SinapUm
-        response = requests.get(
-            image_url,
-            timeout=10,
-            headers={
-                'User-Agent': 'ÉVORA-Connect/1.0',
-            }
-        )
-        
-        if response.status_code == 200:
-            # Determinar content type
-            content_type = response.headers.get('Content-Type', 'image/jpeg')
-            
-            # Cachear a resposta (1 hora)
-            cache.set(cache_key, {
-                'content': response.content,
-                'content_type': content_type
-            }, 3600)
-            
-            logger.info(f"[IMAGE_PROXY] Imagem carregada com sucesso: {image_path} ({len(response.content)} bytes)")
-            
-            # Retornar imagem com headers apropriados
-            http_response = HttpResponse(
-                response.content,
-                content_type=content_type
-            )
-            
-            # Adicionar headers CORS e cache
-            http_response['Access-Control-Allow-Origin'] = '*'
-            http_response['Cache-Control'] = 'public, max-age=3600'
-            
-            return http_response
-        else:
-            logger.warning(f"[IMAGE_PROXY] Erro ao carregar imagem: {image_url} - Status: {response.status_code}")
-            raise Http404(f"Imagem não encontrada: {image_path}")
-            
-    except requests.exceptions.Timeout:
-        logger.error(f"[IMAGE_PROXY] Timeout ao carregar imagem: {image_path}")
-        raise Http404(f"Timeout ao carregar imagem: {image_path}")
-    except requests.exceptions.ConnectionError:
-        logger.error(f"[IMAGE_PROXY] Erro de conexão ao carregar imagem: {image_path}")
-        raise Http404(f"Erro de conexão ao carregar imagem: {image_path}")
+        imagem = cache_imagens.obter(image_url)
+        try:
+            arquivo = open(imagem.caminho, 'rb')
+        except FileNotFoundError:
+            # Objeto removido pela limpeza do cache entre a consulta e a leitura
+            imagem = cache_imagens.obter(image_url, ignorar_cache=True)
+            arquivo = open(imagem.caminho, 'rb')
+    except ImagemIndisponivel as e:
+        logger.warning(f"[IMAGE_PROXY] {str(e)}")
+        raise Http404(f"Imagem não encontrada: {image_path}")
     except Exception as e:
         logger.error(f"[IMAGE_PROXY] Erro ao fazer proxy de imagem: {str(e)}", exc_info=True)
         raise Http404(f"Erro ao carregar imagem: {image_path}")
-
+    
+    last_modified = http_date(imagem.atualizado_em)
+    headers = {
+        'ETag': imagem.etag,
+        'Last-Modified': last_modified,
+        'Cache-Control': f'public, max-age={CACHE_TTL}',
+        'Accept-Ranges': 'bytes',
+        'Access-Control-Allow-Origin': '*',
+    }
+    
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        nao_modificado = imagem.etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    else:
+        desde = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        nao_modificado = desde is not None and int(imagem.atualizado_em) <= desde
+    if nao_modificado:
+        arquivo.close()
+        response = HttpResponseNotModified()
+        for nome, valor in headers.items():
+            response[nome] = valor
+        return response
+    
+    intervalo = _intervalo(request, imagem, last_modified)
+    if intervalo is False:
+        arquivo.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{imagem.tamanho}'
+        response['Accept-Ranges'] = 'bytes'
+        return response
+    
+    if intervalo is None:
+        response = FileResponse(arquivo, content_type=imagem.content_type, filename=os.path.basename(image_path))
+    else:
+        inicio, fim = intervalo
+        response = StreamingHttpResponse(
+            _ler_intervalo(arquivo, inicio, fim), status=206, content_type=imagem.content_type
+        )
+        response['Content-Range'] = f'bytes {inicio}-{fim}/{imagem.tamanho}'
+        response['Content-Length'] = str(fim - inicio + 1)
+    
+    for nome, valor in headers.items():
+        response[nome] = valor
+    return response
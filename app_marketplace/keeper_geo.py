@@ -0,0 +1,324 @@
+"""
+Pontos de Guarda por Proximidade - Marketplace
+==============================================
+
+Índice espacial em memória dos Address Keepers ativos e verificados, usado por
+``WhatsAppFlowEngine.listar_opcoes_entrega`` para sugerir os pontos de guarda
+mais próximos do cliente.
+
+- Coordenadas de keepers e endereços de entrega são geocodificadas offline
+  (``manage.py geocodificar_enderecos``), nunca no fluxo da conversa
+- Os keepers ficam numa KD-tree sobre vetores da esfera unitária: a distância
+  euclidiana (corda) preserva a ordem da distância geodésica
+- O índice é reconstruído sob demanda quando um keeper muda (signals) ou a
+  cada ``KEEPER_INDEX_TTL`` segundos (alterações feitas em outros processos)
+- Endereço sem coordenadas: usa o centróide dos keepers do mesmo prefixo de
+  CEP (5, 3 e 2 dígitos), da cidade ou do estado
+
+Os k vizinhos mais próximos são reordenados por um custo que pondera
+distância, ocupação/capacidade livre e ``taxa_guarda_dia``.
+"""
+
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from django.conf import settings
+
+from .models import AddressKeeper, EnderecoEntrega
+
+logger = logging.getLogger(__name__)
+
+RAIO_TERRA_KM = 6371.0
+INDICE_TTL = getattr(settings, 'KEEPER_INDEX_TTL', 300)
+GEOCODER_URL = getattr(settings, 'GEOCODER_URL', 'https://nominatim.openstreetmap.org/search')
+GEOCODER_USER_AGENT = getattr(settings, 'GEOCODER_USER_AGENT', 'vitrinezap-geocoder')
+
+# Custo = distância_km * (1 + PESO_OCUPACAO * ocupação) * (1 + PESO_LOTACAO / (1 + vagas livres))
+#         + taxa_guarda_dia * KM_POR_REAL
+PESO_OCUPACAO = 1.0
+PESO_LOTACAO = 0.5
+KM_POR_REAL = 2.0
+OCUPACAO_MAXIMA = 95.0  # keepers acima disso não são sugeridos
+
+# Vizinhos buscados por opção retornada (reordenados pelo custo)
+CANDIDATOS_POR_OPCAO = 4
+
+Vetor = Tuple[float, float, float]
+
+
+def normalizar_cep(cep: Optional[str]) -> str:
+    return re.sub(r'\D', '', cep or '')
+
+
+def _normalizar_texto(texto: Optional[str]) -> str:
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).strip().lower()
+
+
+def vetor(latitude: float, longitude: float) -> Vetor:
+    """Ponto na esfera unitária"""
+    lat, lon = math.radians(float(latitude)), math.radians(float(longitude))
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def distancia_km(corda2: float) -> float:
+    """Distância geodésica a partir do quadrado da corda entre dois vetores unitários"""
+    corda = min(math.sqrt(corda2), 2.0)
+    return RAIO_TERRA_KM * 2 * math.asin(corda / 2)
+
+
+class _KDTree:
+    """KD-tree 3D estática (nós como tuplas: ponto, índice, eixo, esquerda, direita)"""
+
+    def __init__(self, pontos: List[Tuple[Vetor, int]]):
+        self._raiz = self._construir(pontos, 0)
+
+    def _construir(self, pontos, profundidade):
+        if not pontos:
+            return None
+        eixo = profundidade % 3
+        pontos = sorted(pontos, key=lambda p: p[0][eixo])
+        meio = len(pontos) // 2
+        ponto, indice = pontos[meio]
+        return (
+            ponto, indice, eixo,
+            self._construir(pontos[:meio], profundidade + 1),
+            self._construir(pontos[meio + 1:], profundidade + 1),
+        )
+
+    def vizinhos(self, alvo: Vetor, k: int) -> List[Tuple[float, int]]:
+        """Os ``k`` pontos mais próximos: [(corda², índice)] em ordem crescente"""
+        melhores = []  # heap máximo (corda² negativa)
+
+        def visitar(no):
+            if no is None:
+                return
+            ponto, indice, eixo, esquerda, direita = no
+            d2 = (alvo[0] - ponto[0]) ** 2 + (alvo[1] - ponto[1]) ** 2 + (alvo[2] - ponto[2]) ** 2
+            if len(melhores) < k:
+                heapq.heappush(melhores, (-d2, indice))
+            elif d2 < -melhores[0][0]:
+                heapq.heapreplace(melhores, (-d2, indice))
+
+            diferenca = alvo[eixo] - ponto[eixo]
+            perto, longe = (esquerda, direita) if diferenca < 0 else (direita, esquerda)
+            visitar(perto)
+            if len(melhores) < k or diferenca * diferenca < -melhores[0][0]:
+                visitar(longe)
+
+        if k > 0:
+            visitar(self._raiz)
+        return sorted((-d2, indice) for d2, indice in melhores)
+
+
+class IndiceKeepers:
+    """Índice espacial dos keepers disponíveis (por processo)"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sujo = True
+        self._construido_em = 0.0
+        self._keepers: List[Dict] = []
+        self._arvore: Optional[_KDTree] = None
+        self._sem_coordenadas: List[int] = []
+        self._centroides: Dict[tuple, Vetor] = {}
+
+    def invalidar(self):
+        """Reconstruir na próxima consulta"""
+        self._sujo = True
+
+    def _garantir(self):
+        if not self._sujo and time.monotonic() - self._construido_em < self.ttl:
+            return
+        with self._lock:
+            if not self._sujo and time.monotonic() - self._construido_em < self.ttl:
+                return
+            self._sujo = False
+            try:
+                self._construir()
+            except Exception:
+                self._sujo = True
+                raise
+            self._construido_em = time.monotonic()
+
+    def _construir(self):
+        keepers, pontos, sem_coordenadas = [], [], []
+        somas: Dict[tuple, List[float]] = {}
+
+        for keeper in AddressKeeper.objects.filter(ativo=True, verificado=True).values(
+            'id', 'apelido_local', 'rua', 'numero', 'bairro', 'cidade', 'estado', 'cep',
+            'latitude', 'longitude', 'aceita_retirada', 'aceita_envio',
+            'capacidade_itens', 'ocupacao_percent', 'taxa_guarda_dia'
+        ).order_by('id'):
+            indice = len(keepers)
+            keepers.append({
+                'id': keeper['id'],
+                'nome': keeper['apelido_local'] or f"{keeper['cidade']}, {keeper['estado']}",
+                'endereco': f"{keeper['rua']}, {keeper['numero']} - {keeper['bairro']}",
+                'cidade': keeper['cidade'],
+                'aceita_retirada': keeper['aceita_retirada'],
+                'aceita_envio': keeper['aceita_envio'],
+                'taxa_guarda_dia': float(keeper['taxa_guarda_dia'] or 0),
+                'ocupacao_percent': float(keeper['ocupacao_percent'] or 0),
+                'capacidade_itens': keeper['capacidade_itens'],
+            })
+            if keeper['latitude'] is None or keeper['longitude'] is None:
+                sem_coordenadas.append(indice)
+                continue
+
+            ponto = vetor(keeper['latitude'], keeper['longitude'])
+            pontos.append((ponto, indice))
+
+            # Centróides para localizar endereços sem coordenadas
+            cep = normalizar_cep(keeper['cep'])
+            chaves = [('cep', cep[:n]) for n in (5, 3, 2) if len(cep) >= n]
+            if keeper['cidade']:
+                chaves.append(('cidade', _normalizar_texto(keeper['cidade']), _normalizar_texto(keeper['estado'])))
+            if keeper['estado']:
+                chaves.append(('estado', _normalizar_texto(keeper['estado'])))
+            for chave in chaves:
+                soma = somas.setdefault(chave, [0.0, 0.0, 0.0])
+                for eixo in range(3):
+                    soma[eixo] += ponto[eixo]
+
+        centroides = {}
+        for chave, soma in somas.items():
+            norma = math.sqrt(sum(c * c for c in soma))
+            if norma > 0:
+                centroides[chave] = tuple(c / norma for c in soma)
+
+        self._keepers = keepers
+        self._arvore = _KDTree(pontos)
+        self._sem_coordenadas = sem_coordenadas
+        self._centroides = centroides
+        logger.info(f"[ENTREGA] Índice de keepers reconstruído: {len(pontos)} com coordenadas, {len(sem_coordenadas)} sem")
+
+    def localizar(self, cep: Optional[str] = None, cidade: Optional[str] = None,
+                  estado: Optional[str] = None) -> Optional[Vetor]:
+        """Posição aproximada de um endereço sem coordenadas (centróide dos keepers)"""
+        self._garantir()
+        cep = normalizar_cep(cep)
+        chaves = [('cep', cep[:n]) for n in (5, 3, 2) if len(cep) >= n]
+        if cidade:
+            chaves.append(('cidade', _normalizar_texto(cidade), _normalizar_texto(estado)))
+        if estado:
+            chaves.append(('estado', _normalizar_texto(estado)))
+        for chave in chaves:
+            if chave in self._centroides:
+                return self._centroides[chave]
+        return None
+
+    def _custo(self, keeper: Dict, distancia: float) -> float:
+        ocupacao = keeper['ocupacao_percent'] / 100
+        custo = distancia * (1 + PESO_OCUPACAO * ocupacao)
+        if keeper['capacidade_itens']:
+            vagas = keeper['capacidade_itens'] * max(1 - ocupacao, 0)
+            custo *= 1 + PESO_LOTACAO / (1 + vagas)
+        return custo + keeper['taxa_guarda_dia'] * KM_POR_REAL
+
+    def mais_proximos(self, origem: Optional[Vetor], k: int = 5) -> List[Dict]:
+        """
+        Até ``k`` keepers, do menor para o maior custo
+
+        Sem ``origem`` (endereço desconhecido) ordena só por ocupação/taxa.
+        Keepers sem coordenadas completam a lista quando faltam opções.
+        """
+        self._garantir()
+        keepers = self._keepers
+
+        candidatos = []
+        if origem is not None and self._arvore is not None:
+            for corda2, indice in self._arvore.vizinhos(origem, k * CANDIDATOS_POR_OPCAO):
+                candidatos.append((indice, distancia_km(corda2)))
+        if origem is None or len(candidatos) < k:
+            vistos = {indice for indice, _ in candidatos}
+            restantes = self._sem_coordenadas if origem is not None else range(len(keepers))
+            candidatos.extend((indice, None) for indice in restantes if indice not in vistos)
+
+        opcoes = []
+        for indice, distancia in candidatos:
+            keeper = keepers[indice]
+            if keeper['ocupacao_percent'] >= OCUPACAO_MAXIMA:
+                continue
+            custo = self._custo(keeper, distancia or 0.0)
+            # Keepers sem distância conhecida ficam depois dos localizados
+            opcoes.append((distancia is None and origem is not None, custo, keeper['id'], keeper, distancia))
+        opcoes.sort(key=lambda opcao: opcao[:3])
+
+        return [
+            {**keeper, 'distancia_km': round(distancia, 1) if distancia is not None else None}
+            for _, _, _, keeper, distancia in opcoes[:k]
+        ]
+
+
+indice_keepers = IndiceKeepers(INDICE_TTL)
+
+
+def localizar_cliente(cliente_id: Optional[int], cep: Optional[str] = None) -> Optional[Vetor]:
+    """
+    Posição do cliente: endereço de entrega padrão geocodificado ou, sem
+    coordenadas, o centróide do CEP/cidade (``cep`` informado tem prioridade)
+    """
+    if cep:
+        return indice_keepers.localizar(cep=cep)
+    if not cliente_id:
+        return None
+
+    endereco = EnderecoEntrega.objects.filter(cliente_id=cliente_id).order_by('-padrao', '-id').values(
+        'latitude', 'longitude', 'cep', 'cidade', 'estado'
+    ).first()
+    if not endereco:
+        return None
+    if endereco['latitude'] is not None and endereco['longitude'] is not None:
+        return vetor(endereco['latitude'], endereco['longitude'])
+    return indice_keepers.localizar(endereco['cep'], endereco['cidade'], endereco['estado'])
+
+
+def keepers_proximos(cliente_id: Optional[int] = None, cep: Optional[str] = None, k: int = 5) -> List[Dict]:
+    """Opções de ponto de guarda mais próximas do cliente"""
+    return indice_keepers.mais_proximos(localizar_cliente(cliente_id, cep), k)
+
+
+# ============================================================================
+# GEOCODIFICAÇÃO (offline - manage.py geocodificar_enderecos)
+# ============================================================================
+
+def geocodificar(cep: str = '', cidade: str = '', estado: str = '', pais: str = 'Brasil',
+                 rua: str = '') -> Optional[Tuple[float, float]]:
+    """
+    Latitude/longitude de um endereço via Nominatim (busca estruturada)
+
+    Tenta do mais específico (rua + CEP) ao menos específico (cidade/estado).
+    """
+    tentativas = []
+    if rua and cidade:
+        tentativas.append({'street': rua, 'city': cidade, 'state': estado})
+    if normalizar_cep(cep):
+        tentativas.append({'postalcode': cep})
+    if cidade:
+        tentativas.append({'city': cidade, 'state': estado})
+
+    for params in tentativas:
+        try:
+            response = requests.get(
+                GEOCODER_URL,
+                params={**{k: v for k, v in params.items() if v}, 'country': pais or 'Brasil', 'format': 'json', 'limit': 1},
+                headers={'User-Agent': GEOCODER_USER_AGENT},
+                timeout=10
+            )
+            response.raise_for_status()
+            resultados = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"[GEO] Erro ao geocodificar {params}: {str(e)}")
+            continue
+        if resultados:
+            return float(resultados[0]['lat']), float(resultados[0]['lon'])
+    return None
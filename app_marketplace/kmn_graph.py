@@ -0,0 +1,226 @@
+"""
+Grafo de Confiança KMN - Marketplace
+====================================
+
+Rede de agentes em memória (ligações Mesh e trustlines ativas) usada para
+responder, sem consultas por nó:
+
+- quais owners (usuários) um cliente alcança a partir dos shoppers que segue
+  (``client_products``)
+- quais parceiros compartilham a carteira de clientes com um agente, respeitando
+  ``tipo_compartilhamento`` (``kmn_clientes``)
+- com quais parceiros um agente tem trustline ativa (``get_available_clients``)
+
+Cada grafo é uma matriz de adjacência CSR (arrays ``inicio``/``vizinhos``/
+``dados``) e a busca em largura aceita ``max_saltos`` para meshes de mais de
+um salto. O grafo é reconstruído sob demanda quando uma ligação muda
+(signals) ou quando a versão das tabelas muda em outro processo (verificada a
+cada ``KMN_GRAPH_RELOAD_SECONDS``).
+"""
+
+import logging
+import threading
+import time
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Max
+
+from .models import Agente, LigacaoMesh, TrustlineKeeper
+
+logger = logging.getLogger(__name__)
+
+RELOAD_SECONDS = getattr(settings, 'KMN_GRAPH_RELOAD_SECONDS', 30)
+
+# Dado da aresta quando ela vem de uma LigacaoMesh (trustlines guardam o próprio id)
+ARESTA_MESH = 0
+
+
+class _CSR:
+    """Grafo dirigido em formato CSR: os vizinhos de cada nó ficam contíguos"""
+
+    def __init__(self, arestas: Iterable[Tuple[int, int, int]]):
+        """``arestas``: (origem, destino, dado); ids de nó são ids do banco"""
+        self.posicao: Dict[int, int] = {}
+        self.ids = array('q')
+        por_origem: Dict[int, List[Tuple[int, int]]] = {}
+
+        for origem, destino, dado in arestas:
+            for no in (origem, destino):
+                if no not in self.posicao:
+                    self.posicao[no] = len(self.ids)
+                    self.ids.append(no)
+            por_origem.setdefault(self.posicao[origem], []).append((self.posicao[destino], dado))
+
+        self.inicio = array('q', [0])
+        self.vizinhos = array('q')
+        self.dados = array('q')
+        for indice in range(len(self.ids)):
+            vistos = set()
+            for destino, dado in por_origem.get(indice, ()):
+                if destino != indice and destino not in vistos:
+                    vistos.add(destino)
+                    self.vizinhos.append(destino)
+                    self.dados.append(dado)
+            self.inicio.append(len(self.vizinhos))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def total_arestas(self) -> int:
+        return len(self.vizinhos)
+
+    def vizinhos_de(self, no: int) -> Iterator[Tuple[int, int]]:
+        """(vizinho, dado) de cada aresta que sai de ``no``"""
+        indice = self.posicao.get(no)
+        if indice is None:
+            return
+        for k in range(self.inicio[indice], self.inicio[indice + 1]):
+            yield self.ids[self.vizinhos[k]], self.dados[k]
+
+    def alcancaveis(self, origens: Iterable[int], max_saltos: int = 1) -> Dict[int, int]:
+        """
+        Nós a até ``max_saltos`` arestas das origens (busca em largura)
+
+        Returns:
+            ``{no: dado da aresta pela qual foi alcançado}`` - sem as origens
+        """
+        fila = deque()
+        visitados = set()
+        for no in origens:
+            indice = self.posicao.get(no)
+            if indice is not None and indice not in visitados:
+                visitados.add(indice)
+                fila.append((indice, 0))
+
+        encontrados: Dict[int, int] = {}
+        while fila:
+            indice, saltos = fila.popleft()
+            if saltos >= max_saltos:
+                continue
+            for k in range(self.inicio[indice], self.inicio[indice + 1]):
+                vizinho = self.vizinhos[k]
+                if vizinho in visitados:
+                    continue
+                visitados.add(vizinho)
+                encontrados[self.ids[vizinho]] = self.dados[k]
+                fila.append((vizinho, saltos + 1))
+        return encontrados
+
+
+@dataclass
+class _Grafos:
+    # Usuários: Mesh + trustlines entre agentes com Personal Shopper (não dirigido)
+    visibilidade: _CSR
+    # Agentes: trustlines ativas (não dirigido), dado = id da trustline
+    parcerias: _CSR
+    # Agentes: quem vê -> quem empresta a carteira, dado = id da trustline
+    compartilhamento: _CSR
+
+
+def _arestas_compartilhamento(trustline: Dict) -> List[Tuple[int, int, int]]:
+    """Arestas (quem vê, dono da carteira, trustline) conforme ``tipo_compartilhamento``"""
+    a, b, tipo = trustline['agente_a_id'], trustline['agente_b_id'], trustline['tipo_compartilhamento']
+    if tipo == TrustlineKeeper.TipoCompartilhamento.UNIDIRECIONAL_A_PARA_B:
+        return [(b, a, trustline['id'])]
+    if tipo == TrustlineKeeper.TipoCompartilhamento.UNIDIRECIONAL_B_PARA_A:
+        return [(a, b, trustline['id'])]
+    # Bidirecional (ou valor desconhecido)
+    return [(a, b, trustline['id']), (b, a, trustline['id'])]
+
+
+class GrafoKMN:
+    """Grafo de confiança da rede KMN (por processo, recarregado quando as ligações mudam)"""
+
+    def __init__(self, intervalo_recarga: float):
+        self.intervalo_recarga = intervalo_recarga
+        self._lock = threading.Lock()
+        self._sujo = True
+        self._versao = None
+        self._verificado_em = 0.0
+        self._grafos: Optional[_Grafos] = None
+
+    def invalidar(self):
+        """Reconstruir na próxima consulta"""
+        self._sujo = True
+
+    def _versao_tabelas(self):
+        try:
+            return tuple(
+                tuple(modelo.objects.aggregate(ultimo=Max('atualizado_em'), total=Count('id')).values())
+                for modelo in (LigacaoMesh, TrustlineKeeper, Agente)
+            )
+        except DatabaseError as e:
+            logger.warning(f"[KMN GRAPH] Não foi possível verificar a versão do grafo: {str(e)}")
+            return None
+
+    def _construir(self) -> _Grafos:
+        shopper_user = dict(
+            Agente.objects.filter(personal_shopper__isnull=False).values_list('id', 'personal_shopper__user_id')
+        )
+        trustlines = list(TrustlineKeeper.objects.filter(
+            status=TrustlineKeeper.StatusTrustline.ATIVA
+        ).values('id', 'agente_a_id', 'agente_b_id', 'tipo_compartilhamento'))
+
+        visibilidade = []
+        for a, b in LigacaoMesh.objects.filter(ativo=True).values_list('agente_a_id', 'agente_b_id'):
+            visibilidade += [(a, b, ARESTA_MESH), (b, a, ARESTA_MESH)]
+
+        parcerias, compartilhamento = [], []
+        for trustline in trustlines:
+            a, b = trustline['agente_a_id'], trustline['agente_b_id']
+            parcerias += [(a, b, trustline['id']), (b, a, trustline['id'])]
+            compartilhamento += _arestas_compartilhamento(trustline)
+            user_a, user_b = shopper_user.get(a), shopper_user.get(b)
+            if user_a and user_b:
+                visibilidade += [(user_a, user_b, trustline['id']), (user_b, user_a, trustline['id'])]
+
+        grafos = _Grafos(
+            visibilidade=_CSR(visibilidade),
+            parcerias=_CSR(parcerias),
+            compartilhamento=_CSR(compartilhamento),
+        )
+        logger.info(
+            f"[KMN GRAPH] Grafo carregado: {len(grafos.visibilidade)} usuário(s), "
+            f"{grafos.visibilidade.total_arestas} aresta(s) de visibilidade, {len(trustlines)} trustline(s) ativa(s)"
+        )
+        return grafos
+
+    def _garantir(self) -> _Grafos:
+        if not self._sujo and self._grafos is not None and time.monotonic() - self._verificado_em < self.intervalo_recarga:
+            return self._grafos
+        with self._lock:
+            if not self._sujo and self._grafos is not None and time.monotonic() - self._verificado_em < self.intervalo_recarga:
+                return self._grafos
+            self._sujo = False
+            versao = self._versao_tabelas()
+            if self._grafos is None or versao is None or versao != self._versao:
+                try:
+                    self._grafos = self._construir()
+                except Exception:
+                    self._sujo = True
+                    raise
+                self._versao = versao
+            self._verificado_em = time.monotonic()
+            return self._grafos
+
+    def owners_alcancaveis(self, user_ids: Iterable[int], max_saltos: int = 1) -> set:
+        """Usuários alcançáveis via Mesh/trustline a partir de ``user_ids`` (inclusive eles)"""
+        user_ids = set(user_ids)
+        return user_ids | set(self._garantir().visibilidade.alcancaveis(user_ids, max_saltos))
+
+    def parceiros(self, agente_id: int, max_saltos: int = 1) -> Dict[int, int]:
+        """Agentes com trustline ativa: ``{agente_id: trustline_id}``"""
+        return self._garantir().parcerias.alcancaveis([agente_id], max_saltos)
+
+    def parceiros_compartilhando(self, agente_id: int, max_saltos: int = 1) -> Dict[int, int]:
+        """Agentes cuja carteira de clientes ``agente_id`` pode ver: ``{agente_id: trustline_id}``"""
+        return self._garantir().compartilhamento.alcancaveis([agente_id], max_saltos)
+
+
+grafo_kmn = GrafoKMN(RELOAD_SECONDS)
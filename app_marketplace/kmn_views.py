@@ -18,6 +18,8 @@ from .models import (
     Oferta, TrustlineKeeper, RoleStats, Pedido, RelacionamentoClienteShopper
 )
 from .services import KMNRoleEngine, KMNStatsService, CatalogoService
+from .kmn_graph import grafo_kmn
+from .schema_registry import esquema
 
 
 # ============================================================================
@@ -50,7 +52,7 @@ def kmn_dashboard(request):
         'total_trustlines': TrustlineKeeper.objects.filter(
             Q(agente_a=agente) | Q(agente_b=agente),
             status='ativa'
-        ).defer('tipo_compartilhamento').count(),
+        ).defer(*esquema.campos_ausentes(TrustlineKeeper, ['tipo_compartilhamento'])).count(),
     }
     
     # Scores do agente
@@ -72,7 +74,7 @@ def kmn_dashboard(request):
     trustlines_ativas = TrustlineKeeper.objects.filter(
         Q(agente_a=agente) | Q(agente_b=agente),
         status='ativa'
-    ).defer('tipo_compartilhamento').order_by('-aceito_em')[:5]
+    ).defer(*esquema.campos_ausentes(TrustlineKeeper, ['tipo_compartilhamento'])).order_by('-aceito_em')[:5]
     
     # Produtos mais ofertados
     produtos_populares = Produto.objects.filter(
@@ -137,95 +139,26 @@ def kmn_clientes(request):
             )
         
         # 2. IDs de clientes via trustlines ATIVAS (emprestimo de carteira)
+        # Parceiros que compartilham a carteira com o agente, respeitando
+        # tipo_compartilhamento (grafo KMN em memória)
+        agentes_parceiros_compartilhando = list(grafo_kmn.parceiros_compartilhando(agente.id))
         cliente_ids_via_trustline = set()
         
-        # Verificar se o campo tipo_compartilhamento existe no banco de dados
-        # Usar uma query de teste para verificar se a coluna existe
-        campo_existe = False
-        try:
-            from django.db import connection
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name='app_marketplace_trustlinekeeper' 
-                    AND column_name='tipo_compartilhamento'
-                """)
-                campo_existe = cursor.fetchone() is not None
-        except:
-            # Se der erro na verificação, assumir que não existe
-            campo_existe = False
-        
-        # Buscar trustlines onde o agente é agente_a ou agente_b
-        # Usar defer() para evitar erro se o campo tipo_compartilhamento não existir
-        trustlines_ativas = TrustlineKeeper.objects.filter(
-            Q(agente_a=agente) | Q(agente_b=agente),
-            status=TrustlineKeeper.StatusTrustline.ATIVA
-        ).defer('tipo_compartilhamento')
-        
-        # Se o campo não existe no banco, já está usando defer()
-        # Se existir, ainda assim usar defer() para evitar problemas
-        
-        trustlines_ativas = trustlines_ativas.select_related('agente_a', 'agente_b')
-        
-        # Para cada trustline, buscar clientes do parceiro respeitando a direcionalidade
-        for trustline in trustlines_ativas:
-            parceiro = None
-            pode_ver_clientes_parceiro = False
-            
-            # Verificar direcionalidade (com fallback para trustlines antigas sem o campo)
-            if campo_existe:
-                try:
-                    tipo_compartilhamento = trustline.tipo_compartilhamento
-                except (AttributeError, KeyError):
-                    tipo_compartilhamento = 'bidirecional'
-            else:
-                # Campo não existe no modelo - tratar como bidirecional
-                tipo_compartilhamento = 'bidirecional'
-            
-            # Comparar com strings para evitar problemas se a classe não existir
-            if tipo_compartilhamento == 'bidirecional' or tipo_compartilhamento is None:
-                # Bidirecional: ambos compartilham
-                parceiro = trustline.agente_b if trustline.agente_a == agente else trustline.agente_a
-                pode_ver_clientes_parceiro = True
-            elif tipo_compartilhamento == 'a_para_b':
-                # Unidirecional A → B: apenas A empresta para B
-                if trustline.agente_a == agente:
-                    # Agente logado é A: não vê clientes de B (direção é A → B)
-                    pode_ver_clientes_parceiro = False
-                else:
-                    # Agente logado é B: vê clientes de A (A empresta para B)
-                    parceiro = trustline.agente_a
-                    pode_ver_clientes_parceiro = True
-            elif tipo_compartilhamento == 'b_para_a':
-                # Unidirecional B → A: apenas B empresta para A
-                if trustline.agente_b == agente:
-                    # Agente logado é B: não vê clientes de A (direção é B → A)
-                    pode_ver_clientes_parceiro = False
-                else:
-                    # Agente logado é A: vê clientes de B (B empresta para A)
-                    parceiro = trustline.agente_b
-                    pode_ver_clientes_parceiro = True
-            else:
-                # Fallback: tratar como bidirecional se o valor não for reconhecido
-                parceiro = trustline.agente_b if trustline.agente_a == agente else trustline.agente_a
-                pode_ver_clientes_parceiro = True
+        if agentes_parceiros_compartilhando:
+            # Via ClienteRelacao dos parceiros
+            cliente_ids_via_trustline.update(
+                ClienteRelacao.objects.filter(
+                    agente_id__in=agentes_parceiros_compartilhando
+                ).values_list('cliente_id', flat=True)
+            )
             
-            # Se pode ver clientes do parceiro, buscar
-            if pode_ver_clientes_parceiro and parceiro:
-                # Via ClienteRelacao do parceiro
-                cliente_ids_via_trustline.update(
-                    ClienteRelacao.objects.filter(agente=parceiro).values_list('cliente_id', flat=True)
-                )
-                
-                # Via RelacionamentoClienteShopper do parceiro
-                if parceiro.personal_shopper:
-                    cliente_ids_via_trustline.update(
-                        Cliente.objects.filter(
-                            relacionamentoclienteshopper__personal_shopper=parceiro.personal_shopper,
-                            relacionamentoclienteshopper__status=RelacionamentoClienteShopper.Status.SEGUINDO
-                        ).values_list('id', flat=True)
-                    )
+            # Via RelacionamentoClienteShopper dos parceiros
+            cliente_ids_via_trustline.update(
+                RelacionamentoClienteShopper.objects.filter(
+                    personal_shopper__agente_profile__in=agentes_parceiros_compartilhando,
+                    status=RelacionamentoClienteShopper.Status.SEGUINDO
+                ).values_list('cliente_id', flat=True)
+            )
         
         # Unir todos os IDs de clientes
         todos_cliente_ids = cliente_ids_diretos | cliente_ids_via_trustline
@@ -241,38 +174,7 @@ def kmn_clientes(request):
                 cliente_id__in=todos_cliente_ids
             )
             
-            # Buscar relações dos parceiros (via trustline) para os mesmos clientes
-            # Filtrar apenas parceiros que realmente compartilham clientes (respeitando direcionalidade)
-            agentes_parceiros_compartilhando = []
-            for tl in trustlines_ativas:
-                if campo_existe:
-                    try:
-                        tipo_compartilhamento = tl.tipo_compartilhamento
-                    except (AttributeError, KeyError):
-                        tipo_compartilhamento = 'bidirecional'
-                else:
-                    # Campo não existe no modelo - tratar como bidirecional
-                    tipo_compartilhamento = 'bidirecional'
-                
-                # Comparar com strings
-                if tipo_compartilhamento == 'bidirecional' or tipo_compartilhamento is None:
-                    # Bidirecional: ambos compartilham
-                    parceiro = tl.agente_b if tl.agente_a == agente else tl.agente_a
-                    if parceiro not in agentes_parceiros_compartilhando:
-                        agentes_parceiros_compartilhando.append(parceiro)
-                elif tipo_compartilhamento == 'a_para_b':
-                    # Unidirecional A → B: apenas B vê clientes de A
-                    if tl.agente_b == agente:
-                        # Agente logado é B: pode ver clientes de A
-                        if tl.agente_a not in agentes_parceiros_compartilhando:
-                            agentes_parceiros_compartilhando.append(tl.agente_a)
-                elif tipo_compartilhamento == 'b_para_a':
-                    # Unidirecional B → A: apenas A vê clientes de B
-                    if tl.agente_a == agente:
-                        # Agente logado é A: pode ver clientes de B
-                        if tl.agente_b not in agentes_parceiros_compartilhando:
-                            agentes_parceiros_compartilhando.append(tl.agente_b)
-            
+            # Relações dos parceiros que compartilham a carteira, para os mesmos clientes
             relacoes_parceiros_qs = ClienteRelacao.objects.filter(
                 agente__in=agentes_parceiros_compartilhando,
                 cliente_id__in=todos_cliente_ids
@@ -496,8 +398,8 @@ def kmn_trustlines(request):
                 trustline_existente = TrustlineKeeper.objects.filter(
                     (Q(agente_a=agente) & Q(agente_b=agente_b)) |
                     (Q(agente_a=agente_b) & Q(agente_b=agente))
-                ).defer('tipo_compartilhamento').first()
-
+                ).defer(*esquema.campos_ausentes(TrustlineKeeper, ['tipo_compartilhamento'])).first()
+                
                 # Se houver trustline ativa / pendente / suspensa, não deixar duplicar
                 if trustline_existente and trustline_existente.status in [
                     TrustlineKeeper.StatusTrustline.ATIVA,
@@ -553,7 +455,7 @@ def kmn_trustlines(request):
     try:
         trustlines = TrustlineKeeper.objects.filter(
             Q(agente_a=agente) | Q(agente_b=agente)
-        ).defer('tipo_compartilhamento').select_related('agente_a__user', 'agente_b__user').order_by('-aceito_em', '-criado_em')
+        ).defer(*esquema.campos_ausentes(TrustlineKeeper, ['tipo_compartilhamento'])).select_related('agente_a__user', 'agente_b__user').order_by('-aceito_em', '-criado_em')
         
         # Agentes disponíveis para criar trustlines
         # IMPORTANTE: Um agente pode ter múltiplas trustlines com diferentes agentes
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_marketplace.agora_ranking import recalcular_spark_scores
+
+
+class Command(BaseCommand):
+    help = "Recalcula o SparkScore/PPA das publicações do Ágora com engajamento novo (decaimento exponencial)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Publicações por lote')
+        parser.add_argument('--loop', action='store_true', help='Recalcular periodicamente')
+        parser.add_argument('--sleep', type=float, default=60.0, help='Intervalo (s) entre execuções com --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            atualizadas = recalcular_spark_scores(batch_size=options['batch_size'])
+            if atualizadas or not options['loop']:
+                self.stdout.write(f"{atualizadas} publicação(ões) atualizada(s)")
+
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
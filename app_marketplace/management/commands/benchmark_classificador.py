@@ -0,0 +1,104 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_marketplace.models import WhatsappMessage
+from app_marketplace.text_classifier import (
+    BRAND_MAP, INTENCAO_SOCIAL, INTENCOES_SOCIAIS, MARCA, PROMOCAO, PROMO_KEYWORDS, analisar_texto,
+)
+
+
+# (texto, marca, labels promocionais): casos fixos conferidos a cada execução
+CASOS_REFERENCIA = [
+    ("30OFF em toda a loja", None, ['desconto']),
+    ("Nike 50off só hoje", 'nike', ['desconto']),
+    ("Promoção Carter's: cupom 10off", "carter's", ['promocao', 'cupom', 'desconto']),
+    ("Bolsa de canvas nova", None, []),
+]
+
+
+def _classificar_legado(texto):
+    """Implementação anterior (um laço de ``in`` por vocabulário), para comparação"""
+    low = texto.lower()
+    marca = None
+    for nome, aliases in BRAND_MAP.items():
+        if any(alias in low for alias in aliases):
+            marca = nome
+            break
+    labels = []
+    for termo, label in PROMO_KEYWORDS.items():
+        if termo in low and label not in labels:
+            labels.append(label)
+    intencao = None
+    for tipo, termos, _ in INTENCOES_SOCIAIS:
+        if any(termo in low for termo in termos):
+            intencao = str(tipo)
+            break
+    return marca, labels, intencao
+
+
+class Command(BaseCommand):
+    help = "Mede o classificador de mensagens sobre mensagens reais de grupo (compara com a versão anterior)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--amostra', type=int, default=5000, help='Mensagens de grupo mais recentes')
+        parser.add_argument('--arquivo', type=str, default=None, help='Corpus em arquivo texto (uma mensagem por linha)')
+        parser.add_argument('--repeticoes', type=int, default=3, help='Passadas sobre o corpus (usa a melhor)')
+
+    def handle(self, *args, **options):
+        if options['arquivo']:
+            with open(options['arquivo'], encoding='utf-8') as arquivo:
+                corpus = [linha.strip() for linha in arquivo if linha.strip()]
+        else:
+            corpus = list(
+                WhatsappMessage.objects.filter(group__isnull=False).exclude(content='').order_by('-timestamp')
+                .values_list('content', flat=True)[:options['amostra']]
+            )
+        if not corpus:
+            self.stdout.write("Nenhuma mensagem para o benchmark")
+            return
+
+        analisar_texto('')  # compilar fora da medição
+        
+        falhas = 0
+        for texto, marca, labels in CASOS_REFERENCIA:
+            analise = analisar_texto(texto)
+            if analise.primeiro(MARCA) != marca or sorted(analise.rotulos(PROMOCAO)) != sorted(labels):
+                falhas += 1
+                self.stdout.write(self.style.ERROR(
+                    f"Caso de referência falhou: {texto!r} -> {analise.primeiro(MARCA)!r}, {analise.rotulos(PROMOCAO)}"
+                ))
+        
+        def medir(funcao):
+            melhor = None
+            for _ in range(options['repeticoes']):
+                inicio = time.perf_counter()
+                for texto in corpus:
+                    funcao(texto)
+                decorrido = time.perf_counter() - inicio
+                melhor = decorrido if melhor is None else min(melhor, decorrido)
+            return melhor
+
+        tempo_legado = medir(_classificar_legado)
+        tempo_novo = medir(analisar_texto)
+
+        divergencias = 0
+        for texto in corpus:
+            analise = analisar_texto(texto)
+            marca, labels, intencao = _classificar_legado(texto)
+            if (
+                analise.primeiro(MARCA) != marca or
+                sorted(analise.rotulos(PROMOCAO)) != sorted(labels) or
+                analise.mais_prioritario(INTENCAO_SOCIAL) != intencao
+            ):
+                divergencias += 1
+
+        total = len(corpus)
+        self.stdout.write(f"Casos de referência: {len(CASOS_REFERENCIA) - falhas}/{len(CASOS_REFERENCIA)} ok")
+        self.stdout.write(f"Mensagens: {total} ({sum(len(t) for t in corpus) / total:.0f} caracteres em média)")
+        self.stdout.write(f"Anterior:  {tempo_legado * 1e6 / total:8.1f} µs/mensagem")
+        self.stdout.write(f"Compilado: {tempo_novo * 1e6 / total:8.1f} µs/mensagem ({tempo_legado / tempo_novo:.1f}x)")
+        self.stdout.write(
+            f"Resultados diferentes: {divergencias} "
+            "(esperado: termos que antes casavam no meio de palavras, ex: 'vs' em 'canvas', e ordem do texto)"
+        )
@@ -0,0 +1,36 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_marketplace.outbox import despachar_pendentes, estatisticas_outbox
+
+
+class Command(BaseCommand):
+    help = "Executa os efeitos pendentes da outbox de pedidos WhatsApp (OutboxEvent)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Eventos reservados por lote')
+        parser.add_argument('--workers', type=int, default=4, help='Threads processando cada lote')
+        parser.add_argument('--loop', action='store_true', help='Continuar consumindo a outbox indefinidamente')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Espera (s) quando não há eventos prontos')
+        parser.add_argument('--stats', action='store_true', help='Apenas imprimir profundidade e atraso da outbox')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(estatisticas_outbox(), indent=4))
+            return
+
+        while True:
+            resultado = despachar_pendentes(
+                batch_size=options['batch_size'],
+                workers=options['workers']
+            )
+            if resultado['total']:
+                self.stdout.write(f"Lote processado: {json.dumps(resultado)}")
+                continue
+
+            # Nenhum evento pronto
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
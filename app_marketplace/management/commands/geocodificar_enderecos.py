@@ -0,0 +1,53 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from app_marketplace.keeper_geo import geocodificar
+from app_marketplace.models import AddressKeeper, EnderecoEntrega
+
+
+class Command(BaseCommand):
+    help = "Geocodifica (lat/long) Address Keepers e endereços de entrega a partir de CEP/cidade/estado"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todos', action='store_true', help='Regeocodificar também os que já têm coordenadas')
+        parser.add_argument('--sem-enderecos', action='store_true', help='Apenas Address Keepers')
+        parser.add_argument('--limite', type=int, default=None, help='Máximo de registros por modelo')
+        parser.add_argument('--sleep', type=float, default=1.1, help='Intervalo (s) entre consultas ao geocodificador')
+
+    def handle(self, *args, **options):
+        modelos = [AddressKeeper]
+        if not options['sem_enderecos']:
+            modelos.append(EnderecoEntrega)
+
+        for modelo in modelos:
+            registros = modelo.objects.order_by('pk')
+            if not options['todos']:
+                registros = registros.filter(latitude__isnull=True)
+            if options['limite']:
+                registros = registros[:options['limite']]
+
+            atualizados = falhas = 0
+            for registro in registros.iterator():
+                coordenadas = geocodificar(
+                    cep=registro.cep,
+                    cidade=registro.cidade,
+                    estado=registro.estado,
+                    pais=getattr(registro, 'pais', 'Brasil'),
+                    rua=f"{registro.numero} {registro.rua}".strip() if registro.rua else '',
+                )
+                if coordenadas:
+                    latitude, longitude = coordenadas
+                    # save() dispara os signals que invalidam o índice de keepers
+                    registro.latitude = Decimal(f"{latitude:.6f}")
+                    registro.longitude = Decimal(f"{longitude:.6f}")
+                    registro.save(update_fields=['latitude', 'longitude'])
+                    atualizados += 1
+                else:
+                    falhas += 1
+                time.sleep(options['sleep'])
+
+            self.stdout.write(
+                f"{modelo._meta.verbose_name_plural}: {atualizados} geocodificado(s), {falhas} sem resultado"
+            )
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_marketplace.agora_engajamento import reconciliar_contadores
+
+
+class Command(BaseCommand):
+    help = "Recalcula os contadores de engajamento das publicações do Ágora a partir de EngajamentoAgora"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Publicações por agregação')
+        parser.add_argument('--loop', action='store_true', help='Reconciliar periodicamente')
+        parser.add_argument('--sleep', type=float, default=3600.0, help='Intervalo (s) entre reconciliações com --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            corrigidas = reconciliar_contadores(batch_size=options['batch_size'])
+            self.stdout.write(f"{corrigidas} publicação(ões) corrigida(s)")
+
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app_marketplace.sales_rollup import reconstruir_rollup
+
+
+class Command(BaseCommand):
+    help = "Recalcula o rollup de vendas (WhatsappOrderRollup) a partir dos pedidos WhatsApp"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None, help='Recalcular apenas os últimos N dias (padrão: todo o histórico)')
+        parser.add_argument('--group', type=int, action='append', dest='groups', help='ID do grupo (pode repetir)')
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['dias'] is not None:
+            desde = timezone.localdate() - timedelta(days=options['dias'])
+
+        total = reconstruir_rollup(desde=desde, group_ids=options['groups'])
+        self.stdout.write(self.style.SUCCESS(f"{total} bucket(s) de vendas gravado(s)"))
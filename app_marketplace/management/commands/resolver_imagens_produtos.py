@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from app_marketplace.models import ProdutoJSON
+from app_marketplace.product_catalog import CAMPOS_DERIVADOS, atualizar_flags
+from app_marketplace.product_images import assinatura_config, atualizar_imagens
+
+
+class Command(BaseCommand):
+    help = "Resolve e grava as URLs das imagens (e flags do catálogo) dos ProdutoJSON desatualizados ou ainda não processados"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Produtos por lote')
+        parser.add_argument('--todos', action='store_true', help='Reprocessar também os que já estão atualizados')
+
+    def handle(self, *args, **options):
+        produtos = ProdutoJSON.objects.only('id', 'dados_json', 'imagem_original').order_by('pk')
+        if not options['todos']:
+            produtos = produtos.exclude(imagens_versao=assinatura_config())
+
+        ultimo_id = 0
+        atualizados = 0
+        while True:
+            lote = list(produtos.filter(pk__gt=ultimo_id)[:options['batch_size']])
+            if not lote:
+                break
+            for produto in lote:
+                atualizar_imagens(produto)
+                atualizar_flags(produto)
+            # bulk_update não dispara save()/signals (sincronização com Produto fica intacta)
+            ProdutoJSON.objects.bulk_update(lote, CAMPOS_DERIVADOS)
+            atualizados += len(lote)
+            ultimo_id = lote[-1].pk
+
+        self.stdout.write(f"{atualizados} produto(s) atualizado(s) (configuração {assinatura_config()})")
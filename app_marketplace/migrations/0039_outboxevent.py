@@ -0,0 +1,38 @@
+# Generated manually
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_marketplace', '0038_add_telefone_personalshopper'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('pagamento', 'Inicializar pagamento'), ('link_pagamento', 'Enviar link de pagamento'), ('kmn_entrega', 'Criar pacote KMN'), ('prova_social', 'Notificação de prova social')], max_length=30)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('resultado', models.JSONField(blank=True, help_text='Retorno do efeito executado', null=True)),
+                ('idempotency_key', models.CharField(help_text="Chave única do efeito (ex: 'pagamento:123')", max_length=100, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('processing', 'Processando'), ('done', 'Concluído'), ('error', 'Erro')], default='pending', max_length=20)),
+                ('tentativas', models.PositiveIntegerField(default=0)),
+                ('ultimo_erro', models.TextField(blank=True, null=True)),
+                ('disponivel_em', models.DateTimeField(default=django.utils.timezone.now, help_text='Não executar antes deste momento (backoff)')),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('processado_em', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_events', to='app_marketplace.whatsapporder')),
+            ],
+            options={
+                'verbose_name': 'Evento de Outbox',
+                'verbose_name_plural': 'Eventos de Outbox',
+                'ordering': ['criado_em'],
+                'indexes': [models.Index(fields=['status', 'disponivel_em'], name='app_marketp_status_56c55c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated manually
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_marketplace', '0039_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WhatsappOrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('confirmed', 'Confirmado'), ('paid', 'Pago'), ('purchased', 'Comprado'), ('shipped', 'Enviado'), ('delivered', 'Entregue'), ('cancelled', 'Cancelado')], max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='Soma de total_amount dos pedidos do bucket', max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_rollups', to='app_marketplace.whatsappgroup')),
+            ],
+            options={
+                'verbose_name': 'Rollup de Vendas WhatsApp',
+                'verbose_name_plural': 'Rollups de Vendas WhatsApp',
+                'unique_together': {('group', 'day', 'hour', 'status')},
+            },
+        ),
+    ]
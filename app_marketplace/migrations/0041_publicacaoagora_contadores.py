@@ -0,0 +1,81 @@
+# Generated manually
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+CONTADORES = {
+    'view': 'total_views',
+    'like': 'total_likes',
+    'add_carrinho': 'total_add_carrinho',
+    'compartilhar': 'total_compartilhar',
+}
+
+
+def preencher_contadores(apps, schema_editor):
+    """Calcula os contadores iniciais a partir dos engajamentos existentes"""
+    PublicacaoAgora = apps.get_model('app_marketplace', 'PublicacaoAgora')
+    EngajamentoAgora = apps.get_model('app_marketplace', 'EngajamentoAgora')
+
+    agregados = EngajamentoAgora.objects.values('publicacao_id').annotate(
+        total_engajamentos=Count('id'),
+        total_view_time=Sum('view_time_segundos', filter=Q(tipo='view')),
+        **{campo: Count('id', filter=Q(tipo=tipo)) for tipo, campo in CONTADORES.items()}
+    ).order_by()
+
+    campos = [*CONTADORES.values(), 'total_view_time', 'total_engajamentos']
+    lote = []
+    for linha in agregados.iterator():
+        publicacao = PublicacaoAgora(pk=linha['publicacao_id'])
+        for campo in campos:
+            setattr(publicacao, campo, linha[campo] or 0)
+        lote.append(publicacao)
+        if len(lote) >= 500:
+            PublicacaoAgora.objects.bulk_update(lote, campos)
+            lote = []
+    if lote:
+        PublicacaoAgora.objects.bulk_update(lote, campos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_marketplace', '0040_whatsapporderrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publicacaoagora',
+            name='total_views',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='publicacaoagora',
+            name='total_likes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='publicacaoagora',
+            name='total_add_carrinho',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='publicacaoagora',
+            name='total_compartilhar',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='publicacaoagora',
+            name='total_view_time',
+            field=models.PositiveBigIntegerField(default=0, help_text='Tempo total de visualização em segundos'),
+        ),
+        migrations.AddField(
+            model_name='publicacaoagora',
+            name='total_engajamentos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='publicacaoagora',
+            index=models.Index(fields=['ativo', '-spark_score', '-ppa', '-total_likes', '-total_views', '-criado_em', '-id'], name='app_marketp_ativo_ea4d6b_idx'),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated manually
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_marketplace', '0041_publicacaoagora_contadores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publicacaoagora',
+            name='engajamento_decaido',
+            field=models.FloatField(default=0.0, help_text='Engajamento ponderado com decaimento exponencial'),
+        ),
+        migrations.AddField(
+            model_name='publicacaoagora',
+            name='ultimo_engajamento_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='publicacaoagora',
+            name='score_calculado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='engajamentoagora',
+            index=models.Index(fields=['publicacao', 'criado_em'], name='app_marketp_publica_38707e_idx'),
+        ),
+        # Publicações com engajamento anterior entram no primeiro recálculo
+        migrations.RunSQL(
+            "UPDATE app_marketplace_publicacaoagora SET ultimo_engajamento_em = atualizado_em "
+            "WHERE total_engajamentos > 0",
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated manually
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Trigger: search_vector acompanha content em todo INSERT/UPDATE (inclusive bulk_create)
+CRIAR_TRIGGER = """
+CREATE OR REPLACE FUNCTION app_marketplace_whatsappmessage_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := to_tsvector('portuguese', coalesce(NEW.content, ''));
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER whatsappmessage_search_vector_update
+    BEFORE INSERT OR UPDATE OF content ON app_marketplace_whatsappmessage
+    FOR EACH ROW EXECUTE FUNCTION app_marketplace_whatsappmessage_search_vector();
+
+UPDATE app_marketplace_whatsappmessage
+    SET search_vector = to_tsvector('portuguese', coalesce(content, ''));
+"""
+
+REMOVER_TRIGGER = """
+DROP TRIGGER IF EXISTS whatsappmessage_search_vector_update ON app_marketplace_whatsappmessage;
+DROP FUNCTION IF EXISTS app_marketplace_whatsappmessage_search_vector();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_marketplace', '0042_publicacaoagora_score_incremental'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whatsappmessage',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(CRIAR_TRIGGER, REMOVER_TRIGGER),
+        migrations.AddIndex(
+            model_name='whatsappmessage',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='app_marketp_search__8cc8f6_gin'),
+        ),
+    ]
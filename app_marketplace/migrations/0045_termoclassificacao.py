@@ -0,0 +1,30 @@
+# Generated manually
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_marketplace', '0044_coordenadas_enderecos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermoClassificacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria', models.CharField(choices=[('marca', 'Marca'), ('promocao', 'Label promocional'), ('intencao_social', 'Intenção social (grupo)')], max_length=30)),
+                ('rotulo', models.CharField(help_text="Ex: 'nike', 'ultimo_dia', 'pergunta'", max_length=100)),
+                ('termo', models.CharField(help_text='Texto procurado na mensagem (sem diferenciar maiúsculas)', max_length=100)),
+                ('prioridade', models.IntegerField(default=0, help_text='Intenções: maior prioridade vence quando várias aparecem')),
+                ('ativo', models.BooleanField(default=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Termo do Classificador',
+                'verbose_name_plural': 'Termos do Classificador',
+                'ordering': ['categoria', 'rotulo', 'termo'],
+                'unique_together': {('categoria', 'termo')},
+            },
+        ),
+    ]
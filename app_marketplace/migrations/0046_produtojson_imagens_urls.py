@@ -0,0 +1,22 @@
+# Generated manually
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_marketplace', '0045_termoclassificacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produtojson',
+            name='imagens_urls',
+            field=models.JSONField(blank=True, default=list, help_text='URLs exibíveis das imagens, sem repetição'),
+        ),
+        migrations.AddField(
+            model_name='produtojson',
+            name='imagens_versao',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Assinatura da configuração usada para resolver imagens_urls', max_length=16),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated manually
+import json
+
+from django.db import migrations, models
+
+
+def _tem_imagem(dados, imagem_original):
+    produto = dados.get('produto') if isinstance(dados.get('produto'), dict) else {}
+    produto_viagem = dados.get('produto_viagem') if isinstance(dados.get('produto_viagem'), dict) else {}
+    candidatas = list(produto.get('imagens') or []) if isinstance(produto.get('imagens'), list) else []
+    candidatas += [
+        imagem_original,
+        produto.get('imagem') or produto.get('image'),
+        produto_viagem.get('imagem') or produto_viagem.get('image'),
+    ]
+    for imagem in candidatas:
+        if isinstance(imagem, dict):
+            imagem = imagem.get('url') or imagem.get('src') or imagem.get('path') or imagem.get('image_url')
+        if isinstance(imagem, str) and imagem:
+            return True
+    return False
+
+
+def preencher_flags(apps, schema_editor):
+    """disponivel/destaque/tem_imagem a partir do JSON dos produtos existentes"""
+    ProdutoJSON = apps.get_model('app_marketplace', 'ProdutoJSON')
+    lote = []
+    for produto_json in ProdutoJSON.objects.only('id', 'dados_json', 'imagem_original').iterator(chunk_size=500):
+        dados = produto_json.dados_json
+        if isinstance(dados, str):
+            try:
+                dados = json.loads(dados)
+            except ValueError:
+                dados = {}
+        dados = dados if isinstance(dados, dict) else {}
+        produto = dados.get('produto') if isinstance(dados.get('produto'), dict) else {}
+
+        produto_json.disponivel = bool(produto.get('is_available', True))
+        produto_json.destaque = bool(produto.get('is_featured', False))
+        produto_json.tem_imagem = _tem_imagem(dados, produto_json.imagem_original)
+        lote.append(produto_json)
+        if len(lote) >= 500:
+            ProdutoJSON.objects.bulk_update(lote, ['disponivel', 'destaque', 'tem_imagem'])
+            lote = []
+    if lote:
+        ProdutoJSON.objects.bulk_update(lote, ['disponivel', 'destaque', 'tem_imagem'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_marketplace', '0046_produtojson_imagens_urls'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produtojson',
+            name='disponivel',
+            field=models.BooleanField(default=True, help_text='produto.is_available'),
+        ),
+        migrations.AddField(
+            model_name='produtojson',
+            name='destaque',
+            field=models.BooleanField(default=False, help_text='produto.is_featured'),
+        ),
+        migrations.AddField(
+            model_name='produtojson',
+            name='tem_imagem',
+            field=models.BooleanField(default=False, help_text='Há ao menos uma imagem em imagens_urls'),
+        ),
+        migrations.AddIndex(
+            model_name='produtojson',
+            index=models.Index(fields=['criado_por', 'disponivel', '-criado_em'], name='app_marketp_criado__7e1080_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produtojson',
+            index=models.Index(fields=['criado_por', 'tem_imagem'], name='app_marketp_criado__eaf1af_idx'),
+        ),
+        migrations.RunPython(preencher_flags, reverse_code=migrations.RunPython.noop),
+    ]
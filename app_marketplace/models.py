@@ -1,5 +1,6 @@
 from django.db import models
-from django.db.models import Sum
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator
@@ -274,6 +275,10 @@ class AddressKeeper(models.Model):
     cep           = models.CharField(max_length=12, blank=True)
     pais          = models.CharField(max_length=50, default='Brasil')
     
+    # Coordenadas (geocodificadas offline: manage.py geocodificar_enderecos)
+    latitude      = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude     = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    
     # Capacidade e taxas
     capacidade_itens  = models.PositiveIntegerField(default=0, help_text="Capacidade aproximada (qtde de volumes)")
     ocupacao_percent  = models.DecimalField(max_digits=5, decimal_places=2, default=0)  # calculado
@@ -478,6 +483,8 @@ class EnderecoEntrega(models.Model):
     estado      = models.CharField(max_length=2)
     cep         = models.CharField(max_length=9)
     padrao      = models.BooleanField(default=False)
+    latitude    = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude   = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     
     class Meta:
         verbose_name = 'Endereço de Entrega'
@@ -1667,6 +1674,9 @@ class WhatsappMessage(models.Model):
     read_at = models.DateTimeField(null=True, blank=True, help_text="Quando foi lida")
     is_from_customer = models.BooleanField(default=True, help_text="Mensagem veio do cliente")
     
+    # Busca textual (tsvector de content) - mantido por trigger no PostgreSQL, ver conversation_search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     class Meta:
         verbose_name = 'Mensagem WhatsApp'
         verbose_name_plural = 'Mensagens WhatsApp'
@@ -1674,6 +1684,7 @@ class WhatsappMessage(models.Model):
         indexes = [
             models.Index(fields=['conversation', 'read']),
             models.Index(fields=['sender', 'timestamp']),
+            GinIndex(fields=['search_vector'], name='app_marketp_search__8cc8f6_gin'),
         ]
     
     def __str__(self):
@@ -1833,6 +1844,112 @@ class WhatsappOrder(models.Model):
         super().save(*args, **kwargs)
 
 
+class WhatsappOrderRollup(models.Model):
+    """
+    Vendas pré-agregadas por (grupo, dia, hora, status) - o owner vem do grupo.
+    
+    Mantido incrementalmente pelos signals de WhatsappOrder (app_marketplace.sales_rollup)
+    e reconstruível com ``manage.py reconstruir_rollup_vendas``. Lido pelos dashboards
+    e analytics do shopper no lugar de agregações sobre WhatsappOrder.
+    """
+    group = models.ForeignKey(WhatsappGroup, on_delete=models.CASCADE, related_name='order_rollups')
+    day = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    status = models.CharField(max_length=20, choices=WhatsappOrder.STATUS_CHOICES)
+    
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Soma de total_amount dos pedidos do bucket")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Rollup de Vendas WhatsApp'
+        verbose_name_plural = 'Rollups de Vendas WhatsApp'
+        unique_together = ('group', 'day', 'hour', 'status')
+    
+    def __str__(self):
+        return f"{self.group_id} {self.day} {self.hour:02d}h {self.status}: {self.order_count}"
+
+
+class OutboxEvent(models.Model):
+    """
+    Outbox transacional dos efeitos colaterais de um pedido WhatsApp.
+    
+    Gravado na mesma transação que cria o pedido; o dispatcher
+    (app_marketplace.outbox / manage.py despachar_outbox) executa pagamento,
+    envios WhatsApp e KMN após o commit, com retentativas e idempotência.
+    """
+    class Tipo(models.TextChoices):
+        PAGAMENTO = 'pagamento', 'Inicializar pagamento'
+        LINK_PAGAMENTO = 'link_pagamento', 'Enviar link de pagamento'
+        KMN_ENTREGA = 'kmn_entrega', 'Criar pacote KMN'
+        PROVA_SOCIAL = 'prova_social', 'Notificação de prova social'
+    
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pendente'
+        PROCESSING = 'processing', 'Processando'
+        DONE = 'done', 'Concluído'
+        ERROR = 'error', 'Erro'
+    
+    tipo = models.CharField(max_length=30, choices=Tipo.choices)
+    order = models.ForeignKey(WhatsappOrder, on_delete=models.CASCADE, related_name='outbox_events')
+    payload = models.JSONField(default=dict, blank=True)
+    resultado = models.JSONField(null=True, blank=True, help_text="Retorno do efeito executado")
+    idempotency_key = models.CharField(max_length=100, unique=True, help_text="Chave única do efeito (ex: 'pagamento:123')")
+    
+    # Controle de execução
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    tentativas = models.PositiveIntegerField(default=0)
+    ultimo_erro = models.TextField(null=True, blank=True)
+    disponivel_em = models.DateTimeField(default=timezone.now, help_text="Não executar antes deste momento (backoff)")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    
+    # Timestamps
+    criado_em = models.DateTimeField(auto_now_add=True)
+    processado_em = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Evento de Outbox'
+        verbose_name_plural = 'Eventos de Outbox'
+        ordering = ['criado_em']
+        indexes = [
+            models.Index(fields=['status', 'disponivel_em']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} - Pedido {self.order_id} ({self.status})"
+
+
+class TermoClassificacao(models.Model):
+    """
+    Dicionário editável do classificador de mensagens (app_marketplace.text_classifier).
+    
+    Complementa os vocabulários padrão do código: cada termo aponta para um
+    rótulo (marca, label promocional ou intenção). Um termo inativo com o mesmo
+    texto de um termo padrão o desativa. Alterações são recarregadas sem deploy.
+    """
+    class Categoria(models.TextChoices):
+        MARCA = 'marca', 'Marca'
+        PROMOCAO = 'promocao', 'Label promocional'
+        INTENCAO_SOCIAL = 'intencao_social', 'Intenção social (grupo)'
+    
+    categoria = models.CharField(max_length=30, choices=Categoria.choices)
+    rotulo = models.CharField(max_length=100, help_text="Ex: 'nike', 'ultimo_dia', 'pergunta'")
+    termo = models.CharField(max_length=100, help_text="Texto procurado na mensagem (sem diferenciar maiúsculas)")
+    prioridade = models.IntegerField(default=0, help_text="Intenções: maior prioridade vence quando várias aparecem")
+    ativo = models.BooleanField(default=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Termo do Classificador'
+        verbose_name_plural = 'Termos do Classificador'
+        ordering = ['categoria', 'rotulo', 'termo']
+        unique_together = ('categoria', 'termo')
+    
+    def __str__(self):
+        return f"{self.get_categoria_display()}: {self.termo} → {self.rotulo}"
+
+
 # ============================================================================
 # SISTEMA KMN - DROPKEEPER + KEEPER MESH NETWORK
 # ============================================================================
@@ -2403,11 +2520,28 @@ class PublicacaoAgora(models.Model):
         help_text="PPA (Potencial Prévio de Ação) 0.0-1.0"
     )
     
+    # Contadores de engajamento (denormalizados; atualizados com F() em
+    # app_marketplace.agora_engajamento e reconciliados periodicamente)
+    total_views = models.PositiveIntegerField(default=0)
+    total_likes = models.PositiveIntegerField(default=0)
+    total_add_carrinho = models.PositiveIntegerField(default=0)
+    total_compartilhar = models.PositiveIntegerField(default=0)
+    total_view_time = models.PositiveBigIntegerField(default=0, help_text="Tempo total de visualização em segundos")
+    total_engajamentos = models.PositiveIntegerField(default=0)
+    
+    # Recalculo incremental do SparkScore (app_marketplace.agora_ranking)
+    engajamento_decaido = models.FloatField(default=0.0, help_text="Engajamento ponderado com decaimento exponencial")
+    ultimo_engajamento_em = models.DateTimeField(null=True, blank=True)
+    score_calculado_em = models.DateTimeField(null=True, blank=True)
+    
     # Status
     ativo = models.BooleanField(default=True)
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
     
+    # Ordenação do feed (cursor keyset em agora_feed); 'id' desempata
+    ORDEM_FEED = ('spark_score', 'ppa', 'total_likes', 'total_views', 'criado_em', 'id')
+    
     class Meta:
         verbose_name = 'Publicação Ágora'
         verbose_name_plural = 'Publicações Ágora'
@@ -2416,40 +2550,16 @@ class PublicacaoAgora(models.Model):
             models.Index(fields=['-spark_score', '-criado_em']),
             models.Index(fields=['ativo', '-spark_score']),
             models.Index(fields=['evento', '-spark_score']),
+            models.Index(
+                fields=['ativo', '-spark_score', '-ppa', '-total_likes', '-total_views', '-criado_em', '-id'],
+                name='app_marketp_ativo_ea4d6b_idx'
+            ),
         ]
     
     def __str__(self):
         autor_nome = self.autor.get_full_name() or self.autor.username
         produto_nome = self.produto.nome if self.produto else "Sem produto"
         return f"{autor_nome} - {produto_nome}"
-    
-    @property
-    def total_views(self):
-        """Total de visualizações"""
-        return self.engajamentos.filter(tipo='view').count()
-    
-    @property
-    def total_likes(self):
-        """Total de likes"""
-        return self.engajamentos.filter(tipo='like').count()
-    
-    @property
-    def total_add_carrinho(self):
-        """Total de adições ao carrinho"""
-        return self.engajamentos.filter(tipo='add_carrinho').count()
-    
-    @property
-    def total_compartilhar(self):
-        """Total de compartilhamentos"""
-        return self.engajamentos.filter(tipo='compartilhar').count()
-    
-    @property
-    def total_view_time(self):
-        """Tempo total de visualização em segundos"""
-        result = self.engajamentos.filter(tipo='view').aggregate(
-            total=Sum('view_time_segundos')
-        )
-        return result['total'] or 0
 
 
 class EngajamentoAgora(models.Model):
@@ -2502,6 +2612,7 @@ class EngajamentoAgora(models.Model):
         indexes = [
             models.Index(fields=['publicacao', 'tipo']),
             models.Index(fields=['usuario', '-criado_em']),
+            models.Index(fields=['publicacao', 'criado_em'], name='app_marketp_publica_38707e_idx'),
         ]
     
     def __str__(self):
@@ -2813,6 +2924,15 @@ class ProdutoJSON(models.Model):
     codigo_barras = models.CharField(max_length=50, unique=True, null=True, blank=True, db_index=True)
     imagem_original = models.CharField(max_length=500, null=True, blank=True, help_text="Caminho do arquivo de imagem original")
     
+    # URLs das imagens resolvidas ao salvar (listagens não percorrem o JSON - ver product_images.py)
+    imagens_urls = models.JSONField(default=list, blank=True, help_text="URLs exibíveis das imagens, sem repetição")
+    imagens_versao = models.CharField(max_length=16, blank=True, default='', db_index=True, help_text="Assinatura da configuração usada para resolver imagens_urls")
+    
+    # Flags do JSON promovidas a colunas (catálogo do shopper filtra/pagina no banco - ver product_catalog.py)
+    disponivel = models.BooleanField(default=True, help_text="produto.is_available")
+    destaque = models.BooleanField(default=False, help_text="produto.is_featured")
+    tem_imagem = models.BooleanField(default=False, help_text="Há ao menos uma imagem em imagens_urls")
+    
     # Relacionamento com shopper que criou
     criado_por = models.ForeignKey(
         User,
@@ -2844,11 +2964,26 @@ class ProdutoJSON(models.Model):
             models.Index(fields=['nome_produto', 'marca']),
             models.Index(fields=['categoria']),
             models.Index(fields=['criado_por', '-criado_em']),
+            models.Index(fields=['criado_por', 'disponivel', '-criado_em']),
+            models.Index(fields=['criado_por', 'tem_imagem']),
         ]
     
     def __str__(self):
         return f"{self.nome_produto} ({self.marca}) - {self.criado_em.strftime('%d/%m/%Y')}"
     
+    def save(self, *args, **kwargs):
+        from .product_images import atualizar_imagens
+        from .product_catalog import CAMPOS_DERIVADOS, atualizar_flags
+        
+        # Resolver as URLs das imagens e as flags quando o JSON ou a imagem original podem ter mudado
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'dados_json', 'imagem_original'} & set(update_fields):
+            atualizar_imagens(self)
+            atualizar_flags(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(CAMPOS_DERIVADOS)
+        super().save(*args, **kwargs)
+    
     def get_produto_data(self):
         """Retorna os dados do produto em formato dict"""
         if isinstance(self.dados_json, str):
@@ -0,0 +1,260 @@
+"""
+Outbox de Pedidos - Marketplace
+===============================
+
+Efeitos colaterais do fechamento de pedidos WhatsApp (pagamento, link de
+pagamento, pacote KMN e prova social no grupo).
+
+``WhatsAppFlowEngine.finalizar_pedido`` grava apenas ``OutboxEvent`` na
+mesma transação do pedido. Após o commit, o dispatcher executa os efeitos
+fora da transação - em uma thread disparada pelo próprio commit e/ou pelo
+worker ``manage.py despachar_outbox`` - com retentativas (backoff) e
+idempotência por ``idempotency_key``.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import ConversaContextualizada, OutboxEvent, WhatsappOrder
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = timedelta(seconds=getattr(settings, 'OUTBOX_LOCK_TIMEOUT', 300))
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+RETRY_BACKOFF = getattr(settings, 'OUTBOX_RETRY_BACKOFF', 30)
+
+
+def registrar_efeitos_pedido(
+    pedido: WhatsappOrder,
+    conversa_contextualizada: ConversaContextualizada,
+    produtos: List[Dict]
+) -> List[OutboxEvent]:
+    """
+    Grava os efeitos do fechamento do pedido na outbox (chamar dentro da transação)
+
+    O despacho é agendado para depois do commit; se a transação for desfeita,
+    nenhum efeito é executado.
+    """
+    eventos = OutboxEvent.objects.bulk_create([
+        OutboxEvent(
+            tipo=OutboxEvent.Tipo.PAGAMENTO,
+            order=pedido,
+            payload={'conversa_id': conversa_contextualizada.id},
+            idempotency_key=f"{OutboxEvent.Tipo.PAGAMENTO}:{pedido.id}",
+        ),
+        OutboxEvent(
+            tipo=OutboxEvent.Tipo.KMN_ENTREGA,
+            order=pedido,
+            payload={'produtos': produtos},
+            idempotency_key=f"{OutboxEvent.Tipo.KMN_ENTREGA}:{pedido.id}",
+        ),
+        OutboxEvent(
+            tipo=OutboxEvent.Tipo.PROVA_SOCIAL,
+            order=pedido,
+            payload={'produtos': produtos},
+            idempotency_key=f"{OutboxEvent.Tipo.PROVA_SOCIAL}:{pedido.id}",
+        ),
+    ])
+    transaction.on_commit(lambda: disparar_despacho(pedido.id))
+    return eventos
+
+
+def disparar_despacho(order_id: int):
+    """Despacha em background os eventos do pedido (o worker cobre falhas e reinícios)"""
+    if not getattr(settings, 'OUTBOX_DISPATCH_ON_COMMIT', True):
+        return
+
+    def _executar():
+        try:
+            despachar_pendentes(order_id=order_id)
+        except Exception as e:
+            logger.error(f"[OUTBOX] Erro ao despachar pedido {order_id}: {str(e)}", exc_info=True)
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=_executar, name=f"outbox-{order_id}", daemon=True).start()
+
+
+# ============================================================================
+# HANDLERS - um por tipo de efeito
+# ============================================================================
+
+def _handler_pagamento(evento: OutboxEvent, engine) -> Dict:
+    resultado = engine._processar_pagamento_pedido(evento.order, None)
+    if resultado.get('status') == 'erro':
+        raise RuntimeError(resultado.get('erro') or 'Erro ao processar pagamento')
+
+    resultado['pedido_numero'] = evento.order.order_number
+    if resultado.get('checkout_url') or resultado.get('qr_code'):
+        # Link só existe depois do pagamento: encadear o envio no privado
+        OutboxEvent.objects.get_or_create(
+            idempotency_key=f"{OutboxEvent.Tipo.LINK_PAGAMENTO}:{evento.order_id}",
+            defaults={
+                'tipo': OutboxEvent.Tipo.LINK_PAGAMENTO,
+                'order': evento.order,
+                'payload': {'conversa_id': evento.payload.get('conversa_id'), 'pagamento': resultado},
+            }
+        )
+    return resultado
+
+
+def _handler_link_pagamento(evento: OutboxEvent, engine) -> Dict:
+    conversa = ConversaContextualizada.objects.select_related('participante').get(
+        id=evento.payload['conversa_id']
+    )
+    resultado = engine._enviar_link_pagamento_privado(conversa, evento.payload.get('pagamento') or {})
+    if not resultado.get('success'):
+        raise RuntimeError(resultado.get('error') or 'Falha ao enviar link de pagamento')
+    return resultado
+
+
+def _handler_kmn_entrega(evento: OutboxEvent, engine) -> Dict:
+    resultado = engine._conectar_kmn_entrega(
+        evento.order, evento.order.customer, evento.payload.get('produtos') or []
+    )
+    if not resultado.get('sucesso'):
+        raise RuntimeError(resultado.get('erro') or 'Falha ao criar pacote KMN')
+    return resultado
+
+
+def _handler_prova_social(evento: OutboxEvent, engine) -> Dict:
+    resultado = engine._enviar_notificacao_prova_social(
+        evento.order, evento.order.group, evento.order.customer, evento.payload.get('produtos') or []
+    )
+    if not resultado.get('success'):
+        raise RuntimeError(resultado.get('error') or 'Falha ao enviar prova social')
+    return resultado
+
+
+HANDLERS: Dict[str, Callable[[OutboxEvent, object], Dict]] = {
+    OutboxEvent.Tipo.PAGAMENTO: _handler_pagamento,
+    OutboxEvent.Tipo.LINK_PAGAMENTO: _handler_link_pagamento,
+    OutboxEvent.Tipo.KMN_ENTREGA: _handler_kmn_entrega,
+    OutboxEvent.Tipo.PROVA_SOCIAL: _handler_prova_social,
+}
+
+
+# ============================================================================
+# DISPATCHER
+# ============================================================================
+
+def reservar_lote(batch_size: int = 50, order_id: Optional[int] = None) -> List[OutboxEvent]:
+    """
+    Reserva eventos prontos para execução (``SELECT ... FOR UPDATE SKIP LOCKED``)
+
+    Eventos em processamento há mais de ``LOCK_TIMEOUT`` (worker morto) voltam a ser elegíveis.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        eventos = OutboxEvent.objects.select_for_update(skip_locked=True).filter(
+            Q(status=OutboxEvent.Status.PENDING, disponivel_em__lte=now) |
+            Q(status=OutboxEvent.Status.PROCESSING, locked_at__lt=now - LOCK_TIMEOUT)
+        )
+        if order_id is not None:
+            eventos = eventos.filter(order_id=order_id)
+        eventos = list(eventos.order_by('disponivel_em', 'id')[:batch_size])
+        if not eventos:
+            return []
+
+        for evento in eventos:
+            evento.status = OutboxEvent.Status.PROCESSING
+            evento.locked_at = now
+            evento.tentativas += 1
+        OutboxEvent.objects.bulk_update(eventos, ['status', 'locked_at', 'tentativas'])
+
+    return eventos
+
+
+def processar_evento(evento: OutboxEvent) -> str:
+    """
+    Executa o efeito de um evento e atualiza seu status
+
+    Falhas voltam para a fila com backoff exponencial até ``MAX_ATTEMPTS``.
+
+    Returns:
+        Status final do evento
+    """
+    from .whatsapp_flow_engine import WhatsAppFlowEngine
+
+    close_old_connections()
+    try:
+        evento = OutboxEvent.objects.select_related(
+            'order__group', 'order__customer'
+        ).get(pk=evento.pk)
+        evento.resultado = HANDLERS[evento.tipo](evento, WhatsAppFlowEngine())
+        evento.status = OutboxEvent.Status.DONE
+        evento.ultimo_erro = None
+        evento.processado_em = timezone.now()
+    except Exception as e:
+        logger.error(f"[OUTBOX] Erro no evento {evento.pk} ({evento.tipo}): {str(e)}", exc_info=True)
+        evento.ultimo_erro = str(e)
+        if evento.tentativas >= MAX_ATTEMPTS:
+            evento.status = OutboxEvent.Status.ERROR
+        else:
+            evento.status = OutboxEvent.Status.PENDING
+            evento.disponivel_em = timezone.now() + timedelta(
+                seconds=RETRY_BACKOFF * 2 ** (evento.tentativas - 1)
+            )
+    finally:
+        evento.locked_at = None
+        evento.save(update_fields=[
+            'status', 'resultado', 'ultimo_erro', 'processado_em', 'disponivel_em', 'locked_at'
+        ])
+        close_old_connections()
+
+    return evento.status
+
+
+def despachar_pendentes(batch_size: int = 50, workers: int = 4, order_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Reserva e executa os eventos prontos (todos, ou apenas os de ``order_id``)
+
+    Eventos encadeados (ex: link de pagamento após o pagamento) são executados
+    na mesma chamada.
+
+    Returns:
+        Dict com a contagem de eventos por status final
+    """
+    resultado = {'total': 0}
+    while True:
+        eventos = reservar_lote(batch_size, order_id=order_id)
+        if not eventos:
+            break
+
+        if workers > 1 and len(eventos) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                status_finais = list(executor.map(processar_evento, eventos))
+        else:
+            status_finais = [processar_evento(evento) for evento in eventos]
+
+        resultado['total'] += len(eventos)
+        for status in status_finais:
+            resultado[status] = resultado.get(status, 0) + 1
+
+        # Sem order_id o worker chama de novo em loop; aqui basta um lote
+        if order_id is None:
+            break
+    return resultado
+
+
+def estatisticas_outbox() -> Dict:
+    """Profundidade e atraso da outbox em uma única consulta"""
+    now = timezone.now()
+    stats = OutboxEvent.objects.aggregate(
+        pending=Count('id', filter=Q(status=OutboxEvent.Status.PENDING)),
+        ready=Count('id', filter=Q(status=OutboxEvent.Status.PENDING, disponivel_em__lte=now)),
+        processing=Count('id', filter=Q(status=OutboxEvent.Status.PROCESSING)),
+        error=Count('id', filter=Q(status=OutboxEvent.Status.ERROR)),
+        oldest_ready=Min('disponivel_em', filter=Q(status=OutboxEvent.Status.PENDING, disponivel_em__lte=now)),
+    )
+    oldest_ready = stats.pop('oldest_ready')
+    stats['lag_seconds'] = round((now - oldest_ready).total_seconds(), 3) if oldest_ready else 0.0
+    return stats
@@ -0,0 +1,201 @@
+"""
+Catálogo do Shopper - Marketplace
+=================================
+
+Listagem de ``ProdutoJSON`` em ``shopper_products`` com filtros e paginação
+no banco:
+
+- ``is_available``/``is_featured`` do JSON e a presença de imagem ficam em
+  colunas (``disponivel``, ``destaque``, ``tem_imagem``), recalculadas no
+  ``save()`` junto com ``imagens_urls`` e indexadas por shopper
+- Paginação por cursor (keyset) em ``(-criado_em, -id)``: cada página é uma
+  consulta ``LIMIT`` pelo índice, sem ``OFFSET`` nem leitura dos produtos
+  anteriores; apenas os produtos da página são adaptados para o template
+- Contadores e listas de categorias/marcas do shopper vêm de uma agregação
+  em cache (``SHOPPER_CATALOG_FACETS_TTL``), invalidada pelos signals de
+  ``ProdutoJSON``
+"""
+
+import base64
+import logging
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import ProdutoJSON
+from .product_images import imagens_do_produto
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'shopper_catalog_facets'
+CACHE_TTL = getattr(settings, 'SHOPPER_CATALOG_FACETS_TTL', 300)
+TAMANHO_PAGINA = 20
+
+# Colunas derivadas de dados_json/imagem_original (gravadas pelo save() e pelo backfill)
+CAMPOS_DERIVADOS = ('imagens_urls', 'imagens_versao', 'disponivel', 'destaque', 'tem_imagem')
+
+
+def atualizar_flags(produto_json):
+    """Copia as flags do JSON para as colunas (sem salvar); requer ``imagens_urls`` atualizado"""
+    dados = produto_json.get_produto_data()
+    produto = dados.get('produto') if isinstance(dados, dict) and isinstance(dados.get('produto'), dict) else {}
+    produto_json.disponivel = bool(produto.get('is_available', True))
+    produto_json.destaque = bool(produto.get('is_featured', False))
+    produto_json.tem_imagem = bool(produto_json.imagens_urls)
+
+
+# ----------------------------------------------------------------------------
+# Facetas (cache por shopper)
+# ----------------------------------------------------------------------------
+
+def _chave(user_id: int) -> str:
+    return f'{CACHE_PREFIX}:{user_id}'
+
+
+def calcular_facetas(user_id: int) -> Dict:
+    """Contadores, categorias e marcas do catálogo do shopper (uma consulta)"""
+    agregado = ProdutoJSON.objects.filter(criado_por_id=user_id).aggregate(
+        total=Count('id'),
+        disponiveis=Count('id', filter=Q(disponivel=True)),
+        destaques=Count('id', filter=Q(destaque=True)),
+        categorias=ArrayAgg(
+            'categoria', distinct=True, ordering='categoria',
+            filter=Q(categoria__isnull=False) & ~Q(categoria='')
+        ),
+        marcas=ArrayAgg(
+            'marca', distinct=True, ordering='marca',
+            filter=Q(marca__isnull=False) & ~Q(marca='')
+        ),
+    )
+    agregado['categorias'] = agregado['categorias'] or []
+    agregado['marcas'] = agregado['marcas'] or []
+    return agregado
+
+
+def facetas_catalogo(user_id: int) -> Dict:
+    """Facetas do shopper (do cache ou recalculadas)"""
+    try:
+        facetas = cache.get(_chave(user_id))
+    except Exception as e:
+        logger.warning(f"Cache de facetas do catálogo indisponível: {str(e)}")
+        facetas = None
+    if facetas is not None:
+        return facetas
+
+    facetas = calcular_facetas(user_id)
+    try:
+        cache.set(_chave(user_id), facetas, CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Cache de facetas do catálogo indisponível: {str(e)}")
+    return facetas
+
+
+def invalidar_facetas_catalogo(user_id: Optional[int]):
+    if not user_id:
+        return
+    try:
+        cache.delete(_chave(user_id))
+    except Exception as e:
+        logger.warning(f"Erro ao invalidar facetas do catálogo: {str(e)}")
+
+
+# ----------------------------------------------------------------------------
+# Paginação por cursor
+# ----------------------------------------------------------------------------
+
+def codificar_cursor(produto) -> str:
+    bruto = f"{produto.criado_em.isoformat()}|{produto.id}"
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    """(criado_em, id) do cursor; ``None`` se inválido"""
+    if not cursor:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        criado_em, produto_id = bruto.rsplit('|', 1)
+        return datetime.fromisoformat(criado_em), int(produto_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class PaginaCatalogo:
+    """Página por cursor com a interface de ``Page`` usada pelo template"""
+
+    def __init__(self, produtos: List, tem_anterior: bool, tem_proxima: bool):
+        self.object_list = produtos
+        self.has_previous = tem_anterior
+        self.has_next = tem_proxima
+        self.has_other_pages = tem_anterior or tem_proxima
+        self.cursor_anterior = codificar_cursor(produtos[0]) if produtos and tem_anterior else ''
+        self.cursor_proximo = codificar_cursor(produtos[-1]) if produtos and tem_proxima else ''
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginar(produtos, depois: str = '', antes: str = '', tamanho: int = TAMANHO_PAGINA) -> PaginaCatalogo:
+    """
+    Página de ``produtos`` em ordem ``(-criado_em, -id)``
+
+    ``depois``: cursor do último item da página anterior (próxima página);
+    ``antes``: cursor do primeiro item da página seguinte (página anterior).
+    """
+    cursor_antes = decodificar_cursor(antes)
+    cursor_depois = None if cursor_antes else decodificar_cursor(depois)
+
+    if cursor_antes:
+        criado_em, produto_id = cursor_antes
+        linhas = list(produtos.filter(
+            Q(criado_em__gt=criado_em) | Q(criado_em=criado_em, id__gt=produto_id)
+        ).order_by('criado_em', 'id')[:tamanho + 1])
+        tem_anterior = len(linhas) > tamanho
+        return PaginaCatalogo(list(reversed(linhas[:tamanho])), tem_anterior, True)
+
+    if cursor_depois:
+        criado_em, produto_id = cursor_depois
+        produtos = produtos.filter(Q(criado_em__lt=criado_em) | Q(criado_em=criado_em, id__lt=produto_id))
+    linhas = list(produtos.order_by('-criado_em', '-id')[:tamanho + 1])
+    return PaginaCatalogo(linhas[:tamanho], cursor_depois is not None, len(linhas) > tamanho)
+
+
+# ----------------------------------------------------------------------------
+# Adaptação para o template
+# ----------------------------------------------------------------------------
+
+def adaptar_produto(produto_json) -> SimpleNamespace:
+    """Campos esperados por ``shopper_products.html`` (name, brand, image_urls, ...)"""
+    dados = produto_json.get_produto_data()
+    produto_data = dados.get('produto', {})
+
+    # Preço do produto_viagem se disponível
+    produto_viagem = dados.get('produto_viagem', {})
+    price = produto_viagem.get('preco_venda_brl') or produto_viagem.get('preco_venda_usd')
+    currency = 'BRL' if produto_viagem.get('preco_venda_brl') else 'USD'
+
+    return SimpleNamespace(
+        id=produto_json.id,
+        name=produto_json.nome_produto,
+        brand=produto_json.marca or produto_data.get('marca', ''),
+        description=produto_data.get('descricao', ''),
+        category=produto_json.categoria or produto_data.get('categoria', ''),
+        image_urls=imagens_do_produto(produto_json),
+        price=price,
+        currency=currency,
+        is_available=produto_json.disponivel,
+        is_featured=produto_json.destaque,
+        group=produto_json.grupo_whatsapp,
+        estabelecimento=None,  # ProdutoJSON não tem estabelecimento direto
+        localizacao_especifica=None,
+        created_at=produto_json.criado_em,
+        dados_json=dados,
+    )
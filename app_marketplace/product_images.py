@@ -0,0 +1,98 @@
+"""
+URLs de Imagens de Produtos - Marketplace
+=========================================
+
+Resolução única das imagens de um ``ProdutoJSON`` (``dados_json`` +
+``imagem_original``) em URLs exibíveis, feita ao salvar o produto e guardada
+em ``ProdutoJSON.imagens_urls``. Listagens e serializers apenas leem a lista,
+sem percorrer o JSON nem chamar ``build_image_url`` por imagem.
+
+As URLs dependem da configuração (``OPENMIND_AI_URL``, ``MEDIA_URL``,
+``IS_RAILWAY`` - proxy HTTPS); ``imagens_versao`` guarda a assinatura da
+configuração usada. Linhas com assinatura diferente (configuração mudou, ou
+salvas por ``bulk_create``/``update()``) são resolvidas na leitura e
+regravadas por ``python manage.py resolver_imagens_produtos``.
+
+Ordem: ``produto.imagens`` (texto ou objeto com ``url``/``src``/``path``/
+``image_url``), depois ``imagem_original``; sem nenhuma delas,
+``produto.imagem`` e ``produto_viagem.imagem``. URLs repetidas aparecem uma vez.
+"""
+
+import hashlib
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .utils import build_image_url
+
+CHAVES_URL = ('url', 'src', 'path', 'image_url')
+
+_assinatura: Optional[str] = None
+
+
+def assinatura_config() -> str:
+    """Assinatura da configuração que determina as URLs (calculada uma vez por processo)"""
+    global _assinatura
+    if _assinatura is None:
+        partes = (
+            getattr(settings, 'OPENMIND_AI_URL', ''),
+            getattr(settings, 'MEDIA_URL', '/media/'),
+            str(bool(getattr(settings, 'IS_RAILWAY', False))),
+        )
+        _assinatura = hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest()[:12]
+    return _assinatura
+
+
+def _caminho(imagem) -> Optional[str]:
+    if isinstance(imagem, str):
+        return imagem
+    if isinstance(imagem, dict):
+        for chave in CHAVES_URL:
+            if isinstance(imagem.get(chave), str) and imagem[chave]:
+                return imagem[chave]
+    return None
+
+
+def resolver_imagens(dados_json, imagem_original: Optional[str] = None) -> List[str]:
+    """URLs exibíveis e sem repetição das imagens de um produto"""
+    dados = dados_json if isinstance(dados_json, dict) else {}
+    produto = dados.get('produto') if isinstance(dados.get('produto'), dict) else {}
+
+    openmind_url = getattr(settings, 'OPENMIND_AI_URL', '')
+    media_url = getattr(settings, 'MEDIA_URL', '/media/')
+    urls: Dict[str, None] = {}
+
+    def adicionar(imagem):
+        caminho = _caminho(imagem)
+        if caminho:
+            url = build_image_url(caminho, openmind_url=openmind_url, media_url=media_url)
+            if url:
+                urls.setdefault(url, None)
+
+    imagens = produto.get('imagens')
+    if isinstance(imagens, list):
+        for imagem in imagens:
+            adicionar(imagem)
+    adicionar(imagem_original)
+
+    if not urls:
+        adicionar(produto.get('imagem') or produto.get('image'))
+    if not urls:
+        produto_viagem = dados.get('produto_viagem') if isinstance(dados.get('produto_viagem'), dict) else {}
+        adicionar(produto_viagem.get('imagem') or produto_viagem.get('image'))
+
+    return list(urls)
+
+
+def atualizar_imagens(produto_json) -> List[str]:
+    """Recalcula ``imagens_urls``/``imagens_versao`` na instância (sem salvar)"""
+    produto_json.imagens_urls = resolver_imagens(produto_json.get_produto_data(), produto_json.imagem_original)
+    produto_json.imagens_versao = assinatura_config()
+    return produto_json.imagens_urls
+
+
+def imagens_do_produto(produto_json) -> List[str]:
+    """URLs já resolvidas; resolve na hora se a linha ainda não foi atualizada"""
+    if produto_json.imagens_versao == assinatura_config():
+        return produto_json.imagens_urls or []
+    return resolver_imagens(produto_json.get_produto_data(), produto_json.imagem_original)
@@ -5,7 +5,7 @@ Fluxo: Foto → IA extrai dados → Formulário editável → Salvar
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.files.storage import default_storage
@@ -23,7 +23,7 @@ from .models import (
     WhatsappGroup, WhatsappParticipant,
     Categoria, Empresa, ProdutoJSON
 )
-from .services import analyze_image_with_openmind, analyze_multiple_images
+from .services import analyze_image_with_openmind, analyze_multiple_images, iter_analyze_multiple_images
 from .utils import transform_evora_to_modelo_json
 from pathlib import Path
 import uuid
@@ -60,6 +60,73 @@ def product_photo_create(request):
     return render(request, 'app_marketplace/product_photo_create.html', context)
 
 
+def _resposta_verificacao(result, total_imagens):
+    """Resumo da verificação de fotos + URLs das imagens salvas no SinapUm"""
+    # Extrair URLs das imagens salvas no SinapUm (para reutilizar na análise completa)
+    image_urls = []
+    image_paths = []
+    saved_filenames = []
+    
+    if result.get('analises_individuais'):
+        for analise in result['analises_individuais']:
+            analise_result = analise.get('result', {})
+            if analise_result.get('image_url'):
+                image_urls.append(analise_result['image_url'])
+            if analise_result.get('image_path'):
+                image_paths.append(analise_result['image_path'])
+            if analise_result.get('saved_filename'):
+                saved_filenames.append(analise_result['saved_filename'])
+    
+    return {
+        'success': True,
+        'mesmo_produto': result.get('mesmo_produto', False),
+        'consistencia': result.get('consistencia', {}),
+        'total_imagens': total_imagens,
+        'aviso': result.get('aviso'),
+        'produtos_identificados': len(result.get('produtos_diferentes', [])) if not result.get('mesmo_produto') else 1,
+        # URLs das imagens salvas no SinapUm (para reutilizar)
+        'image_urls': image_urls,
+        'image_paths': image_paths,
+        'saved_filenames': saved_filenames
+    }
+
+
+def _evento_sse(evento, dados):
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False, default=str)}\n\n"
+
+
+def _eventos_verificacao_sse(processed_images, user):
+    """
+    Eventos SSE da verificação de fotos:
+    - ``analise``: uma imagem concluída (em ordem de conclusão) + consistência parcial
+    - ``resultado``: mesmo conteúdo da resposta JSON sem streaming
+    """
+    try:
+        for evento in iter_analyze_multiple_images(processed_images, user=user):
+            if evento['evento'] == 'analise':
+                analise_result = evento['result']
+                produto = (analise_result.get('data') or {}).get('produto') or {}
+                yield _evento_sse('analise', {
+                    'index': evento['index'],
+                    'filename': evento['filename'],
+                    'success': analise_result.get('success', False),
+                    'error': analise_result.get('error'),
+                    'nome': produto.get('nome'),
+                    'marca': produto.get('marca'),
+                    'image_url': analise_result.get('image_url'),
+                    'image_path': analise_result.get('image_path'),
+                    'saved_filename': analise_result.get('saved_filename'),
+                    'concluidas': evento['concluidas'],
+                    'total_imagens': evento['total_imagens'],
+                    'consistencia': evento['consistencia'],
+                })
+            else:
+                yield _evento_sse('resultado', _resposta_verificacao(evento, len(processed_images)))
+    except Exception as e:
+        logger.error(f"Erro ao verificar produto (streaming): {str(e)}", exc_info=True)
+        yield _evento_sse('erro', {'error': f'Erro ao verificar produto: {str(e)}'})
+
+
 @login_required
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -70,6 +137,9 @@ def verificar_produto_fotos(request):
     
     Recebe múltiplas imagens e verifica se são do mesmo produto.
     Não gera JSON completo, apenas verifica consistência.
+    
+    Com ``?stream=1`` (ou ``Accept: text/event-stream``) responde em SSE,
+    enviando cada análise assim que ela termina.
     """
     if not (request.user.is_shopper or request.user.is_address_keeper):
         return JsonResponse({'error': 'Acesso restrito'}, status=403)
@@ -130,38 +200,22 @@ def verificar_produto_fotos(request):
             
             processed_images.append(processed_file)
         
+        # Streaming (SSE): cada análise é enviada assim que termina
+        if request.GET.get('stream') == '1' or 'text/event-stream' in request.headers.get('Accept', ''):
+            response = StreamingHttpResponse(
+                _eventos_verificacao_sse(processed_images, request.user),
+                content_type='text/event-stream'
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+        
         # Verificar se são do mesmo produto (análise rápida)
         # Passar usuário para detectar idioma
         result = analyze_multiple_images(processed_images, user=request.user)
         
-        # Extrair URLs das imagens salvas no SinapUm (para reutilizar na análise completa)
-        image_urls = []
-        image_paths = []
-        saved_filenames = []
-        
-        if result.get('analises_individuais'):
-            for analise in result['analises_individuais']:
-                analise_result = analise.get('result', {})
-                if analise_result.get('image_url'):
-                    image_urls.append(analise_result['image_url'])
-                if analise_result.get('image_path'):
-                    image_paths.append(analise_result['image_path'])
-                if analise_result.get('saved_filename'):
-                    saved_filenames.append(analise_result['saved_filename'])
-        
         # Retornar informações de verificação + URLs das imagens salvas
-        return JsonResponse({
-            'success': True,
-            'mesmo_produto': result.get('mesmo_produto', False),
-            'consistencia': result.get('consistencia', {}),
-            'total_imagens': len(processed_images),
-            'aviso': result.get('aviso'),
-            'produtos_identificados': len(result.get('produtos_diferentes', [])) if not result.get('mesmo_produto') else 1,
-            # URLs das imagens salvas no SinapUm (para reutilizar)
-            'image_urls': image_urls,
-            'image_paths': image_paths,
-            'saved_filenames': saved_filenames
-        })
+        return JsonResponse(_resposta_verificacao(result, len(processed_images)))
         
     except Exception as e:
         import traceback
@@ -0,0 +1,212 @@
+"""
+Rollup de Vendas WhatsApp - Marketplace
+=======================================
+
+Mantém ``WhatsappOrderRollup``: contagem de pedidos e soma de ``total_amount``
+por (grupo, dia, hora, status). Os signals de ``WhatsappOrder`` aplicam deltas
+(pedido criado, status/valor alterado, pedido removido) e o comando
+``manage.py reconstruir_rollup_vendas`` recalcula tudo a partir dos pedidos
+(backfill ou reconciliação após ``QuerySet.update()``, que não dispara signals).
+
+Os dashboards leem algumas centenas de linhas do rollup no lugar de dezenas
+de agregações sobre ``WhatsappOrder``.
+"""
+
+import logging
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models import WhatsappOrder, WhatsappOrderRollup
+
+logger = logging.getLogger(__name__)
+
+# Status que contam como receita nos dashboards
+REVENUE_STATUSES = ('paid', 'purchased', 'shipped', 'delivered')
+
+
+def _bucket(group_id: int, created_at, status: str) -> Dict:
+    """Chave do rollup (dia/hora no fuso local, como ``created_at__hour`` do ORM)"""
+    local = timezone.localtime(created_at) if timezone.is_aware(created_at) else created_at
+    return {'group_id': group_id, 'day': local.date(), 'hour': local.hour, 'status': status}
+
+
+def _incrementar(bucket: Dict, pedidos: int, receita: Decimal):
+    """Soma ``pedidos``/``receita`` ao bucket, criando-o se necessário"""
+    atualizados = WhatsappOrderRollup.objects.filter(**bucket).update(
+        order_count=F('order_count') + pedidos,
+        revenue=F('revenue') + receita,
+    )
+    if atualizados:
+        return
+    try:
+        with transaction.atomic():
+            WhatsappOrderRollup.objects.create(order_count=pedidos, revenue=receita, **bucket)
+    except IntegrityError:
+        # Outro processo criou o bucket entre o update e o create
+        WhatsappOrderRollup.objects.filter(**bucket).update(
+            order_count=F('order_count') + pedidos,
+            revenue=F('revenue') + receita,
+        )
+
+
+def _decrementar(bucket: Dict, receita: Decimal):
+    """Remove um pedido do bucket (nunca cria linhas: o grupo pode estar sendo removido)"""
+    WhatsappOrderRollup.objects.filter(**bucket).update(
+        order_count=F('order_count') - 1,
+        revenue=F('revenue') - receita,
+    )
+
+
+# ============================================================================
+# ATUALIZAÇÃO INCREMENTAL (signals de WhatsappOrder)
+# ============================================================================
+
+def capturar_estado_anterior(pedido: WhatsappOrder):
+    """pre_save: guarda o bucket/valor atuais do pedido para calcular o delta"""
+    pedido._rollup_anterior = None
+    if pedido.pk:
+        pedido._rollup_anterior = WhatsappOrder.objects.filter(pk=pedido.pk).values(
+            'group_id', 'created_at', 'status', 'total_amount'
+        ).first()
+
+
+def aplicar_pedido_salvo(pedido: WhatsappOrder):
+    """post_save: move o pedido do bucket anterior para o atual"""
+    anterior = getattr(pedido, '_rollup_anterior', None)
+    pedido._rollup_anterior = None
+    novo_bucket = _bucket(pedido.group_id, pedido.created_at, pedido.status)
+    novo_valor = Decimal(str(pedido.total_amount or 0))
+
+    if anterior:
+        bucket_anterior = _bucket(anterior['group_id'], anterior['created_at'], anterior['status'])
+        valor_anterior = anterior['total_amount'] or Decimal('0')
+        if bucket_anterior == novo_bucket and valor_anterior == novo_valor:
+            return
+        if bucket_anterior == novo_bucket:
+            _incrementar(novo_bucket, 0, novo_valor - valor_anterior)
+            return
+        _decrementar(bucket_anterior, valor_anterior)
+
+    _incrementar(novo_bucket, 1, novo_valor)
+
+
+def aplicar_pedido_removido(pedido: WhatsappOrder):
+    """post_delete: retira o pedido do seu bucket"""
+    _decrementar(
+        _bucket(pedido.group_id, pedido.created_at, pedido.status),
+        Decimal(str(pedido.total_amount or 0))
+    )
+
+
+# ============================================================================
+# BACKFILL / RECONCILIAÇÃO
+# ============================================================================
+
+def reconstruir_rollup(desde: Optional[date] = None, group_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recalcula o rollup a partir de ``WhatsappOrder`` (uma agregação no banco)
+
+    Args:
+        desde: Recalcular apenas a partir deste dia (padrão: todo o histórico)
+        group_ids: Restringir aos grupos informados
+
+    Returns:
+        Número de buckets gravados
+    """
+    pedidos = WhatsappOrder.objects.all()
+    rollups = WhatsappOrderRollup.objects.all()
+    if group_ids is not None:
+        group_ids = list(group_ids)
+        pedidos = pedidos.filter(group_id__in=group_ids)
+        rollups = rollups.filter(group_id__in=group_ids)
+
+    linhas = pedidos.annotate(
+        day=TruncDate('created_at'),
+        hour=ExtractHour('created_at'),
+    ).values('group_id', 'day', 'hour', 'status').annotate(
+        order_count=Count('id'),
+        revenue=Sum('total_amount'),
+    )
+    if desde is not None:
+        linhas = linhas.filter(day__gte=desde)
+        rollups = rollups.filter(day__gte=desde)
+
+    with transaction.atomic():
+        rollups.delete()
+        criados = WhatsappOrderRollup.objects.bulk_create(
+            [
+                WhatsappOrderRollup(
+                    group_id=linha['group_id'],
+                    day=linha['day'],
+                    hour=linha['hour'],
+                    status=linha['status'],
+                    order_count=linha['order_count'],
+                    revenue=linha['revenue'] or Decimal('0'),
+                )
+                for linha in linhas.order_by()
+            ],
+            batch_size=1000
+        )
+
+    logger.info(f"[ROLLUP] {len(criados)} bucket(s) de vendas reconstruído(s)")
+    return len(criados)
+
+
+# ============================================================================
+# LEITURA (dashboards)
+# ============================================================================
+
+def carregar_rollup(desde: Optional[date] = None, por: Optional[Iterable[str]] = None, **filtros) -> List[Dict]:
+    """
+    Linhas do rollup em uma consulta
+
+    Args:
+        desde: Primeiro dia incluído
+        por: Reagrupar no banco por estes campos (``status`` é sempre incluído);
+            útil para períodos longos, ex: ``por=['day']``
+        **filtros: Filtros do ORM (ex: ``group__owner=user``, ``group__shopper=shopper``)
+    """
+    rollups = WhatsappOrderRollup.objects.filter(**filtros)
+    if desde is not None:
+        rollups = rollups.filter(day__gte=desde)
+    if por is None:
+        return list(rollups.values('group_id', 'day', 'hour', 'status', 'order_count', 'revenue'))
+
+    campos = list(dict.fromkeys([*por, 'status']))
+    linhas = rollups.values(*campos).annotate(
+        soma_pedidos=Sum('order_count'),
+        soma_receita=Sum('revenue'),
+    ).order_by()
+    return [
+        {
+            **{campo: linha[campo] for campo in campos},
+            'order_count': linha['soma_pedidos'],
+            'revenue': linha['soma_receita'],
+        }
+        for linha in linhas
+    ]
+
+
+def totais(linhas: Iterable[Dict]) -> Dict:
+    """Pedidos, soma de todos os valores e receita (status pagos) das linhas"""
+    resultado = {'orders': 0, 'amount': Decimal('0'), 'revenue': Decimal('0')}
+    for linha in linhas:
+        resultado['orders'] += linha['order_count']
+        resultado['amount'] += linha['revenue']
+        if linha['status'] in REVENUE_STATUSES:
+            resultado['revenue'] += linha['revenue']
+    return resultado
+
+
+def agrupar(linhas: Iterable[Dict], campo: str) -> Dict:
+    """Totais das linhas agrupados por ``campo`` ('day', 'hour', 'status' ou 'group_id')"""
+    grupos = {}
+    for linha in linhas:
+        grupos.setdefault(linha[campo], []).append(linha)
+    return {chave: totais(itens) for chave, itens in grupos.items()}
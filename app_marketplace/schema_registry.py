@@ -0,0 +1,133 @@
+"""
+Capacidades do Esquema - Marketplace
+====================================
+
+Colunas existentes no banco para as tabelas de todos os models instalados,
+lidas uma vez por processo (uma consulta ao catálogo no PostgreSQL para todas
+as tabelas) e consultadas pelas views que toleram migrações ainda não
+aplicadas - ``.only()``/``.defer()`` de colunas opcionais - no lugar de um
+``information_schema`` por requisição.
+
+- Carregado na inicialização do WSGI (``setup/wsgi.py``) ou na primeira consulta
+- Descartado no ``post_migrate`` (processo que rodou ``migrate``); nos demais
+  processos, recarregado quando ``django_migrations`` muda (verificado a cada
+  ``SCHEMA_REGISTRY_CHECK_SECONDS``)
+- Se o catálogo não puder ser lido, todas as colunas dos models são tratadas
+  como existentes
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import DatabaseError, connection
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Count, Max
+
+logger = logging.getLogger(__name__)
+
+CHECK_SECONDS = getattr(settings, 'SCHEMA_REGISTRY_CHECK_SECONDS', 300)
+
+
+def _coluna(model, campo: str) -> str:
+    """Coluna do banco de um campo (aceita nome do campo ou ``attname``, ex.: ``cliente_id``)"""
+    try:
+        return model._meta.get_field(campo).column
+    except FieldDoesNotExist:
+        return campo
+
+
+class RegistroEsquema:
+    """Colunas por tabela (por processo, recarregado após migrações)"""
+
+    def __init__(self, intervalo_verificacao: float):
+        self.intervalo_verificacao = intervalo_verificacao
+        self._lock = threading.Lock()
+        self._sujo = True
+        self._versao = None
+        self._verificado_em = 0.0
+        self._colunas: Optional[Dict[str, FrozenSet[str]]] = None
+
+    def invalidar(self):
+        """Reler o catálogo na próxima consulta"""
+        self._sujo = True
+
+    def _versao_migracoes(self):
+        try:
+            agregado = MigrationRecorder.Migration.objects.aggregate(ultimo=Max('id'), total=Count('id'))
+            return agregado['ultimo'], agregado['total']
+        except DatabaseError as e:
+            logger.warning(f"[ESQUEMA] Não foi possível verificar as migrações aplicadas: {str(e)}")
+            return None
+
+    def _ler_catalogo(self) -> Dict[str, FrozenSet[str]]:
+        tabelas = sorted({model._meta.db_table for model in apps.get_models()})
+        colunas: Dict[str, set] = {tabela: set() for tabela in tabelas}
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    "SELECT table_name, column_name FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() AND table_name = ANY(%s)",
+                    [tabelas]
+                )
+                for tabela, coluna in cursor.fetchall():
+                    colunas[tabela].add(coluna)
+            else:
+                existentes = set(connection.introspection.table_names(cursor))
+                for tabela in tabelas:
+                    if tabela in existentes:
+                        colunas[tabela].update(
+                            coluna.name for coluna in connection.introspection.get_table_description(cursor, tabela)
+                        )
+
+        logger.info(f"[ESQUEMA] Catálogo carregado: {sum(1 for c in colunas.values() if c)} tabela(s)")
+        return {tabela: frozenset(nomes) for tabela, nomes in colunas.items()}
+
+    def carregar(self):
+        """Ler o catálogo agora (aquecimento na inicialização); falhas ficam para a próxima consulta"""
+        try:
+            self._garantir()
+        except DatabaseError as e:
+            logger.warning(f"[ESQUEMA] Catálogo indisponível na inicialização: {str(e)}")
+
+    def _garantir(self) -> Optional[Dict[str, FrozenSet[str]]]:
+        if not self._sujo and self._colunas is not None and time.monotonic() - self._verificado_em < self.intervalo_verificacao:
+            return self._colunas
+        with self._lock:
+            if not self._sujo and self._colunas is not None and time.monotonic() - self._verificado_em < self.intervalo_verificacao:
+                return self._colunas
+            versao = self._versao_migracoes()
+            if self._sujo or self._colunas is None or versao != self._versao:
+                self._colunas = self._ler_catalogo()
+                self._versao = versao
+            self._sujo = False
+            self._verificado_em = time.monotonic()
+            return self._colunas
+
+    def colunas(self, model) -> Optional[FrozenSet[str]]:
+        """Colunas existentes da tabela do model (``None`` se o catálogo não pôde ser lido)"""
+        try:
+            return self._garantir().get(model._meta.db_table, frozenset())
+        except DatabaseError as e:
+            logger.warning(f"[ESQUEMA] Catálogo indisponível: {str(e)}")
+            return None
+
+    def tem_coluna(self, model, campo: str) -> bool:
+        colunas = self.colunas(model)
+        return colunas is None or _coluna(model, campo) in colunas
+
+    def campos_existentes(self, model, campos: Iterable[str]) -> List[str]:
+        """``campos`` cuja coluna existe no banco (para ``.only()``)"""
+        return [campo for campo in campos if self.tem_coluna(model, campo)]
+
+    def campos_ausentes(self, model, campos: Iterable[str]) -> List[str]:
+        """``campos`` cuja coluna ainda não existe no banco (para ``.defer()``)"""
+        return [campo for campo in campos if not self.tem_coluna(model, campo)]
+
+
+esquema = RegistroEsquema(CHECK_SECONDS)
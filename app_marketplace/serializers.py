@@ -9,7 +9,7 @@ from .models import (
     Pagamento, TransacaoGateway, Evento,
     PublicacaoAgora, EngajamentoAgora, ProdutoJSON, OfertaProduto
 )
-from .utils import build_image_url
+from .product_images import imagens_do_produto
 
 
 class UserBasicSerializer(serializers.ModelSerializer):
@@ -667,43 +667,8 @@ class ProdutoJSONSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'criado_em', 'atualizado_em']
     
     def get_imagens_urls(self, obj):
-        """Retorna array de URLs completas das imagens"""
-        image_urls = []
-        
-        # 1. Tentar campo imagem_original
-        if obj.imagem_original:
-            url = build_image_url(obj.imagem_original)
-            if url:
-                image_urls.append(url)
-        
-        # 2. Tentar extrair do dados_json.produto.imagens
-        dados = obj.dados_json or {}
-        produto = dados.get('produto', {})
-        imagens = produto.get('imagens', [])
-        
-        if imagens and isinstance(imagens, list):
-            for img in imagens:
-                if isinstance(img, str):
-                    url = build_image_url(img)
-                    if url and url not in image_urls:
-                        image_urls.append(url)
-                elif isinstance(img, dict):
-                    # Se for objeto, tentar extrair URL
-                    img_url = img.get('url') or img.get('src') or img.get('path')
-                    if img_url:
-                        url = build_image_url(img_url)
-                        if url and url not in image_urls:
-                            image_urls.append(url)
-        
-        # 3. Fallback: tentar campo imagem (singular) no dados_json
-        if not image_urls:
-            imagem = produto.get('imagem') or produto.get('image')
-            if imagem:
-                url = build_image_url(imagem)
-                if url:
-                    image_urls.append(url)
-        
-        return image_urls
+        """Retorna array de URLs completas das imagens (resolvidas ao salvar o produto)"""
+        return imagens_do_produto(obj)
 
 
 class OfertaProdutoSerializer(serializers.ModelSerializer):
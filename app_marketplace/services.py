@@ -7,7 +7,12 @@ Serviços para integração com OpenMind AI (melhorias do SinapUm)
 """
 from typing import Optional, Tuple, Dict, Any
 from decimal import Decimal
-from django.db.models import Q, Max
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.db import close_old_connections
+from django.core.cache import cache
+from django.db.models import Q, Max, Case, When, Value, IntegerField
 from django.utils import timezone
 import requests
 import logging
@@ -16,7 +21,8 @@ from .models import (
     Agente, Cliente, Produto, Oferta, ClienteRelacao, 
     TrustlineKeeper, Pedido, RoleStats
 )
-from .utils import transform_evora_to_modelo_json
+from .utils import transform_evora_to_modelo_json, preparar_imagem_para_ia
+from .image_analysis_cache import image_analysis_cache
 
 logger = logging.getLogger(__name__)
 
@@ -93,57 +99,92 @@ class KMNRoleEngine:
     
     def __init__(self):
         self.debug_info = {}
+        # Owner primário por cliente (o engine vive o tempo de uma requisição)
+        self._owners = {}
     
     def get_primary_owner(self, cliente_id: int) -> Optional[Agente]:
         """
         Determina o dono primário de um cliente baseado na força da relação.
         """
+        if cliente_id in self._owners:
+            return self._owners[cliente_id]
+        
         try:
             relacao_principal = ClienteRelacao.objects.filter(
                 cliente_id=cliente_id,
                 status=ClienteRelacao.StatusRelacao.ATIVA
-            ).order_by(
+            ).select_related('agente').order_by(
                 '-forca_relacao',
                 '-ultimo_pedido',
                 '-total_pedidos'
             ).first()
             
-            return relacao_principal.agente if relacao_principal else None
+            owner = relacao_principal.agente if relacao_principal else None
+            self._owners[cliente_id] = owner
+            return owner
         except Exception as e:
             self.debug_info['error_primary_owner'] = str(e)
             return None
     
+    def resolver_ofertas_cliente(self, cliente: Cliente, produto_ids=None) -> Dict[int, Oferta]:
+        """
+        Resolve, em uma única consulta, a oferta correta de cada produto para o cliente.
+        
+        Mesma regra de ``escolher_oferta_para_cliente``: a oferta do owner primário
+        tem preferência; sem ela, a de menor preço. Usa ``DISTINCT ON (produto_id)``
+        ordenado pela preferência, no lugar de 1-2 consultas por produto.
+        
+        Args:
+            cliente: Cliente
+            produto_ids: Restringir a esses produtos (padrão: todos os produtos ativos)
+        
+        Returns:
+            dict: {produto_id: Oferta}
+        """
+        owner_primario = self.get_primary_owner(cliente.id)
+        
+        ofertas = Oferta.objects.filter(
+            ativo=True,
+            quantidade_disponivel__gt=0
+        )
+        if produto_ids is None:
+            ofertas = ofertas.filter(produto__ativo=True)
+        else:
+            ofertas = ofertas.filter(produto_id__in=produto_ids)
+        
+        preferencia = Value(1, output_field=IntegerField())
+        if owner_primario:
+            preferencia = Case(
+                When(agente_ofertante_id=owner_primario.id, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        
+        ofertas = ofertas.select_related(
+            'produto__categoria', 'produto__empresa',
+            'agente_origem__user', 'agente_ofertante__user'
+        ).annotate(
+            preferencia_owner=preferencia
+        ).order_by(
+            'produto_id', 'preferencia_owner', 'preco_oferta', '-criado_em', 'id'
+        ).distinct('produto_id')
+        
+        return {oferta.produto_id: oferta for oferta in ofertas}
+    
     def escolher_oferta_para_cliente(self, cliente: Cliente, produto: Produto) -> Optional[Oferta]:
         """
         Escolhe a oferta correta para um cliente específico.
         Regra: cliente deve ver apenas a oferta do seu owner primário.
         """
         try:
-            # 1. Buscar owner primário do cliente
-            owner_primario = self.get_primary_owner(cliente.id)
+            oferta = self.resolver_ofertas_cliente(cliente, produto_ids=[produto.id]).get(produto.id)
             
-            # 2. Se tem owner primário, buscar oferta dele
-            if owner_primario:
-                oferta_owner = Oferta.objects.filter(
-                    produto=produto,
-                    agente_ofertante=owner_primario,
-                    ativo=True,
-                    quantidade_disponivel__gt=0
-                ).first()
-                
-                if oferta_owner:
-                    self.debug_info['oferta_escolhida'] = 'owner_primario'
-                    return oferta_owner
-            
-            # 3. Fallback: menor preço disponível
-            oferta_menor_preco = Oferta.objects.filter(
-                produto=produto,
-                ativo=True,
-                quantidade_disponivel__gt=0
-            ).order_by('preco_oferta').first()
-            
-            self.debug_info['oferta_escolhida'] = 'menor_preco_fallback'
-            return oferta_menor_preco
+            owner_primario = self.get_primary_owner(cliente.id)
+            if oferta and owner_primario and oferta.agente_ofertante_id == owner_primario.id:
+                self.debug_info['oferta_escolhida'] = 'owner_primario'
+            else:
+                self.debug_info['oferta_escolhida'] = 'menor_preco_fallback'
+            return oferta
             
         except Exception as e:
             self.debug_info['error_escolher_oferta'] = str(e)
@@ -393,8 +434,80 @@ class KMNStatsService:
 class CatalogoService:
     """
     Serviço para geração de catálogos personalizados por cliente.
+    
+    A resolução (produto -> oferta) de cada cliente fica em cache como lista de
+    IDs de ofertas. Escritas em ``Oferta``/``Produto`` trocam a versão global
+    do cache; escritas em ``ClienteRelacao`` invalidam apenas o cliente
+    (ver ``signals_kmn``).
     """
     
+    CACHE_PREFIX = 'kmn_catalogo'
+    
+    @classmethod
+    def _versao_cache(cls) -> str:
+        versao = cache.get(f'{cls.CACHE_PREFIX}:versao')
+        if versao is None:
+            versao = cls.invalidar_cache()
+        return versao
+    
+    @classmethod
+    def _chave_cache(cls, cliente_id: int) -> str:
+        return f'{cls.CACHE_PREFIX}:{cls._versao_cache()}:{cliente_id}'
+    
+    @classmethod
+    def invalidar_cache(cls, cliente_id: Optional[int] = None) -> Optional[str]:
+        """
+        Invalida o catálogo em cache de um cliente, ou de todos (``cliente_id=None``).
+        
+        Returns:
+            Nova versão global do cache (quando invalida todos)
+        """
+        try:
+            if cliente_id is not None:
+                cache.delete(cls._chave_cache(cliente_id))
+                return None
+            versao = uuid.uuid4().hex[:12]
+            cache.set(f'{cls.CACHE_PREFIX}:versao', versao, None)
+            return versao
+        except Exception as e:
+            logger.warning(f"Erro ao invalidar cache do catálogo: {str(e)}")
+            return None
+    
+    @classmethod
+    def _ofertas_cliente(cls, cliente: Cliente, engine: KMNRoleEngine):
+        """Ofertas do catálogo do cliente (do cache ou resolvidas em uma consulta)"""
+        from django.conf import settings
+        
+        chave = None
+        try:
+            chave = cls._chave_cache(cliente.id)
+            oferta_ids = cache.get(chave)
+        except Exception as e:
+            logger.warning(f"Cache do catálogo indisponível: {str(e)}")
+            oferta_ids = None
+        
+        if oferta_ids is not None:
+            # Materializar as ofertas em uma consulta (dados sempre atuais)
+            ofertas = Oferta.objects.filter(
+                id__in=oferta_ids, ativo=True, quantidade_disponivel__gt=0, produto__ativo=True
+            ).select_related(
+                'produto__categoria', 'produto__empresa',
+                'agente_origem__user', 'agente_ofertante__user'
+            )
+            return list(ofertas), True
+        
+        ofertas = list(engine.resolver_ofertas_cliente(cliente).values())
+        if chave:
+            try:
+                cache.set(
+                    chave,
+                    [oferta.id for oferta in ofertas],
+                    getattr(settings, 'KMN_CATALOGO_CACHE_TTL', 600)
+                )
+            except Exception as e:
+                logger.warning(f"Cache do catálogo indisponível: {str(e)}")
+        return ofertas, False
+    
     @staticmethod
     def gerar_catalogo_cliente(cliente: Cliente) -> Dict[str, Any]:
         """
@@ -409,23 +522,20 @@ class CatalogoService:
         }
         
         try:
-            # Buscar todos os produtos ativos
-            produtos = Produto.objects.filter(ativo=True)
+            # Uma oferta por produto ativo, resolvidas de uma vez (ou do cache)
+            ofertas, do_cache = CatalogoService._ofertas_cliente(cliente, engine)
+            catalogo['debug']['cache'] = do_cache
             
-            for produto in produtos:
-                # Escolher a oferta correta para este cliente
-                oferta = engine.escolher_oferta_para_cliente(cliente, produto)
-                
-                if oferta:
-                    item_catalogo = {
-                        'produto': produto,
-                        'oferta': oferta,
-                        'preco': oferta.preco_oferta,
-                        'agente': oferta.agente_ofertante,
-                        'disponivel': oferta.quantidade_disponivel > 0,
-                        'markup_percentual': oferta.percentual_markup
-                    }
-                    catalogo['produtos'].append(item_catalogo)
+            for oferta in ofertas:
+                item_catalogo = {
+                    'produto': oferta.produto,
+                    'oferta': oferta,
+                    'preco': oferta.preco_oferta,
+                    'agente': oferta.agente_ofertante,
+                    'disponivel': oferta.quantidade_disponivel > 0,
+                    'markup_percentual': oferta.percentual_markup
+                }
+                catalogo['produtos'].append(item_catalogo)
             
             # Ordenar por preço
             catalogo['produtos'].sort(key=lambda x: x['preco'])
@@ -508,6 +618,46 @@ def _detect_user_language(user):
     return None
 
 
+def _salvar_upload_analisado(image_bytes, filename):
+    """
+    Salva no MEDIA_ROOT o upload cuja análise veio do cache
+    
+    O servidor de análise não recebe a imagem nesse caso, então ela é guardada
+    aqui para que o produto aponte para o arquivo deste upload.
+    
+    Returns:
+        dict: ``image_url``, ``image_path`` e ``saved_filename`` (vazio se falhar)
+    """
+    import os
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+    
+    extensao = os.path.splitext(filename or '')[1].lower() or '.jpg'
+    try:
+        caminho = default_storage.save(f"uploads/analises/{uuid.uuid4()}{extensao}", ContentFile(image_bytes))
+    except Exception as e:
+        logger.error(f"Erro ao salvar imagem analisada (cache): {str(e)}", exc_info=True)
+        return {}
+    url = default_storage.url(caminho)
+    return {
+        'image_url': url,
+        'image_path': url,  # /media/... (build_image_url trata como media local)
+        'saved_filename': os.path.basename(caminho),
+    }
+
+
+def _analise_para_cache(result):
+    """Análise do modelo (``data`` antes da transformação) e as referências ao upload salvo"""
+    import copy
+    
+    analise = copy.deepcopy(result.get('data')) if isinstance(result, dict) else None
+    referencias = (
+        result.get('image_url'), result.get('saved_image_url'),
+        result.get('image_path'), result.get('saved_filename'),
+    ) if isinstance(result, dict) else ()
+    return analise, referencias
+
+
 def analyze_image_with_mcp(image_file, language='pt-BR', user=None, context_pack=None):
     """
     Analisa uma imagem usando o MCP Service (Model Context Protocol).
@@ -547,6 +697,26 @@ def analyze_image_with_mcp(image_file, language='pt-BR', user=None, context_pack
         image_data = image_file.read()
         image_filename = image_file.name or "product_image.jpg"
         
+        # Mesma imagem (ou a mesma foto recomprimida) já analisada: sem chamar o modelo
+        cache_key = image_analysis_cache.chave(image_data, language, 'mcp:vitrinezap.analisar_produto:1.0')
+        analise = image_analysis_cache.get(cache_key)
+        if analise is not None:
+            logger.info(f"[MCP] Análise recuperada do cache: {image_filename}")
+            return {
+                'success': True,
+                'data': analise,
+                'cached': True,
+                **_salvar_upload_analisado(image_data, image_filename)
+            }
+        
+        # Reduzir/normalizar antes do base64 (payload bem menor que o upload original)
+        try:
+            tamanho_original = len(image_data)
+            image_data = preparar_imagem_para_ia(image_data)
+            logger.info(f"[MCP] Imagem preparada: {tamanho_original} -> {len(image_data)} bytes")
+        except Exception as e:
+            logger.warning(f"[MCP] Não foi possível reduzir a imagem, enviando original: {str(e)}")
+        
         # Converter imagem para base64 (MCP aceita base64 ou URL)
         image_base64 = base64.b64encode(image_data).decode('utf-8')
         
@@ -648,7 +818,7 @@ def analyze_image_with_mcp(image_file, language='pt-BR', user=None, context_pack
                 saved_filename = output.get('saved_filename')
                 
                 # Formatar resposta no formato esperado pelo Evora
-                return {
+                analysis_result = {
                     'success': True,
                     'data': data,
                     'image_url': image_url,
@@ -658,6 +828,8 @@ def analyze_image_with_mcp(image_file, language='pt-BR', user=None, context_pack
                     'trace_id': result.get('trace_id'),
                     'latency_ms': result.get('latency_ms', 0)
                 }
+                image_analysis_cache.set(cache_key, data, (image_url, image_path, saved_filename))
+                return analysis_result
             else:
                 # Tool retornou erro
                 error = result.get('error', {})
@@ -705,6 +877,221 @@ def analyze_image_with_mcp(image_file, language='pt-BR', user=None, context_pack
         return analyze_image_with_openmind(image_file, language, user)
 
 
+PROMPT_ANALISE_PRODUTO_PADRAO = """Analise esta imagem de um produto e extraia TODAS as informações visíveis no rótulo, etiqueta ou embalagem.
+
+Extraia as seguintes informações:
+- Nome do produto
+- Marca
+- Categoria (se visível)
+- Código de barras (se visível)
+- Descrição/ingredientes (se visível)
+- Informações nutricionais (se visível)
+- Dimensões da embalagem (se visível)
+- Peso/volume (se visível)
+- Qualquer outra informação relevante visível na imagem
+
+Retorne os dados em formato JSON estruturado compatível com o modelo ÉVORA."""
+
+
+def _prompt_analise_produto():
+    """Prompt de análise de imagem de produto (editável no banco, com fallback)"""
+    return get_prompt_from_database(
+        prompt_key='analise_produto_imagem',
+        fallback_prompt=PROMPT_ANALISE_PRODUTO_PADRAO
+    )
+
+
+def _chave_cache_openmind(image_bytes, language, prompt):
+    """Chave do cache de análise do OpenMind (a versão do prompt entra na chave: editar o prompt no banco invalida o cache)"""
+    prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+    return image_analysis_cache.chave(image_bytes, language, f"openmind:{prompt_hash}")
+
+
+def _processar_resultado_openmind(result, image_name):
+    """
+    Normaliza a resposta de análise do OpenMind AI (``/analyze-product-image``)
+    
+    Corrige ``image_url``/``image_path`` da imagem salva e converte ``data``
+    para o formato modelo.json, com a imagem em ``produto.imagens``. Usado na
+    resposta do servidor e no acerto do cache de análise (com a imagem do
+    upload atual).
+    """
+    # Extrair informações da imagem salva no SinapUm (se retornada)
+    image_url = result.get('image_url') or result.get('saved_image_url')
+    image_path = result.get('image_path')  # Caminho relativo (ex: media/uploads/uuid.jpg)
+    saved_filename = result.get('saved_filename')  # Nome do arquivo salvo
+    
+    # DEBUG: Log dos dados recebidos do SinapUm
+    logger.info(f"[SERVICES] Dados recebidos do SinapUm:")
+    logger.info(f"[SERVICES]   image_url original: {image_url}")
+    logger.info(f"[SERVICES]   image_path original: {image_path}")
+    logger.info(f"[SERVICES]   saved_filename: {saved_filename}")
+    
+    # Corrigir URL malformada (ex: mediauploads -> media/uploads)
+    if image_url and 'mediauploads' in image_url:
+        logger.warning(f"[SERVICES] URL malformada detectada, corrigindo: {image_url}")
+        image_url = image_url.replace('mediauploads', 'media/uploads')
+        logger.info(f"[SERVICES]   image_url corrigida: {image_url}")
+    
+    # Se image_url estiver incorreto ou ausente, construir a partir do image_path
+    if image_path and (not image_url or 'mediauploads' in image_url):
+        url_base, _ = _get_openmind_config()
+        sinapum_base = url_base.replace('/api/v1', '').rstrip('/')
+        logger.info(f"[SERVICES] Construindo URL a partir do image_path: {image_path}")
+        logger.info(f"[SERVICES]   sinapum_base: {sinapum_base}")
+        
+        # Garantir que image_path começa com media/
+        if image_path.startswith('media/'):
+            image_url = f"{sinapum_base}/{image_path}"
+        elif image_path.startswith('/media/'):
+            image_url = f"{sinapum_base}{image_path}"
+        else:
+            # Adicionar media/ se não tiver
+            image_url = f"{sinapum_base}/media/{image_path.lstrip('/')}"
+        
+        logger.info(f"[SERVICES]   image_url construída: {image_url}")
+    
+    # Usar image_path no JSON do produto (caminho relativo) e image_url para acesso
+    image_path_for_json = image_path or image_url
+    
+    # DEBUG: Log final
+    logger.info(f"[SERVICES] Dados finais:")
+    logger.info(f"[SERVICES]   image_url final: {image_url}")
+    logger.info(f"[SERVICES]   image_path_for_json: {image_path_for_json}")
+    
+    # Verificar se dados já estão no formato modelo.json ou precisam transformação
+    if result.get('success') and result.get('data'):
+        try:
+            # DEBUG: Log dos dados recebidos do SinapUm ANTES da transformação
+            import json as json_module
+            dados_originais = result['data']
+            logger.info(f"[SERVICES] Dados recebidos do SinapUm (ANTES transformação):")
+            logger.info(f"[SERVICES]   Tipo: {type(dados_originais)}")
+            logger.info(f"[SERVICES]   Chaves principais: {list(dados_originais.keys()) if isinstance(dados_originais, dict) else 'não é dict'}")
+            
+            # Verificar se já está no formato modelo.json (tem 'produto', 'produto_generico_catalogo', etc.)
+            ja_esta_modelo_json = (
+                isinstance(dados_originais, dict) and
+                'produto' in dados_originais and
+                'produto_generico_catalogo' in dados_originais
+            )
+            
+            if ja_esta_modelo_json:
+                logger.info(f"[SERVICES] ✓ Dados já estão no formato modelo.json - preservando estrutura original")
+                # Fazer deep copy para não modificar o original
+                import copy
+                modelo_json = copy.deepcopy(dados_originais)
+                
+                # IMPORTANTE: Garantir que TODOS os campos do produto original sejam preservados DIRETAMENTE no produto
+                # Não apenas no analise_ia, mas diretamente acessíveis
+                if 'produto' in modelo_json and isinstance(modelo_json['produto'], dict):
+                    produto_original = dados_originais.get('produto', {})
+                    produto_atualizado = modelo_json['produto']
+                    
+                    # PRESERVAR TODOS os campos do produto original diretamente no produto
+                    # Mesmo que já existam, garantir que não sejam sobrescritos
+                    for campo, valor in produto_original.items():
+                        # Se o campo não existe ou está None/vazio, usar o valor original
+                        if campo not in produto_atualizado or not produto_atualizado.get(campo):
+                            produto_atualizado[campo] = valor
+                        # Se ambos existem, preservar o original se o atual está vazio/null
+                        elif produto_atualizado.get(campo) is None or produto_atualizado.get(campo) == '':
+                            produto_atualizado[campo] = valor
+                        # Se ambos têm valores, preservar o original como backup
+                        elif campo in ['caracteristicas', 'dimensoes_embalagem', 'fabricacao']:
+                            # Para campos complexos, garantir que todos os subcampos sejam preservados
+                            if isinstance(valor, dict) and isinstance(produto_atualizado.get(campo), dict):
+                                # Mesclar dicionários para preservar todas as chaves
+                                for subcampo, subvalor in valor.items():
+                                    if subcampo not in produto_atualizado[campo] or produto_atualizado[campo][subcampo] is None:
+                                        produto_atualizado[campo][subcampo] = subvalor
+                    
+                    # Garantir que imagens estão no array produto.imagens
+                    if 'imagens' not in produto_atualizado:
+                        produto_atualizado['imagens'] = []
+                    if image_path_for_json and image_path_for_json not in produto_atualizado['imagens']:
+                        produto_atualizado['imagens'].insert(0, image_path_for_json)
+                
+                # Criar ou atualizar campo analise_ia com TODOS os dados originais preservados
+                if 'analise_ia' not in modelo_json:
+                    modelo_json['analise_ia'] = {}
+                
+                # PRESERVAR TODA A ESTRUTURA ORIGINAL no analise_ia como backup completo
+                # Isso garante que nenhum dado seja perdido, mesmo que não esteja no produto principal
+                modelo_json['analise_ia']['dados_originais_completos'] = copy.deepcopy(dados_originais)
+                
+                # Preservar dados específicos do produto que podem ser úteis
+                if isinstance(dados_originais.get('produto'), dict):
+                    produto_original = dados_originais['produto']
+                    
+                    # Preservar características completas (mesmo que tenham nulls)
+                    if 'caracteristicas' in produto_original:
+                        modelo_json['analise_ia']['caracteristicas_completas'] = copy.deepcopy(produto_original['caracteristicas'])
+                    
+                    # Preservar dimensões completas (mesmo que tenham nulls)
+                    if 'dimensoes_embalagem' in produto_original:
+                        modelo_json['analise_ia']['dimensoes_embalagem_completas'] = copy.deepcopy(produto_original['dimensoes_embalagem'])
+                    
+                    # Preservar fabricação completa
+                    if 'fabricacao' in produto_original:
+                        modelo_json['analise_ia']['fabricacao_completa'] = copy.deepcopy(produto_original['fabricacao'])
+                    
+                    # Preservar TODOS os outros campos do produto (mesmo que None) como backup
+                    campos_produto_principais = {'nome', 'marca', 'descricao', 'categoria', 'subcategoria', 
+                                              'codigo_barras', 'imagens', 'caracteristicas', 'dimensoes_embalagem',
+                                              'peso_embalagem_gramas', 'preco_visivel', 'fabricacao'}
+                    for campo, valor in produto_original.items():
+                        if campo not in campos_produto_principais:
+                            # Preservar mesmo se None, como documentação do que foi retornado
+                            modelo_json['analise_ia'][f'produto_{campo}'] = valor
+                
+                # Preservar TODOS os outros campos do nível raiz que não estão mapeados
+                campos_raiz_mapeados = {'produto', 'produto_generico_catalogo', 'produto_viagem', 
+                                        'estabelecimento', 'campanha', 'shopper', 'cadastro_meta', 'analise_ia'}
+                for campo, valor in dados_originais.items():
+                    if campo not in campos_raiz_mapeados:
+                        # Preservar mesmo se None
+                        modelo_json['analise_ia'][f'raiz_{campo}'] = valor
+                
+                # Preservar metadados da análise original
+                if 'cadastro_meta' in dados_originais:
+                    modelo_json['analise_ia']['cadastro_meta_original'] = copy.deepcopy(dados_originais['cadastro_meta'])
+                
+                logger.info(f"[SERVICES] ✓ Estrutura original preservada com TODOS os campos. Campo analise_ia criado com backup completo.")
+            
+            else:
+                logger.info(f"[SERVICES] Dados no formato ÉVORA - aplicando transformação")
+                modelo_json = transform_evora_to_modelo_json(
+                    result['data'],
+                    image_name,
+                    image_path=image_path_for_json  # Usar image_path (relativo) ou image_url (completo)
+                )
+            
+            # DEBUG: Log dos dados APÓS processamento
+            logger.info(f"[SERVICES] Dados processados (APÓS processamento):")
+            logger.info(f"[SERVICES]   Chaves principais: {list(modelo_json.keys()) if isinstance(modelo_json, dict) else 'não é dict'}")
+            logger.info(f"[SERVICES]   Tem campo 'analise_ia': {'analise_ia' in modelo_json if isinstance(modelo_json, dict) else False}")
+            if isinstance(modelo_json, dict) and 'analise_ia' in modelo_json:
+                logger.info(f"[SERVICES]   analise_ia chaves: {list(modelo_json['analise_ia'].keys()) if isinstance(modelo_json['analise_ia'], dict) else 'não é dict'}")
+                logger.info(f"[SERVICES]   analise_ia completo: {json_module.dumps(modelo_json['analise_ia'], indent=2, ensure_ascii=False)[:1500]}")
+            
+            # Substituir data pelo formato modelo.json
+            result['data'] = modelo_json
+            # Adicionar informações da imagem salva no SinapUm
+            if image_url:
+                result['image_url'] = image_url
+            if image_path:
+                result['image_path'] = image_path
+            if saved_filename:
+                result['saved_filename'] = saved_filename
+            logger.info(f"Dados processados para formato modelo.json. Imagem salva: {image_url or 'não retornada'}")
+        except Exception as transform_error:
+            logger.error(f"Erro ao processar dados: {str(transform_error)}", exc_info=True)
+            # Continuar com dados originais se houver erro na transformação
+    
+    return result
+
+
 def analyze_image_with_openmind(image_file, language='pt-BR', user=None):
     """
     Analisa uma imagem usando o OpenMind AI Server.
@@ -725,25 +1112,19 @@ def analyze_image_with_openmind(image_file, language='pt-BR', user=None):
                 language = detected_lang
         
         # Buscar prompt do banco de dados usando mapeamento configurável
-        fallback_prompt = """Analise esta imagem de um produto e extraia TODAS as informações visíveis no rótulo, etiqueta ou embalagem.
-
-Extraia as seguintes informações:
-- Nome do produto
-- Marca
-- Categoria (se visível)
-- Código de barras (se visível)
-- Descrição/ingredientes (se visível)
-- Informações nutricionais (se visível)
-- Dimensões da embalagem (se visível)
-- Peso/volume (se visível)
-- Qualquer outra informação relevante visível na imagem
-
-Retorne os dados em formato JSON estruturado compatível com o modelo ÉVORA."""
+        prompt = _prompt_analise_produto()
         
-        prompt = get_prompt_from_database(
-            prompt_key='analise_produto_imagem',
-            fallback_prompt=fallback_prompt
-        )
+        # Ler a imagem uma única vez (usada na chave do cache e no upload)
+        image_file.seek(0)
+        image_bytes = image_file.read()
+        
+        cache_key = _chave_cache_openmind(image_bytes, language, prompt)
+        analise = image_analysis_cache.get(cache_key)
+        if analise is not None:
+            logger.info(f"Análise recuperada do cache: {image_file.name} (idioma: {language})")
+            result = {'success': True, 'data': analise, 'cached': True}
+            result.update(_salvar_upload_analisado(image_bytes, image_file.name))
+            return _processar_resultado_openmind(result, image_file.name)
         
         url_base, api_key = _get_openmind_config()
         # Construir URL do endpoint - verificar se já inclui /api/v1
@@ -760,7 +1141,7 @@ Retorne os dados em formato JSON estruturado compatível com o modelo ÉVORA."""
             headers['Authorization'] = f'Bearer {api_key}'
         
         files = {
-            'image': (image_file.name, image_file.read(), image_file.content_type)
+            'image': (image_file.name, image_bytes, image_file.content_type)
         }
         
         data = {
@@ -799,185 +1180,18 @@ Retorne os dados em formato JSON estruturado compatível com o modelo ÉVORA."""
                             logger.info(f"[SERVICES]   Tem 'dimensoes_embalagem': {'dimensoes_embalagem' in dados_ia}")
                             logger.info(f"[SERVICES]   Dados completos (primeiros 2000 chars): {json_module.dumps(dados_ia, indent=2, ensure_ascii=False)[:2000]}")
                     
-                    # Extrair informações da imagem salva no SinapUm (se retornada)
-                    image_url = result.get('image_url') or result.get('saved_image_url')
-                    image_path = result.get('image_path')  # Caminho relativo (ex: media/uploads/uuid.jpg)
-                    saved_filename = result.get('saved_filename')  # Nome do arquivo salvo
-                    
-                    # DEBUG: Log dos dados recebidos do SinapUm
-                    logger.info(f"[SERVICES] Dados recebidos do SinapUm:")
-                    logger.info(f"[SERVICES]   image_url original: {image_url}")
-                    logger.info(f"[SERVICES]   image_path original: {image_path}")
-                    logger.info(f"[SERVICES]   saved_filename: {saved_filename}")
-                    
-                    # Corrigir URL malformada (ex: mediauploads -> media/uploads)
-                    if image_url and 'mediauploads' in image_url:
-                        logger.warning(f"[SERVICES] URL malformada detectada, corrigindo: {image_url}")
-                        image_url = image_url.replace('mediauploads', 'media/uploads')
-                        logger.info(f"[SERVICES]   image_url corrigida: {image_url}")
-                    
-                    # Se image_url estiver incorreto ou ausente, construir a partir do image_path
-                    if image_path and (not image_url or 'mediauploads' in image_url):
-                        url_base, _ = _get_openmind_config()
-                        sinapum_base = url_base.replace('/api/v1', '').rstrip('/')
-                        logger.info(f"[SERVICES] Construindo URL a partir do image_path: {image_path}")
-                        logger.info(f"[SERVICES]   sinapum_base: {sinapum_base}")
-                        
-                        # Garantir que image_path começa com media/
-                        if image_path.startswith('media/'):
-                            image_url = f"{sinapum_base}/{image_path}"
-                        elif image_path.startswith('/media/'):
-                            image_url = f"{sinapum_base}{image_path}"
-                        else:
-                            # Adicionar media/ se não tiver
-                            image_url = f"{sinapum_base}/media/{image_path.lstrip('/')}"
-                        
-                        logger.info(f"[SERVICES]   image_url construída: {image_url}")
-                    
-                    # Usar image_path no JSON do produto (caminho relativo) e image_url para acesso
-                    image_path_for_json = image_path or image_url
-                    
-                    # DEBUG: Log final
-                    logger.info(f"[SERVICES] Dados finais:")
-                    logger.info(f"[SERVICES]   image_url final: {image_url}")
-                    logger.info(f"[SERVICES]   image_path_for_json: {image_path_for_json}")
-                    
-                    # Verificar se dados já estão no formato modelo.json ou precisam transformação
-                    if result.get('success') and result.get('data'):
-                        try:
-                            # DEBUG: Log dos dados recebidos do SinapUm ANTES da transformação
-                            import json as json_module
-                            dados_originais = result['data']
-                            logger.info(f"[SERVICES] Dados recebidos do SinapUm (ANTES transformação):")
-                            logger.info(f"[SERVICES]   Tipo: {type(dados_originais)}")
-                            logger.info(f"[SERVICES]   Chaves principais: {list(dados_originais.keys()) if isinstance(dados_originais, dict) else 'não é dict'}")
-                            
-                            # Verificar se já está no formato modelo.json (tem 'produto', 'produto_generico_catalogo', etc.)
-                            ja_esta_modelo_json = (
-                                isinstance(dados_originais, dict) and
-                                'produto' in dados_originais and
-                                'produto_generico_catalogo' in dados_originais
-                            )
-                            
-                            if ja_esta_modelo_json:
-                                logger.info(f"[SERVICES] ✓ Dados já estão no formato modelo.json - preservando estrutura original")
-                                # Fazer deep copy para não modificar o original
-                                import copy
-                                modelo_json = copy.deepcopy(dados_originais)
-                                
-                                # IMPORTANTE: Garantir que TODOS os campos do produto original sejam preservados DIRETAMENTE no produto
-                                # Não apenas no analise_ia, mas diretamente acessíveis
-                                if 'produto' in modelo_json and isinstance(modelo_json['produto'], dict):
-                                    produto_original = dados_originais.get('produto', {})
-                                    produto_atualizado = modelo_json['produto']
-                                    
-                                    # PRESERVAR TODOS os campos do produto original diretamente no produto
-                                    # Mesmo que já existam, garantir que não sejam sobrescritos
-                                    for campo, valor in produto_original.items():
-                                        # Se o campo não existe ou está None/vazio, usar o valor original
-                                        if campo not in produto_atualizado or not produto_atualizado.get(campo):
-                                            produto_atualizado[campo] = valor
-                                        # Se ambos existem, preservar o original se o atual está vazio/null
-                                        elif produto_atualizado.get(campo) is None or produto_atualizado.get(campo) == '':
-                                            produto_atualizado[campo] = valor
-                                        # Se ambos têm valores, preservar o original como backup
-                                        elif campo in ['caracteristicas', 'dimensoes_embalagem', 'fabricacao']:
-                                            # Para campos complexos, garantir que todos os subcampos sejam preservados
-                                            if isinstance(valor, dict) and isinstance(produto_atualizado.get(campo), dict):
-                                                # Mesclar dicionários para preservar todas as chaves
-                                                for subcampo, subvalor in valor.items():
-                                                    if subcampo not in produto_atualizado[campo] or produto_atualizado[campo][subcampo] is None:
-                                                        produto_atualizado[campo][subcampo] = subvalor
-                                    
-                                    # Garantir que imagens estão no array produto.imagens
-                                    if 'imagens' not in produto_atualizado:
-                                        produto_atualizado['imagens'] = []
-                                    if image_path_for_json and image_path_for_json not in produto_atualizado['imagens']:
-                                        produto_atualizado['imagens'].insert(0, image_path_for_json)
-                                
-                                # Criar ou atualizar campo analise_ia com TODOS os dados originais preservados
-                                if 'analise_ia' not in modelo_json:
-                                    modelo_json['analise_ia'] = {}
-                                
-                                # PRESERVAR TODA A ESTRUTURA ORIGINAL no analise_ia como backup completo
-                                # Isso garante que nenhum dado seja perdido, mesmo que não esteja no produto principal
-                                modelo_json['analise_ia']['dados_originais_completos'] = copy.deepcopy(dados_originais)
-                                
-                                # Preservar dados específicos do produto que podem ser úteis
-                                if isinstance(dados_originais.get('produto'), dict):
-                                    produto_original = dados_originais['produto']
-                                    
-                                    # Preservar características completas (mesmo que tenham nulls)
-                                    if 'caracteristicas' in produto_original:
-                                        modelo_json['analise_ia']['caracteristicas_completas'] = copy.deepcopy(produto_original['caracteristicas'])
-                                    
-                                    # Preservar dimensões completas (mesmo que tenham nulls)
-                                    if 'dimensoes_embalagem' in produto_original:
-                                        modelo_json['analise_ia']['dimensoes_embalagem_completas'] = copy.deepcopy(produto_original['dimensoes_embalagem'])
-                                    
-                                    # Preservar fabricação completa
-                                    if 'fabricacao' in produto_original:
-                                        modelo_json['analise_ia']['fabricacao_completa'] = copy.deepcopy(produto_original['fabricacao'])
-                                    
-                                    # Preservar TODOS os outros campos do produto (mesmo que None) como backup
-                                    campos_produto_principais = {'nome', 'marca', 'descricao', 'categoria', 'subcategoria', 
-                                                              'codigo_barras', 'imagens', 'caracteristicas', 'dimensoes_embalagem',
-                                                              'peso_embalagem_gramas', 'preco_visivel', 'fabricacao'}
-                                    for campo, valor in produto_original.items():
-                                        if campo not in campos_produto_principais:
-                                            # Preservar mesmo se None, como documentação do que foi retornado
-                                            modelo_json['analise_ia'][f'produto_{campo}'] = valor
-                                
-                                # Preservar TODOS os outros campos do nível raiz que não estão mapeados
-                                campos_raiz_mapeados = {'produto', 'produto_generico_catalogo', 'produto_viagem', 
-                                                        'estabelecimento', 'campanha', 'shopper', 'cadastro_meta', 'analise_ia'}
-                                for campo, valor in dados_originais.items():
-                                    if campo not in campos_raiz_mapeados:
-                                        # Preservar mesmo se None
-                                        modelo_json['analise_ia'][f'raiz_{campo}'] = valor
-                                
-                                # Preservar metadados da análise original
-                                if 'cadastro_meta' in dados_originais:
-                                    modelo_json['analise_ia']['cadastro_meta_original'] = copy.deepcopy(dados_originais['cadastro_meta'])
-                                
-                                logger.info(f"[SERVICES] ✓ Estrutura original preservada com TODOS os campos. Campo analise_ia criado com backup completo.")
-                                
-                            else:
-                                logger.info(f"[SERVICES] Dados no formato ÉVORA - aplicando transformação")
-                                modelo_json = transform_evora_to_modelo_json(
-                                    result['data'],
-                                    image_file.name,
-                                    image_path=image_path_for_json  # Usar image_path (relativo) ou image_url (completo)
-                                )
-                            
-                            # DEBUG: Log dos dados APÓS processamento
-                            logger.info(f"[SERVICES] Dados processados (APÓS processamento):")
-                            logger.info(f"[SERVICES]   Chaves principais: {list(modelo_json.keys()) if isinstance(modelo_json, dict) else 'não é dict'}")
-                            logger.info(f"[SERVICES]   Tem campo 'analise_ia': {'analise_ia' in modelo_json if isinstance(modelo_json, dict) else False}")
-                            if isinstance(modelo_json, dict) and 'analise_ia' in modelo_json:
-                                logger.info(f"[SERVICES]   analise_ia chaves: {list(modelo_json['analise_ia'].keys()) if isinstance(modelo_json['analise_ia'], dict) else 'não é dict'}")
-                                logger.info(f"[SERVICES]   analise_ia completo: {json_module.dumps(modelo_json['analise_ia'], indent=2, ensure_ascii=False)[:1500]}")
-                            
-                            # Substituir data pelo formato modelo.json
-                            result['data'] = modelo_json
-                            # Adicionar informações da imagem salva no SinapUm
-                            if image_url:
-                                result['image_url'] = image_url
-                            if image_path:
-                                result['image_path'] = image_path
-                            if saved_filename:
-                                result['saved_filename'] = saved_filename
-                            logger.info(f"Dados processados para formato modelo.json. Imagem salva: {image_url or 'não retornada'}")
-                        except Exception as transform_error:
-                            logger.error(f"Erro ao processar dados: {str(transform_error)}", exc_info=True)
-                            # Continuar com dados originais se houver erro na transformação
+                    analise, referencias_upload = _analise_para_cache(result)
+                    result = _processar_resultado_openmind(result, image_file.name)
                     
+                    if result.get('success'):
+                        image_analysis_cache.set(cache_key, analise, referencias_upload)
                     return result
                 else:
                     # Tentar parsear mesmo sem Content-Type correto
                     try:
                         result = response.json()
                         logger.info(f"Análise concluída com sucesso: {result.get('success', False)}")
+                        analise, referencias_upload = _analise_para_cache(result)
                         
                         # Extrair informações da imagem salva no SinapUm (se retornada)
                         image_url = result.get('image_url') or result.get('saved_image_url')
@@ -1024,6 +1238,8 @@ Retorne os dados em formato JSON estruturado compatível com o modelo ÉVORA."""
                             except Exception as transform_error:
                                 logger.error(f"Erro ao transformar dados: {str(transform_error)}", exc_info=True)
                         
+                        if result.get('success'):
+                            image_analysis_cache.set(cache_key, analise, referencias_upload)
                         return result
                     except ValueError:
                         # Resposta não é JSON - tratar como erro
@@ -1097,20 +1313,43 @@ Retorne os dados em formato JSON estruturado compatível com o modelo ÉVORA."""
         }
 
 
-def analyze_multiple_images(image_files, language='pt-BR', user=None):
+def _analisar_imagem_worker(idx, image_file, language):
+    """Analisa uma imagem (executado nas threads de ``iter_analyze_multiple_images``)"""
+    try:
+        image_file.seek(0)
+        # Idioma já resolvido: não repassar o usuário (evita consultas ao perfil na thread)
+        return analyze_image_with_openmind(image_file, language=language)
+    except Exception as e:
+        logger.error(f"Erro ao analisar imagem {idx + 1}: {str(e)}", exc_info=True)
+        return {
+            'success': False,
+            'error': f"Erro inesperado: {str(e)}",
+            'error_code': 'UNKNOWN_ERROR'
+        }
+    finally:
+        close_old_connections()
+
+
+def iter_analyze_multiple_images(image_files, language='pt-BR', user=None, max_workers=None):
     """
-    Analisa múltiplas imagens e verifica se são do mesmo produto.
+    Analisa múltiplas imagens em paralelo, produzindo os resultados em ordem de conclusão.
+    
+    A consistência e a consolidação são atualizadas a cada imagem concluída.
     
     Args:
         image_files: Lista de arquivos de imagem (Django UploadedFile)
         language: Código do idioma (ex: 'pt-BR', 'en-US', 'es-ES'). Padrão: 'pt-BR'
         user: Usuário Django (opcional) - para detectar idioma do perfil
+        max_workers: Análises simultâneas (padrão: IMAGE_ANALYSIS_MAX_PARALLEL)
     
-    Returns:
-        dict: Resultado da análise com informações sobre consistência dos produtos
+    Yields:
+        dict: ``{'evento': 'analise', ...}`` para cada imagem concluída e, por último,
+        ``{'evento': 'resultado', ...}`` com o mesmo conteúdo de ``analyze_multiple_images``
     """
-    results = []
-    produtos_identificados = []
+    from django.conf import settings
+    
+    image_files = list(image_files)
+    total = len(image_files)
     
     # Detectar idioma do usuário se fornecido
     if user:
@@ -1118,109 +1357,388 @@ def analyze_multiple_images(image_files, language='pt-BR', user=None):
         if detected_lang:
             language = detected_lang
     
-    for idx, image_file in enumerate(image_files):
-        logger.info(f"Analisando imagem {idx + 1}/{len(image_files)}: {image_file.name}")
-        
-        # Resetar ponteiro do arquivo
-        image_file.seek(0)
-        
-        # Analisar imagem com idioma
-        result = analyze_image_with_openmind(image_file, language=language, user=user)
+    max_workers = max_workers or getattr(settings, 'IMAGE_ANALYSIS_MAX_PARALLEL', 4)
+    max_workers = max(1, min(max_workers, total or 1))
+    
+    agregador = AgregadorProdutos()
+    results = []
+    
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {}
+        for idx, image_file in enumerate(image_files):
+            logger.info(f"Analisando imagem {idx + 1}/{total}: {image_file.name}")
+            futures[executor.submit(_analisar_imagem_worker, idx, image_file, language)] = idx
         
-        if result.get('success') and result.get('data'):
-            produto_data = result['data']
-            produtos_identificados.append({
+        for future in as_completed(futures):
+            idx = futures[future]
+            image_file = image_files[idx]
+            result = future.result()
+            
+            if result.get('success') and result.get('data'):
+                agregador.adicionar({
+                    'index': idx,
+                    'filename': image_file.name,
+                    'produto_data': result['data']
+                })
+            
+            results.append({
                 'index': idx,
                 'filename': image_file.name,
-                'produto_data': produto_data
+                'result': result
             })
-        
-        results.append({
-            'index': idx,
-            'filename': image_file.name,
-            'result': result
-        })
+            
+            yield {
+                'evento': 'analise',
+                'index': idx,
+                'filename': image_file.name,
+                'result': result,
+                'concluidas': len(results),
+                'total_imagens': total,
+                'consistencia': agregador.consistencia()
+            }
+    finally:
+        # Cliente desconectado no meio do streaming: descartar o que não começou
+        executor.shutdown(wait=False, cancel_futures=True)
     
-    # Verificar consistência dos produtos
-    consistencia = verificar_consistencia_produtos(produtos_identificados)
+    results.sort(key=lambda r: r['index'])
+    consistencia = agregador.consistencia()
     
     # Se todas as imagens são do mesmo produto, consolidar dados
-    if consistencia['mesmo_produto'] and len(produtos_identificados) > 0:
-        produto_consolidado = consolidar_produto_multiplas_imagens(produtos_identificados)
-        return {
+    if consistencia['mesmo_produto'] and agregador.produtos:
+        yield {
+            'evento': 'resultado',
             'success': True,
             'mesmo_produto': True,
-            'produto_consolidado': produto_consolidado,
+            'produto_consolidado': agregador.consolidado(),
             'analises_individuais': results,
             'consistencia': consistencia,
-            'total_imagens': len(image_files)
+            'total_imagens': total
         }
     else:
         # Produtos diferentes ou erro na análise
-        return {
+        yield {
+            'evento': 'resultado',
             'success': True,
             'mesmo_produto': False,
-            'produtos_diferentes': produtos_identificados,
+            'produtos_diferentes': agregador.produtos,
             'analises_individuais': results,
             'consistencia': consistencia,
-            'total_imagens': len(image_files),
+            'total_imagens': total,
             'aviso': 'As imagens parecem ser de produtos diferentes. Verifique antes de salvar.'
         }
 
 
-def verificar_consistencia_produtos(produtos_identificados):
+def analyze_multiple_images(image_files, language='pt-BR', user=None, max_workers=None):
     """
-    Verifica se as imagens são do mesmo produto comparando nome, marca e código de barras.
+    Analisa múltiplas imagens (em paralelo) e verifica se são do mesmo produto.
     
     Args:
-        produtos_identificados: Lista de dicionários com dados dos produtos identificados
+        image_files: Lista de arquivos de imagem (Django UploadedFile)
+        language: Código do idioma (ex: 'pt-BR', 'en-US', 'es-ES'). Padrão: 'pt-BR'
+        user: Usuário Django (opcional) - para detectar idioma do perfil
+        max_workers: Análises simultâneas (padrão: IMAGE_ANALYSIS_MAX_PARALLEL)
     
     Returns:
-        dict: Informações sobre consistência
+        dict: Resultado da análise com informações sobre consistência dos produtos
     """
-    if len(produtos_identificados) < 2:
+    from django.conf import settings
+    
+    image_files = list(image_files)
+    
+    # Servidor com endpoint em lote: uma requisição (e, se possível, uma chamada ao modelo)
+    if len(image_files) > 1 and getattr(settings, 'OPENMIND_BATCH_ANALYSIS', False):
+        resultado = analyze_images_batch_with_openmind(image_files, language, user)
+        if resultado is not None:
+            return resultado
+    
+    resultado = None
+    for evento in iter_analyze_multiple_images(image_files, language, user, max_workers):
+        resultado = evento
+    resultado.pop('evento')
+    return resultado
+
+
+def analyze_images_batch_with_openmind(image_files, language='pt-BR', user=None):
+    """
+    Analisa várias imagens do mesmo produto com o endpoint em lote do OpenMind AI
+    (POST /analyze-product-images) - uma requisição para todas as imagens.
+    
+    Usa o mesmo prompt (editável no banco) e idioma da análise por imagem e o
+    mesmo cache de análise: imagens já analisadas não são enviadas (o upload
+    atual é salvo localmente). Cada resultado traz ``image_url``/``image_path``
+    da imagem salva, como na análise por imagem.
+    
+    Args:
+        image_files: Lista de arquivos de imagem (Django UploadedFile)
+        language: Código do idioma (ex: 'pt-BR', 'en-US', 'es-ES'). Padrão: 'pt-BR'
+        user: Usuário Django (opcional) - para detectar idioma do perfil
+    
+    Returns:
+        dict: Mesmo formato de ``analyze_multiple_images``, ou None se o servidor
+        não oferece o endpoint em lote ou a requisição falhou (usar a análise por imagem)
+    """
+    # Detectar idioma do usuário se fornecido
+    if user:
+        detected_lang = _detect_user_language(user)
+        if detected_lang:
+            language = detected_lang
+    
+    prompt = _prompt_analise_produto()
+    
+    imagens = []
+    for image_file in image_files:
+        image_file.seek(0)
+        imagens.append(image_file.read())
+    chaves = [_chave_cache_openmind(image_bytes, language, prompt) for image_bytes in imagens]
+    
+    resultados = {}
+    for idx, (image_file, image_bytes, chave) in enumerate(zip(image_files, imagens, chaves)):
+        analise = image_analysis_cache.get(chave)
+        if analise is not None:
+            logger.info(f"Análise recuperada do cache: {image_file.name} (idioma: {language})")
+            result = {'success': True, 'data': analise, 'cached': True}
+            result.update(_salvar_upload_analisado(image_bytes, image_file.name))
+            resultados[idx] = _processar_resultado_openmind(result, image_file.name)
+    
+    pendentes = [idx for idx in range(len(image_files)) if idx not in resultados]
+    batch = {}
+    if pendentes:
+        url_base, api_key = _get_openmind_config()
+        if '/api/v1' in url_base:
+            url = f"{url_base}/analyze-product-images"
+        else:
+            url = f"{url_base}/api/v1/analyze-product-images"
+        url = f"{url}?language={language}"
+        
+        headers = {}
+        if api_key:
+            headers['Authorization'] = f'Bearer {api_key}'
+        
+        files = [
+            ('images', (image_files[idx].name, imagens[idx], image_files[idx].content_type))
+            for idx in pendentes
+        ]
+        
+        try:
+            logger.info(
+                f"Enviando lote de {len(pendentes)} imagens para análise "
+                f"({len(resultados)} do cache, idioma: {language})"
+            )
+            response = requests.post(
+                url, files=files, data={'prompt': prompt, 'language': language}, headers=headers, timeout=120
+            )
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Análise em lote indisponível, usando análise por imagem: {str(e)}")
+            return None
+        
+        if response.status_code != 200:
+            logger.warning(f"Análise em lote retornou status {response.status_code}, usando análise por imagem")
+            return None
+        
+        try:
+            batch = response.json()
+        except ValueError:
+            logger.warning("Resposta da análise em lote não é JSON, usando análise por imagem")
+            return None
+        if not batch.get('success'):
+            logger.warning(f"Análise em lote falhou ({batch.get('error')}), usando análise por imagem")
+            return None
+        
+        logger.info(
+            f"Lote analisado em {batch.get('processing_time_ms')}ms "
+            f"(modo: {batch.get('mode')}, chamadas ao modelo: {batch.get('model_calls')})"
+        )
+    
+    produto_diferente = False
+    for item in batch.get('results') or []:
+        posicao = item.get('index', 0)
+        if not isinstance(posicao, int) or not 0 <= posicao < len(pendentes):
+            continue
+        idx = pendentes[posicao]
+        filename = image_files[idx].name
+        result = {
+            'success': bool(item.get('success') and item.get('data')),
+            'data': item.get('data'),
+            'error': item.get('error'),
+            'image_url': item.get('image_url'),
+            'image_path': item.get('image_path'),
+            'saved_filename': item.get('saved_filename'),
+        }
+        if result['success'] and batch.get('mode') == 'per_image':
+            # Mesmo prompt da análise por imagem (no modo multi-imagem os dados
+            # por imagem vêm de outro prompt e não entram no cache)
+            analise, referencias_upload = _analise_para_cache(result)
+            image_analysis_cache.set(chaves[idx], analise, referencias_upload)
+        if result['success']:
+            result = _processar_resultado_openmind(result, filename)
+        if item.get('mesmo_produto') is False:
+            produto_diferente = True
+        resultados[idx] = result
+    
+    agregador = AgregadorProdutos()
+    results = []
+    for idx, image_file in enumerate(image_files):
+        result = resultados.get(idx) or {
+            'success': False,
+            'data': None,
+            'error': 'Imagem ausente na resposta da análise em lote'
+        }
+        if result.get('success') and result.get('data'):
+            agregador.adicionar({'index': idx, 'filename': image_file.name, 'produto_data': result['data']})
+        results.append({'index': idx, 'filename': image_file.name, 'result': result})
+    
+    consistencia = agregador.consistencia()
+    if produto_diferente:
+        # O modelo viu todas as imagens juntas e apontou uma diferente
+        consistencia['mesmo_produto'] = False
+        if isinstance(consistencia.get('detalhes'), dict):
+            consistencia['detalhes']['modelo_indicou_produto_diferente'] = True
+    
+    if consistencia['mesmo_produto'] and agregador.produtos:
+        consolidado = batch.get('produto_consolidado')
+        if isinstance(consolidado, dict) and consolidado and len(pendentes) == len(image_files):
+            # O modelo consolidou todas as imagens (nenhuma veio do cache)
+            produto_consolidado = transform_evora_to_modelo_json(
+                consolidado, image_files[0].name, image_path=results[0]['result'].get('image_path')
+            )
+            if isinstance(produto_consolidado.get('cadastro_meta'), dict):
+                produto_consolidado['cadastro_meta']['fonte'] = (
+                    f"Análise automática de {len(image_files)} imagem(ns) do mesmo produto"
+                )
+        else:
+            produto_consolidado = agregador.consolidado()
         return {
+            'success': True,
             'mesmo_produto': True,
-            'confianca': 1.0,
-            'detalhes': 'Apenas uma imagem analisada'
+            'produto_consolidado': produto_consolidado,
+            'analises_individuais': results,
+            'consistencia': consistencia,
+            'total_imagens': len(image_files)
         }
     
-    # Extrair informações principais de cada produto
-    produtos_info = []
-    for prod in produtos_identificados:
-        produto = prod['produto_data'].get('produto', {})
-        produtos_info.append({
-            'nome': produto.get('nome', '').lower().strip(),
-            'marca': produto.get('marca', '').lower().strip(),
-            'codigo_barras': produto.get('codigo_barras', ''),
-            'categoria': produto.get('categoria', '').lower().strip()
-        })
-    
-    # Comparar produtos
-    mesmo_nome = all(p['nome'] == produtos_info[0]['nome'] for p in produtos_info if p['nome'])
-    mesma_marca = all(p['marca'] == produtos_info[0]['marca'] for p in produtos_info if p['marca'])
-    mesmo_codigo = all(p['codigo_barras'] == produtos_info[0]['codigo_barras'] for p in produtos_info if p['codigo_barras'] and produtos_info[0]['codigo_barras'])
-    mesma_categoria = all(p['categoria'] == produtos_info[0]['categoria'] for p in produtos_info if p['categoria'])
-    
-    # Calcular confiança
-    fatores = [mesmo_nome, mesma_marca, mesmo_codigo, mesma_categoria]
-    confianca = sum(fatores) / len(fatores) if fatores else 0.0
-    
-    mesmo_produto = confianca >= 0.75  # 75% de similaridade
-    
     return {
-        'mesmo_produto': mesmo_produto,
-        'confianca': confianca,
-        'detalhes': {
-            'mesmo_nome': mesmo_nome,
-            'mesma_marca': mesma_marca,
-            'mesmo_codigo_barras': mesmo_codigo,
-            'mesma_categoria': mesma_categoria
-        },
-        'produtos_comparados': len(produtos_identificados)
+        'success': True,
+        'mesmo_produto': False,
+        'produtos_diferentes': agregador.produtos,
+        'analises_individuais': results,
+        'consistencia': consistencia,
+        'total_imagens': len(image_files),
+        'aviso': 'As imagens parecem ser de produtos diferentes. Verifique antes de salvar.'
     }
 
 
+class AgregadorProdutos:
+    """
+    Consistência e consolidação incrementais de produtos identificados em várias imagens.
+    
+    Cada produto é adicionado assim que sua análise termina (em qualquer ordem);
+    o resultado não depende da ordem de chegada - a base da consolidação é
+    sempre a imagem de menor índice.
+    """
+    
+    CAMPOS = ('nome', 'marca', 'codigo_barras', 'categoria')
+    
+    def __init__(self):
+        self.produtos = []
+        self._valores = {campo: set() for campo in self.CAMPOS}
+    
+    def adicionar(self, prod):
+        """Adiciona um produto identificado (``{'index', 'filename', 'produto_data'}``)"""
+        posicao = len(self.produtos)
+        while posicao > 0 and self.produtos[posicao - 1]['index'] > prod['index']:
+            posicao -= 1
+        self.produtos.insert(posicao, prod)
+        
+        produto = prod['produto_data'].get('produto') or {}
+        for campo in self.CAMPOS:
+            valor = str(produto.get(campo) or '').strip()
+            if campo != 'codigo_barras':
+                valor = valor.lower()
+            if valor:
+                self._valores[campo].add(valor)
+    
+    def consistencia(self):
+        """Informações sobre consistência dos produtos adicionados até agora"""
+        if len(self.produtos) < 2:
+            return {
+                'mesmo_produto': True,
+                'confianca': 1.0,
+                'detalhes': 'Apenas uma imagem analisada'
+            }
+        
+        # Um campo é consistente se todas as imagens que o mostram concordam
+        mesmo_nome, mesma_marca, mesmo_codigo, mesma_categoria = (
+            len(self._valores[campo]) <= 1 for campo in self.CAMPOS
+        )
+        
+        # Calcular confiança
+        fatores = [mesmo_nome, mesma_marca, mesmo_codigo, mesma_categoria]
+        confianca = sum(fatores) / len(fatores)
+        
+        mesmo_produto = confianca >= 0.75  # 75% de similaridade
+        
+        return {
+            'mesmo_produto': mesmo_produto,
+            'confianca': confianca,
+            'detalhes': {
+                'mesmo_nome': mesmo_nome,
+                'mesma_marca': mesma_marca,
+                'mesmo_codigo_barras': mesmo_codigo,
+                'mesma_categoria': mesma_categoria
+            },
+            'produtos_comparados': len(self.produtos)
+        }
+    
+    def consolidado(self):
+        """Produto consolidado com todas as imagens (None se não há produtos)"""
+        if not self.produtos:
+            return None
+        
+        # Usar o primeiro produto como base (sem alterar os dados originais)
+        produto_base = self.produtos[0]['produto_data'].copy()
+        
+        # Coletar todas as imagens, removendo duplicatas e mantendo a ordem
+        imagens_unicas = []
+        vistas = set()
+        for prod in self.produtos:
+            for img in (prod['produto_data'].get('produto') or {}).get('imagens') or []:
+                chave = img if isinstance(img, str) else repr(img)
+                if chave not in vistas:
+                    vistas.add(chave)
+                    imagens_unicas.append(img)
+        
+        # Atualizar array de imagens
+        if isinstance(produto_base.get('produto'), dict):
+            produto_base['produto'] = {**produto_base['produto'], 'imagens': imagens_unicas}
+        
+        # Atualizar fonte do cadastro_meta para indicar múltiplas imagens
+        if isinstance(produto_base.get('cadastro_meta'), dict):
+            total_imagens = len(self.produtos)
+            produto_base['cadastro_meta'] = {
+                **produto_base['cadastro_meta'],
+                'fonte': f"Análise automática de {total_imagens} imagem(ns) do mesmo produto"
+            }
+        
+        return produto_base
+
+
+def verificar_consistencia_produtos(produtos_identificados):
+    """
+    Verifica se as imagens são do mesmo produto comparando nome, marca e código de barras.
+    
+    Args:
+        produtos_identificados: Lista de dicionários com dados dos produtos identificados
+    
+    Returns:
+        dict: Informações sobre consistência
+    """
+    agregador = AgregadorProdutos()
+    for prod in produtos_identificados:
+        agregador.adicionar(prod)
+    return agregador.consistencia()
+
+
 def consolidar_produto_multiplas_imagens(produtos_identificados):
     """
     Consolida dados de múltiplas imagens do mesmo produto.
@@ -1231,31 +1749,7 @@ def consolidar_produto_multiplas_imagens(produtos_identificados):
     Returns:
         dict: Produto consolidado com todas as imagens
     """
-    if not produtos_identificados:
-        return None
-    
-    # Usar o primeiro produto como base
-    produto_base = produtos_identificados[0]['produto_data'].copy()
-    
-    # Coletar todas as imagens
-    todas_imagens = []
+    agregador = AgregadorProdutos()
     for prod in produtos_identificados:
-        imagens = prod['produto_data'].get('produto', {}).get('imagens', [])
-        todas_imagens.extend(imagens)
-    
-    # Remover duplicatas mantendo ordem
-    imagens_unicas = []
-    for img in todas_imagens:
-        if img not in imagens_unicas:
-            imagens_unicas.append(img)
-    
-    # Atualizar array de imagens
-    if 'produto' in produto_base:
-        produto_base['produto']['imagens'] = imagens_unicas
-    
-    # Atualizar fonte do cadastro_meta para indicar múltiplas imagens
-    if 'cadastro_meta' in produto_base:
-        total_imagens = len(produtos_identificados)
-        produto_base['cadastro_meta']['fonte'] = f"Análise automática de {total_imagens} imagem(ns) do mesmo produto"
-    
-    return produto_base
+        agregador.adicionar(prod)
+    return agregador.consolidado()
@@ -13,6 +13,7 @@ from django.utils import timezone
 from django.core.paginator import Paginator
 from datetime import datetime, timedelta
 import json
+from urllib.parse import urlencode
 import requests
 from decimal import Decimal
 
@@ -22,7 +23,8 @@ from .models import (
     Cliente, Produto, Categoria, Empresa, Estabelecimento, ProdutoJSON
 )
 from .whatsapp_views import send_message, send_reaction
-from .utils import build_image_url
+from .product_catalog import adaptar_produto, facetas_catalogo, paginar
+from .sales_rollup import agrupar, carregar_rollup, totais
 
 
 # ============================================================================
@@ -59,24 +61,40 @@ def shopper_dashboard(request):
     available_products = total_products  # ProdutoJSON não tem flag de disponibilidade
     featured_products = 0  # ProdutoJSON não tem flag de destaque
     
-    # Pedidos e vendas
+    # Pedidos e vendas (rollup: histórico por status e últimos 6 meses por dia)
     orders = WhatsappOrder.objects.filter(group__owner=request.user)
-    total_orders = orders.count()
+    por_status = agrupar(carregar_rollup(por=['status'], group__owner=request.user), 'status')
+    total_orders = sum(dados['orders'] for dados in por_status.values())
     
     # Vendas por status
-    pending_orders = orders.filter(status='pending').count()
-    paid_orders = orders.filter(status='paid').count()
-    delivered_orders = orders.filter(status='delivered').count()
+    pending_orders = (por_status.get('pending') or totais([]))['orders']
+    paid_orders = (por_status.get('paid') or totais([]))['orders']
+    delivered_orders = (por_status.get('delivered') or totais([]))['orders']
     
     # Receita
-    total_revenue = orders.filter(
-        status__in=['paid', 'purchased', 'shipped', 'delivered']
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
+    total_revenue = sum(
+        (dados['revenue'] for dados in por_status.values()), Decimal('0')
+    )
     
-    monthly_revenue = orders.filter(
-        status__in=['paid', 'purchased', 'shipped', 'delivered'],
-        created_at__gte=start_date
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
+    por_dia = agrupar(
+        carregar_rollup(
+            desde=timezone.localdate(end_date - timedelta(days=180)),
+            por=['day'],
+            group__owner=request.user
+        ),
+        'day'
+    )
+    
+    def _totais_periodo(inicio, fim):
+        """Pedidos e receita dos dias em [inicio, fim)"""
+        inicio, fim = timezone.localdate(inicio), timezone.localdate(fim)
+        dias = [dados for dia, dados in por_dia.items() if inicio <= dia < fim]
+        return {
+            'orders': sum(dados['orders'] for dados in dias),
+            'revenue': sum((dados['revenue'] for dados in dias), Decimal('0')),
+        }
+    
+    monthly_revenue = _totais_periodo(start_date, end_date + timedelta(days=1))['revenue']
     
     # Grupos com mais atividade
     active_groups_data = groups.annotate(
@@ -103,21 +121,13 @@ def shopper_dashboard(request):
         month_start = end_date - timedelta(days=30*(i+1))
         month_end = end_date - timedelta(days=30*i)
         
-        month_orders = orders.filter(
-            created_at__gte=month_start,
-            created_at__lt=month_end
-        ).count()
-        
-        month_revenue = orders.filter(
-            created_at__gte=month_start,
-            created_at__lt=month_end,
-            status__in=['paid', 'purchased', 'shipped', 'delivered']
-        ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
+        # O mês mais recente inclui o dia de hoje
+        mes = _totais_periodo(month_start, month_end + timedelta(days=1 if i == 0 else 0))
         
         monthly_growth.append({
             'month': month_start.strftime('%b'),
-            'orders': month_orders,
-            'revenue': float(month_revenue)
+            'orders': mes['orders'],
+            'revenue': float(mes['revenue'])
         })
     
     monthly_growth.reverse()  # Ordem cronológica
@@ -299,33 +309,29 @@ def shopper_group_detail(request, group_id):
 
 @login_required
 def shopper_products(request):
-    """Catálogo de produtos do shopper - usando ProdutoJSON"""
-    import logging
-    logger = logging.getLogger(__name__)
+    """
+    Catálogo de produtos do shopper - usando ProdutoJSON
     
+    Filtros e paginação (cursor) no banco; apenas a página atual é adaptada
+    para o template. Contadores, categorias e marcas vêm das facetas em cache.
+    """
     if not request.user.is_shopper:
         messages.error(request, "Acesso restrito a Personal Shoppers.")
         return redirect('home')
     
-    # Base: todos os produtos do shopper (ProdutoJSON)
-    base_products = ProdutoJSON.objects.filter(criado_por=request.user).order_by('-criado_em')
-    logger.info(f"[SHOPPER_PRODUCTS] Usuário: {request.user.username} (ID: {request.user.id})")
-    logger.info(f"[SHOPPER_PRODUCTS] Total de produtos base: {base_products.count()}")
-    
-    # Categorias e marcas disponíveis - BUSCAR ANTES DOS FILTROS para mostrar todas
-    categories = base_products.values_list('categoria', flat=True).distinct().exclude(categoria='').exclude(categoria__isnull=True)
-    brands = base_products.values_list('marca', flat=True).distinct().exclude(marca='').exclude(marca__isnull=True)
+    # Contadores, categorias e marcas do shopper (todos os produtos, antes dos filtros)
+    facetas = facetas_catalogo(request.user.id)
     
-    # Aplicar filtros
-    products = base_products
+    # Base: todos os produtos do shopper (ProdutoJSON)
+    products = ProdutoJSON.objects.filter(criado_por=request.user).select_related('grupo_whatsapp')
     
     # Filtro de grupo (se vier na URL)
     group_id = request.GET.get('group', '')
     if group_id:
-        try:
+        if group_id.isdigit():
             products = products.filter(grupo_whatsapp_id=group_id)
-        except ValueError:
-            pass  # Se não for um ID válido, ignora
+        else:
+            group_id = ''  # Se não for um ID válido, ignora
     
     # Outros filtros
     search = request.GET.get('search', '')
@@ -347,11 +353,32 @@ def shopper_products(request):
     if brand:
         products = products.filter(marca=brand)
     
-    # Estatísticas (base total do shopper)
-    total_products = base_products.count()
-    # Para ProdutoJSON, não temos is_available ou is_featured, então usamos total
-    available_products = total_products
-    featured_products = 0
+    if availability == 'available':
+        products = products.filter(disponivel=True)
+    elif availability == 'unavailable':
+        products = products.filter(disponivel=False)
+    
+    if featured == 'yes':
+        products = products.filter(destaque=True)
+    elif featured == 'no':
+        products = products.filter(destaque=False)
+    
+    # Paginação por cursor (?depois= / ?antes=) e adaptação só da página atual
+    page_obj = paginar(
+        products,
+        depois=request.GET.get('depois', ''),
+        antes=request.GET.get('antes', ''),
+    )
+    page_obj.object_list = [adaptar_produto(produto_json) for produto_json in page_obj.object_list]
+    total_filtrados = products.count()
+    
+    # Filtros atuais para os links de paginação
+    filtros_query = urlencode({
+        chave: valor for chave, valor in (
+            ('search', search), ('category', category), ('brand', brand),
+            ('availability', availability), ('featured', featured), ('group', group_id),
+        ) if valor
+    })
     
     # Estabelecimentos disponíveis (base geral)
     estabelecimentos = Empresa.objects.filter(ativo=True).order_by('nome')
@@ -359,159 +386,22 @@ def shopper_products(request):
     # Grupos do shopper para o modal de criação (OBRIGATÓRIO para o dropdown)
     groups = WhatsappGroup.objects.filter(owner=request.user).order_by('name')
     
-    # Converter ProdutoJSON para formato compatível com o template
-    # O template espera campos como name, brand, image_urls, etc.
-    # IMPORTANTE: Filtrar apenas produtos disponíveis ANTES da paginação
-    from django.conf import settings
-    
-    produtos_adaptados = []
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    logger.info(f"[SHOPPER_PRODUCTS] Total de produtos antes do filtro de disponibilidade: {products.count()}")
-    
-    # Processar TODOS os produtos filtrados para verificar disponibilidade
-    for produto_json in products:
-        try:
-            dados = produto_json.get_produto_data()
-            produto_data = dados.get('produto', {})
-            
-            # Extrair imagens - verificar múltiplos locais possíveis
-            image_urls = []
-            media_url = getattr(settings, 'MEDIA_URL', '/media/')
-            
-            # DEBUG: Log para verificar dados do produto
-            logger.info(f"[SHOPPER_PRODUCTS] Processando produto ID: {produto_json.id}, Nome: {produto_json.nome_produto}")
-            logger.info(f"[SHOPPER_PRODUCTS] imagem_original: {produto_json.imagem_original}")
-            logger.info(f"[SHOPPER_PRODUCTS] dados completos (keys): {list(dados.keys()) if dados else 'None'}")
-            logger.info(f"[SHOPPER_PRODUCTS] produto_data (keys): {list(produto_data.keys()) if produto_data else 'None'}")
-            logger.info(f"[SHOPPER_PRODUCTS] produto_data.imagens: {produto_data.get('imagens', [])}")
-            
-            # Usar função utilitária build_image_url importada de utils
-            
-            # 1. Tentar campo imagens (array)
-            imagens = produto_data.get('imagens', [])
-            logger.info(f"[SHOPPER_PRODUCTS] Campo 'imagens' encontrado: {imagens} (tipo: {type(imagens)})")
-            if imagens and isinstance(imagens, list):
-                for idx, img in enumerate(imagens):
-                    logger.info(f"[SHOPPER_PRODUCTS]   Processando imagem {idx + 1}: {img} (tipo: {type(img)})")
-                    if isinstance(img, str):
-                        # Se já é URL completa, usar diretamente; senão, construir
-                        if img.startswith('http://') or img.startswith('https://'):
-                            logger.info(f"[SHOPPER_PRODUCTS]     URL completa detectada, adicionando: {img}")
-                            image_urls.append(img)
-                        else:
-                            logger.info(f"[SHOPPER_PRODUCTS]     Construindo URL a partir de: {img}")
-                            url = build_image_url(img)
-                            logger.info(f"[SHOPPER_PRODUCTS]     URL construída: {url}")
-                            if url:
-                                image_urls.append(url)
-                    elif isinstance(img, dict):
-                        # Se for objeto, tentar extrair URL
-                        url = img.get('url') or img.get('src') or img.get('path') or img.get('image_url')
-                        if url:
-                            # Se já é URL completa, usar diretamente
-                            if isinstance(url, str) and (url.startswith('http://') or url.startswith('https://')):
-                                image_urls.append(url)
-                            else:
-                                final_url = build_image_url(url)
-                                if final_url:
-                                    image_urls.append(final_url)
-            
-            # 2. Tentar campo imagem_original do modelo ProdutoJSON
-            if not image_urls and produto_json.imagem_original:
-                logger.info(f"[SHOPPER_PRODUCTS] Tentando imagem_original: {produto_json.imagem_original}")
-                url = build_image_url(produto_json.imagem_original)
-                if url:
-                    image_urls.append(url)
-                    logger.info(f"[SHOPPER_PRODUCTS] imagem_original construída: {url}")
-            
-            # 3. Tentar campo imagem (singular) no dados_json
-            if not image_urls:
-                imagem = produto_data.get('imagem') or produto_data.get('image')
-                if imagem:
-                    url = build_image_url(imagem)
-                    if url:
-                        image_urls.append(url)
-            
-            # 4. Verificar também em produto_viagem
-            if not image_urls:
-                produto_viagem = dados.get('produto_viagem', {})
-                imagem_viagem = produto_viagem.get('imagem') or produto_viagem.get('image')
-                if imagem_viagem:
-                    url = build_image_url(imagem_viagem)
-                    if url:
-                        image_urls.append(url)
-            
-            # DEBUG: Log das URLs extraídas
-            logger.info(f"[SHOPPER_PRODUCTS] image_urls extraídas: {image_urls}")
-            logger.info(f"[SHOPPER_PRODUCTS] Total de URLs: {len(image_urls)}")
-            
-            # Extrair preço do produto_viagem se disponível
-            produto_viagem = dados.get('produto_viagem', {})
-            price = produto_viagem.get('preco_venda_brl') or produto_viagem.get('preco_venda_usd')
-            currency = 'BRL' if produto_viagem.get('preco_venda_brl') else 'USD'
-            
-            # Verificar se produto está disponível (filtrar apenas disponíveis)
-            is_available = produto_data.get('is_available', True)  # Padrão True se não existir
-            
-            # Pular produtos não disponíveis
-            if not is_available:
-                logger.info(f"[SHOPPER_PRODUCTS] Produto {produto_json.id} pulado (não disponível)")
-                continue
-            
-            # Criar objeto adaptado
-            produto_adaptado = type('ProdutoAdaptado', (), {
-            'id': produto_json.id,
-            'name': produto_json.nome_produto,
-            'brand': produto_json.marca or produto_data.get('marca', ''),
-            'description': produto_data.get('descricao', ''),
-            'category': produto_json.categoria or produto_data.get('categoria', ''),
-            'image_urls': image_urls,  # Lista de URLs das imagens
-            'price': price,
-            'currency': currency,
-            'is_available': is_available,
-            'is_featured': produto_data.get('is_featured', False),  # Ler do JSON ou padrão False
-            'group': produto_json.grupo_whatsapp,
-            'estabelecimento': None,  # ProdutoJSON não tem estabelecimento direto
-            'localizacao_especifica': None,
-            'created_at': produto_json.criado_em,
-                'dados_json': dados,  # Manter dados completos para acesso
-            })()
-            
-            # DEBUG: Verificar objeto criado
-            logger.info(f"[SHOPPER_PRODUCTS] Objeto criado - image_urls: {produto_adaptado.image_urls}, len: {len(produto_adaptado.image_urls) if produto_adaptado.image_urls else 0}")
-            
-            produtos_adaptados.append(produto_adaptado)
-        except Exception as e:
-            logger.error(f"[SHOPPER_PRODUCTS] Erro ao processar produto ID {produto_json.id}: {str(e)}", exc_info=True)
-            # Continuar com próximo produto mesmo se houver erro
-            continue
-    
-    # Agora aplicar paginação nos produtos já filtrados (apenas disponíveis)
-    logger.info(f"[SHOPPER_PRODUCTS] Total de produtos disponíveis após filtro: {len(produtos_adaptados)}")
-    
-    paginator = Paginator(produtos_adaptados, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    logger.info(f"[SHOPPER_PRODUCTS] Página atual: {page_obj.number}, Total de páginas: {paginator.num_pages}")
-    logger.info(f"[SHOPPER_PRODUCTS] Produtos na página atual: {len(page_obj)}")
-    
     context = {
         'page_obj': page_obj,
+        'total_filtrados': total_filtrados,
+        'filtros_query': filtros_query,
         'search': search,
         'category': category,
         'brand': brand,
         'availability': availability,
         'featured': featured,
         'group_id': group_id,
-        'categories': categories,
-        'brands': brands,
+        'categories': facetas['categorias'],
+        'brands': facetas['marcas'],
         'groups': groups,  # GRUPOS PARA O DROPDOWN - ESSENCIAL!
-        'total_products': total_products,
-        'available_products': available_products,
-        'featured_products': featured_products,
+        'total_products': facetas['total'],
+        'available_products': facetas['disponiveis'],
+        'featured_products': facetas['destaques'],
         'estabelecimentos': estabelecimentos,
     }
     
@@ -612,19 +502,14 @@ def shopper_analytics(request):
         days = int(request.GET.get('period', 90))
         start_date = end_date - timedelta(days=days)
     
-    # Dados do período
-    orders = WhatsappOrder.objects.filter(
-        group__owner=request.user,
-        created_at__gte=start_date
-    )
+    # Vendas do período (rollup por grupo/dia/hora/status - uma consulta)
+    rollup = carregar_rollup(desde=timezone.localdate(start_date), group__owner=request.user)
+    periodo = totais(rollup)
     
     # Métricas principais
-    total_orders = orders.count()
-    total_revenue = orders.filter(
-        status__in=['paid', 'purchased', 'shipped', 'delivered']
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
-    
-    avg_order_value = orders.aggregate(avg=Avg('total_amount'))['avg'] or Decimal('0')
+    total_orders = periodo['orders']
+    total_revenue = periodo['revenue']
+    avg_order_value = periodo['amount'] / total_orders if total_orders else Decimal('0')
     
     # Participantes
     total_participants = WhatsappParticipant.objects.filter(
@@ -639,28 +524,24 @@ def shopper_analytics(request):
     ).count()
     
     # Vendas por status
+    por_status = agrupar(rollup, 'status')
     sales_by_status = {}
     for status, label in WhatsappOrder.STATUS_CHOICES:
-        count = orders.filter(status=status).count()
-        revenue = orders.filter(
-            status=status,
-            status__in=['paid', 'purchased', 'shipped', 'delivered']
-        ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
-        
+        dados = por_status.get(status) or totais([])
         sales_by_status[status] = {
             'label': label,
-            'count': count,
-            'revenue': float(revenue)
+            'count': dados['orders'],
+            'revenue': float(dados['revenue'])
         }
     
     # Vendas por grupo
-    sales_by_group = WhatsappGroup.objects.filter(owner=request.user).annotate(
-        order_count=Count('orders', filter=Q(orders__created_at__gte=start_date)),
-        revenue=Sum('orders__total_amount', filter=Q(
-            orders__created_at__gte=start_date,
-            orders__status__in=['paid', 'purchased', 'shipped', 'delivered']
-        ))
-    ).order_by('-revenue')
+    por_grupo = agrupar(rollup, 'group_id')
+    sales_by_group = list(WhatsappGroup.objects.filter(owner=request.user))
+    for group in sales_by_group:
+        dados = por_grupo.get(group.id) or totais([])
+        group.order_count = dados['orders']
+        group.revenue = dados['revenue']
+    sales_by_group.sort(key=lambda g: g.revenue, reverse=True)
     
     # Produtos mais vendidos
     popular_products = ProdutoJSON.objects.filter(
@@ -668,34 +549,26 @@ def shopper_analytics(request):
     ).order_by('-criado_em')[:10]
     
     # Crescimento diário
+    por_dia = agrupar(rollup, 'day')
     daily_sales = []
     for i in range(30):  # Últimos 30 dias
-        day = end_date - timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day.replace(hour=23, minute=59, second=59, microsecond=999999)
-        
-        day_orders = orders.filter(created_at__gte=day_start, created_at__lte=day_end).count()
-        day_revenue = orders.filter(
-            created_at__gte=day_start,
-            created_at__lte=day_end,
-            status__in=['paid', 'purchased', 'shipped', 'delivered']
-        ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
-        
+        day = timezone.localdate(end_date) - timedelta(days=i)
+        dados = por_dia.get(day) or totais([])
         daily_sales.append({
             'date': day.strftime('%d/%m'),
-            'orders': day_orders,
-            'revenue': float(day_revenue)
+            'orders': dados['orders'],
+            'revenue': float(dados['revenue'])
         })
     
     daily_sales.reverse()
     
     # Horários de maior atividade
+    por_hora = agrupar(rollup, 'hour')
     hourly_activity = []
     for hour in range(24):
-        hour_orders = orders.filter(created_at__hour=hour).count()
         hourly_activity.append({
             'hour': f"{hour:02d}:00",
-            'orders': hour_orders
+            'orders': (por_hora.get(hour) or totais([]))['orders']
         })
     
     context = {
@@ -0,0 +1,14 @@
+"""
+Signals do catálogo do shopper - invalidação das facetas em cache
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import ProdutoJSON
+from .product_catalog import invalidar_facetas_catalogo
+
+
+@receiver(post_save, sender=ProdutoJSON)
+@receiver(post_delete, sender=ProdutoJSON)
+def invalidar_facetas_produto(sender, instance, **kwargs):
+    """Signal: produto criado/alterado/removido - recalcular contadores, categorias e marcas do shopper"""
+    invalidar_facetas_catalogo(instance.criado_por_id)
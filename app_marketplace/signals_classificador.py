@@ -0,0 +1,14 @@
+"""
+Signals do classificador de mensagens - recompilação do dicionário de termos
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import TermoClassificacao
+from .text_classifier import classificador
+
+
+@receiver(post_save, sender=TermoClassificacao)
+@receiver(post_delete, sender=TermoClassificacao)
+def recompilar_classificador(sender, instance, **kwargs):
+    """Signal: termo editado no admin - recompilar na próxima mensagem (demais processos: por versão)"""
+    classificador.invalidar()
@@ -0,0 +1,12 @@
+"""
+Signals de esquema - descarta o registro de colunas após migrate
+"""
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+from .schema_registry import esquema
+
+
+@receiver(post_migrate)
+def invalidar_registro_esquema(sender, **kwargs):
+    """Signal: migrações aplicadas - reler o catálogo na próxima consulta"""
+    esquema.invalidar()
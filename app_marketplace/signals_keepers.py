@@ -0,0 +1,14 @@
+"""
+Signals de Address Keepers - invalidação do índice espacial de pontos de guarda
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import AddressKeeper
+from .keeper_geo import indice_keepers
+
+
+@receiver(post_save, sender=AddressKeeper)
+@receiver(post_delete, sender=AddressKeeper)
+def invalidar_indice_keepers(sender, instance, **kwargs):
+    """Signal: keeper criado/alterado/removido - reconstruir o índice na próxima consulta"""
+    indice_keepers.invalidar()
@@ -0,0 +1,36 @@
+"""
+Signals KMN - invalidação do catálogo personalizado em cache e do grafo de confiança
+Ofertas/produtos afetam o catálogo de todos os clientes; relações, apenas do cliente
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Oferta, Produto, ClienteRelacao, Agente, TrustlineKeeper, LigacaoMesh
+from .services import CatalogoService
+from .kmn_graph import grafo_kmn
+
+
+@receiver(post_save, sender=Oferta)
+@receiver(post_delete, sender=Oferta)
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+def invalidar_catalogos_oferta(sender, instance, **kwargs):
+    """Signal: oferta ou produto alterado - invalida o catálogo de todos os clientes"""
+    CatalogoService.invalidar_cache()
+
+
+@receiver(post_save, sender=ClienteRelacao)
+@receiver(post_delete, sender=ClienteRelacao)
+def invalidar_catalogo_cliente(sender, instance, **kwargs):
+    """Signal: relação cliente-agente alterada - o owner primário pode ter mudado"""
+    CatalogoService.invalidar_cache(cliente_id=instance.cliente_id)
+
+
+@receiver(post_save, sender=TrustlineKeeper)
+@receiver(post_delete, sender=TrustlineKeeper)
+@receiver(post_save, sender=LigacaoMesh)
+@receiver(post_delete, sender=LigacaoMesh)
+@receiver(post_save, sender=Agente)
+@receiver(post_delete, sender=Agente)
+def invalidar_grafo_kmn(sender, instance, **kwargs):
+    """Signal: trustline, ligação Mesh ou agente alterado - recarregar o grafo na próxima consulta"""
+    grafo_kmn.invalidar()
@@ -2,10 +2,12 @@
 Signals para integração WhatsApp - criação automática de conversas
 Paradigma: Grupo → Pedido → Conversa Individual
 """
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import WhatsappOrder
+from .models import WhatsappOrder, WhatsappConversation
 from .conversations_views import create_conversation_after_order
+from .conversation_facets import invalidar_facetas_conversa
+from . import sales_rollup
 
 
 @receiver(post_save, sender=WhatsappOrder)
@@ -18,3 +20,30 @@ def create_conversation_on_order_creation(sender, instance, created, **kwargs):
         # Criar conversa apenas quando pedido é criado (não atualizado)
         create_conversation_after_order(instance)
 
+
+@receiver(pre_save, sender=WhatsappOrder)
+def capture_order_rollup_state(sender, instance, raw=False, **kwargs):
+    """Signal: guarda status/valor anteriores do pedido para o rollup de vendas"""
+    if not raw:
+        sales_rollup.capturar_estado_anterior(instance)
+
+
+@receiver(post_save, sender=WhatsappOrder)
+def update_order_rollup(sender, instance, raw=False, **kwargs):
+    """Signal: aplica o pedido criado/alterado ao rollup de vendas"""
+    if not raw:
+        sales_rollup.aplicar_pedido_salvo(instance)
+
+
+@receiver(post_delete, sender=WhatsappOrder)
+def remove_order_rollup(sender, instance, **kwargs):
+    """Signal: retira o pedido removido do rollup de vendas"""
+    sales_rollup.aplicar_pedido_removido(instance)
+
+
+@receiver(post_save, sender=WhatsappConversation)
+@receiver(post_delete, sender=WhatsappConversation)
+def invalidate_inbox_facets(sender, instance, raw=False, **kwargs):
+    """Signal: contadores/tags da caixa de entrada do dono e do responsável mudaram"""
+    if not raw:
+        invalidar_facetas_conversa(instance)
@@ -1,3 +1,31 @@
-from django.test import TestCase
+from io import BytesIO
 
-# Create your tests here.
+from django.test import SimpleTestCase
+from PIL import Image
+
+from .utils import preparar_imagem_para_ia, reduzir_na_decodificacao
+
+
+def _jpeg(largura, altura):
+    output = BytesIO()
+    Image.new('RGB', (largura, altura), (120, 80, 40)).save(output, format='JPEG')
+    return output.getvalue()
+
+
+class ReduzirNaDecodificacaoTests(SimpleTestCase):
+    """Foto de celular (4032x3024) decodificada já reduzida pelo draft do JPEG"""
+    
+    def test_draft_reduz_foto_de_celular(self):
+        img = Image.open(BytesIO(_jpeg(4032, 3024)))
+        reduzir_na_decodificacao(img, 1600)
+        # Escala 1/2: menor redução com os dois lados >= 1600x1200
+        self.assertEqual(img.size, (2016, 1512))
+    
+    def test_draft_sem_efeito_dentro_do_limite(self):
+        img = Image.open(BytesIO(_jpeg(1200, 900)))
+        reduzir_na_decodificacao(img, 1600)
+        self.assertEqual(img.size, (1200, 900))
+    
+    def test_preparar_imagem_respeita_max_dim(self):
+        with Image.open(BytesIO(preparar_imagem_para_ia(_jpeg(4032, 3024), max_dim=1600, quality=85))) as img:
+            self.assertEqual(img.size, (1600, 1200))
@@ -0,0 +1,226 @@
+"""
+Classificador de Mensagens - Marketplace
+========================================
+
+Motor único de classificação de texto das mensagens de grupo: marcas
+(``detect_brand``/``parse_listing``), labels promocionais (``parse_listing``)
+e intenção social (``WhatsAppFlowEngine._classificar_intencao``).
+
+Todos os vocabulários são compilados numa única regex em forma de trie
+(termos fatorados por prefixo comum) e cada mensagem é percorrida uma vez;
+o termo encontrado aponta para seus rótulos por categoria. O custo por
+mensagem praticamente não cresce com o tamanho do dicionário, ao contrário
+de um ``in`` por termo.
+
+- Termos alfanuméricos casam quando não precedidos de letra (``vs`` não casa
+  em ``canvas``, mas ``promo`` casa em ``promoção`` e ``off`` em ``30OFF``)
+- Vocabulários padrão ficam no código; ``TermoClassificacao`` (admin) adiciona
+  ou desativa termos. O dicionário é recarregado quando a tabela muda
+  (verificada a cada ``TEXT_CLASSIFIER_RELOAD_SECONDS``, ou na hora por signal
+  no próprio processo)
+
+Benchmark: ``python manage.py benchmark_classificador``.
+"""
+
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Max
+
+from .models import IntencaoSocial, TermoClassificacao
+
+logger = logging.getLogger(__name__)
+
+RELOAD_SECONDS = getattr(settings, 'TEXT_CLASSIFIER_RELOAD_SECONDS', 30)
+
+MARCA = TermoClassificacao.Categoria.MARCA
+PROMOCAO = TermoClassificacao.Categoria.PROMOCAO
+INTENCAO_SOCIAL = TermoClassificacao.Categoria.INTENCAO_SOCIAL
+
+# Mapa de marcas (expandir pelo admin: Termos do Classificador)
+BRAND_MAP = {
+    "victoria's secret": ["victoria's secret", "victorias secret", "vs", "victoria"],
+    "adidas": ["adidas"],
+    "nike": ["nike", "niké"],
+    "puma": ["puma"],
+    "bath & body works": ["bath & body works", "bbw", "bbworks", "bathandbody"],
+    "gap": ["gap"],
+    "carter's": ["carters", "carter's", "carter"],
+    "hollister": ["hollister"],
+    "old navy": ["old navy", "oldnavy"],
+}
+
+PROMO_KEYWORDS = {
+    "bogo": "bogo",
+    "last day": "ultimo_dia",
+    "último dia": "ultimo_dia",
+    "clearance": "clearance",
+    "cupom": "cupom",
+    "desconto": "desconto",
+    "off": "desconto",
+    "promoção": "promocao",
+    "promo": "promocao",
+}
+
+# (tipo, termos, prioridade): emoji > pergunta > manifestação de interesse
+INTENCOES_SOCIAIS = [
+    (IntencaoSocial.TipoIntencao.EMOJI, ['❤️', '👍', '🔥', '💯', '😍', '👏', '✅'], 30),
+    (IntencaoSocial.TipoIntencao.PERGUNTA, ['quanto', 'preço', 'custa', 'tem', 'disponível'], 20),
+    (IntencaoSocial.TipoIntencao.TEXTO, ['quero', 'eu quero', 'vou querer', 'me interessa'], 10),
+]
+
+
+def vocabulario_padrao() -> Dict[Tuple[str, str], Tuple[str, int]]:
+    """(categoria, termo) -> (rótulo, prioridade)"""
+    vocabulario = {}
+    for marca, aliases in BRAND_MAP.items():
+        for alias in aliases:
+            vocabulario[(MARCA, alias.lower())] = (marca, 0)
+    for termo, label in PROMO_KEYWORDS.items():
+        vocabulario[(PROMOCAO, termo.lower())] = (label, 0)
+    for tipo, termos, prioridade in INTENCOES_SOCIAIS:
+        for termo in termos:
+            vocabulario[(INTENCAO_SOCIAL, termo.lower())] = (str(tipo), prioridade)
+    return vocabulario
+
+
+def _regex_trie(termos: List[str]) -> str:
+    """
+    Alternância dos termos fatorada por prefixo comum (``b(?:bw|ogo)``)
+
+    Evita que o ``re`` teste cada termo em cada posição do texto; a repetição
+    opcional gulosa faz o termo mais longo vencer (``carter's`` antes de ``carter``).
+    """
+    trie: Dict = {}
+    for termo in termos:
+        no = trie
+        for caractere in termo:
+            no = no.setdefault(caractere, {})
+        no[''] = True
+
+    def montar(no: Dict) -> str:
+        ramos = [re.escape(caractere) + montar(filho) for caractere, filho in sorted(no.items()) if caractere]
+        if not ramos:
+            return ''
+        fim = '' in no
+        if len(ramos) == 1 and not fim:
+            return ramos[0]
+        return '(?:' + '|'.join(ramos) + ')' + ('?' if fim else '')
+
+    return montar(trie)
+
+
+@dataclass
+class Analise:
+    """Rótulos encontrados por categoria, na ordem em que aparecem no texto"""
+    encontrados: Dict[str, List[Tuple[str, int]]] = field(default_factory=dict)
+
+    def rotulos(self, categoria: str) -> List[str]:
+        return [rotulo for rotulo, _ in self.encontrados.get(categoria, [])]
+
+    def primeiro(self, categoria: str) -> Optional[str]:
+        itens = self.encontrados.get(categoria)
+        return itens[0][0] if itens else None
+
+    def mais_prioritario(self, categoria: str) -> Optional[str]:
+        itens = self.encontrados.get(categoria)
+        if not itens:
+            return None
+        return max(itens, key=lambda item: item[1])[0]
+
+
+class ClassificadorTexto:
+    """Vocabulários compilados numa regex (por processo, recarregada quando o dicionário muda)"""
+
+    def __init__(self, intervalo_recarga: float):
+        self.intervalo_recarga = intervalo_recarga
+        self._lock = threading.Lock()
+        self._sujo = True
+        self._versao = None
+        self._verificado_em = 0.0
+        self._regex: Optional[re.Pattern] = None
+        self._rotulos: Dict[str, List[Tuple[str, str, int]]] = {}
+
+    def invalidar(self):
+        """Recompilar na próxima mensagem"""
+        self._sujo = True
+
+    def _versao_dicionario(self):
+        try:
+            agregado = TermoClassificacao.objects.aggregate(ultimo=Max('atualizado_em'), total=Count('id'))
+            return agregado['ultimo'], agregado['total']
+        except DatabaseError as e:
+            logger.warning(f"[CLASSIFICADOR] Dicionário indisponível, usando vocabulário padrão: {str(e)}")
+            return None
+
+    def _carregar(self) -> Dict[Tuple[str, str], Tuple[str, int]]:
+        vocabulario = vocabulario_padrao()
+        try:
+            for termo in TermoClassificacao.objects.values('categoria', 'rotulo', 'termo', 'prioridade', 'ativo'):
+                chave = (termo['categoria'], termo['termo'].strip().lower())
+                if not chave[1]:
+                    continue
+                if termo['ativo']:
+                    vocabulario[chave] = (termo['rotulo'], termo['prioridade'])
+                else:
+                    vocabulario.pop(chave, None)
+        except DatabaseError as e:
+            logger.warning(f"[CLASSIFICADOR] Dicionário indisponível, usando vocabulário padrão: {str(e)}")
+        return vocabulario
+
+    def _compilar(self, vocabulario: Dict[Tuple[str, str], Tuple[str, int]]):
+        rotulos: Dict[str, List[Tuple[str, str, int]]] = {}
+        for (categoria, termo), (rotulo, prioridade) in vocabulario.items():
+            rotulos.setdefault(termo, []).append((categoria, rotulo, prioridade))
+
+        palavras = [termo for termo in rotulos if re.match(r'\w', termo)]
+        simbolos = [termo for termo in rotulos if not re.match(r'\w', termo)]
+        partes = []
+        if palavras:
+            # Sem ``\b``: dígito antes do termo é comum em promoções (``50off``)
+            partes.append(r'(?<![^\W\d_])(?:' + _regex_trie(palavras) + ')')
+        if simbolos:
+            partes.append('(?:' + _regex_trie(simbolos) + ')')
+        self._regex = re.compile('|'.join(partes)) if partes else None
+        self._rotulos = rotulos
+        logger.info(f"[CLASSIFICADOR] {len(rotulos)} termo(s) compilado(s)")
+
+    def _garantir(self):
+        if not self._sujo and time.monotonic() - self._verificado_em < self.intervalo_recarga:
+            return
+        with self._lock:
+            if not self._sujo and time.monotonic() - self._verificado_em < self.intervalo_recarga:
+                return
+            versao = self._versao_dicionario()
+            if self._sujo or self._regex is None or versao != self._versao:
+                self._compilar(self._carregar())
+                self._versao = versao
+            self._sujo = False
+            self._verificado_em = time.monotonic()
+
+    def analisar(self, texto: str) -> Analise:
+        """Uma passada pelo texto; rótulos por categoria sem repetição"""
+        self._garantir()
+        analise = Analise()
+        if not texto or self._regex is None:
+            return analise
+
+        for match in self._regex.finditer(texto.lower()):
+            for categoria, rotulo, prioridade in self._rotulos[match.group(0)]:
+                itens = analise.encontrados.setdefault(categoria, [])
+                if all(existente != rotulo for existente, _ in itens):
+                    itens.append((rotulo, prioridade))
+        return analise
+
+
+classificador = ClassificadorTexto(RELOAD_SECONDS)
+
+
+def analisar_texto(texto: str) -> Analise:
+    return classificador.analisar(texto)
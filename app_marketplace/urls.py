@@ -71,6 +71,8 @@ urlpatterns = [
            path('api/whatsapp/groups/<int:group_id>/products/<int:product_id>/screenshots/<int:screenshot_id>/delete/', whatsapp_dashboard_views.delete_screenshot, name='api_delete_screenshot'),
            path('api/whatsapp/orders/<int:order_id>/update-status/', whatsapp_dashboard_views.update_order_status, name='api_update_order_status'),
            path('api/whatsapp/groups/<int:group_id>/send-message/', whatsapp_dashboard_views.send_group_message, name='api_send_group_message'),
+           path('api/whatsapp/groups/<int:group_id>/broadcast/', whatsapp_dashboard_views.broadcast_group_offer, name='api_broadcast_group_offer'),
+           path('api/whatsapp/broadcasts/<int:campaign_id>/', whatsapp_dashboard_views.broadcast_status, name='api_broadcast_status'),
            
       # API para criação de produtos (sem grupo específico)
       path('api/products/create/', shopper_dashboard_views.create_product, name='api_create_product_general'),
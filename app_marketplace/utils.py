@@ -405,8 +405,8 @@ def transform_evora_to_modelo_json(evora_data: Dict[str, Any], image_filename: s
         'plataformas', 'funcoes', 'observacoes', 'tags', 'palavras_chave',
         'analise_texto', 'extracao_ocr', 'confianca_extracao'
     ]
-    
 
+    
     for campo in campos_analise:
         if evora_data.get(campo) is not None:
             analise_ia[campo] = evora_data[campo]
@@ -574,3 +574,67 @@ def build_image_url(img_path, openmind_url=None, media_url=None, use_proxy=True)
     
     return None
 
+
+def reduzir_na_decodificacao(img, max_dim):
+    """
+    Decodifica um JPEG já reduzido (``Image.draft``, escala DCT 1/2, 1/4, 1/8)
+    
+    O ``draft`` escolhe a maior redução que mantém os DOIS lados >= o tamanho
+    pedido, então o alvo precisa ter a proporção da imagem: com uma caixa
+    quadrada (max_dim, max_dim) o lado menor impede qualquer redução. Sem efeito
+    em outros formatos ou em imagens dentro de ``max_dim``.
+    """
+    if img.format != 'JPEG' or max(img.size) <= max_dim:
+        return img
+    scale = max_dim / max(img.size)
+    img.draft('RGB', (int(img.width * scale), int(img.height * scale)))
+    return img
+
+
+def preparar_imagem_para_ia(image_bytes: bytes, max_dim: Optional[int] = None, quality: Optional[int] = None) -> bytes:
+    """
+    Reduz e normaliza uma imagem antes de enviá-la para análise de IA
+    
+    Decodifica uma única vez (JPEG em modo draft, já reduzido), aplica a
+    orientação EXIF, descarta os metadados e recodifica como JPEG RGB. Fotos
+    de celular (12MP+) ficam 5-20x menores, o que reduz o payload em base64
+    e a memória por requisição.
+    
+    Args:
+        image_bytes: Dados binários da imagem original
+        max_dim: Maior dimensão permitida (padrão: IMAGE_ANALYSIS_MAX_DIMENSION)
+        quality: Qualidade JPEG (padrão: IMAGE_ANALYSIS_JPEG_QUALITY)
+    
+    Returns:
+        bytes: Imagem JPEG (os bytes originais se já é um JPEG pequeno sem EXIF)
+    """
+    from io import BytesIO
+    from PIL import Image, ImageOps
+    
+    max_dim = max_dim or getattr(settings, 'IMAGE_ANALYSIS_MAX_DIMENSION', 1600)
+    quality = quality or getattr(settings, 'IMAGE_ANALYSIS_JPEG_QUALITY', 85)
+    
+    img = Image.open(BytesIO(image_bytes))
+    
+    if (img.format == 'JPEG' and img.width <= max_dim and img.height <= max_dim
+            and 'exif' not in img.info and img.mode in ('RGB', 'L')):
+        return image_bytes
+    
+    reduzir_na_decodificacao(img, max_dim)
+    
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((max_dim, max_dim), Image.Resampling.LANCZOS)
+    
+    # Converter para RGB se necessário (transparência vira fundo branco)
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        img = background
+    elif img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    
+    # Salvar sem ``exif=`` remove os metadados (GPS, câmera, orientação)
+    output = BytesIO()
+    img.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
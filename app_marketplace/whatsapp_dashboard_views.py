@@ -19,11 +19,13 @@ from .models import (
     PersonalShopper, WhatsappGroup, WhatsappParticipant, 
     WhatsappMessage, WhatsappProduct, WhatsappOrder,
     Cliente, Produto, Categoria, Agente, ClienteRelacao,
-    RelacionamentoClienteShopper, TrustlineKeeper,
+    RelacionamentoClienteShopper,
     ParticipantPermissionRequest, CarteiraCliente,
     PostScreenshot, WhatsappConversation, ConversationNote
 )
 from .whatsapp_views import send_message, send_reaction
+from .sales_rollup import carregar_rollup, totais
+from .kmn_graph import grafo_kmn
 
 
 # ============================================================================
@@ -306,31 +308,31 @@ def get_available_clients(request, group_id):
                             'owner_name': request.user.get_full_name() or request.user.username
                         })
             
-            # 2. Clientes via trustlines
-            trustlines_ativas = TrustlineKeeper.objects.filter(
-                Q(agente_a=agente) | Q(agente_b=agente),
-                status=TrustlineKeeper.StatusTrustline.ATIVA
-            ).defer('tipo_compartilhamento').select_related('agente_a__user', 'agente_b__user')
+            # 2. Clientes via trustlines (parceiros do grafo KMN em memória)
+            parceiros = grafo_kmn.parceiros(agente.id)
             
-            for trustline in trustlines_ativas:
-                parceiro = trustline.agente_b if trustline.agente_a == agente else trustline.agente_a
-                
-                # Buscar clientes do parceiro
-                relacoes_parceiro = ClienteRelacao.objects.filter(
-                    agente=parceiro,
+            if parceiros:
+                relacoes_parceiros = ClienteRelacao.objects.filter(
+                    agente_id__in=list(parceiros),
                     status='ativa'
-                ).select_related('cliente', 'cliente__user')
+                ).select_related('agente__user', 'cliente', 'cliente__user').order_by('agente_id', 'id')
                 
-                for relacao in relacoes_parceiro:
+                # Permissões já solicitadas neste grupo (uma consulta para todos os clientes)
+                permissoes = {
+                    permission.cliente_id: permission
+                    for permission in ParticipantPermissionRequest.objects.filter(
+                        group=group,
+                        cliente_id__in=relacoes_parceiros.values('cliente_id'),
+                        status__in=['pendente', 'aprovado']
+                    )
+                }
+                
+                for relacao in relacoes_parceiros:
                     cliente = relacao.cliente
+                    parceiro = relacao.agente
                     telefone = cliente.telefone or (cliente.user.username if cliente.user else '')
                     if telefone:
-                        # Verificar se já existe permissão
-                        permission = ParticipantPermissionRequest.objects.filter(
-                            group=group,
-                            cliente=cliente,
-                            status__in=['pendente', 'aprovado']
-                        ).first()
+                        permission = permissoes.get(cliente.id)
                         
                         has_permission = False
                         permission_pending = False
@@ -348,7 +350,7 @@ def get_available_clients(request, group_id):
                             'owner': 'trustline',
                             'owner_name': parceiro.user.get_full_name() or parceiro.user.username,
                             'owner_id': parceiro.user.id,
-                            'trustline_id': trustline.id,
+                            'trustline_id': parceiros[parceiro.id],
                             'has_permission': has_permission,
                             'permission_pending': permission_pending,
                             'permission_id': permission_id
@@ -940,6 +942,66 @@ def send_group_message(request, group_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@login_required
+@require_http_methods(["POST"])
+def broadcast_group_offer(request, group_id):
+    """
+    Criar campanha de envio em massa de um produto/oferta para o grupo
+    
+    Payload:
+    {
+        "produto_id": 123,          // ou "oferta_id": "OFT-1234ABCD"
+        "participant_ids": [1, 2]   // opcional (padrão: todos os participantes)
+    }
+    
+    A campanha é executada pelo worker (manage.py processar_broadcasts);
+    o progresso pode ser consultado em broadcast_status.
+    """
+    if not request.user.is_shopper:
+        return JsonResponse({'error': 'Acesso restrito'}, status=403)
+    
+    try:
+        from .models import OfertaProduto, ProdutoJSON
+        from app_whatsapp_integration.broadcast import criar_campanha, resumo_campanha
+        
+        group = get_object_or_404(WhatsappGroup, id=group_id, shopper=request.user.personalshopper)
+        data = json.loads(request.body)
+        
+        oferta = None
+        produto = None
+        if data.get('oferta_id'):
+            oferta = get_object_or_404(OfertaProduto, oferta_id=data['oferta_id'], grupo=group)
+        elif data.get('produto_id'):
+            produto = get_object_or_404(ProdutoJSON, id=data['produto_id'], criado_por=request.user)
+        else:
+            return JsonResponse({'error': 'produto_id ou oferta_id é obrigatório'}, status=400)
+        
+        destino = group
+        participant_ids = data.get('participant_ids')
+        if participant_ids:
+            destino = group.participants.filter(id__in=participant_ids)
+        
+        campanha = criar_campanha(destino, produto=produto, oferta=oferta, created_by=request.user)
+        
+        return JsonResponse({'success': True, 'campaign': resumo_campanha(campanha)}, status=202)
+        
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+def broadcast_status(request, campaign_id):
+    """Progresso de uma campanha de envio em massa"""
+    from app_whatsapp_integration.broadcast import resumo_campanha
+    from app_whatsapp_integration.models import BroadcastCampaign
+    
+    campanha = get_object_or_404(BroadcastCampaign, id=campaign_id, created_by=request.user)
+    return JsonResponse({'success': True, 'campaign': resumo_campanha(campanha)})
+
+
 # ============================================================================
 # ESTATÍSTICAS E RELATÓRIOS
 # ============================================================================
@@ -967,17 +1029,14 @@ def whatsapp_analytics(request):
         group__shopper=shopper,
         timestamp__gte=start_date
     ).count()
-    total_orders = WhatsappOrder.objects.filter(
-        group__shopper=shopper,
-        created_at__gte=start_date
-    ).count()
-    
-    # Receita
-    revenue = WhatsappOrder.objects.filter(
-        group__shopper=shopper,
-        status__in=['paid', 'purchased', 'shipped', 'delivered'],
-        created_at__gte=start_date
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
+    # Pedidos e receita (rollup de vendas)
+    vendas = totais(carregar_rollup(
+        desde=timezone.localdate(start_date),
+        por=['status'],
+        group__shopper=shopper
+    ))
+    total_orders = vendas['orders']
+    revenue = vendas['revenue']
     
     # Produtos mais vendidos (legacy desativado)
     popular_products = []
@@ -20,6 +20,7 @@ RETORNO AO GRUPO → Prova social → Reaquecimento do ciclo
 
 import logging
 import requests
+from decimal import Decimal
 from typing import Dict, Optional, List
 from django.utils import timezone
 from django.db import transaction
@@ -31,6 +32,9 @@ from .models import (
     Pacote, Cliente
 )
 from app_whatsapp_integration.evolution_service import EvolutionAPIService
+from .outbox import registrar_efeitos_pedido
+from .keeper_geo import keepers_proximos
+from .text_classifier import INTENCAO_SOCIAL, analisar_texto
 
 logger = logging.getLogger(__name__)
 
@@ -128,23 +132,11 @@ class WhatsAppFlowEngine:
     
     def _classificar_intencao(self, mensagem: str) -> str:
         """Classifica tipo de intenção social"""
-        mensagem_lower = mensagem.lower()
-        
-        # Emojis
-        emojis_interesse = ['❤️', '👍', '🔥', '💯', '😍', '👏', '✅']
-        if any(emoji in mensagem for emoji in emojis_interesse):
-            return IntencaoSocial.TipoIntencao.EMOJI
-        
-        # Perguntas
-        if any(palavra in mensagem_lower for palavra in ['quanto', 'preço', 'custa', 'tem', 'disponível']):
-            return IntencaoSocial.TipoIntencao.PERGUNTA
-        
-        # Manifestação de interesse
-        if any(palavra in mensagem_lower for palavra in ['quero', 'eu quero', 'vou querer', 'me interessa']):
-            return IntencaoSocial.TipoIntencao.TEXTO
+        # Emoji > pergunta > manifestação de interesse (vocabulário em text_classifier)
+        tipo = analisar_texto(mensagem).mais_prioritario(INTENCAO_SOCIAL)
         
         # Comentário
-        return IntencaoSocial.TipoIntencao.COMENTARIO
+        return tipo or IntencaoSocial.TipoIntencao.COMENTARIO
     
     def _criar_intencao_social(
         self,
@@ -599,37 +591,38 @@ class WhatsAppFlowEngine:
     
     def listar_opcoes_entrega(
         self,
-        conversa_contextualizada: ConversaContextualizada
+        conversa_contextualizada: ConversaContextualizada,
+        cep: Optional[str] = None
     ) -> Dict:
         """
         Lista opções de entrega disponíveis para o cliente.
         
-        Busca Address Keepers disponíveis e métodos de entrega.
+        Busca os Address Keepers mais próximos do cliente (índice espacial em
+        memória, ver keeper_geo.py) e métodos de entrega.
         """
         try:
-            grupo = conversa_contextualizada.oferta.grupo
-            
-            # Buscar Address Keepers disponíveis no grupo ou região
-            address_keepers = AddressKeeper.objects.filter(
-                ativo=True,
-                verificado=True
-            )[:5]  # Limitar a 5 opções
+            # Keepers mais próximos do endereço do cliente (ou do CEP informado)
+            address_keepers = keepers_proximos(
+                cliente_id=conversa_contextualizada.participante.cliente_id,
+                cep=cep,
+                k=5  # Limitar a 5 opções
+            )
             
             opcoes = []
             
             # Opção 1: Address Keeper (ponto de guarda)
-            if address_keepers.exists():
-                for keeper in address_keepers:
-                    opcoes.append({
-                        'tipo': 'keeper',
-                        'id': keeper.id,
-                        'nome': keeper.apelido_local or f"{keeper.cidade}, {keeper.estado}",
-                        'endereco': f"{keeper.rua}, {keeper.numero} - {keeper.bairro}",
-                        'cidade': keeper.cidade,
-                        'aceita_retirada': keeper.aceita_retirada,
-                        'aceita_envio': keeper.aceita_envio,
-                        'taxa_guarda_dia': float(keeper.taxa_guarda_dia) if keeper.taxa_guarda_dia else 0
-                    })
+            for keeper in address_keepers:
+                opcoes.append({
+                    'tipo': 'keeper',
+                    'id': keeper['id'],
+                    'nome': keeper['nome'],
+                    'endereco': keeper['endereco'],
+                    'cidade': keeper['cidade'],
+                    'aceita_retirada': keeper['aceita_retirada'],
+                    'aceita_envio': keeper['aceita_envio'],
+                    'taxa_guarda_dia': keeper['taxa_guarda_dia'],
+                    'distancia_km': keeper['distancia_km']
+                })
             
             # Opção 2: Correios (sempre disponível)
             opcoes.append({
@@ -640,7 +633,7 @@ class WhatsAppFlowEngine:
             })
             
             # Opção 3: Retirada (se houver keeper disponível)
-            if address_keepers.exists():
+            if address_keepers:
                 opcoes.append({
                     'tipo': 'retirada',
                     'nome': 'Retirada no ponto de guarda',
@@ -834,22 +827,9 @@ class WhatsAppFlowEngine:
                     f"Total: {carrinho.moeda} {carrinho.total}. Itens: {len(produtos_pedido)}"
                 )
                 
-                # Processar pagamento (inicializar)
-                resultado_pagamento = self._processar_pagamento_pedido(pedido, carrinho)
-                
-                # Enviar link de pagamento ao cliente no privado (se disponível)
-                resultado_pagamento['pedido_numero'] = pedido.order_number
-                if resultado_pagamento.get('checkout_url') or resultado_pagamento.get('qr_code'):
-                    self._enviar_link_pagamento_privado(
-                        conversa_contextualizada,
-                        resultado_pagamento
-                    )
-                
-                # Conectar com KMN (criar pacote para entrega)
-                resultado_kmn = self._conectar_kmn_entrega(pedido, participante, produtos_pedido)
-                
-                # Enviar notificação de prova social no grupo
-                self._enviar_notificacao_prova_social(pedido, grupo, participante, produtos_pedido)
+                # Pagamento, link no privado, pacote KMN e prova social vão para a
+                # outbox: executados após o commit, com retentativas (ver outbox.py)
+                registrar_efeitos_pedido(pedido, conversa_contextualizada, produtos_pedido)
                 
                 return {
                     'sucesso': True,
@@ -861,7 +841,10 @@ class WhatsAppFlowEngine:
                         'moeda': carrinho.moeda
                     },
                     'produtos': produtos_pedido,
-                    'pagamento': resultado_pagamento
+                    'pagamento': {
+                        'status': 'processando',
+                        'mensagem': 'Pagamento sendo inicializado. O link será enviado no privado.'
+                    }
                 }
                 
         except Exception as e:
@@ -877,7 +860,7 @@ class WhatsAppFlowEngine:
         grupo: WhatsappGroup,
         participante: WhatsappParticipant,
         produtos: List[Dict]
-    ):
+    ) -> Dict:
         """
         Envia notificação de prova social no grupo após fechamento do pedido.
         
@@ -914,22 +897,22 @@ class WhatsAppFlowEngine:
             grupo_chat_id = grupo.chat_id
             
             # Enviar via Evolution API
-            self.evolution_service.send_text_message(
-                number=grupo_chat_id,
-                text=mensagem
-            )
-            
-            logger.info(
-                f"[PROVA_SOCIAL] Notificação enviada no grupo {grupo.name} "
-                f"para pedido {pedido.order_number}"
-            )
+            resultado = self.evolution_service.send_text_message(grupo_chat_id, mensagem)
             
+            if resultado.get('success'):
+                logger.info(
+                    f"[PROVA_SOCIAL] Notificação enviada no grupo {grupo.name} "
+                    f"para pedido {pedido.order_number}"
+                )
+            return resultado
+        
         except Exception as e:
-            # Não falhar o fechamento se a notificação falhar
+            # Executado pela outbox: o erro volta como resultado para retentativa
             logger.error(
                 f"[PROVA_SOCIAL] Erro ao enviar notificação de prova social: {str(e)}",
                 exc_info=True
             )
+            return {'success': False, 'error': str(e)}
     
     def _processar_pagamento_pedido(
         self,
@@ -1065,9 +1048,17 @@ class WhatsAppFlowEngine:
                 except PersonalShopper.DoesNotExist:
                     pass
             
-            # Criar pacote no sistema KMN
-            import uuid
-            codigo_publico = f"PKG-{uuid.uuid4().hex[:8].upper()}"
+            # Código determinístico por pedido: a outbox pode reexecutar este passo
+            # sem duplicar o pacote ("W" não ocorre nos códigos hex aleatórios)
+            codigo_publico = f"PKG-W{pedido.id:07d}"
+            pacote_existente = Pacote.objects.filter(codigo_publico=codigo_publico).first()
+            if pacote_existente:
+                return {
+                    'sucesso': True,
+                    'pacote_id': pacote_existente.id,
+                    'pacote_codigo': pacote_existente.codigo_publico,
+                    'status': pacote_existente.get_status_display()
+                }
             
             # Calcular valor total dos produtos
             valor_total = sum(
@@ -1121,7 +1112,7 @@ class WhatsAppFlowEngine:
         self,
         conversa_contextualizada: ConversaContextualizada,
         resultado_pagamento: Dict
-    ):
+    ) -> Dict:
         """
         Envia link de pagamento ou QR Code PIX ao cliente no privado.
         
@@ -1157,21 +1148,21 @@ class WhatsAppFlowEngine:
             mensagem += "Após o pagamento, você receberá a confirmação aqui mesmo! ✅"
             
             # Enviar via Evolution API
-            self.evolution_service.send_text_message(
-                number=participante.phone,
-                text=mensagem
-            )
-            
-            logger.info(
-                f"[PAGAMENTO] Link de pagamento enviado para {participante.name}"
-            )
+            resultado = self.evolution_service.send_text_message(participante.phone, mensagem)
             
+            if resultado.get('success'):
+                logger.info(
+                    f"[PAGAMENTO] Link de pagamento enviado para {participante.name}"
+                )
+            return resultado
+        
         except Exception as e:
-            # Não falhar o fechamento se o envio falhar
+            # Executado pela outbox: o erro volta como resultado para retentativa
             logger.error(
                 f"[PAGAMENTO] Erro ao enviar link de pagamento: {str(e)}",
                 exc_info=True
             )
+            return {'success': False, 'error': str(e)}
     
     def processar_confirmacao_pagamento(
         self,
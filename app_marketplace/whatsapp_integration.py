@@ -7,6 +7,8 @@ from typing import Optional, List, Dict, Tuple
 from dataclasses import dataclass
 from decimal import Decimal
 
+from .text_classifier import BRAND_MAP, MARCA, PROMOCAO, analisar_texto  # noqa: F401 (BRAND_MAP: compatibilidade)
+
 
 # ============================================================================
 # PARSERS DE COMANDOS E DETECÇÃO
@@ -39,28 +41,10 @@ NF_RE = re.compile(r'\bNF\b|\bnota\s*fiscal\b', re.I)
 URL_RE = re.compile(r'(https?://\S+)', re.I)
 
 
-# Mapa de marcas (expandir conforme necessário)
-BRAND_MAP = {
-    "victoria's secret": ["victoria's secret", "victorias secret", "vs", "victoria"],
-    "adidas": ["adidas"],
-    "nike": ["nike", "niké"],
-    "puma": ["puma"],
-    "bath & body works": ["bath & body works", "bbw", "bbworks", "bathandbody"],
-    "gap": ["gap"],
-    "carter's": ["carters", "carter's", "carter"],
-    "hollister": ["hollister"],
-    "old navy": ["old navy", "oldnavy"],
-}
-
-
 def detect_brand(text: str) -> Optional[str]:
     """Detecta marca no texto"""
-    low = text.lower()
-    for name, aliases in BRAND_MAP.items():
-        for alias in aliases:
-            if alias in low:
-                return name.title()
-    return None
+    brand = analisar_texto(text).primeiro(MARCA)
+    return brand.title() if brand else None
 
 
 def normalize_price(text: str) -> Tuple[Optional[Decimal], Optional[str]]:
@@ -108,30 +92,16 @@ def parse_listing(text: str) -> ParsedListing:
         "Nike Air Max 42 por R$ 299,90"
         "Hollister BOGO 50% off - último dia!"
     """
-    brand = detect_brand(text)
+    # Marca e labels promocionais em uma passada (text_classifier)
+    analise = analisar_texto(text)
+    brand = analise.primeiro(MARCA)
+    brand = brand.title() if brand else None
     price, currency = normalize_price(text)
     discount = extract_discount(text)
     urls = extract_urls(text)
     has_nf = has_invoice_mention(text)
     
-    # Detecta labels promocionais
-    labels = []
-    promo_keywords = {
-        "bogo": "bogo",
-        "last day": "ultimo_dia",
-        "último dia": "ultimo_dia",
-        "clearance": "clearance",
-        "cupom": "cupom",
-        "desconto": "desconto",
-        "off": "desconto",
-        "promoção": "promocao",
-        "promo": "promocao",
-    }
-    
-    text_lower = text.lower()
-    for keyword, label in promo_keywords.items():
-        if keyword in text_lower and label not in labels:
-            labels.append(label)
+    labels = analise.rotulos(PROMOCAO)
     
     if has_nf:
         labels.append("nota_fiscal")
@@ -6,7 +6,7 @@ Este módulo define os endpoints que recebem webhooks do provedor
 e fazem a comunicação com o backend Django.
 """
 
-from fastapi import APIRouter, Request, HTTPException, Body
+from fastapi import APIRouter, BackgroundTasks, Request, HTTPException, Body
 from fastapi.responses import JSONResponse
 import httpx
 import logging
@@ -30,14 +30,62 @@ class WhatsAppWebhookPayload(BaseModel):
     data: Dict[str, Any] = {}
 
 
+async def forward_to_django(
+    django_client: httpx.AsyncClient,
+    provider_client,
+    django_payload: Dict[str, Any]
+):
+    """
+    Repassa a mensagem para o Django e envia a resposta via provedor
+    
+    Executado como tarefa em background, depois que o provedor já recebeu o 200.
+    """
+    from_number = django_payload["from"]
+    try:
+        response = await django_client.post(
+            "/api/whatsapp/webhook-from-gateway/",
+            json=django_payload
+        )
+        response.raise_for_status()
+        django_response = response.json()
+    except httpx.HTTPError as e:
+        logger.error(f"Erro ao comunicar com Django: {str(e)}")
+        return
+    except Exception as e:
+        logger.error(f"Erro ao processar resposta do Django: {str(e)}", exc_info=True)
+        return
+    
+    # Verificar se o Django retornou uma resposta para enviar
+    reply_message = django_response.get("reply")
+    if not reply_message:
+        return
+    
+    logger.info(f"Enviando resposta para {from_number}: {reply_message[:50]}...")
+    
+    # Enviar resposta via provedor
+    send_result = await provider_client.send_text(
+        phone=from_number,
+        message=reply_message
+    )
+    
+    if send_result.get("success"):
+        logger.info(f"Resposta enviada com sucesso para {from_number}")
+    else:
+        logger.error(f"Erro ao enviar resposta: {send_result.get('error')}")
+
+
 @router.post("/whatsapp")
-async def whatsapp_webhook(request: Request, payload: Dict[str, Any] = Body(...)):
+async def whatsapp_webhook(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    payload: Dict[str, Any] = Body(...)
+):
     """
     Endpoint que recebe webhooks do provedor de WhatsApp
     
     Fluxo:
-    1. Recebe mensagem do provedor
-    2. Envia para o backend Django
+    1. Recebe mensagem do provedor e responde 200 imediatamente
+    2. Em background: envia para o backend Django
     3. Recebe resposta do Django
     4. Envia resposta via provedor
     """
@@ -66,51 +114,17 @@ async def whatsapp_webhook(request: Request, payload: Dict[str, Any] = Body(...)
             "raw_payload": payload  # Enviar payload completo para análise
         }
         
-        # Enviar para o backend Django
-        provider_client = request.app.state.provider_client
-        django_backend_url = request.app.state.django_backend_url
+        background_tasks.add_task(
+            forward_to_django,
+            request.app.state.django_client,
+            request.app.state.provider_client,
+            django_payload
+        )
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.post(
-                    f"{django_backend_url}/api/whatsapp/webhook-from-gateway/",
-                    json=django_payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                response.raise_for_status()
-                django_response = response.json()
-                
-                # Verificar se o Django retornou uma resposta para enviar
-                reply_message = django_response.get("reply")
-                
-                if reply_message:
-                    logger.info(f"Enviando resposta para {from_number}: {reply_message[:50]}...")
-                    
-                    # Enviar resposta via provedor
-                    send_result = await provider_client.send_text(
-                        phone=from_number,
-                        message=reply_message
-                    )
-                    
-                    if send_result.get("success"):
-                        logger.info(f"Resposta enviada com sucesso para {from_number}")
-                    else:
-                        logger.error(f"Erro ao enviar resposta: {send_result.get('error')}")
-                
-                return JSONResponse(
-                    status_code=200,
-                    content={
-                        "status": "processed",
-                        "reply_sent": bool(reply_message)
-                    }
-                )
-                
-            except httpx.HTTPError as e:
-                logger.error(f"Erro ao comunicar com Django: {str(e)}")
-                return JSONResponse(
-                    status_code=200,  # Retornar 200 para o provedor não reenviar
-                    content={"status": "error", "error": "django_communication_failed"}
-                )
+        return JSONResponse(
+            status_code=200,
+            content={"status": "accepted"}
+        )
         
     except Exception as e:
         logger.error(f"Erro ao processar webhook: {str(e)}", exc_info=True)
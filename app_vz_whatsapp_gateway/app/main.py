@@ -6,14 +6,18 @@ Este microserviço atua como intermediário entre o provedor de WhatsApp
 (Z-API, Evolution API, UltraMsg, etc.) e o backend Django (Évora/VitrineZap).
 
 Fluxo:
-1. Recebe webhook do provedor de WhatsApp
-2. Repassa para o backend Django
+1. Recebe webhook do provedor de WhatsApp (responde 200 imediatamente)
+2. Repassa para o backend Django (tarefa em background)
 3. Recebe resposta do Django
 4. Envia resposta via provedor de WhatsApp
 
+Os clientes HTTP (Django e provedor) são criados uma única vez no lifespan
+do app e reutilizam conexões keep-alive.
+
 Autor: Évora Connect
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -33,7 +37,11 @@ class Settings(BaseSettings):
     """Configurações do gateway"""
     PROVIDER_BASE_URL: str = os.getenv("PROVIDER_BASE_URL", "")
     PROVIDER_API_KEY: str = os.getenv("PROVIDER_API_KEY", "")
+    PROVIDER_DIALECT: str = os.getenv("PROVIDER_DIALECT", "")  # zapi | evolution | ultramsg (vazio = detectar)
+    PROVIDER_MAX_CONNECTIONS: int = int(os.getenv("PROVIDER_MAX_CONNECTIONS", "20"))
     DJANGO_BACKEND_URL: str = os.getenv("DJANGO_BACKEND_URL", "http://localhost:8000")
+    DJANGO_TIMEOUT: float = float(os.getenv("DJANGO_TIMEOUT", "30"))
+    DJANGO_MAX_CONNECTIONS: int = int(os.getenv("DJANGO_MAX_CONNECTIONS", "20"))
     PORT: int = int(os.getenv("PORT", "8001"))
     
     class Config:
@@ -42,11 +50,44 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
+# Inicializar cliente do provedor
+provider_client = WhatsAppProviderClient(
+    base_url=settings.PROVIDER_BASE_URL,
+    api_key=settings.PROVIDER_API_KEY,
+    dialect=settings.PROVIDER_DIALECT,
+    max_connections=settings.PROVIDER_MAX_CONNECTIONS
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Abre os pools de conexão no startup e fecha no shutdown"""
+    django_client = httpx.AsyncClient(
+        base_url=settings.DJANGO_BACKEND_URL,
+        timeout=settings.DJANGO_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=settings.DJANGO_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.DJANGO_MAX_CONNECTIONS,
+        ),
+        headers={"Content-Type": "application/json"},
+    )
+    await provider_client.start()
+    await provider_client.probe_dialect()
+    
+    app.state.django_client = django_client
+    try:
+        yield
+    finally:
+        await django_client.aclose()
+        await provider_client.aclose()
+
+
 # Inicializar FastAPI
 app = FastAPI(
     title="Évora WhatsApp Gateway",
     description="Gateway de integração WhatsApp para Évora/VitrineZap",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS - Permitir requisições do frontend e do provedor
@@ -58,12 +99,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Inicializar cliente do provedor
-provider_client = WhatsAppProviderClient(
-    base_url=settings.PROVIDER_BASE_URL,
-    api_key=settings.PROVIDER_API_KEY
-)
-
 # Incluir rotas
 app.include_router(router, prefix="/webhook")
 
@@ -88,6 +123,7 @@ async def health():
     return {
         "status": "healthy",
         "provider_configured": bool(settings.PROVIDER_BASE_URL and settings.PROVIDER_API_KEY),
+        "provider_dialect": provider_client.dialect,
         "django_backend": settings.DJANGO_BACKEND_URL
     }
 
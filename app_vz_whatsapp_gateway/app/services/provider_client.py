@@ -5,37 +5,210 @@ WhatsApp Provider Client
 Cliente para comunicação com provedores de WhatsApp (Z-API, Evolution API, UltraMsg, etc.)
 
 Este módulo abstrai a comunicação com diferentes provedores via HTTP/REST.
+O cliente mantém um único ``httpx.AsyncClient`` (pool de conexões keep-alive)
+durante toda a vida do app e fixa o "dialeto" do provedor (endpoint, payload
+e header de autenticação) - via configuração ou no primeiro envio
+bem-sucedido. O probe na inicialização só ordena as tentativas. Se o dialeto
+fixado for recusado (4xx, exceto 429), as demais combinações são testadas de
+novo.
 """
 
+import asyncio
 import httpx
 import logging
-from typing import Dict, Optional
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 
+class ProviderDialect(NamedTuple):
+    """Formato de API de um provedor de WhatsApp"""
+    path: str
+    build_payload: Callable[[str, str], Dict]
+    build_headers: Callable[[str], Dict]
+
+
+ENDPOINTS: Dict[str, str] = {
+    "zapi": "/send-text",
+    "evolution": "/messages/send",
+    "ultramsg": "/send-message",
+}
+
+PAYLOADS: Dict[str, Callable[[str, str], Dict]] = {
+    "zapi": lambda phone, message: {"phone": phone, "message": message},
+    "evolution": lambda phone, message: {"number": phone, "text": message},
+    "ultramsg": lambda phone, message: {"to": phone, "body": message},
+}
+
+AUTH_HEADERS: Dict[str, Callable[[str], Dict]] = {
+    "zapi": lambda api_key: {"apikey": api_key},
+    "evolution": lambda api_key: {"Authorization": f"Bearer {api_key}"},
+    "ultramsg": lambda api_key: {"api-key": api_key},
+}
+
+
+def _build_dialects() -> Dict[str, ProviderDialect]:
+    """
+    Combinações endpoint x payload x header testadas na detecção
+    
+    O formato nativo de cada provedor vem primeiro, com o nome usado em
+    ``PROVIDER_DIALECT``. As demais combinações (``endpoint+payload+header``)
+    vêm depois.
+    """
+    dialects = {
+        name: ProviderDialect(ENDPOINTS[name], PAYLOADS[name], AUTH_HEADERS[name])
+        for name in ENDPOINTS
+    }
+    for endpoint, path in ENDPOINTS.items():
+        for payload, build_payload in PAYLOADS.items():
+            for header, build_headers in AUTH_HEADERS.items():
+                if endpoint == payload == header:
+                    continue
+                dialects[f"{endpoint}+{payload}+{header}"] = ProviderDialect(path, build_payload, build_headers)
+    return dialects
+
+
+DIALECTS: Dict[str, ProviderDialect] = _build_dialects()
+
+
 class WhatsAppProviderClient:
     """
     Cliente para comunicação com provedores de WhatsApp
     
     Suporta múltiplos provedores através de configuração de URL base.
+    Use ``start()``/``aclose()`` no lifespan do app para abrir e fechar o
+    pool de conexões.
     """
     
-    def __init__(self, base_url: str, api_key: str):
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        dialect: Optional[str] = None,
+        timeout: float = 30.0,
+        max_connections: int = 20,
+    ):
         """
         Inicializar cliente do provedor
         
         Args:
             base_url: URL base da API do provedor (ex: https://api.z-api.io)
             api_key: Chave de API do provedor
+            dialect: Dialeto fixo do provedor ("zapi", "evolution", "ultramsg").
+                Se vazio, é descoberto via probe/primeiro envio.
+            timeout: Timeout das requisições (segundos)
+            max_connections: Tamanho máximo do pool de conexões
         """
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
-        self.timeout = 30.0
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.dialect = dialect or None
+        self._probe_hint: Optional[Tuple[str, str]] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._dialect_lock = asyncio.Lock()
+        
+        if self.dialect and self.dialect not in DIALECTS:
+            logger.warning(f"Dialeto de provedor desconhecido: {self.dialect} - usando detecção automática")
+            self.dialect = None
         
         if not self.base_url or not self.api_key:
             logger.warning("Provider não configurado completamente")
     
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.base_url and self.api_key)
+    
+    async def start(self):
+        """Abrir o pool de conexões (chamado no startup do app)"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                headers={"Content-Type": "application/json"},
+            )
+    
+    async def aclose(self):
+        """Fechar o pool de conexões (chamado no shutdown do app)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            await self.start()
+        return self._client
+    
+    async def probe_dialect(self) -> Optional[str]:
+        """
+        Sondar o provedor sem enviar mensagens
+        
+        Faz um POST vazio em cada par endpoint/header conhecido. O primeiro que
+        existir (não 404/405) e aceitar a autenticação (não 401/403) é testado
+        primeiro no envio. Nada é fixado aqui: um corpo vazio não confirma o
+        formato do payload, e um 400/422/5xx pode vir só do corpo vazio. O
+        dialeto é fixado no primeiro envio com 2xx.
+        
+        Returns:
+            Nome do dialeto fixado (None até o primeiro envio bem-sucedido)
+        """
+        if self.dialect or not self.is_configured:
+            return self.dialect
+        
+        client = await self._get_client()
+        sondados = set()
+        for dialect in DIALECTS.values():
+            build_headers = dialect.build_headers
+            par = (dialect.path, build_headers)
+            if par in sondados:
+                continue
+            sondados.add(par)
+            try:
+                response = await client.post(
+                    dialect.path,
+                    json={},
+                    headers=build_headers(self.api_key)
+                )
+            except httpx.HTTPError as e:
+                logger.debug(f"Probe de {dialect.path} falhou: {str(e)}")
+                continue
+            if response.status_code not in (401, 403, 404, 405):
+                self._probe_hint = par
+                logger.info(f"Provedor responde em {dialect.path} - dialeto será confirmado no primeiro envio")
+                break
+        else:
+            logger.warning("Não foi possível sondar o provedor - dialeto será descoberto no primeiro envio")
+        
+        return self.dialect
+    
+    def _candidates(self, skip: Optional[str] = None) -> List[str]:
+        """Dialetos a testar, com os compatíveis com o probe primeiro"""
+        names = [name for name in DIALECTS if name != skip]
+        if self._probe_hint:
+            path, build_headers = self._probe_hint
+            names.sort(key=lambda name: (DIALECTS[name].path, DIALECTS[name].build_headers) != (path, build_headers))
+        return names
+    
+    async def _post(self, dialect: ProviderDialect, phone: str, message: str) -> httpx.Response:
+        client = await self._get_client()
+        return await client.post(
+            dialect.path,
+            json=dialect.build_payload(phone, message),
+            headers=dialect.build_headers(self.api_key)
+        )
+    
+    @staticmethod
+    def _response_body(response: httpx.Response):
+        """Corpo da resposta do provedor (JSON, ou texto se não for JSON)"""
+        try:
+            return response.json()
+        except ValueError:
+            return response.text
+    
     async def send_text(self, phone: str, message: str) -> Dict:
         """
         Enviar mensagem de texto via WhatsApp
@@ -43,11 +216,11 @@ class WhatsAppProviderClient:
         Args:
             phone: Número do telefone (formato: 5511999999999)
             message: Texto da mensagem
-            
+        
         Returns:
             Dict com 'success' (bool) e 'error' (str) se houver
         """
-        if not self.base_url or not self.api_key:
+        if not self.is_configured:
             return {
                 "success": False,
                 "error": "Provider não configurado"
@@ -58,63 +231,59 @@ class WhatsAppProviderClient:
         if not phone.startswith("+"):
             phone = f"+{phone}"
         
-        # Tentar diferentes formatos de API (compatibilidade com múltiplos provedores)
-        endpoints_to_try = [
-            f"{self.base_url}/send-text",  # Z-API
-            f"{self.base_url}/messages/send",  # Evolution API
-            f"{self.base_url}/send-message",  # UltraMsg
-        ]
-        
-        payloads_to_try = [
-            # Formato Z-API
-            {
-                "phone": phone,
-                "message": message
-            },
-            # Formato Evolution API
-            {
-                "number": phone,
-                "text": message
-            },
-            # Formato UltraMsg
-            {
-                "to": phone,
-                "body": message
+        # Dialeto já conhecido: uma única requisição
+        if self.dialect:
+            pinned = self.dialect
+            try:
+                response = await self._post(DIALECTS[pinned], phone, message)
+                if response.status_code in [200, 201]:
+                    return {
+                        "success": True,
+                        "provider_response": self._response_body(response)
+                    }
+                error = f"Provedor retornou {response.status_code}"
+                if 400 <= response.status_code < 500 and response.status_code != 429:
+                    # Dialeto recusado: testar as demais combinações
+                    logger.warning(f"Dialeto {pinned} recusado ({response.status_code}) - redescobrindo o dialeto do provedor")
+                    return await self._learn_dialect(phone, message, skip=pinned)
+            except httpx.HTTPError as e:
+                error = str(e)
+            logger.error(f"Falha ao enviar mensagem para {phone}: {error}")
+            return {
+                "success": False,
+                "error": error
             }
-        ]
         
-        headers = {
-            "Content-Type": "application/json",
-            "apikey": self.api_key,  # Z-API
-            "Authorization": f"Bearer {self.api_key}",  # Evolution API
-            "api-key": self.api_key,  # UltraMsg
-        }
+        return await self._learn_dialect(phone, message)
+    
+    async def _learn_dialect(self, phone: str, message: str, skip: Optional[str] = None) -> Dict:
+        """
+        Testar cada dialeto uma vez e fixar o primeiro que enviar com 2xx
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            # Tentar cada combinação de endpoint/payload
-            for endpoint in endpoints_to_try:
-                for payload in payloads_to_try:
-                    try:
-                        # Tentar com diferentes headers
-                        for header_key, header_value in headers.items():
-                            try:
-                                response = await client.post(
-                                    endpoint,
-                                    json=payload,
-                                    headers={header_key: header_value}
-                                )
-                                
-                                if response.status_code in [200, 201]:
-                                    logger.info(f"Mensagem enviada via {endpoint}")
-                                    return {
-                                        "success": True,
-                                        "provider_response": response.json()
-                                    }
-                            except Exception as e:
-                                continue
-                    except Exception as e:
-                        logger.debug(f"Tentativa falhou para {endpoint}: {str(e)}")
-                        continue
+        ``skip``: dialeto fixado que acabou de ser recusado. Se nenhum outro
+        funcionar, ele continua fixado: a recusa pode ter sido da mensagem
+        (ex.: número inválido) e não do formato.
+        """
+        async with self._dialect_lock:
+            if self.dialect != skip:
+                # Outro envio concorrente já (re)descobriu o dialeto
+                return await self.send_text(phone, message)
+            
+            for name in self._candidates(skip):
+                dialect = DIALECTS[name]
+                try:
+                    response = await self._post(dialect, phone, message)
+                except httpx.HTTPError as e:
+                    logger.debug(f"Tentativa falhou para {dialect.path} ({name}): {str(e)}")
+                    continue
+                
+                if response.status_code in [200, 201]:
+                    self.dialect = name
+                    logger.info(f"Mensagem enviada via {dialect.path} - dialeto fixado: {name}")
+                    return {
+                        "success": True,
+                        "provider_response": self._response_body(response)
+                    }
         
         # Se nenhuma tentativa funcionou
         logger.error(f"Falha ao enviar mensagem para {phone}")
@@ -131,7 +300,7 @@ class WhatsAppProviderClient:
             phone: Número do telefone
             image_url: URL da imagem
             caption: Legenda da imagem
-            
+        
         Returns:
             Dict com resultado
         """
@@ -149,7 +318,7 @@ class WhatsAppProviderClient:
             phone: Número do telefone
             document_url: URL do documento
             filename: Nome do arquivo
-            
+        
         Returns:
             Dict com resultado
         """
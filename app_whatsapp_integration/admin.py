@@ -10,7 +10,10 @@ from .models import (
     WhatsAppContact, 
     WhatsAppMessageLog,
     EvolutionInstance,
-    EvolutionMessage
+    EvolutionMessage,
+    WebhookEvent,
+    BroadcastCampaign,
+    BroadcastRecipient
 )
 
 
@@ -128,3 +131,45 @@ class EvolutionMessageAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         # Mensagens são criadas apenas via webhook ou envio
         return False
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['event', 'instance_name', 'evolution_message_id', 'status', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['status', 'event', 'instance_name', 'received_at']
+    search_fields = ['evolution_message_id', 'instance_name']
+    readonly_fields = ['received_at', 'locked_at', 'processed_at', 'payload', 'error_message']
+    
+    actions = ['reprocess_events']
+    
+    def reprocess_events(self, request, queryset):
+        """Devolve os eventos selecionados para a fila"""
+        updated = queryset.update(
+            status=WebhookEvent.EventStatus.PENDING,
+            attempts=0,
+            locked_at=None
+        )
+        self.message_user(request, f"✅ {updated} evento(s) devolvido(s) para a fila")
+    
+    reprocess_events.short_description = "Reprocessar eventos selecionados"
+    
+    def has_add_permission(self, request):
+        # Eventos são criados apenas via webhook
+        return False
+
+
+class BroadcastRecipientInline(admin.TabularInline):
+    model = BroadcastRecipient
+    extra = 0
+    fields = ['phone', 'status', 'evolution_message_id', 'error_message', 'sent_at']
+    readonly_fields = fields
+    can_delete = False
+
+
+@admin.register(BroadcastCampaign)
+class BroadcastCampaignAdmin(admin.ModelAdmin):
+    list_display = ['id', 'group', 'produto', 'instance_name', 'status', 'sent_count', 'failed_count', 'total_recipients', 'created_at']
+    list_filter = ['status', 'instance_name', 'created_at']
+    search_fields = ['group__name', 'produto__nome_produto', 'oferta__oferta_id']
+    readonly_fields = ['total_recipients', 'sent_count', 'failed_count', 'created_at', 'started_at', 'finished_at']
+    inlines = [BroadcastRecipientInline]
@@ -0,0 +1,376 @@
+"""
+Broadcast - WhatsApp Integration
+================================
+
+Envio em massa de ofertas/produtos para grupos ou listas de participantes.
+
+Os envios são distribuídos em um pool de threads limitado, com rate limit
+por instância Evolution (token bucket) para respeitar o throttling do
+WhatsApp. Cada destinatário é marcado como enviado (com o ID da mensagem)
+assim que o envio retorna, de modo que uma campanha interrompida pode ser
+retomada com ``executar_campanha`` sem reenviar para quem já recebeu; as
+``WhatsappMessage`` resultantes (bulk_create) e os contadores da campanha são
+gravados em lotes.
+
+O worker renova ``locked_at`` enquanto envia; campanhas em envio sem sinal há
+mais de ``LOCK_TIMEOUT`` (worker morto) voltam a ser elegíveis em
+``processar_campanhas_pendentes``.
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Union
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from app_marketplace.models import (
+    OfertaProduto, ProdutoJSON, WhatsappGroup, WhatsappMessage, WhatsappParticipant
+)
+from .evolution_service import EvolutionAPIService
+from .models import BroadcastCampaign, BroadcastRecipient
+
+logger = logging.getLogger(__name__)
+
+# Campanhas em envio sem sinal do worker há mais tempo que isso são
+# consideradas abandonadas (worker morto) e podem ser retomadas
+LOCK_TIMEOUT = timedelta(seconds=getattr(settings, 'EVOLUTION_BROADCAST_LOCK_TIMEOUT', 300))
+
+
+class RateLimiter:
+    """
+    Token bucket por instância Evolution (compartilhado no processo)
+
+    ``rate`` mensagens por segundo, com rajadas de até ``burst`` mensagens.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str):
+        """Bloqueia até haver um token disponível para ``key``"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(key, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                if tokens >= 1:
+                    self._buckets[key] = (tokens - 1, now)
+                    return
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+rate_limiter = RateLimiter(
+    rate=getattr(settings, 'EVOLUTION_BROADCAST_RATE', 1.0),
+    burst=getattr(settings, 'EVOLUTION_BROADCAST_BURST', 5),
+)
+
+
+def _imagem_produto(produto: Optional[ProdutoJSON]) -> str:
+    """URL absoluta da primeira imagem do produto (a Evolution API baixa a mídia)"""
+    if not produto:
+        return ''
+    from app_marketplace.utils import build_image_url
+
+    imagens = (produto.get_produto_data().get('produto') or {}).get('imagens') or []
+    image_path = imagens[0] if imagens else produto.imagem_original
+    image_url = build_image_url(image_path, use_proxy=False) if image_path else None
+    if image_url and image_url.startswith('/'):
+        image_url = f"{getattr(settings, 'RAILWAY_URL', 'http://localhost:8000')}{image_url}"
+    return image_url or ''
+
+
+def criar_campanha(
+    destino: Union[WhatsappGroup, Iterable[WhatsappParticipant]],
+    produto: Optional[ProdutoJSON] = None,
+    oferta: Optional[OfertaProduto] = None,
+    created_by=None,
+    instance_name: Optional[str] = None,
+) -> BroadcastCampaign:
+    """
+    Cria uma campanha e seus destinatários
+
+    Args:
+        destino: Grupo (todos os participantes) ou lista de participantes
+        produto: Produto divulgado (usado para montar a mensagem)
+        oferta: Oferta divulgada (mensagem/imagem da postagem têm prioridade)
+        created_by: Usuário que criou a campanha
+        instance_name: Instância Evolution (padrão: EVOLUTION_INSTANCE_NAME)
+
+    Returns:
+        Campanha pendente, pronta para ``executar_campanha``
+    """
+    if oferta and not produto:
+        produto = oferta.produto
+    if not produto:
+        raise ValueError("Informe um produto ou uma oferta para a campanha")
+
+    if isinstance(destino, WhatsappGroup):
+        group = destino
+        participantes = list(destino.participants.all())
+    else:
+        participantes = list(destino)
+        group = participantes[0].group if participantes else None
+
+    message = ''
+    image_url = ''
+    if oferta:
+        message = oferta.mensagem_postada
+        image_url = oferta.imagem_url
+    if not message:
+        dados_produto = produto.get_produto_data().get('produto') or {}
+        message = EvolutionAPIService.format_product_message({
+            'produto': {'nome': produto.nome_produto, **dados_produto}
+        })
+        if oferta:
+            message += f"\n🔖 Oferta: {oferta.oferta_id}"
+    if not image_url:
+        image_url = _imagem_produto(produto)
+
+    with transaction.atomic():
+        campanha = BroadcastCampaign.objects.create(
+            group=group,
+            produto=produto,
+            oferta=oferta,
+            instance_name=instance_name or getattr(settings, 'EVOLUTION_INSTANCE_NAME', 'default'),
+            message=message,
+            image_url=image_url,
+            total_recipients=len({p.pk for p in participantes}),
+            created_by=created_by,
+        )
+        BroadcastRecipient.objects.bulk_create(
+            [
+                BroadcastRecipient(campaign=campanha, participant=participante, phone=participante.phone)
+                for participante in participantes
+            ],
+            ignore_conflicts=True
+        )
+
+    return campanha
+
+
+class BroadcastEngine:
+    """
+    Executa campanhas de envio em massa
+
+    Uso:
+        engine = BroadcastEngine()
+        engine.executar_campanha(campanha)
+    """
+
+    def __init__(
+        self,
+        service: Optional[EvolutionAPIService] = None,
+        max_workers: Optional[int] = None,
+        flush_size: int = 50,
+    ):
+        self.service = service or EvolutionAPIService()
+        self.max_workers = max_workers or getattr(settings, 'EVOLUTION_BROADCAST_WORKERS', 4)
+        self.flush_size = flush_size
+
+    def _enviar(self, campanha: BroadcastCampaign, destinatario: BroadcastRecipient) -> BroadcastRecipient:
+        """Envia a mensagem para um destinatário (executado nas threads do pool)"""
+        rate_limiter.acquire(campanha.instance_name)
+        try:
+            if campanha.image_url:
+                result = self.service.send_image(
+                    destinatario.phone, campanha.image_url, campanha.message,
+                    instance_name=campanha.instance_name
+                )
+            else:
+                result = self.service.send_text_message(
+                    destinatario.phone, campanha.message,
+                    instance_name=campanha.instance_name
+                )
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        finally:
+            close_old_connections()
+
+        if result.get('success'):
+            destinatario.status = BroadcastRecipient.RecipientStatus.SENT
+            destinatario.evolution_message_id = (
+                result.get('evolution_message_id')
+                or ((result.get('data') or {}).get('key') or {}).get('id')
+                or ''
+            )
+            destinatario.error_message = None
+            destinatario.sent_at = timezone.now()
+        else:
+            destinatario.status = BroadcastRecipient.RecipientStatus.FAILED
+            destinatario.error_message = result.get('error', 'Erro desconhecido')
+        return destinatario
+    
+    def _gravar_envio(self, destinatario: BroadcastRecipient):
+        """Marca o destinatário como enviado logo após o envio (evita reenvio ao retomar)"""
+        BroadcastRecipient.objects.filter(pk=destinatario.pk).update(
+            status=destinatario.status,
+            evolution_message_id=destinatario.evolution_message_id,
+            error_message=None,
+            sent_at=destinatario.sent_at,
+        )
+    
+    def _renovar_reserva(self, campanha: BroadcastCampaign):
+        """Sinal de vida do worker (impede que outro worker retome a campanha)"""
+        BroadcastCampaign.objects.filter(pk=campanha.pk).update(locked_at=timezone.now())
+    
+    def _gravar_lote(self, campanha: BroadcastCampaign, lote: List[BroadcastRecipient]):
+        """Grava o progresso de um lote de destinatários e as mensagens enviadas"""
+        if not lote:
+            return
+        enviados = [d for d in lote if d.status == BroadcastRecipient.RecipientStatus.SENT]
+        falhas = len(lote) - len(enviados)
+
+        with transaction.atomic():
+            BroadcastRecipient.objects.bulk_update(
+                lote, ['status', 'evolution_message_id', 'error_message', 'sent_at']
+            )
+            WhatsappMessage.objects.bulk_create(
+                [
+                    WhatsappMessage(
+                        message_id=d.evolution_message_id or f"bc_{campanha.pk}_{d.pk}",
+                        group=d.participant.group,
+                        sender=d.participant,
+                        message_type='image' if campanha.image_url else 'text',
+                        content=campanha.message,
+                        media_url=campanha.image_url,
+                        timestamp=d.sent_at,
+                        processed=True,
+                        is_from_customer=False,
+                    )
+                    for d in enviados
+                ],
+                ignore_conflicts=True
+            )
+            BroadcastCampaign.objects.filter(pk=campanha.pk).update(
+                sent_count=F('sent_count') + len(enviados),
+                failed_count=F('failed_count') + falhas,
+                locked_at=timezone.now(),
+            )
+
+    def executar_campanha(self, campanha: BroadcastCampaign, retry_failed: bool = False) -> BroadcastCampaign:
+        """
+        Envia a campanha para todos os destinatários pendentes
+
+        Pode ser chamada novamente para retomar uma campanha interrompida.
+
+        Args:
+            campanha: Campanha a executar
+            retry_failed: Também reenviar para destinatários que falharam
+        """
+        statuses = [BroadcastRecipient.RecipientStatus.PENDING]
+        if retry_failed:
+            statuses.append(BroadcastRecipient.RecipientStatus.FAILED)
+        
+        destinatarios = list(
+            campanha.recipients.filter(status__in=statuses).select_related('participant__group')
+        )
+        
+        # Contadores a partir dos destinatários: uma execução interrompida pode
+        # ter marcado envios sem chegar a gravar o lote com os contadores
+        contagem = campanha.recipients.aggregate(
+            enviados=Count('id', filter=Q(status=BroadcastRecipient.RecipientStatus.SENT)),
+            falhas=Count('id', filter=Q(status=BroadcastRecipient.RecipientStatus.FAILED)),
+        )
+        campanha.sent_count = contagem['enviados']
+        campanha.failed_count = 0 if retry_failed else contagem['falhas']
+        
+        campanha.status = BroadcastCampaign.CampaignStatus.RUNNING
+        campanha.started_at = campanha.started_at or timezone.now()
+        campanha.locked_at = timezone.now()
+        campanha.save(update_fields=['status', 'started_at', 'locked_at', 'sent_count', 'failed_count'])
+        logger.info(f"[BROADCAST] Campanha {campanha.pk}: {len(destinatarios)} destinatário(s) pendente(s)")
+
+        try:
+            # Uma consulta para todos os contatos no lugar de um get_or_create por envio
+            self.service.preload_contacts(d.phone for d in destinatarios)
+
+            lote = []
+            renovada_em = time.monotonic()
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(self._enviar, campanha, d) for d in destinatarios]
+                for future in as_completed(futures):
+                    destinatario = future.result()
+                    if destinatario.status == BroadcastRecipient.RecipientStatus.SENT:
+                        self._gravar_envio(destinatario)
+                    lote.append(destinatario)
+                    if len(lote) >= self.flush_size:
+                        self._gravar_lote(campanha, lote)
+                        lote = []
+                        renovada_em = time.monotonic()
+                    elif time.monotonic() - renovada_em > LOCK_TIMEOUT.total_seconds() / 3:
+                        self._renovar_reserva(campanha)
+                        renovada_em = time.monotonic()
+            self._gravar_lote(campanha, lote)
+
+            campanha.status = BroadcastCampaign.CampaignStatus.DONE
+        except Exception as e:
+            logger.error(f"[BROADCAST] Erro na campanha {campanha.pk}: {str(e)}", exc_info=True)
+            campanha.status = BroadcastCampaign.CampaignStatus.ERROR
+        finally:
+            campanha.finished_at = timezone.now()
+            campanha.locked_at = None
+            campanha.save(update_fields=['status', 'finished_at', 'locked_at'])
+            campanha.refresh_from_db(fields=['sent_count', 'failed_count'])
+
+        return campanha
+
+
+def resumo_campanha(campanha: BroadcastCampaign) -> Dict:
+    """Dict com o progresso da campanha (usado pela API)"""
+    return {
+        'id': campanha.id,
+        'status': campanha.status,
+        'total_recipients': campanha.total_recipients,
+        'sent_count': campanha.sent_count,
+        'failed_count': campanha.failed_count,
+        'progress': campanha.progress,
+        'created_at': campanha.created_at.isoformat(),
+        'started_at': campanha.started_at.isoformat() if campanha.started_at else None,
+        'finished_at': campanha.finished_at.isoformat() if campanha.finished_at else None,
+    }
+
+
+def processar_campanhas_pendentes(engine: Optional[BroadcastEngine] = None) -> int:
+    """
+    Executa as campanhas pendentes (chamado pelo worker ``processar_broadcasts``)
+    
+    Campanhas em envio sem sinal do worker há mais de ``LOCK_TIMEOUT`` (worker
+    morto) são retomadas a partir dos destinatários ainda pendentes.
+    
+    Returns:
+        Número de campanhas executadas
+    """
+    engine = engine or BroadcastEngine()
+    executadas = 0
+    
+    def elegiveis():
+        limite = timezone.now() - LOCK_TIMEOUT
+        return Q(status=BroadcastCampaign.CampaignStatus.PENDING) | Q(
+            Q(locked_at__lt=limite) | Q(locked_at__isnull=True, started_at__lt=limite),
+            status=BroadcastCampaign.CampaignStatus.RUNNING,
+        )
+    
+    for campanha_id in BroadcastCampaign.objects.filter(
+        elegiveis()
+    ).order_by('created_at').values_list('id', flat=True):
+        # Reservar a campanha (evita que dois workers executem a mesma)
+        reservada = BroadcastCampaign.objects.filter(elegiveis(), pk=campanha_id).update(
+            status=BroadcastCampaign.CampaignStatus.RUNNING,
+            locked_at=timezone.now(),
+        )
+        if not reservada:
+            continue
+        engine.executar_campanha(BroadcastCampaign.objects.get(pk=campanha_id))
+        executadas += 1
+    return executadas
@@ -8,7 +8,13 @@ Todas as operações são centralizadas no Django e armazenadas no PostgreSQL.
 
 import requests
 import logging
-from typing import Dict, Optional, List
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
 from django.utils import timezone
 from .models import EvolutionInstance, EvolutionMessage, WhatsAppContact
@@ -16,6 +22,147 @@ from .models import EvolutionInstance, EvolutionMessage, WhatsAppContact
 logger = logging.getLogger(__name__)
 
 
+class EvolutionAPIUnavailable(Exception):
+    """Evolution API indisponível (circuit breaker aberto)"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker simples (por processo)
+    
+    Após ``failure_threshold`` falhas consecutivas o circuito abre e as
+    chamadas falham imediatamente durante ``reset_timeout`` segundos; depois
+    disso uma chamada de teste é liberada (half-open).
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+    
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Half-open: liberar uma chamada de teste
+                self._opened_at = None
+                self._failures = self.failure_threshold - 1
+                return False
+            return True
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold and self._opened_at is None:
+                self._opened_at = time.monotonic()
+                logger.warning(f"Circuit breaker da Evolution API aberto após {self._failures} falhas")
+
+
+class _TTLCache:
+    """Cache LRU em memória com expiração por item (thread-safe)"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter com TCP keep-alive nos sockets do pool"""
+    
+    def __init__(self, *args, keepalive_idle: int = 60, **kwargs):
+        self.keepalive_idle = keepalive_idle
+        super().__init__(*args, **kwargs)
+    
+    def init_poolmanager(self, *args, **kwargs):
+        socket_options = [
+            (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            socket_options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_idle))
+        kwargs['socket_options'] = socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+_session = None
+_session_lock = threading.Lock()
+_circuit_breaker = CircuitBreaker(
+    failure_threshold=getattr(settings, 'EVOLUTION_CIRCUIT_FAILURES', 5),
+    reset_timeout=getattr(settings, 'EVOLUTION_CIRCUIT_RESET', 30),
+)
+_instance_cache = _TTLCache(maxsize=32, ttl=getattr(settings, 'EVOLUTION_LOOKUP_CACHE_TTL', 300))
+_contact_cache = _TTLCache(maxsize=5000, ttl=getattr(settings, 'EVOLUTION_LOOKUP_CACHE_TTL', 300))
+
+
+def get_session() -> requests.Session:
+    """
+    Retorna a sessão HTTP compartilhada do processo
+    
+    A sessão mantém um pool de conexões keep-alive com a Evolution API e
+    faz retries limitados com backoff exponencial + jitter. POSTs só são
+    repetidos em falhas de conexão (antes do envio), para não duplicar mensagens.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=getattr(settings, 'EVOLUTION_HTTP_MAX_RETRIES', 3),
+                    read=0,
+                    backoff_factor=getattr(settings, 'EVOLUTION_HTTP_BACKOFF', 0.3),
+                    backoff_jitter=getattr(settings, 'EVOLUTION_HTTP_BACKOFF', 0.3),
+                    status_forcelist=(502, 503, 504),
+                    allowed_methods=frozenset(['GET']),
+                    raise_on_status=False,
+                )
+                pool_size = getattr(settings, 'EVOLUTION_HTTP_POOL_SIZE', 20)
+                adapter = _KeepAliveAdapter(
+                    pool_connections=pool_size,
+                    pool_maxsize=pool_size,
+                    max_retries=retry,
+                    keepalive_idle=getattr(settings, 'EVOLUTION_HTTP_KEEPALIVE', 60),
+                )
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
 class EvolutionAPIService:
     """
     Serviço para comunicação com Evolution API
@@ -31,6 +178,73 @@ class EvolutionAPIService:
         if not self.base_url or not self.api_key:
             logger.warning("Evolution API não configurada completamente")
     
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """
+        Executa requisição na Evolution API usando a sessão compartilhada
+        
+        Raises:
+            EvolutionAPIUnavailable: se o circuit breaker estiver aberto
+        """
+        if _circuit_breaker.is_open:
+            raise EvolutionAPIUnavailable("Evolution API indisponível (circuit breaker aberto)")
+        
+        kwargs.setdefault('headers', self._get_headers())
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = get_session().request(method, f"{self.base_url}{path}", **kwargs)
+        except requests.RequestException:
+            _circuit_breaker.record_failure()
+            raise
+        
+        if response.status_code >= 500:
+            _circuit_breaker.record_failure()
+        else:
+            _circuit_breaker.record_success()
+        return response
+    
+    def _get_instance(self, instance_name: str) -> Optional[EvolutionInstance]:
+        """Busca instância no banco (com cache em memória)"""
+        instance = _instance_cache.get(instance_name)
+        if instance is None:
+            instance = EvolutionInstance.objects.filter(name=instance_name).first()
+            if instance is not None:
+                _instance_cache.set(instance_name, instance)
+        return instance
+    
+    def _get_contact(self, phone: str) -> WhatsAppContact:
+        """Busca ou cria contato (com cache em memória)"""
+        contact = _contact_cache.get(phone)
+        if contact is None:
+            contact, _ = WhatsAppContact.objects.get_or_create(
+                phone=phone,
+                defaults={'name': ''}
+            )
+            _contact_cache.set(phone, contact)
+        return contact
+    
+    def preload_contacts(self, phones: Iterable[str]) -> Dict[str, WhatsAppContact]:
+        """
+        Carrega (e cria, se faltarem) os contatos de uma lista de telefones
+        
+        Usado antes de envios em massa: uma consulta + um bulk_create no lugar
+        de um get_or_create por destinatário.
+        
+        Returns:
+            Dict telefone normalizado -> contato
+        """
+        normalized = {self._normalize_phone(phone) for phone in phones if phone}
+        contacts = {c.phone: c for c in WhatsAppContact.objects.filter(phone__in=normalized)}
+        missing = normalized - contacts.keys()
+        if missing:
+            WhatsAppContact.objects.bulk_create(
+                [WhatsAppContact(phone=phone, name='') for phone in missing],
+                ignore_conflicts=True
+            )
+            contacts.update({c.phone: c for c in WhatsAppContact.objects.filter(phone__in=missing)})
+        for phone, contact in contacts.items():
+            _contact_cache.set(phone, contact)
+        return contacts
+    
     def _get_headers(self) -> Dict[str, str]:
         """Retorna headers para requisições"""
         return {
@@ -72,12 +286,7 @@ class EvolutionAPIService:
             )
             
             # Buscar status da Evolution API
-            url = f"{self.base_url}/instance/fetchInstances"
-            response = requests.get(
-                url,
-                headers=self._get_headers(),
-                timeout=self.timeout
-            )
+            response = self._request('GET', '/instance/fetchInstances')
             
             if response.status_code == 200:
                 data = response.json()
@@ -114,6 +323,7 @@ class EvolutionAPIService:
                     instance.last_sync = timezone.now()
                     instance.metadata = evolution_instance_data
                     instance.save()
+                    _instance_cache.set(instance_name, instance)
                     
                     return {
                         'success': True,
@@ -170,34 +380,23 @@ class EvolutionAPIService:
             phone = self._normalize_phone(phone)
             
             # Buscar instância no banco
-            try:
-                instance = EvolutionInstance.objects.get(name=instance_name)
-            except EvolutionInstance.DoesNotExist:
+            instance = self._get_instance(instance_name)
+            if instance is None:
                 return {
                     'success': False,
                     'error': f'Instância {instance_name} não encontrada no banco'
                 }
             
             # Buscar ou criar contato
-            contact, _ = WhatsAppContact.objects.get_or_create(
-                phone=phone,
-                defaults={'name': ''}
-            )
+            contact = self._get_contact(phone)
             
             # Enviar mensagem via Evolution API
-            url = f"{self.base_url}/message/sendText/{instance_name}"
-            
             payload = {
                 "number": phone,
                 "text": message
             }
             
-            response = requests.post(
-                url,
-                json=payload,
-                headers=self._get_headers(),
-                timeout=self.timeout
-            )
+            response = self._request('POST', f'/message/sendText/{instance_name}', json=payload)
             
             if response.status_code in [200, 201]:
                 response_data = response.json()
@@ -260,7 +459,7 @@ class EvolutionAPIService:
                 'error': str(e)
             }
     
-    def send_image(self, phone: str, image_url: str, caption: str = "") -> Dict:
+    def send_image(self, phone: str, image_url: str, caption: str = "", instance_name: Optional[str] = None) -> Dict:
         """
         Envia imagem
         
@@ -268,15 +467,15 @@ class EvolutionAPIService:
             phone: Número do telefone
             image_url: URL da imagem
             caption: Legenda da imagem
+            instance_name: Nome da instância (opcional)
             
         Returns:
             Dict com resultado
         """
         try:
+            instance_name = instance_name or self.instance_name
             phone = self._normalize_phone(phone)
             
-            url = f"{self.base_url}/message/sendMedia/{self.instance_name}"
-            
             payload = {
                 "number": phone,
                 "mediatype": "image",
@@ -284,12 +483,7 @@ class EvolutionAPIService:
                 "caption": caption
             }
             
-            response = requests.post(
-                url,
-                json=payload,
-                headers=self._get_headers(),
-                timeout=self.timeout
-            )
+            response = self._request('POST', f'/message/sendMedia/{instance_name}', json=payload)
             
             if response.status_code in [200, 201]:
                 logger.info(f"Imagem enviada para {phone}")
@@ -317,7 +511,38 @@ class EvolutionAPIService:
                 'error': str(e)
             }
     
-    def send_product_message(self, phone: str, product_data: Dict, image_url: Optional[str] = None) -> Dict:
+    @staticmethod
+    def format_product_message(product_data: Dict) -> str:
+        """
+        Monta o texto de divulgação de um produto
+        
+        Args:
+            product_data: Dados do produto (nome, descrição, preço, etc)
+            
+        Returns:
+            Mensagem formatada para WhatsApp
+        """
+        produto = product_data.get('produto', {})
+        nome = produto.get('nome', 'Produto')
+        descricao = produto.get('descricao', '')
+        preco = produto.get('preco', '')
+        categoria = produto.get('categoria', '')
+        marca = produto.get('marca', '')
+        
+        message = f"🛍️ *{nome}*\n\n"
+        
+        if marca:
+            message += f"🏷️ Marca: {marca}\n"
+        if categoria:
+            message += f"📂 Categoria: {categoria}\n"
+        if preco:
+            message += f"💰 Preço: {preco}\n"
+        if descricao:
+            message += f"\n📝 {descricao[:200]}...\n" if len(descricao) > 200 else f"\n📝 {descricao}\n"
+        
+        return message
+    
+    def send_product_message(self, phone: str, product_data: Dict, image_url: Optional[str] = None, instance_name: Optional[str] = None) -> Dict:
         """
         Envia mensagem com informações de produto
         
@@ -325,36 +550,20 @@ class EvolutionAPIService:
             phone: Número do telefone
             product_data: Dados do produto (nome, descrição, preço, etc)
             image_url: URL da imagem do produto (opcional)
+            instance_name: Nome da instância (opcional)
             
         Returns:
             Dict com resultado
         """
         try:
-            # Construir mensagem formatada
-            produto = product_data.get('produto', {})
-            nome = produto.get('nome', 'Produto')
-            descricao = produto.get('descricao', '')
-            preco = produto.get('preco', '')
-            categoria = produto.get('categoria', '')
-            marca = produto.get('marca', '')
-            
-            message = f"🛍️ *{nome}*\n\n"
-            
-            if marca:
-                message += f"🏷️ Marca: {marca}\n"
-            if categoria:
-                message += f"📂 Categoria: {categoria}\n"
-            if preco:
-                message += f"💰 Preço: {preco}\n"
-            if descricao:
-                message += f"\n📝 {descricao[:200]}...\n" if len(descricao) > 200 else f"\n📝 {descricao}\n"
+            message = self.format_product_message(product_data)
             
             # Se tiver imagem, enviar imagem com legenda
             if image_url:
-                return self.send_image(phone, image_url, message)
+                return self.send_image(phone, image_url, message, instance_name=instance_name)
             else:
                 # Enviar apenas texto
-                return self.send_text_message(phone, message)
+                return self.send_text_message(phone, message, instance_name=instance_name)
         except Exception as e:
             logger.error(f"Erro ao enviar mensagem de produto para {phone}: {str(e)}")
             return {
@@ -374,20 +583,13 @@ class EvolutionAPIService:
         """
         try:
             instance = instance_name or self.instance_name
-            url = f"{self.base_url}/instance/create"
-            
             payload = {
                 "instanceName": instance,
                 "token": self.api_key,
                 "qrcode": True
             }
             
-            response = requests.post(
-                url,
-                json=payload,
-                headers=self._get_headers(),
-                timeout=self.timeout
-            )
+            response = self._request('POST', '/instance/create', json=payload)
             
             if response.status_code in [200, 201]:
                 return {
@@ -418,13 +620,7 @@ class EvolutionAPIService:
         """
         try:
             instance = instance_name or self.instance_name
-            url = f"{self.base_url}/instance/connect/{instance}"
-            
-            response = requests.get(
-                url,
-                headers=self._get_headers(),
-                timeout=self.timeout
-            )
+            response = self._request('GET', f'/instance/connect/{instance}')
             
             if response.status_code == 200:
                 return {
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_whatsapp_integration.broadcast import BroadcastEngine, processar_campanhas_pendentes
+from app_whatsapp_integration.models import BroadcastCampaign
+
+
+class Command(BaseCommand):
+    help = "Executa campanhas de envio em massa (BroadcastCampaign) pendentes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Envios simultâneos por campanha')
+        parser.add_argument('--campaign', type=int, default=None, help='Retomar uma campanha específica')
+        parser.add_argument('--retry-failed', action='store_true', help='Reenviar também destinatários que falharam')
+        parser.add_argument('--loop', action='store_true', help='Continuar aguardando novas campanhas')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Espera (s) quando não há campanhas')
+
+    def handle(self, *args, **options):
+        engine = BroadcastEngine(max_workers=options['workers'])
+
+        if options['campaign']:
+            campanha = BroadcastCampaign.objects.get(pk=options['campaign'])
+            campanha = engine.executar_campanha(campanha, retry_failed=options['retry_failed'])
+            self.stdout.write(
+                f"Campanha #{campanha.pk}: {campanha.sent_count} enviada(s), {campanha.failed_count} falha(s)"
+            )
+            return
+
+        while True:
+            executadas = processar_campanhas_pendentes(engine)
+            if executadas:
+                self.stdout.write(f"{executadas} campanha(s) executada(s)")
+                continue
+
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,36 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_whatsapp_integration.webhook_queue import drenar_fila, estatisticas_fila
+
+
+class Command(BaseCommand):
+    help = "Consome a fila de webhooks da Evolution API (WebhookEvent) em lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Eventos reservados por lote')
+        parser.add_argument('--workers', type=int, default=4, help='Threads processando cada lote')
+        parser.add_argument('--loop', action='store_true', help='Continuar consumindo a fila indefinidamente')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Espera (s) quando a fila está vazia')
+        parser.add_argument('--stats', action='store_true', help='Apenas imprimir profundidade e atraso da fila')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(estatisticas_fila(), indent=4))
+            return
+
+        while True:
+            resultado = drenar_fila(
+                batch_size=options['batch_size'],
+                workers=options['workers']
+            )
+            if resultado['total']:
+                self.stdout.write(f"Lote processado: {json.dumps(resultado)}")
+                continue
+
+            # Fila vazia
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,34 @@
+# Generated manually
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_whatsapp_integration', '0003_evolutioninstance_evolutionmessage_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(help_text="Tipo do evento (ex: 'messages.upsert')", max_length=50)),
+                ('instance_name', models.CharField(blank=True, help_text='Nome da instância que gerou o evento', max_length=100)),
+                ('evolution_message_id', models.CharField(blank=True, help_text='ID da mensagem na Evolution API (chave de idempotência)', max_length=100, null=True, unique=True)),
+                ('payload', models.JSONField(default=dict, help_text='Payload bruto recebido no webhook')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('processing', 'Processando'), ('done', 'Processado'), ('skipped', 'Ignorado (duplicado)'), ('error', 'Erro')], default='pending', help_text='Status do evento na fila', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Número de tentativas de processamento')),
+                ('error_message', models.TextField(blank=True, help_text='Último erro de processamento (se houver)', null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de Webhook',
+                'verbose_name_plural': 'Fila de Webhooks',
+                'ordering': ['received_at'],
+                'indexes': [models.Index(fields=['status', 'received_at'], name='app_whatsap_status_7e5f35_idx')],
+            },
+        ),
+    ]
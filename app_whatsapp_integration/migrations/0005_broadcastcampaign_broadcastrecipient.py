@@ -0,0 +1,61 @@
+# Generated manually
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_marketplace', '0038_add_telefone_personalshopper'),
+        ('app_whatsapp_integration', '0004_webhookevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BroadcastCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('instance_name', models.CharField(help_text='Instância Evolution usada nos envios', max_length=100)),
+                ('message', models.TextField(help_text='Texto enviado (legenda, quando houver imagem)')),
+                ('image_url', models.URLField(blank=True, help_text='URL da imagem enviada (opcional)')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Enviando'), ('done', 'Concluída'), ('cancelled', 'Cancelada'), ('error', 'Erro')], default='pending', help_text='Status da campanha', max_length=20)),
+                ('total_recipients', models.PositiveIntegerField(default=0)),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, help_text='Usuário que criou a campanha', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='broadcast_campaigns', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(blank=True, help_text='Grupo de origem dos destinatários (se houver)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='broadcast_campaigns', to='app_marketplace.whatsappgroup')),
+                ('oferta', models.ForeignKey(blank=True, help_text='Oferta divulgada (se houver)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='broadcast_campaigns', to='app_marketplace.ofertaproduto')),
+                ('produto', models.ForeignKey(blank=True, help_text='Produto divulgado', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='broadcast_campaigns', to='app_marketplace.produtojson')),
+            ],
+            options={
+                'verbose_name': 'Campanha de Envio',
+                'verbose_name_plural': 'Campanhas de Envio',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='app_whatsap_status_e5e271_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BroadcastRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(help_text='Número do destinatário', max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('sent', 'Enviada'), ('failed', 'Falhou')], default='pending', max_length=20)),
+                ('evolution_message_id', models.CharField(blank=True, help_text='ID da mensagem na Evolution API', max_length=100)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='app_whatsapp_integration.broadcastcampaign')),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcast_recipients', to='app_marketplace.whatsappparticipant')),
+            ],
+            options={
+                'verbose_name': 'Destinatário de Campanha',
+                'verbose_name_plural': 'Destinatários de Campanha',
+                'indexes': [models.Index(fields=['campaign', 'status'], name='app_whatsap_campaig_3b3559_idx')],
+                'unique_together': {('campaign', 'participant')},
+            },
+        ),
+    ]
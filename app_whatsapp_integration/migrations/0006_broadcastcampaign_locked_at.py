@@ -0,0 +1,17 @@
+# Generated manually
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_whatsapp_integration', '0005_broadcastcampaign_broadcastrecipient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastcampaign',
+            name='locked_at',
+            field=models.DateTimeField(blank=True, help_text='Último sinal de vida do worker que está enviando a campanha', null=True),
+        ),
+    ]
@@ -459,3 +459,235 @@ class EvolutionMessage(models.Model):
     def __str__(self):
         direction_icon = "📥" if self.direction == self.MessageDirection.INBOUND else "📤"
         return f"{direction_icon} {self.phone} - {self.message_type} - {self.timestamp}"
+
+
+class WebhookEvent(models.Model):
+    """
+    Fila durável de webhooks da Evolution API
+
+    O webhook apenas grava o evento bruto aqui e responde imediatamente;
+    os workers (``manage.py processar_fila_webhooks``) consomem a fila em lotes.
+    A idempotência é garantida por ``evolution_message_id`` (único).
+    """
+
+    class EventStatus(models.TextChoices):
+        PENDING = 'pending', 'Pendente'
+        PROCESSING = 'processing', 'Processando'
+        DONE = 'done', 'Processado'
+        SKIPPED = 'skipped', 'Ignorado (duplicado)'
+        ERROR = 'error', 'Erro'
+
+    event = models.CharField(
+        max_length=50,
+        help_text="Tipo do evento (ex: 'messages.upsert')"
+    )
+
+    instance_name = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Nome da instância que gerou o evento"
+    )
+
+    evolution_message_id = models.CharField(
+        max_length=100,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="ID da mensagem na Evolution API (chave de idempotência)"
+    )
+
+    payload = models.JSONField(
+        default=dict,
+        help_text="Payload bruto recebido no webhook"
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=EventStatus.choices,
+        default=EventStatus.PENDING,
+        help_text="Status do evento na fila"
+    )
+
+    attempts = models.PositiveIntegerField(
+        default=0,
+        help_text="Número de tentativas de processamento"
+    )
+
+    error_message = models.TextField(
+        blank=True,
+        null=True,
+        help_text="Último erro de processamento (se houver)"
+    )
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Evento de Webhook'
+        verbose_name_plural = 'Fila de Webhooks'
+        ordering = ['received_at']
+        indexes = [
+            models.Index(fields=['status', 'received_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event} - {self.evolution_message_id or self.pk} - {self.get_status_display()}"
+
+
+class BroadcastCampaign(models.Model):
+    """
+    Campanha de envio em massa (oferta/produto para um grupo ou lista de participantes)
+
+    O progresso é controlado por ``BroadcastRecipient``: reexecutar uma
+    campanha interrompida envia apenas para os destinatários pendentes.
+    Campanhas em envio sem sinal do worker (``locked_at``) há mais de
+    ``EVOLUTION_BROADCAST_LOCK_TIMEOUT`` são retomadas por outro worker.
+    """
+
+    class CampaignStatus(models.TextChoices):
+        PENDING = 'pending', 'Pendente'
+        RUNNING = 'running', 'Enviando'
+        DONE = 'done', 'Concluída'
+        CANCELLED = 'cancelled', 'Cancelada'
+        ERROR = 'error', 'Erro'
+
+    group = models.ForeignKey(
+        'app_marketplace.WhatsappGroup',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='broadcast_campaigns',
+        help_text="Grupo de origem dos destinatários (se houver)"
+    )
+
+    produto = models.ForeignKey(
+        'app_marketplace.ProdutoJSON',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='broadcast_campaigns',
+        help_text="Produto divulgado"
+    )
+
+    oferta = models.ForeignKey(
+        'app_marketplace.OfertaProduto',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='broadcast_campaigns',
+        help_text="Oferta divulgada (se houver)"
+    )
+
+    instance_name = models.CharField(
+        max_length=100,
+        help_text="Instância Evolution usada nos envios"
+    )
+
+    message = models.TextField(
+        help_text="Texto enviado (legenda, quando houver imagem)"
+    )
+
+    image_url = models.URLField(
+        blank=True,
+        help_text="URL da imagem enviada (opcional)"
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=CampaignStatus.choices,
+        default=CampaignStatus.PENDING,
+        help_text="Status da campanha"
+    )
+
+    total_recipients = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='broadcast_campaigns',
+        help_text="Usuário que criou a campanha"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Último sinal de vida do worker que está enviando a campanha"
+    )
+    
+    class Meta:
+        verbose_name = 'Campanha de Envio'
+        verbose_name_plural = 'Campanhas de Envio'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Campanha #{self.pk} - {self.sent_count}/{self.total_recipients} - {self.get_status_display()}"
+
+    @property
+    def progress(self) -> float:
+        """Percentual de destinatários já processados"""
+        if not self.total_recipients:
+            return 100.0
+        return round((self.sent_count + self.failed_count) * 100 / self.total_recipients, 1)
+
+
+class BroadcastRecipient(models.Model):
+    """Destinatário de uma campanha de envio em massa"""
+
+    class RecipientStatus(models.TextChoices):
+        PENDING = 'pending', 'Pendente'
+        SENT = 'sent', 'Enviada'
+        FAILED = 'failed', 'Falhou'
+
+    campaign = models.ForeignKey(
+        BroadcastCampaign,
+        on_delete=models.CASCADE,
+        related_name='recipients'
+    )
+
+    participant = models.ForeignKey(
+        'app_marketplace.WhatsappParticipant',
+        on_delete=models.CASCADE,
+        related_name='broadcast_recipients'
+    )
+
+    phone = models.CharField(
+        max_length=20,
+        help_text="Número do destinatário"
+    )
+
+    status = models.CharField(
+        max_length=20,
+        choices=RecipientStatus.choices,
+        default=RecipientStatus.PENDING
+    )
+
+    evolution_message_id = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="ID da mensagem na Evolution API"
+    )
+
+    error_message = models.TextField(blank=True, null=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Destinatário de Campanha'
+        verbose_name_plural = 'Destinatários de Campanha'
+        unique_together = ['campaign', 'participant']
+        indexes = [
+            models.Index(fields=['campaign', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.phone} - {self.get_status_display()}"
@@ -39,4 +39,9 @@ urlpatterns = [
         views.instance_status,
         name='instance_status'
     ),
+    path(
+        'api/whatsapp/webhook/queue-status/',
+        views.webhook_queue_status,
+        name='webhook_queue_status'
+    ),
 ]
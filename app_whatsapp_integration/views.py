@@ -5,6 +5,8 @@ Views - WhatsApp Integration
 Views para receber e processar mensagens do gateway WhatsApp.
 """
 
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
@@ -21,6 +23,7 @@ from .models import (
     EvolutionMessage
 )
 from .evolution_service import EvolutionAPIService
+from .webhook_queue import enfileirar_evento, estatisticas_fila
 from app_marketplace.models import (
     Cliente, PersonalShopper, AddressKeeper,
     WhatsappGroup, WhatsappParticipant, WhatsappConversation
@@ -131,173 +134,16 @@ def webhook_evolution_api(request):
         
         # Processar apenas eventos de mensagens
         if event == 'messages.upsert':
-            key = event_data.get('key', {})
-            remote_jid = key.get('remoteJid', '')
-            message_id = key.get('id', '')
-            
-            # Extrair número do JID (formato: 5511999999999@s.whatsapp.net)
-            phone = remote_jid.split('@')[0] if '@' in remote_jid else remote_jid
-            
-            # Extrair mensagem
-            message_obj = event_data.get('message', {})
-            message_text = None
-            message_type = 'text'
-            
-            if 'conversation' in message_obj:
-                message_text = message_obj['conversation']
-            elif 'extendedTextMessage' in message_obj:
-                message_text = message_obj['extendedTextMessage'].get('text', '')
-            elif 'imageMessage' in message_obj:
-                message_type = 'image'
-                message_text = message_obj['imageMessage'].get('caption', '')
-            elif 'videoMessage' in message_obj:
-                message_type = 'video'
-                message_text = message_obj['videoMessage'].get('caption', '')
-            
-            if not message_text:
-                return JsonResponse({'status': 'ok'})
-            
-            # Timestamp
-            timestamp_ms = event_data.get('messageTimestamp', 0)
-            from datetime import datetime
-            timestamp = datetime.fromtimestamp(timestamp_ms) if timestamp_ms else timezone.now()
+            if getattr(settings, 'EVOLUTION_WEBHOOK_ASYNC', False):
+                # Modo fila: gravar evento bruto e responder imediatamente
+                # (processamento feito por manage.py processar_fila_webhooks)
+                evento, created = enfileirar_evento(data)
+                return JsonResponse({
+                    'status': 'queued' if created else 'duplicate',
+                    'event_id': evento.id
+                }, status=202 if created else 200)
             
-            # Processar mensagem
-            with transaction.atomic():
-                # Buscar instância no banco
-                try:
-                    instance = EvolutionInstance.objects.get(name=instance)
-                except EvolutionInstance.DoesNotExist:
-                    # Criar instância se não existir
-                    instance = EvolutionInstance.objects.create(
-                        name=instance,
-                        status=EvolutionInstance.InstanceStatus.UNKNOWN
-                    )
-                
-                # Buscar ou criar contato
-                contact, created = WhatsAppContact.objects.get_or_create(
-                    phone=f"+{phone}",
-                    defaults={'name': ''}
-                )
-                
-                # Tentar identificar usuário
-                if not contact.user and not contact.cliente:
-                    cliente = Cliente.objects.filter(telefone__icontains=phone).first()
-                    if cliente:
-                        contact.cliente = cliente
-                        if cliente.user:
-                            contact.user = cliente.user
-                        contact.save()
-                
-                # Mapear tipo de mensagem
-                message_type_map = {
-                    'text': EvolutionMessage.MessageType.TEXT,
-                    'image': EvolutionMessage.MessageType.IMAGE,
-                    'video': EvolutionMessage.MessageType.VIDEO,
-                    'audio': EvolutionMessage.MessageType.AUDIO,
-                    'document': EvolutionMessage.MessageType.DOCUMENT,
-                }
-                evolution_message_type = message_type_map.get(message_type, EvolutionMessage.MessageType.UNKNOWN)
-                
-                # Salvar mensagem no banco Django (EvolutionMessage)
-                evolution_message = EvolutionMessage.objects.create(
-                    instance=instance,
-                    contact=contact,
-                    evolution_message_id=message_id or f"ev_{timezone.now().timestamp()}",
-                    phone=f"+{phone}",
-                    direction=EvolutionMessage.MessageDirection.INBOUND,
-                    message_type=evolution_message_type,
-                    content=message_text,
-                    status=EvolutionMessage.MessageStatus.DELIVERED,
-                    timestamp=timestamp,
-                    raw_payload=data
-                )
-                
-                # Também salvar no log antigo (compatibilidade)
-                message_log = WhatsAppMessageLog.objects.create(
-                    message_id=message_id or f"ev_{timezone.now().timestamp()}",
-                    contact=contact,
-                    phone=f"+{phone}",
-                    direction=WhatsAppMessageLog.MessageDirection.INBOUND,
-                    message_type=message_type,
-                    content=message_text,
-                    timestamp=timestamp,
-                    raw_payload=data
-                )
-                
-                # Atualizar último contato
-                contact.last_message_at = timestamp
-                contact.save()
-                
-                # ============================================================
-                # FLUXO CONVERSACIONAL ÉVORA/VITRINEZAP
-                # ============================================================
-                # Verificar se é mensagem de grupo ou privada
-                is_group = '@g.us' in remote_jid
-                
-                if is_group:
-                    # FLUXO GRUPO: Intenção Social Assistida
-                    grupo = _obter_grupo_por_jid(remote_jid)
-                    if grupo:
-                        participante = _obter_ou_criar_participante(grupo, phone, contact)
-                        resultado = flow_engine.processar_mensagem_grupo(
-                            grupo=grupo,
-                            participante=participante,
-                            mensagem=message_text,
-                            mensagem_id=message_id,
-                            tipo_mensagem=message_type
-                        )
-                        
-                        # Enviar resposta no grupo se houver
-                        if resultado.get('resposta_grupo'):
-                            reply_message = resultado.get('resposta_grupo')
-                            result = evolution_service.send_text_message(
-                                number=remote_jid,
-                                text=reply_message,
-                                instance_name=instance.name
-                            )
-                            if result.get('success'):
-                                message_log.reply_sent = True
-                                message_log.reply_content = reply_message
-                                evolution_message.processed = True
-                else:
-                    # FLUXO PRIVADO: Negociação e Carrinho Invisível
-                    conversa = _obter_ou_criar_conversa(contact, phone)
-                    if conversa:
-                        participante = _obter_participante_da_conversa(conversa, phone, contact)
-                        if participante:
-                            resultado = flow_engine.processar_mensagem_privada(
-                                conversa=conversa,
-                                participante=participante,
-                                mensagem=message_text,
-                                mensagem_id=message_id
-                            )
-                            
-                            # Enviar resposta do IA-Vendedor
-                            if resultado.get('resposta'):
-                                reply_message = resultado.get('resposta')
-                                result = evolution_service.send_text_message(
-                                    number=contact.phone,
-                                    text=reply_message,
-                                    instance_name=instance.name
-                                )
-                                if result.get('success'):
-                                    message_log.reply_sent = True
-                                    message_log.reply_content = reply_message
-                                    evolution_message.processed = True
-                    else:
-                        # Fallback: processar mensagem padrão
-                        reply_message = process_message(contact, message_text, message_log)
-                        if reply_message:
-                            result = evolution_service.send_text_message(contact.phone, reply_message, instance_name=instance.name)
-                            if result.get('success'):
-                                message_log.reply_sent = True
-                                message_log.reply_content = reply_message
-                                evolution_message.processed = True
-                
-                message_log.processed = True
-                message_log.save()
-                evolution_message.save()
+            processar_mensagem_evolution(data)
         
         return JsonResponse({'status': 'ok'})
         
@@ -308,6 +154,190 @@ def webhook_evolution_api(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def processar_mensagem_evolution(data: dict) -> bool:
+    """
+    Processa um evento ``messages.upsert`` da Evolution API
+    
+    Usado diretamente pelo webhook (modo síncrono) e pelos workers da fila
+    de webhooks (modo assíncrono).
+    
+    Returns:
+        True se a mensagem foi registrada, False se foi ignorada (sem texto)
+    """
+    instance = data.get('instance')
+    event_data = data.get('data', {})
+    
+    key = event_data.get('key', {})
+    remote_jid = key.get('remoteJid', '')
+    message_id = key.get('id', '')
+    
+    # Extrair número do JID (formato: 5511999999999@s.whatsapp.net)
+    phone = remote_jid.split('@')[0] if '@' in remote_jid else remote_jid
+    
+    # Extrair mensagem
+    message_obj = event_data.get('message', {})
+    message_text = None
+    message_type = 'text'
+    
+    if 'conversation' in message_obj:
+        message_text = message_obj['conversation']
+    elif 'extendedTextMessage' in message_obj:
+        message_text = message_obj['extendedTextMessage'].get('text', '')
+    elif 'imageMessage' in message_obj:
+        message_type = 'image'
+        message_text = message_obj['imageMessage'].get('caption', '')
+    elif 'videoMessage' in message_obj:
+        message_type = 'video'
+        message_text = message_obj['videoMessage'].get('caption', '')
+    
+    if not message_text:
+        return False
+    
+    # Timestamp
+    timestamp_ms = event_data.get('messageTimestamp', 0)
+    from datetime import datetime
+    timestamp = datetime.fromtimestamp(timestamp_ms) if timestamp_ms else timezone.now()
+    
+    # Processar mensagem
+    with transaction.atomic():
+        # Buscar instância no banco
+        try:
+            instance = EvolutionInstance.objects.get(name=instance)
+        except EvolutionInstance.DoesNotExist:
+            # Criar instância se não existir
+            instance = EvolutionInstance.objects.create(
+                name=instance,
+                status=EvolutionInstance.InstanceStatus.UNKNOWN
+            )
+        
+        # Buscar ou criar contato
+        contact, created = WhatsAppContact.objects.get_or_create(
+            phone=f"+{phone}",
+            defaults={'name': ''}
+        )
+        
+        # Tentar identificar usuário
+        if not contact.user and not contact.cliente:
+            cliente = Cliente.objects.filter(telefone__icontains=phone).first()
+            if cliente:
+                contact.cliente = cliente
+                if cliente.user:
+                    contact.user = cliente.user
+                contact.save()
+        
+        # Mapear tipo de mensagem
+        message_type_map = {
+            'text': EvolutionMessage.MessageType.TEXT,
+            'image': EvolutionMessage.MessageType.IMAGE,
+            'video': EvolutionMessage.MessageType.VIDEO,
+            'audio': EvolutionMessage.MessageType.AUDIO,
+            'document': EvolutionMessage.MessageType.DOCUMENT,
+        }
+        evolution_message_type = message_type_map.get(message_type, EvolutionMessage.MessageType.UNKNOWN)
+        
+        # Salvar mensagem no banco Django (EvolutionMessage)
+        evolution_message = EvolutionMessage.objects.create(
+            instance=instance,
+            contact=contact,
+            evolution_message_id=message_id or f"ev_{timezone.now().timestamp()}",
+            phone=f"+{phone}",
+            direction=EvolutionMessage.MessageDirection.INBOUND,
+            message_type=evolution_message_type,
+            content=message_text,
+            status=EvolutionMessage.MessageStatus.DELIVERED,
+            timestamp=timestamp,
+            raw_payload=data
+        )
+        
+        # Também salvar no log antigo (compatibilidade)
+        message_log = WhatsAppMessageLog.objects.create(
+            message_id=message_id or f"ev_{timezone.now().timestamp()}",
+            contact=contact,
+            phone=f"+{phone}",
+            direction=WhatsAppMessageLog.MessageDirection.INBOUND,
+            message_type=message_type,
+            content=message_text,
+            timestamp=timestamp,
+            raw_payload=data
+        )
+        
+        # Atualizar último contato
+        contact.last_message_at = timestamp
+        contact.save()
+        
+        # ============================================================
+        # FLUXO CONVERSACIONAL ÉVORA/VITRINEZAP
+        # ============================================================
+        # Verificar se é mensagem de grupo ou privada
+        is_group = '@g.us' in remote_jid
+        
+        if is_group:
+            # FLUXO GRUPO: Intenção Social Assistida
+            grupo = _obter_grupo_por_jid(remote_jid)
+            if grupo:
+                participante = _obter_ou_criar_participante(grupo, phone, contact)
+                resultado = flow_engine.processar_mensagem_grupo(
+                    grupo=grupo,
+                    participante=participante,
+                    mensagem=message_text,
+                    mensagem_id=message_id,
+                    tipo_mensagem=message_type
+                )
+                
+                # Enviar resposta no grupo se houver
+                if resultado.get('resposta_grupo'):
+                    reply_message = resultado.get('resposta_grupo')
+                    result = evolution_service.send_text_message(
+                        phone=remote_jid,
+                        message=reply_message,
+                        instance_name=instance.name
+                    )
+                    if result.get('success'):
+                        message_log.reply_sent = True
+                        message_log.reply_content = reply_message
+                        evolution_message.processed = True
+        else:
+            # FLUXO PRIVADO: Negociação e Carrinho Invisível
+            conversa = _obter_ou_criar_conversa(contact, phone)
+            if conversa:
+                participante = _obter_participante_da_conversa(conversa, phone, contact)
+                if participante:
+                    resultado = flow_engine.processar_mensagem_privada(
+                        conversa=conversa,
+                        participante=participante,
+                        mensagem=message_text,
+                        mensagem_id=message_id
+                    )
+                    
+                    # Enviar resposta do IA-Vendedor
+                    if resultado.get('resposta'):
+                        reply_message = resultado.get('resposta')
+                        result = evolution_service.send_text_message(
+                            phone=contact.phone,
+                            message=reply_message,
+                            instance_name=instance.name
+                        )
+                        if result.get('success'):
+                            message_log.reply_sent = True
+                            message_log.reply_content = reply_message
+                            evolution_message.processed = True
+            else:
+                # Fallback: processar mensagem padrão
+                reply_message = process_message(contact, message_text, message_log)
+                if reply_message:
+                    result = evolution_service.send_text_message(contact.phone, reply_message, instance_name=instance.name)
+                    if result.get('success'):
+                        message_log.reply_sent = True
+                        message_log.reply_content = reply_message
+                        evolution_message.processed = True
+        
+        message_log.processed = True
+        message_log.save()
+        evolution_message.save()
+    
+    return True
+
+
 # ============================================================================
 # FUNÇÕES AUXILIARES PARA FLUXO CONVERSACIONAL
 # ============================================================================
@@ -683,6 +713,22 @@ def instance_status(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@staff_member_required
+@require_http_methods(["GET"])
+def webhook_queue_status(request):
+    """
+    Retorna profundidade e atraso da fila de webhooks
+    """
+    try:
+        return JsonResponse({
+            'async_enabled': getattr(settings, 'EVOLUTION_WEBHOOK_ASYNC', False),
+            **estatisticas_fila()
+        })
+    except Exception as e:
+        logger.error(f"Erro ao obter estatísticas da fila: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def send_product(request):
@@ -0,0 +1,174 @@
+"""
+Fila de Webhooks - WhatsApp Integration
+=======================================
+
+Ingestão assíncrona de webhooks da Evolution API.
+
+O webhook apenas grava o evento bruto em ``WebhookEvent`` e responde em
+milissegundos. Os workers (``manage.py processar_fila_webhooks``) consomem
+a fila em lotes, com idempotência por ``evolution_message_id``, e as
+estatísticas (profundidade e atraso) ficam disponíveis em
+``estatisticas_fila()``.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import EvolutionMessage, WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# Eventos em processamento há mais tempo que isso são considerados abandonados
+# (worker morto) e voltam para a fila
+LOCK_TIMEOUT = timedelta(seconds=getattr(settings, 'EVOLUTION_WEBHOOK_LOCK_TIMEOUT', 300))
+MAX_ATTEMPTS = getattr(settings, 'EVOLUTION_WEBHOOK_MAX_ATTEMPTS', 5)
+
+
+def extrair_message_id(data: Dict) -> Optional[str]:
+    """Extrai o ID da mensagem (chave de idempotência) do payload da Evolution API"""
+    event_data = data.get('data') or {}
+    if not isinstance(event_data, dict):
+        return None
+    return (event_data.get('key') or {}).get('id') or None
+
+
+def enfileirar_evento(data: Dict) -> Tuple[WebhookEvent, bool]:
+    """
+    Grava o evento bruto na fila
+
+    Reentregas do provedor com o mesmo ``evolution_message_id`` não geram
+    um novo evento.
+
+    Returns:
+        Tupla (evento, created)
+    """
+    message_id = extrair_message_id(data)
+    fields = {
+        'event': data.get('event') or '',
+        'instance_name': data.get('instance') or '',
+        'payload': data,
+    }
+
+    if not message_id:
+        return WebhookEvent.objects.create(**fields), True
+
+    try:
+        with transaction.atomic():
+            return WebhookEvent.objects.create(evolution_message_id=message_id, **fields), True
+    except IntegrityError:
+        logger.info(f"[WEBHOOK_QUEUE] Evento duplicado ignorado: {message_id}")
+        return WebhookEvent.objects.get(evolution_message_id=message_id), False
+
+
+def reservar_lote(batch_size: int = 50) -> List[WebhookEvent]:
+    """
+    Reserva um lote de eventos pendentes para processamento
+
+    Usa ``SELECT ... FOR UPDATE SKIP LOCKED`` para que vários workers possam
+    consumir a fila ao mesmo tempo sem pegar o mesmo evento.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        eventos = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True).filter(
+                Q(status=WebhookEvent.EventStatus.PENDING) |
+                Q(status=WebhookEvent.EventStatus.PROCESSING, locked_at__lt=now - LOCK_TIMEOUT)
+            ).order_by('received_at')[:batch_size]
+        )
+        if not eventos:
+            return []
+
+        for evento in eventos:
+            evento.status = WebhookEvent.EventStatus.PROCESSING
+            evento.locked_at = now
+            evento.attempts += 1
+        WebhookEvent.objects.bulk_update(eventos, ['status', 'locked_at', 'attempts'])
+
+    return eventos
+
+
+def processar_evento(evento: WebhookEvent) -> str:
+    """
+    Processa um evento da fila e atualiza seu status
+
+    Returns:
+        Status final do evento
+    """
+    from .views import processar_mensagem_evolution
+
+    close_old_connections()
+    try:
+        if evento.evolution_message_id and EvolutionMessage.objects.filter(
+            evolution_message_id=evento.evolution_message_id
+        ).exists():
+            # Já processado (ex: recebido antes em modo síncrono)
+            evento.status = WebhookEvent.EventStatus.SKIPPED
+        else:
+            processar_mensagem_evolution(evento.payload)
+            evento.status = WebhookEvent.EventStatus.DONE
+        evento.error_message = None
+        evento.processed_at = timezone.now()
+    except Exception as e:
+        logger.error(f"[WEBHOOK_QUEUE] Erro ao processar evento {evento.pk}: {str(e)}", exc_info=True)
+        evento.error_message = str(e)
+        if evento.attempts >= MAX_ATTEMPTS:
+            evento.status = WebhookEvent.EventStatus.ERROR
+        else:
+            evento.status = WebhookEvent.EventStatus.PENDING
+    finally:
+        evento.locked_at = None
+        evento.save(update_fields=['status', 'error_message', 'processed_at', 'locked_at'])
+        close_old_connections()
+
+    return evento.status
+
+
+def drenar_fila(batch_size: int = 50, workers: int = 4) -> Dict[str, int]:
+    """
+    Reserva um lote e processa os eventos em um pool de threads
+
+    Returns:
+        Dict com a contagem de eventos por status final
+    """
+    eventos = reservar_lote(batch_size)
+    resultado = {'total': len(eventos)}
+    if not eventos:
+        return resultado
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            status_finais = list(executor.map(processar_evento, eventos))
+    else:
+        status_finais = [processar_evento(evento) for evento in eventos]
+
+    for status in status_finais:
+        resultado[status] = resultado.get(status, 0) + 1
+    return resultado
+
+
+def estatisticas_fila() -> Dict:
+    """
+    Retorna profundidade e atraso da fila em uma única consulta
+
+    ``lag_seconds`` é a idade do evento pendente mais antigo.
+    """
+    stats = WebhookEvent.objects.aggregate(
+        pending=Count('id', filter=Q(status=WebhookEvent.EventStatus.PENDING)),
+        processing=Count('id', filter=Q(status=WebhookEvent.EventStatus.PROCESSING)),
+        error=Count('id', filter=Q(status=WebhookEvent.EventStatus.ERROR)),
+        oldest_pending=Min('received_at', filter=Q(status=WebhookEvent.EventStatus.PENDING)),
+    )
+    oldest_pending = stats.pop('oldest_pending')
+    stats['depth'] = stats['pending'] + stats['processing']
+    stats['lag_seconds'] = (
+        round((timezone.now() - oldest_pending).total_seconds(), 3) if oldest_pending else 0.0
+    )
+    stats['oldest_pending_at'] = oldest_pending.isoformat() if oldest_pending else None
+    return stats
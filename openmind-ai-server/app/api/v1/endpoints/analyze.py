@@ -2,12 +2,16 @@
 Endpoint de análise de imagens de produtos
 """
 import time
-from fastapi import APIRouter, File, UploadFile, HTTPException, status, Depends
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, File, Form, UploadFile, HTTPException, status, Depends
 from fastapi.responses import JSONResponse
 from app.core.security import verify_api_key
-from app.core.image_analyzer import analyze_product_image
+from app.core.image_analyzer import analyze_product_image_async, analyze_product_images_batch_async
+from app.core.concurrency import metrics
 from app.core.config import settings
-from app.models.schemas import AnalyzeResponse
+from app.models.schemas import AnalyzeResponse, BatchAnalyzeResponse
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,6 +19,85 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _validate_image_name(filename: Optional[str]):
+    """Valida o formato da imagem pela extensão"""
+    file_extension = filename.split('.')[-1].lower() if filename else ''
+    if file_extension not in settings.allowed_formats_list:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Formato de imagem não suportado. Formatos permitidos: {settings.ALLOWED_IMAGE_FORMATS}",
+            headers={"error_code": "UNSUPPORTED_FORMAT"}
+        )
+
+
+def _validate_image_size(image_data: bytes):
+    if len(image_data) > settings.max_image_size_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Imagem muito grande. Tamanho máximo: {settings.MAX_IMAGE_SIZE_MB}MB",
+            headers={"error_code": "IMAGE_TOO_LARGE"}
+        )
+
+
+async def _read_image(image: UploadFile) -> bytes:
+    """Valida tipo, formato e tamanho de uma imagem enviada e retorna seus bytes"""
+    # Validar tipo de arquivo
+    if not image.content_type or not image.content_type.startswith('image/'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Arquivo deve ser uma imagem",
+            headers={"error_code": "INVALID_IMAGE"}
+        )
+    
+    # Validar formato
+    _validate_image_name(image.filename)
+    
+    # Ler dados da imagem
+    image_data = await image.read()
+    
+    # Validar tamanho
+    _validate_image_size(image_data)
+    return image_data
+
+
+def _read_stored_image(image_path: str) -> bytes:
+    """Lê uma imagem já salva no servidor (caminho relativo ao MEDIA_ROOT)"""
+    media_root = Path(settings.MEDIA_ROOT).resolve()
+    relative = image_path.strip().lstrip('/')
+    if relative.startswith('media/'):
+        relative = relative[len('media/'):]
+    full_path = (media_root / relative).resolve()
+    
+    # Impedir acesso fora do MEDIA_ROOT (ex: ../../etc/passwd)
+    if media_root not in full_path.parents or not full_path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Imagem não encontrada: {image_path}",
+            headers={"error_code": "IMAGE_NOT_FOUND"}
+        )
+    
+    _validate_image_name(full_path.name)
+    image_data = full_path.read_bytes()
+    _validate_image_size(image_data)
+    return image_data
+
+
+def _save_uploaded_image(image_data: bytes, filename: Optional[str]) -> Tuple[str, str]:
+    """Salva uma imagem enviada em MEDIA_ROOT/uploads; retorna (image_path, saved_filename)"""
+    extension = (filename or '').rsplit('.', 1)[-1].lower() if filename and '.' in filename else 'jpg'
+    saved_filename = f"{uuid.uuid4()}.{extension}"
+    uploads = Path(settings.MEDIA_ROOT) / 'uploads'
+    uploads.mkdir(parents=True, exist_ok=True)
+    (uploads / saved_filename).write_bytes(image_data)
+    return f"media/uploads/{saved_filename}", saved_filename
+
+
+def _stored_image_path(image_path: str) -> str:
+    """Caminho de uma imagem já salva, no formato media/..."""
+    relative = image_path.strip().lstrip('/')
+    return relative if relative.startswith('media/') else f"media/{relative}"
+
+
 @router.post(
     "/analyze-product-image",
     response_model=AnalyzeResponse,
@@ -36,38 +119,12 @@ async def analyze_product_image_endpoint(
     start_time = time.time()
     
     try:
-        # Validar tipo de arquivo
-        if not image.content_type or not image.content_type.startswith('image/'):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Arquivo deve ser uma imagem",
-                headers={"error_code": "INVALID_IMAGE"}
-            )
-        
-        # Validar formato
-        file_extension = image.filename.split('.')[-1].lower() if image.filename else ''
-        if file_extension not in settings.allowed_formats_list:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Formato de imagem não suportado. Formatos permitidos: {settings.ALLOWED_IMAGE_FORMATS}",
-                headers={"error_code": "UNSUPPORTED_FORMAT"}
-            )
-        
-        # Ler dados da imagem
-        image_data = await image.read()
-        
-        # Validar tamanho
-        if len(image_data) > settings.max_image_size_bytes:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Imagem muito grande. Tamanho máximo: {settings.MAX_IMAGE_SIZE_MB}MB",
-                headers={"error_code": "IMAGE_TOO_LARGE"}
-            )
+        image_data = await _read_image(image)
         
         # Analisar imagem
         logger.info(f"Analisando imagem: {image.filename}, tamanho: {len(image_data)} bytes")
         
-        product_data = analyze_product_image(image_data, image.filename or 'image.jpg')
+        product_data = await analyze_product_image_async(image_data, image.filename or 'image.jpg')
         
         # Calcular tempo de processamento
         processing_time_ms = int((time.time() - start_time) * 1000)
@@ -93,3 +150,103 @@ async def analyze_product_image_endpoint(
             error_code="PROCESSING_ERROR",
             processing_time_ms=processing_time_ms
         )
+
+
+@router.post(
+    "/analyze-product-images",
+    response_model=BatchAnalyzeResponse,
+    summary="Analisa várias imagens do mesmo produto",
+    description="Analisa N fotos (ângulos) de um produto em uma requisição e retorna resultados por imagem e o produto consolidado"
+)
+async def analyze_product_images_batch_endpoint(
+    images: Optional[List[UploadFile]] = File(None, description="Imagens do produto"),
+    image_paths: Optional[List[str]] = Form(None, description="Imagens já salvas no servidor (relativas ao MEDIA_ROOT)"),
+    multi_image: bool = Form(True, description="Enviar todas as imagens em uma única chamada ao modelo"),
+    prompt: Optional[str] = Form(None, description="Prompt de análise (padrão: prompt do servidor)"),
+    language: Optional[str] = Form(None, description="Idioma dos textos extraídos (ex: pt-BR)"),
+    _: bool = Depends(verify_api_key)
+):
+    """
+    Analisa várias imagens de um produto em uma única requisição
+    
+    - **images**: Arquivos de imagem (JPEG, PNG, WebP)
+    - **image_paths**: Referências a imagens já salvas no servidor
+    - **multi_image**: Uma única chamada ao modelo para todas as imagens (padrão: true)
+    - **prompt**: Prompt de análise do cliente (o mesmo da análise por imagem)
+    - **language**: Idioma dos textos extraídos
+    - **Authorization**: Bearer token (API key)
+    
+    Retorna um resultado por imagem (na ordem: arquivos e depois referências),
+    com o ``image_path`` da imagem salva no servidor, e o produto consolidado
+    no formato JSON ÉVORA.
+    """
+    start_time = time.time()
+    
+    try:
+        # Validar a quantidade antes de ler/decodificar qualquer imagem
+        total_images = len(images or []) + len(image_paths or [])
+        if not total_images:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Envie ao menos uma imagem (images) ou referência (image_paths)",
+                headers={"error_code": "NO_IMAGES"}
+            )
+        if total_images > settings.BATCH_MAX_IMAGES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Máximo de {settings.BATCH_MAX_IMAGES} imagens por requisição",
+                headers={"error_code": "TOO_MANY_IMAGES"}
+            )
+        
+        batch = []
+        saved = []
+        for image in images or []:
+            image_data = await _read_image(image)
+            batch.append((image_data, image.filename or 'image.jpg'))
+            saved.append(_save_uploaded_image(image_data, image.filename))
+        for image_path in image_paths or []:
+            batch.append((_read_stored_image(image_path), image_path))
+            saved.append((_stored_image_path(image_path), Path(image_path).name))
+        
+        logger.info(f"Analisando lote de {len(batch)} imagem(ns) (multi_image={multi_image}, idioma: {language})")
+        
+        result = await analyze_product_images_batch_async(
+            batch, multi_image=multi_image, prompt=prompt, language=language
+        )
+        for item in result['results']:
+            item['image_path'], item['saved_filename'] = saved[item['index']]
+        
+        processing_time_ms = int((time.time() - start_time) * 1000)
+        logger.info(
+            f"Lote concluído em {processing_time_ms}ms "
+            f"(modo: {result['mode']}, chamadas ao modelo: {result['model_calls']})"
+        )
+        
+        return BatchAnalyzeResponse(
+            success=True,
+            processing_time_ms=processing_time_ms,
+            **result
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao processar lote de imagens: {str(e)}", exc_info=True)
+        processing_time_ms = int((time.time() - start_time) * 1000)
+        
+        return BatchAnalyzeResponse(
+            success=False,
+            error=f"Erro ao processar imagens: {str(e)}",
+            error_code="PROCESSING_ERROR",
+            processing_time_ms=processing_time_ms
+        )
+
+
+@router.get(
+    "/analyze-product-image/metrics",
+    summary="Métricas de concorrência da análise",
+    description="Chamadas ao modelo em andamento, aguardando vaga e tempos de espera (por processo)"
+)
+async def analyze_metrics_endpoint(_: bool = Depends(verify_api_key)):
+    """Retorna as métricas de fila da análise de imagens deste processo"""
+    return metrics.snapshot()
@@ -13,12 +13,25 @@ Princípios:
 """
 
 import logging
+import re
 from typing import Dict, Optional, Any, List
 from abc import ABC, abstractmethod
 from enum import Enum
 
 logger = logging.getLogger(__name__)
 
+# Vocabulário de intenções do vendedor, em ordem de precedência
+INTENT_VOCABULARY = [
+    ("add_to_cart", ['quero', 'adiciona', 'coloca', 'vou querer']),
+    ("ask_price", ['quanto', 'preço', 'custa', 'valor']),
+    ("ask_delivery", ['entrega', 'envio', 'frete', 'chega']),
+    ("finalize_order", ['finalizar', 'fechar', 'pagar', 'confirmar']),
+    ("set_quantity", ['2x', '3x', 'duas', 'três', 'quatro']),
+]
+_INTENT_PRECEDENCE = {intent: ordem for ordem, (intent, _) in enumerate(INTENT_VOCABULARY)}
+_INTENT_BY_TERM = {term: intent for intent, terms in INTENT_VOCABULARY for term in terms}
+_INTENT_RE = re.compile('|'.join(re.escape(term) for term in sorted(_INTENT_BY_TERM, key=len, reverse=True)))
+
 
 class AgentRole(Enum):
     """Papéis que o agente pode assumir"""
@@ -153,28 +166,11 @@ class VendedorAgent(AgnosticAgent):
             return self._handle_general_conversation(message, context)
     
     def _detect_intent(self, message: str) -> str:
-        """Detecta intenção da mensagem"""
-        # Adicionar ao pedido
-        if any(word in message for word in ['quero', 'adiciona', 'coloca', 'vou querer']):
-            return "add_to_cart"
-        
-        # Pergunta sobre preço
-        if any(word in message for word in ['quanto', 'preço', 'custa', 'valor']):
-            return "ask_price"
-        
-        # Pergunta sobre entrega
-        if any(word in message for word in ['entrega', 'envio', 'frete', 'chega']):
-            return "ask_delivery"
-        
-        # Finalizar pedido
-        if any(word in message for word in ['finalizar', 'fechar', 'pagar', 'confirmar']):
-            return "finalize_order"
-        
-        # Definir quantidade
-        if any(word in message for word in ['2x', '3x', 'duas', 'três', 'quatro']):
-            return "set_quantity"
-        
-        return "general"
+        """Detecta intenção da mensagem (uma passada da regex do vocabulário)"""
+        intents = {_INTENT_BY_TERM[match.group(0)] for match in _INTENT_RE.finditer(message)}
+        if not intents:
+            return "general"
+        return min(intents, key=_INTENT_PRECEDENCE.__getitem__)
     
     def _handle_add_to_cart(
         self,
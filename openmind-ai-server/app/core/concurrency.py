@@ -0,0 +1,111 @@
+"""
+Controle de concorrência da análise de imagens
+
+- Pool de processos para o trabalho CPU-bound (PIL, base64), fora do event loop
+- Semáforo limitando chamadas simultâneas ao modelo de visão
+- Métricas de fila (em andamento, aguardando, tempo de espera)
+"""
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_model_semaphore: Optional[asyncio.Semaphore] = None
+
+
+class AnalysisMetrics:
+    """Métricas de concorrência das chamadas ao modelo (por processo)"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.total_call_ms = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "max_concurrency": settings.MODEL_MAX_CONCURRENCY,
+            "avg_wait_ms": round(self.total_wait_ms / finished, 1) if finished else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 1),
+            "avg_model_call_ms": round(self.total_call_ms / finished, 1) if finished else 0.0,
+        }
+
+
+metrics = AnalysisMetrics()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Pool de processos para pré-processamento de imagens (criado sob demanda)"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESS_WORKERS)
+    return _process_pool
+
+
+def shutdown_process_pool():
+    """Encerra o pool de processos (shutdown do app)"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+async def run_cpu_bound(func: Callable, *args) -> Any:
+    """Executa ``func(*args)`` no pool de processos sem bloquear o event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), func, *args)
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _model_semaphore
+    if _model_semaphore is None:
+        _model_semaphore = asyncio.Semaphore(settings.MODEL_MAX_CONCURRENCY)
+    return _model_semaphore
+
+
+@asynccontextmanager
+async def model_slot():
+    """
+    Reserva uma vaga para chamar o modelo de visão
+
+    Uso:
+        async with model_slot():
+            response = await client.chat.completions.create(...)
+    """
+    semaphore = _get_semaphore()
+    metrics.waiting += 1
+    wait_start = time.perf_counter()
+    try:
+        await semaphore.acquire()
+    finally:
+        metrics.waiting -= 1
+
+    wait_ms = (time.perf_counter() - wait_start) * 1000
+    metrics.total_wait_ms += wait_ms
+    metrics.max_wait_ms = max(metrics.max_wait_ms, wait_ms)
+    metrics.in_flight += 1
+    call_start = time.perf_counter()
+    try:
+        yield
+        metrics.completed += 1
+    except BaseException:
+        metrics.failed += 1
+        raise
+    finally:
+        metrics.total_call_ms += (time.perf_counter() - call_start) * 1000
+        metrics.in_flight -= 1
+        semaphore.release()
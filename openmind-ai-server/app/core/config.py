@@ -36,6 +36,16 @@ class Settings(BaseSettings):
     MAX_IMAGE_SIZE_MB: int = 10
     ALLOWED_IMAGE_FORMATS: str = "jpeg,jpg,png,webp"
     IMAGE_MAX_DIMENSION: int = 2048
+    IMAGE_PROCESS_WORKERS: int = 2  # Processos para decode/resize/base64
+    
+    # Concorrência das chamadas ao modelo de visão (por processo uvicorn)
+    MODEL_MAX_CONCURRENCY: int = 16
+    
+    # Análise em lote (várias fotos do mesmo produto por requisição)
+    BATCH_MAX_IMAGES: int = 10
+    BATCH_MULTI_IMAGE_PROMPT: bool = True  # Todas as imagens em uma chamada (modelo multi-imagem)
+    BATCH_MAX_TOKENS: int = 8000
+    MEDIA_ROOT: str = "media"  # Imagens já salvas no servidor (referenciadas por image_paths)
     
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -1,98 +1,35 @@
 """
 Lógica de análise de imagens
 Integra com modelos de IA (OpenAI, Ollama, ou modelo customizado)
+
+O pré-processamento (decode/resize/base64) é CPU-bound e roda em um pool de
+processos; a chamada ao modelo usa o cliente assíncrono com concorrência
+limitada (ver app.core.concurrency), para não bloquear o event loop.
 """
 import os
+import re
 import json
 import base64
+import asyncio
 from io import BytesIO
-from PIL import Image
-from typing import Dict, Any
+from PIL import Image, ImageOps
+from typing import Dict, Any, List, Optional, Tuple
 from app.core.config import settings
+from app.core.concurrency import run_cpu_bound, model_slot
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Tentar importar OpenAI (para usar com OpenMind.org que é compatível)
 try:
-    from openai import OpenAI
+    from openai import OpenAI, AsyncOpenAI
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
 
 
-def analyze_product_image(image_data: bytes, image_filename: str) -> Dict[str, Any]:
-    """
-    Analisa uma imagem de produto e extrai informações
-    
-    Args:
-        image_data: Dados binários da imagem
-        image_filename: Nome do arquivo (para detectar formato)
-    
-    Returns:
-        dict: Dados extraídos no formato ÉVORA
-    """
-    # Redimensionar imagem se necessário
-    img = Image.open(BytesIO(image_data))
-    max_dim = settings.IMAGE_MAX_DIMENSION
-    
-    if img.width > max_dim or img.height > max_dim:
-        img.thumbnail((max_dim, max_dim), Image.Resampling.LANCZOS)
-        output = BytesIO()
-        img.save(output, format='JPEG', quality=90)
-        image_data = output.getvalue()
-        img = Image.open(BytesIO(image_data))
-    
-    # Converter para base64
-    base64_image = base64.b64encode(image_data).decode('utf-8')
-    
-    # Chamar modelo de IA - Priorizar OpenMind.org
-    # Usa OPENMIND_ORG_API_KEY ou OPENMIND_AI_API_KEY como fallback (mesma chave!)
-    org_api_key = settings.OPENMIND_ORG_API_KEY or settings.OPENMIND_AI_API_KEY
-    if org_api_key and settings.OPENMIND_ORG_BASE_URL:
-        return _analyze_with_openmind_org(img, base64_image, org_api_key)
-    elif OPENAI_AVAILABLE and settings.OPENAI_API_KEY:
-        return _analyze_with_openai(img, base64_image)
-    else:
-        # Fallback: retornar estrutura básica
-        return {
-            "nome_produto": "Produto identificado",
-            "categoria": "Não identificada",
-            "subcategoria": "",
-            "descricao": "Análise de imagem em desenvolvimento - Configure OPENMIND_ORG_API_KEY",
-            "caracteristicas": {},
-            "compatibilidade": {},
-            "codigo_barras": None,
-            "dimensoes_embalagem": {
-                "altura_cm": None,
-                "largura_cm": None,
-                "profundidade_cm": None
-            },
-            "peso_embalagem_gramas": None,
-            "preco_visivel": None
-        }
-
-
-def _analyze_with_openmind_org(img: Image.Image, base64_image: str, api_key: str = None) -> Dict[str, Any]:
-    """
-    Analisa imagem usando OpenMind.org API (compatível com OpenAI)
-    Você já pagou por isso! 🎉
-    """
-    if not OPENAI_AVAILABLE:
-        raise ValueError("OpenAI client não está disponível (necessário para OpenMind.org)")
-    
-    # Usa a chave fornecida ou OPENMIND_ORG_API_KEY ou OPENMIND_AI_API_KEY como fallback
-    if not api_key:
-        api_key = settings.OPENMIND_ORG_API_KEY or settings.OPENMIND_AI_API_KEY
-    
-    # OpenMind.org usa API compatível com OpenAI, mas com URL customizada
-    client = OpenAI(
-        api_key=api_key,
-        base_url=settings.OPENMIND_ORG_BASE_URL
-    )
-    
-    # Usar modelo de visão do OpenMind.org (mais barato!)
-    model = settings.OPENMIND_ORG_MODEL or "qwen2.5-vl-72b-instruct"
-    
-    # Prompt melhorado para extrair MÁXIMO de informações
-    prompt = """Analise esta imagem de um produto e extraia TODAS as informações possíveis visíveis no rótulo, etiqueta ou embalagem.
+# Prompt melhorado para extrair MÁXIMO de informações
+PRODUCT_ANALYSIS_PROMPT = """Analise esta imagem de um produto e extraia TODAS as informações possíveis visíveis no rótulo, etiqueta ou embalagem.
 
 🔍 MISSÃO: Identificar e extrair CADA TEXTO, NÚMERO, CÓDIGO, LOGO e INFORMAÇÃO visível na imagem.
 
@@ -164,36 +101,219 @@ REGRAS CRÍTICAS:
 8. Certificações: identifique todas as certificações/logos visíveis
 9. Para categoria/subcategoria, use termos comerciais padrão e seja específico
 10. Retorne APENAS o JSON válido, sem markdown, sem explicações adicionais"""
+
+# Prompt para várias fotos (ângulos) do mesmo produto em uma única chamada ao modelo
+MULTI_IMAGE_ANALYSIS_PROMPT = """As {total} imagens a seguir são fotos (ângulos diferentes) de um produto, numeradas de 0 a {total_menos_um} na ordem em que aparecem.
+
+Use as instruções abaixo para extrair as informações do produto, combinando o que estiver visível em TODAS as imagens
+(ex: nome na frente, ingredientes no verso, código de barras na lateral).
+
+{prompt}
+
+FORMATO DA RESPOSTA PARA VÁRIAS IMAGENS (substitui o formato acima):
+Retorne APENAS um JSON válido com esta estrutura:
+{{
+    "produto_consolidado": {{ ...JSON ÉVORA completo com os dados combinados de todas as imagens... }},
+    "imagens": [
+        {{
+            "indice": 0,
+            "mesmo_produto": true,
+            "dados": {{ ...JSON ÉVORA apenas com o que está visível NESTA imagem (null no restante)... }}
+        }}
+    ]
+}}
+
+REGRAS:
+1. "imagens" deve ter exatamente {total} itens, um por imagem, na mesma ordem
+2. "mesmo_produto" = false se a imagem mostrar um produto diferente das demais
+3. Não invente informações - use null quando não estiver visível"""
+
+FALLBACK_PRODUCT_DATA = {
+    "nome_produto": "Produto identificado",
+    "categoria": "Não identificada",
+    "subcategoria": "",
+    "descricao": "Análise de imagem em desenvolvimento - Configure OPENMIND_ORG_API_KEY",
+    "caracteristicas": {},
+    "compatibilidade": {},
+    "codigo_barras": None,
+    "dimensoes_embalagem": {
+        "altura_cm": None,
+        "largura_cm": None,
+        "profundidade_cm": None
+    },
+    "peso_embalagem_gramas": None,
+    "preco_visivel": None
+}
+
+# Clientes assíncronos compartilhados (um pool de conexões por processo)
+_async_clients: Dict[str, "AsyncOpenAI"] = {}
+
+
+def prepare_image_bytes(image_data: bytes, max_dim: int, quality: int = 90) -> bytes:
+    """
+    Estágio único de pré-processamento: decode (uma vez), orientação, EXIF e redução
     
-    # Chamar OpenMind.org API (compatível com OpenAI)
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
+    - JPEG: decodificado já reduzido (``Image.draft``, escala DCT) - bem mais rápido
+      e com menos memória que decodificar na resolução total
+    - Aplica a orientação EXIF (``exif_transpose``) e descarta os metadados
+    - Transparência vira fundo branco; o resultado é sempre JPEG RGB
+    
+    Se a imagem já é um JPEG sem EXIF dentro de ``max_dim``, os bytes originais
+    são devolvidos sem recodificar.
+    
+    Args:
+        image_data: Dados binários da imagem
+        max_dim: Maior dimensão (largura/altura) permitida
+        quality: Qualidade JPEG da recodificação
+    
+    Returns:
+        bytes: Imagem JPEG pronta para o modelo
+    """
+    img = Image.open(BytesIO(image_data))
+    
+    if (img.format == 'JPEG' and img.width <= max_dim and img.height <= max_dim
+            and 'exif' not in img.info and img.mode in ('RGB', 'L')):
+        return image_data
+    
+    if img.format == 'JPEG':
+        # Reduz na decodificação para a menor escala (1/2, 1/4, 1/8) que mantém
+        # os dois lados >= o alvo - o alvo precisa ter a proporção da imagem
+        # (com uma caixa quadrada o lado menor impede a redução)
+        scale = max_dim / max(img.size)
+        img.draft('RGB', (int(img.width * scale), int(img.height * scale)))
+    
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((max_dim, max_dim), Image.Resampling.LANCZOS)
+    
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        img = background
+    elif img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    
+    # Salvar sem ``exif=`` remove os metadados (GPS, câmera, orientação)
+    output = BytesIO()
+    img.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def preprocess_image(image_data: bytes) -> str:
+    """
+    Prepara a imagem (ver ``prepare_image_bytes``) e converte para base64
+    
+    Função pura de módulo para poder rodar no pool de processos.
+    
+    Args:
+        image_data: Dados binários da imagem
+    
+    Returns:
+        str: Imagem em base64
+    """
+    image_data = prepare_image_bytes(image_data, settings.IMAGE_MAX_DIMENSION)
+    return base64.b64encode(image_data).decode('utf-8')
+
+
+def _select_backend() -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
+    """
+    Escolhe o backend de IA - Priorizar OpenMind.org
+    
+    Usa OPENMIND_ORG_API_KEY ou OPENMIND_AI_API_KEY como fallback (mesma chave!)
+    
+    Returns:
+        Tupla (backend, api_key, base_url, model) - backend None se nenhum configurado
+    """
+    org_api_key = settings.OPENMIND_ORG_API_KEY or settings.OPENMIND_AI_API_KEY
+    if org_api_key and settings.OPENMIND_ORG_BASE_URL:
+        model = settings.OPENMIND_ORG_MODEL or "qwen2.5-vl-72b-instruct"
+        return "openmind_org", org_api_key, settings.OPENMIND_ORG_BASE_URL, model
+    elif OPENAI_AVAILABLE and settings.OPENAI_API_KEY:
+        return "openai", settings.OPENAI_API_KEY, None, settings.OPENAI_MODEL
+    return None, None, None, None
+
+
+def build_prompt(prompt: Optional[str] = None, language: Optional[str] = None) -> str:
+    """
+    Prompt de análise: o enviado pelo cliente (editável no banco do marketplace)
+    ou o padrão, com a instrução de idioma quando informado
+    """
+    text = (prompt or '').strip() or PRODUCT_ANALYSIS_PROMPT
+    if language:
+        text += f"\n\nIDIOMA: escreva os textos extraídos e descritivos (descrição, categoria, características) em {language}."
+    return text
+
+
+def _build_messages(base64_image: str, prompt: Optional[str] = None) -> list:
+    """Mensagens do chat para análise de uma imagem"""
+    return [
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": prompt or PRODUCT_ANALYSIS_PROMPT
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{base64_image}"
                     }
-                ]
+                }
+            ]
+        }
+    ]
+
+
+def _build_multi_image_messages(base64_images: List[str], prompt: Optional[str] = None) -> list:
+    """Mensagens do chat para análise de várias imagens do mesmo produto"""
+    content = [
+        {
+            "type": "text",
+            "text": MULTI_IMAGE_ANALYSIS_PROMPT.format(
+                total=len(base64_images),
+                total_menos_um=len(base64_images) - 1,
+                prompt=prompt or PRODUCT_ANALYSIS_PROMPT
+            )
+        }
+    ]
+    for base64_image in base64_images:
+        content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:image/jpeg;base64,{base64_image}"
             }
-        ],
-        max_tokens=4000,
-        temperature=0.1
-    )
+        })
+    return [{"role": "user", "content": content}]
+
+
+def consolidate_product_data(products: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combina os dados ÉVORA de várias imagens do mesmo produto
     
-    # Extrair resposta (mesmo formato OpenAI)
-    content = response.choices[0].message.content.strip()
+    Para cada campo usa o primeiro valor preenchido (na ordem das imagens);
+    dicionários são combinados campo a campo e listas são unidas sem duplicatas.
+    """
+    consolidated: Dict[str, Any] = {}
+    for product in products:
+        for key, value in (product or {}).items():
+            if value in (None, "", [], {}):
+                continue
+            current = consolidated.get(key)
+            if current in (None, "", [], {}):
+                consolidated[key] = value
+            elif isinstance(current, dict) and isinstance(value, dict):
+                consolidated[key] = consolidate_product_data([current, value])
+            elif isinstance(current, list) and isinstance(value, list):
+                consolidated[key] = current + [item for item in value if item not in current]
+    return consolidated
+
+
+def _parse_model_response(content: str) -> Dict[str, Any]:
+    """Extrai o JSON ÉVORA da resposta do modelo"""
+    content = content.strip()
     
     # Remover markdown code blocks
-    import re
     if content.startswith('```json'):
         content = content.replace('```json', '').replace('```', '').strip()
     elif content.startswith('```'):
@@ -213,132 +333,247 @@ REGRAS CRÍTICAS:
     return product_data
 
 
-def _analyze_with_openai(img: Image.Image, base64_image: str) -> Dict[str, Any]:
+def _get_async_client(api_key: str, base_url: Optional[str]) -> "AsyncOpenAI":
+    """Retorna o cliente assíncrono compartilhado para (api_key, base_url)"""
+    key = f"{base_url or 'openai'}:{api_key}"
+    client = _async_clients.get(key)
+    if client is None:
+        client = AsyncOpenAI(api_key=api_key, base_url=base_url) if base_url else AsyncOpenAI(api_key=api_key)
+        _async_clients[key] = client
+    return client
+
+
+async def close_async_clients():
+    """Fecha os clientes assíncronos (shutdown do app)"""
+    for client in _async_clients.values():
+        await client.close()
+    _async_clients.clear()
+
+
+async def analyze_product_image_async(image_data: bytes, image_filename: str) -> Dict[str, Any]:
     """
-    Analisa imagem usando OpenAI Vision API
+    Versão assíncrona de ``analyze_product_image`` (usada pelos endpoints)
+    
+    Args:
+        image_data: Dados binários da imagem
+        image_filename: Nome do arquivo (para detectar formato)
+    
+    Returns:
+        dict: Dados extraídos no formato ÉVORA
     """
+    backend, api_key, base_url, model = _select_backend()
+    if backend is None:
+        # Fallback: retornar estrutura básica
+        return dict(FALLBACK_PRODUCT_DATA)
     if not OPENAI_AVAILABLE:
-        raise ValueError("OpenAI não está disponível")
+        raise ValueError("OpenAI client não está disponível (necessário para OpenMind.org)")
     
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    base64_image = await run_cpu_bound(preprocess_image, image_data)
     
-    # Prompt melhorado para extrair MÁXIMO de informações
-    prompt = """Analise esta imagem de um produto e extraia TODAS as informações possíveis visíveis no rótulo, etiqueta ou embalagem.
+    return await _call_model_async(api_key, base_url, model, _build_messages(base64_image))
 
-🔍 MISSÃO: Identificar e extrair CADA TEXTO, NÚMERO, CÓDIGO, LOGO e INFORMAÇÃO visível na imagem.
 
-IMPORTANTE: 
-- Leia TODOS os textos da imagem, incluindo textos pequenos, números de série, códigos, ingredientes, instruções
-- Extraia dados REAIS que estão visíveis na imagem. NÃO invente informações.
-- Se uma informação estiver parcialmente visível, extraia o que conseguir
-- Seja EXTREMAMENTE DETALHADO na descrição - inclua todos os textos que conseguir ler
+async def _call_model_async(api_key: str, base_url: Optional[str], model: str, messages: list,
+                            max_tokens: int = 4000) -> Dict[str, Any]:
+    """Chama o modelo de visão (com vaga reservada) e parseia o JSON da resposta"""
+    client = _get_async_client(api_key, base_url)
+    async with model_slot():
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=0.1
+        )
+    
+    return _parse_model_response(response.choices[0].message.content)
 
-Retorne APENAS um JSON válido no formato ÉVORA com esta estrutura EXATA (preencha TODOS os campos possíveis):
-{
-    "nome_produto": "Nome COMPLETO exatamente como aparece no rótulo/embalagem",
-    "categoria": "Categoria principal (ex: Eletrônicos, Roupas, Cosméticos, Alimentos, Bebidas, Produtos de Limpeza, etc.)",
-    "subcategoria": "Subcategoria específica e detalhada",
-    "descricao": "Descrição COMPLETA incluindo TODOS os textos visíveis: características, benefícios, ingredientes, modo de uso, advertências, etc.",
-    "caracteristicas": {
-        "marca": "Marca do produto (se visível)",
-        "modelo": "Modelo/versão específica (se visível)",
-        "tipo": "Tipo específico do produto (ex: Eau de Parfum, Shampoo Anticaspa, etc.)",
-        "funcoes": ["lista de todas as funções mencionadas"],
-        "conectividade": "Tipo de conexão se aplicável",
-        "aplicativo_compativel": "Nome do app se mencionado",
-        "plataformas": ["iOS", "Android", "PC"],
-        "bateria": "Informações de bateria se visível",
-        "material": "Material(s) do produto (se visível)",
-        "cor": "Cor(s) do produto (se visível)",
-        "alcance_estimado": "Alcance ou distância (se visível)",
-        "volume_ml": "Volume em ml se visível",
-        "peso_kg": "Peso em kg se visível",
-        "tamanho": "Tamanho/porte se visível (ex: Grande, Médio, P, M, G, GG)",
-        "fragrancia": "Fragrância se for produto perfumado",
-        "ingredientes": "Lista de ingredientes se visível (pode ser resumida)",
-        "certificacoes": "Certificações se visível (ex: Orgânico, Vegano, Cruelty Free)",
-        "beneficios": "Benefícios mencionados no produto",
-        "uso": "Modo de uso se visível",
-        "validade": "Validade ou prazo de validade se visível",
-        "lote": "Número de lote se visível"
-    },
-    "compatibilidade": {
-        "ios": "Modelos iOS compatíveis se visível",
-        "android": "Versão Android mínima se visível",
-        "sistemas": ["iOS", "Android", "PC", "Windows", "Mac"]
-    },
-    "dimensoes_embalagem": {
-        "altura_cm": "altura se visível (número)",
-        "largura_cm": "largura se visível (número)",
-        "profundidade_cm": "profundidade se visível (número)",
-        "diametro_cm": "diâmetro se for produto cilíndrico",
-        "formato": "Formato da embalagem se relevante"
-    },
-    "peso_embalagem_gramas": "peso em gramas se visível (número)",
-    "codigo_barras": "Código de barras COMPLETO se visível (EAN, UPC, etc.)",
-    "codigo_interno": "Código interno/ref do fabricante se visível",
-    "fabricante": "Nome completo do fabricante se visível",
-    "pais_origem": "País de origem/fabricação se visível",
-    "data_fabricacao": "Data de fabricação se visível (formato YYYY-MM-DD)",
-    "preco_visivel": "Preço se estiver IMPRESSO na embalagem original (não etiqueta de loja)",
-    "informacoes_adicionais": "Qualquer outro texto ou informação visível que não se encaixe nos campos acima"
-}
 
-REGRAS CRÍTICAS:
-1. LEIA CADA TEXTO da imagem - não pule informações
-2. Se alguma informação NÃO estiver visível, use null (não invente)
-3. Preço: apenas se estiver IMPRESSO na EMBALAGEM do produto, NÃO em etiquetas de loja
-4. Descrição: seja EXTREMAMENTE DETALHADO - inclua textos de ingredientes, benefícios, advertências, modo de uso
-5. Características: extraia TODOS os detalhes visíveis (tamanho, cor, material, tipo, etc.)
-6. Código de barras: se visível, copie COMPLETO
-7. Ingredientes: se houver lista longa, mencione os principais e indique quantidade
-8. Certificações: identifique todas as certificações/logos visíveis
-9. Para categoria/subcategoria, use termos comerciais padrão e seja específico
-10. Retorne APENAS o JSON válido, sem markdown, sem explicações adicionais"""
+async def analyze_product_images_batch_async(
+    images: List[Tuple[bytes, str]],
+    multi_image: bool = True,
+    prompt: Optional[str] = None,
+    language: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Analisa várias imagens (ângulos) de um produto em uma única requisição
     
-    # Chamar OpenAI Vision API
-    response = client.chat.completions.create(
-        model=settings.OPENAI_MODEL,
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": prompt
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
-                    }
-                ]
+    O pré-processamento de todas as imagens roda em paralelo no pool de
+    processos. Com ``multi_image`` (e mais de uma imagem), todas as imagens vão
+    em uma única chamada ao modelo; se o modelo não suportar ou a resposta vier
+    fora do formato, cai para uma chamada por imagem (em paralelo).
+    
+    Args:
+        images: Lista de tuplas (dados binários, nome do arquivo)
+        multi_image: Enviar todas as imagens em um único prompt
+        prompt: Prompt de análise do cliente (padrão: PRODUCT_ANALYSIS_PROMPT)
+        language: Idioma dos textos extraídos (ex: pt-BR)
+    
+    Returns:
+        dict com ``results`` (um item por imagem, na ordem recebida),
+        ``produto_consolidado``, ``mode`` e ``model_calls``
+    """
+    backend, api_key, base_url, model = _select_backend()
+    if backend is None:
+        # Fallback: retornar estrutura básica
+        return {
+            "mode": "fallback",
+            "model_calls": 0,
+            "results": [
+                {"index": idx, "filename": filename, "success": True, "data": dict(FALLBACK_PRODUCT_DATA)}
+                for idx, (_, filename) in enumerate(images)
+            ],
+            "produto_consolidado": dict(FALLBACK_PRODUCT_DATA),
+        }
+    if not OPENAI_AVAILABLE:
+        raise ValueError("OpenAI client não está disponível (necessário para OpenMind.org)")
+    
+    prompt = build_prompt(prompt, language)
+    
+    # Pipeline de pré-processamento compartilhado (todas as imagens em paralelo)
+    base64_images = await asyncio.gather(
+        *(run_cpu_bound(preprocess_image, image_data) for image_data, _ in images)
+    )
+    
+    if multi_image and len(images) > 1 and settings.BATCH_MULTI_IMAGE_PROMPT:
+        try:
+            response_data = await _call_model_async(
+                api_key, base_url, model,
+                _build_multi_image_messages(list(base64_images), prompt),
+                max_tokens=settings.BATCH_MAX_TOKENS
+            )
+            per_image = response_data.get("imagens")
+            consolidated = response_data.get("produto_consolidado")
+            if not isinstance(consolidated, dict) or not isinstance(per_image, list):
+                raise ValueError("Resposta multi-imagem fora do formato esperado")
+            
+            by_index = {
+                item.get("indice"): item for item in per_image
+                if isinstance(item, dict)
+            }
+            results = []
+            for idx, (_, filename) in enumerate(images):
+                item = by_index.get(idx) or {}
+                results.append({
+                    "index": idx,
+                    "filename": filename,
+                    "success": bool(item),
+                    "mesmo_produto": item.get("mesmo_produto", True),
+                    "data": item.get("dados") if isinstance(item.get("dados"), dict) else None,
+                    "error": None if item else "Imagem ausente na resposta do modelo",
+                })
+            return {
+                "mode": "multi_image",
+                "model_calls": 1,
+                "results": results,
+                "produto_consolidado": consolidated,
             }
-        ],
+        except Exception as e:
+            logger.warning(f"Análise multi-imagem falhou, usando uma chamada por imagem: {str(e)}")
+    
+    # Uma chamada por imagem, em paralelo (limitadas pelo semáforo do modelo)
+    responses = await asyncio.gather(
+        *(_call_model_async(api_key, base_url, model, _build_messages(b64, prompt)) for b64 in base64_images),
+        return_exceptions=True
+    )
+    results = []
+    for idx, ((_, filename), response_data) in enumerate(zip(images, responses)):
+        if isinstance(response_data, Exception):
+            results.append({
+                "index": idx,
+                "filename": filename,
+                "success": False,
+                "data": None,
+                "error": str(response_data),
+            })
+        else:
+            results.append({
+                "index": idx,
+                "filename": filename,
+                "success": True,
+                "data": response_data,
+                "error": None,
+            })
+    
+    return {
+        "mode": "per_image",
+        "model_calls": len(images),
+        "results": results,
+        "produto_consolidado": consolidate_product_data(
+            [r["data"] for r in results if r["success"]]
+        ) or None,
+    }
+
+
+def analyze_product_image(image_data: bytes, image_filename: str) -> Dict[str, Any]:
+    """
+    Analisa uma imagem de produto e extrai informações (versão síncrona)
+    
+    Args:
+        image_data: Dados binários da imagem
+        image_filename: Nome do arquivo (para detectar formato)
+    
+    Returns:
+        dict: Dados extraídos no formato ÉVORA
+    """
+    backend, api_key, base_url, model = _select_backend()
+    if backend is None:
+        # Fallback: retornar estrutura básica
+        return dict(FALLBACK_PRODUCT_DATA)
+    
+    base64_image = preprocess_image(image_data)
+    
+    if backend == "openmind_org":
+        return _analyze_with_openmind_org(base64_image, api_key)
+    return _analyze_with_openai(base64_image)
+
+
+def _analyze_with_openmind_org(base64_image: str, api_key: str = None) -> Dict[str, Any]:
+    """
+    Analisa imagem usando OpenMind.org API (compatível com OpenAI)
+    Você já pagou por isso! 🎉
+    """
+    if not OPENAI_AVAILABLE:
+        raise ValueError("OpenAI client não está disponível (necessário para OpenMind.org)")
+    
+    # Usa a chave fornecida ou OPENMIND_ORG_API_KEY ou OPENMIND_AI_API_KEY como fallback
+    if not api_key:
+        api_key = settings.OPENMIND_ORG_API_KEY or settings.OPENMIND_AI_API_KEY
+    
+    # OpenMind.org usa API compatível com OpenAI, mas com URL customizada
+    client = OpenAI(
+        api_key=api_key,
+        base_url=settings.OPENMIND_ORG_BASE_URL
+    )
+    
+    # Usar modelo de visão do OpenMind.org (mais barato!)
+    model = settings.OPENMIND_ORG_MODEL or "qwen2.5-vl-72b-instruct"
+    
+    # Chamar OpenMind.org API (compatível com OpenAI)
+    response = client.chat.completions.create(
+        model=model,
+        messages=_build_messages(base64_image),
         max_tokens=4000,
         temperature=0.1
     )
     
-    # Extrair resposta
-    content = response.choices[0].message.content.strip()
+    return _parse_model_response(response.choices[0].message.content)
+
+
+def _analyze_with_openai(base64_image: str) -> Dict[str, Any]:
+    """
+    Analisa imagem usando OpenAI Vision API
+    """
+    if not OPENAI_AVAILABLE:
+        raise ValueError("OpenAI não está disponível")
     
-    # Remover markdown code blocks
-    import re
-    if content.startswith('```json'):
-        content = content.replace('```json', '').replace('```', '').strip()
-    elif content.startswith('```'):
-        content = content.replace('```', '').strip()
+    client = OpenAI(api_key=settings.OPENAI_API_KEY)
     
-    # Parsear JSON
-    try:
-        product_data = json.loads(content)
-    except json.JSONDecodeError as e:
-        # Tentar extrair JSON do texto
-        json_match = re.search(r'\{.*\}', content, re.DOTALL)
-        if json_match:
-            product_data = json.loads(json_match.group())
-        else:
-            raise ValueError(f"Erro ao parsear JSON da resposta: {str(e)}")
+    # Chamar OpenAI Vision API
+    response = client.chat.completions.create(
+        model=settings.OPENAI_MODEL,
+        messages=_build_messages(base64_image),
+        max_tokens=4000,
+        temperature=0.1
+    )
     
-    return product_data
+    return _parse_model_response(response.choices[0].message.content)
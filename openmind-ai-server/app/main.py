@@ -2,12 +2,15 @@
 OpenMind AI Server - FastAPI Application
 Servidor de IA para análise de imagens de produtos (ÉVORA Connect)
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.core.config import settings
 from app.api.v1.endpoints import analyze, agent
 from app.models.schemas import HealthResponse
+from app.core.concurrency import shutdown_process_pool
+from app.core.image_analyzer import close_async_clients
 import logging
 
 # Configurar logging
@@ -18,13 +21,22 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Libera o pool de processos e os clientes HTTP no shutdown"""
+    yield
+    await close_async_clients()
+    shutdown_process_pool()
+
+
 # Criar aplicação FastAPI
 app = FastAPI(
     title="OpenMind AI Server",
     description="Servidor de IA para análise de imagens de produtos - ÉVORA Connect",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -15,6 +15,30 @@ class AnalyzeResponse(BaseModel):
     processing_time_ms: Optional[int] = None
 
 
+class BatchImageResult(BaseModel):
+    """Resultado de uma imagem na análise em lote"""
+    index: int
+    filename: str
+    success: bool
+    mesmo_produto: Optional[bool] = None
+    data: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    image_path: Optional[str] = None  # Imagem salva no servidor (ex: media/uploads/uuid.jpg)
+    saved_filename: Optional[str] = None
+
+
+class BatchAnalyzeResponse(BaseModel):
+    """Resposta da análise em lote (várias imagens do mesmo produto)"""
+    success: bool
+    mode: Optional[str] = None
+    model_calls: int = 0
+    results: List[BatchImageResult] = []
+    produto_consolidado: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    error_code: Optional[str] = None
+    processing_time_ms: Optional[int] = None
+
+
 class HealthResponse(BaseModel):
     """Resposta do health check"""
     status: str
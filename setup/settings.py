@@ -23,6 +23,19 @@ OPENMIND_AI_URL = config("OPENMIND_AI_URL", default="")
 OPENMIND_AI_KEY = config("OPENMIND_AI_KEY", default="")
 OPENMIND_AI_TIMEOUT = config("OPENMIND_AI_TIMEOUT", default=30, cast=int)
 OPENMIND_ORG_MODEL = config("OPENMIND_ORG_MODEL", default="qwen2.5-vl-72b-instruct")
+# Cache dos resultados de análise de imagem (chave: SHA-256 + hash perceptual + idioma + versão do prompt)
+# Usa o cache do Django; com DummyCache (ou IMAGE_ANALYSIS_CACHE_DIR definido) usa um store em disco
+IMAGE_ANALYSIS_CACHE_TTL = config("IMAGE_ANALYSIS_CACHE_TTL", default=7 * 24 * 3600, cast=int)  # 0 desativa
+IMAGE_ANALYSIS_CACHE_MAX_ENTRIES = config("IMAGE_ANALYSIS_CACHE_MAX_ENTRIES", default=2000, cast=int)
+IMAGE_ANALYSIS_CACHE_DIR = config("IMAGE_ANALYSIS_CACHE_DIR", default="")
+IMAGE_ANALYSIS_PROMPT_VERSION = config("IMAGE_ANALYSIS_PROMPT_VERSION", default="v1")  # alterar invalida o cache
+# Análises simultâneas ao receber várias fotos do mesmo produto
+IMAGE_ANALYSIS_MAX_PARALLEL = config("IMAGE_ANALYSIS_MAX_PARALLEL", default=4, cast=int)
+# Redução da imagem antes do envio ao MCP (decode em modo draft, sem EXIF, orientação corrigida)
+IMAGE_ANALYSIS_MAX_DIMENSION = config("IMAGE_ANALYSIS_MAX_DIMENSION", default=1600, cast=int)
+IMAGE_ANALYSIS_JPEG_QUALITY = config("IMAGE_ANALYSIS_JPEG_QUALITY", default=85, cast=int)
+# Usar o endpoint em lote do OpenMind AI (/analyze-product-images) para várias fotos do mesmo produto
+OPENMIND_BATCH_ANALYSIS = config("OPENMIND_BATCH_ANALYSIS", default=False, cast=bool)
 
 # Agente Ágnosto SinapUm - Para processamento de mensagens WhatsApp
 SINAPUM_AGENT_URL = config("SINAPUM_AGENT_URL", default="http://69.169.102.84:8001/api/v1/process-message")
@@ -47,6 +60,30 @@ PROMPT_MAPPING = {
 EVOLUTION_API_URL = config("EVOLUTION_API_URL", default="http://69.169.102.84:8004")
 EVOLUTION_API_KEY = config("EVOLUTION_API_KEY", default="GKvy6psn-8HHpBQ4HAHKFOXnwjHR-oSzeGZzCaws0xg")
 EVOLUTION_INSTANCE_NAME = config("EVOLUTION_INSTANCE_NAME", default="default")
+# Cliente HTTP da Evolution API (sessão compartilhada por processo)
+EVOLUTION_HTTP_POOL_SIZE = config("EVOLUTION_HTTP_POOL_SIZE", default=20, cast=int)
+EVOLUTION_HTTP_KEEPALIVE = config("EVOLUTION_HTTP_KEEPALIVE", default=60, cast=int)  # segundos ociosos até o TCP keep-alive
+EVOLUTION_HTTP_MAX_RETRIES = config("EVOLUTION_HTTP_MAX_RETRIES", default=3, cast=int)
+EVOLUTION_HTTP_BACKOFF = config("EVOLUTION_HTTP_BACKOFF", default=0.3, cast=float)
+EVOLUTION_CIRCUIT_FAILURES = config("EVOLUTION_CIRCUIT_FAILURES", default=5, cast=int)
+EVOLUTION_CIRCUIT_RESET = config("EVOLUTION_CIRCUIT_RESET", default=30, cast=int)
+EVOLUTION_LOOKUP_CACHE_TTL = config("EVOLUTION_LOOKUP_CACHE_TTL", default=300, cast=int)  # cache de instância/contato
+# Envio em massa (python manage.py processar_broadcasts --loop)
+EVOLUTION_BROADCAST_WORKERS = config("EVOLUTION_BROADCAST_WORKERS", default=4, cast=int)
+EVOLUTION_BROADCAST_RATE = config("EVOLUTION_BROADCAST_RATE", default=1.0, cast=float)  # mensagens/s por instância
+EVOLUTION_BROADCAST_BURST = config("EVOLUTION_BROADCAST_BURST", default=5, cast=int)
+EVOLUTION_BROADCAST_LOCK_TIMEOUT = config("EVOLUTION_BROADCAST_LOCK_TIMEOUT", default=300, cast=int)  # campanha sem sinal do worker é retomada
+# Fila de webhooks: quando ativa, o webhook só grava o evento e os workers
+# (python manage.py processar_fila_webhooks --loop) fazem o processamento
+EVOLUTION_WEBHOOK_ASYNC = config("EVOLUTION_WEBHOOK_ASYNC", default=False, cast=bool)
+EVOLUTION_WEBHOOK_LOCK_TIMEOUT = config("EVOLUTION_WEBHOOK_LOCK_TIMEOUT", default=300, cast=int)
+EVOLUTION_WEBHOOK_MAX_ATTEMPTS = config("EVOLUTION_WEBHOOK_MAX_ATTEMPTS", default=5, cast=int)
+# Outbox dos pedidos WhatsApp (pagamento, link, pacote KMN, prova social):
+# despachada após o commit e pelo worker (python manage.py despachar_outbox --loop)
+OUTBOX_DISPATCH_ON_COMMIT = config("OUTBOX_DISPATCH_ON_COMMIT", default=True, cast=bool)
+OUTBOX_LOCK_TIMEOUT = config("OUTBOX_LOCK_TIMEOUT", default=300, cast=int)
+OUTBOX_MAX_ATTEMPTS = config("OUTBOX_MAX_ATTEMPTS", default=5, cast=int)
+OUTBOX_RETRY_BACKOFF = config("OUTBOX_RETRY_BACKOFF", default=30, cast=int)  # segundos, dobra a cada tentativa
 
 # Lead Registry - Core_SinapUm Integration
 CORE_LEAD_URL = config("CORE_LEAD_URL", default="http://69.169.102.84:5000")
@@ -385,3 +422,49 @@ else:
         }
     }
 
+
+# Catálogo KMN por cliente em cache (invalidado por signals em Oferta/Produto/ClienteRelacao)
+KMN_CATALOGO_CACHE_TTL = config("KMN_CATALOGO_CACHE_TTL", default=600, cast=int)
+
+# Ingestão em lote de engajamentos do Ágora (POST /api/agora/publicacoes/engajamentos/)
+AGORA_ENGAJAMENTO_BUFFER_SIZE = config("AGORA_ENGAJAMENTO_BUFFER_SIZE", default=500, cast=int)
+AGORA_ENGAJAMENTO_FLUSH_SECONDS = config("AGORA_ENGAJAMENTO_FLUSH_SECONDS", default=5.0, cast=float)
+AGORA_ENGAJAMENTO_MAX_EVENTOS = config("AGORA_ENGAJAMENTO_MAX_EVENTOS", default=100, cast=int)  # por requisição
+AGORA_VIEW_COALESCE_SECONDS = config("AGORA_VIEW_COALESCE_SECONDS", default=30, cast=int)  # views repetidas viram uma
+
+# SparkScore do Ágora (python manage.py atualizar_spark_score --loop)
+AGORA_SCORE_MEIA_VIDA_HORAS = config("AGORA_SCORE_MEIA_VIDA_HORAS", default=24.0, cast=float)  # decaimento do engajamento
+AGORA_SCORE_MAX_IDADE_HORAS = config("AGORA_SCORE_MAX_IDADE_HORAS", default=6.0, cast=float)  # recalcular mesmo sem engajamento novo
+AGORA_SCORE_MARGEM_COMMIT_SEGUNDOS = config("AGORA_SCORE_MARGEM_COMMIT_SEGUNDOS", default=30.0, cast=float)  # duração máxima de uma transação de engajamento
+
+# Ranking público do Ágora (GET /api/agora/analytics/), materializado em cache
+AGORA_LEADERBOARD_TAMANHO = config("AGORA_LEADERBOARD_TAMANHO", default=100, cast=int)
+AGORA_LEADERBOARD_TTL = config("AGORA_LEADERBOARD_TTL", default=60, cast=int)  # segundos
+
+# Contadores/tags da caixa de entrada de conversas, em cache por usuário
+INBOX_FACETS_CACHE_TTL = config("INBOX_FACETS_CACHE_TTL", default=30, cast=int)
+
+# Pontos de guarda por proximidade (índice em memória; coordenadas via manage.py geocodificar_enderecos)
+KEEPER_INDEX_TTL = config("KEEPER_INDEX_TTL", default=300, cast=int)  # reconstrução periódica (alterações de outros processos)
+GEOCODER_URL = config("GEOCODER_URL", default="https://nominatim.openstreetmap.org/search")
+GEOCODER_USER_AGENT = config("GEOCODER_USER_AGENT", default="vitrinezap-geocoder")
+
+# Classificador de mensagens (marcas, labels promocionais, intenções) - dicionário editável no admin
+TEXT_CLASSIFIER_RELOAD_SECONDS = config("TEXT_CLASSIFIER_RELOAD_SECONDS", default=30, cast=int)
+
+# Grafo de confiança KMN em memória (ligações Mesh/trustlines; recarregado por signals ou mudança de versão)
+KMN_GRAPH_RELOAD_SECONDS = config("KMN_GRAPH_RELOAD_SECONDS", default=30, cast=int)
+
+# Registro de colunas do banco por processo (views que toleram migrações pendentes)
+SCHEMA_REGISTRY_CHECK_SECONDS = config("SCHEMA_REGISTRY_CHECK_SECONDS", default=300, cast=int)  # verificação de novas migrações
+
+# Contadores/categorias/marcas do catálogo do shopper (shopper_products), em cache por shopper
+SHOPPER_CATALOG_FACETS_TTL = config("SHOPPER_CATALOG_FACETS_TTL", default=300, cast=int)
+
+# Proxy de imagens do SinapUm (/api/images/proxy/): cache em disco com limpeza LRU
+IMAGE_PROXY_CACHE_DIR = config("IMAGE_PROXY_CACHE_DIR", default="")  # vazio = diretório temporário do sistema
+IMAGE_PROXY_CACHE_MAX_MB = config("IMAGE_PROXY_CACHE_MAX_MB", default=512, cast=int)
+IMAGE_PROXY_CACHE_TTL = config("IMAGE_PROXY_CACHE_TTL", default=3600, cast=int)  # revalidação com o upstream (segundos)
+IMAGE_PROXY_MAX_IMAGE_MB = config("IMAGE_PROXY_MAX_IMAGE_MB", default=20, cast=int)
+IMAGE_PROXY_TIMEOUT = config("IMAGE_PROXY_TIMEOUT", default=10, cast=int)
+IMAGE_PROXY_POOL_SIZE = config("IMAGE_PROXY_POOL_SIZE", default=10, cast=int)
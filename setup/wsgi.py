@@ -11,3 +11,7 @@ except Exception:
     print(">>> ERRO AO INICIAR O WSGI <<<", flush=True)
     traceback.print_exc(file=sys.stdout)
     sys.exit(1)
+
+# Registro de colunas do banco, lido uma vez por processo (ver app_marketplace/schema_registry.py)
+from app_marketplace.schema_registry import esquema  # noqa: E402
+esquema.carregar()